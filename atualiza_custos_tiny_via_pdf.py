@@ -21,12 +21,12 @@ Observação importante:
   que não estão cobertos nesta primeira versão. Se desejar, expandimos depois.
 """
 from __future__ import annotations
-import sys, os, csv, time
+import sys, os, csv
 from typing import List, Dict
 
 from modules.nfe_parser import parse_nfe_xml, to_rows
 from modules.pdf_parser import extract_from_pdf
-from modules.tiny_api import atualizar_preco_custo
+from modules.tiny_async import atualizar_precos_custo_paralelo
 from modules.database import get_regra_custo, add_or_update_regra_custo, init_database
 from modules.regras_custo import calcular_custo_item, adicionar_regra as cache_regra
 
@@ -184,20 +184,23 @@ def main():
     print("\nEnviando atualização de custo para o Tiny (preco_custo):")
     ok = 0
     fail = 0
+    custos = {}
     for r in rows2:
         codigo = (r.get('codigo') or '').strip()
         custo = float(r.get('custo_unit_final') or 0.0)
         if not codigo or custo <= 0:
             print(f"  Ignorando item sem código/custo válido: {codigo} -> {custo}")
             continue
-        resp = atualizar_preco_custo(codigo, custo)
-        if isinstance(resp, dict) and resp.get('error'):
-            print(f"  ERRO ao atualizar {codigo}: {resp['error']}")
+        custos[codigo] = custo
+    # Envios em paralelo; o ritmo fica com o limitador/cota do Tiny
+    for codigo, resp in atualizar_precos_custo_paralelo(custos).items():
+        if isinstance(resp, Exception) or not resp.get('ok'):
+            erro = resp if isinstance(resp, Exception) else (resp.get('text') or resp.get('data'))
+            print(f"  ERRO ao atualizar {codigo}: {str(erro)[:200]}")
             fail += 1
         else:
-            print(f"  OK  {codigo}: custo atualizado para {custo:.2f}")
+            print(f"  OK  {codigo}: custo atualizado para {custos[codigo]:.2f}")
             ok += 1
-        time.sleep(0.2)  # rate limit simples
     print(f"\nConcluído. Sucesso: {ok}, Erros: {fail}")
 
 if __name__ == '__main__':
@@ -7,12 +7,40 @@ categoria starting with 'Receita'. Everything else is treated as expense.
 """
 
 from __future__ import annotations
+import os
 from typing import Dict, List, Tuple, Optional
 from sqlalchemy import func
 from datetime import date, datetime, timedelta
 
-from .database import get_db, ContaPagar
-from .cache import cached
+from .database import get_db, ContaPagar, ResumoMensal, resumo_por_periodo, contas_texto_filter
+from .cache import cached, tags_periodo
+
+
+COGS_CATEGORIA = 'Despesa Venda - Custo Produto (Tiny)'
+
+# Entradas invalidadas por commits em contas_pagar (ver database._invalida_cache_tags);
+# o TTL só limita valores órfãos, não a defasagem dos KPIs
+ANALYTICS_TTL = 3600
+
+
+def _tags_periodo(argumentos: Dict) -> List[str]:
+    return tags_periodo('contas_pagar', argumentos.get('data_inicio'), argumentos.get('data_fim'))
+
+
+def _tags_ano(argumentos: Dict) -> List[str]:
+    ano = argumentos.get('ano')
+    return tags_periodo('contas_pagar', date(ano, 1, 1), date(ano, 12, 31)) if ano else tags_periodo('contas_pagar')
+
+# 'sqlite' (padrão) ou 'duckdb' (snapshots Parquet; ver analytics_duckdb.py)
+ANALYTICS_BACKEND = os.getenv('ANALYTICS_BACKEND', 'sqlite').lower()
+
+
+def _olap_backend():
+    """Módulo DuckDB quando habilitado e com snapshot disponível; senão None."""
+    if ANALYTICS_BACKEND != 'duckdb':
+        return None
+    from . import analytics_duckdb
+    return analytics_duckdb if analytics_duckdb.disponivel() else None
 
 
 def _is_revenue(categoria: str | None) -> bool:
@@ -21,7 +49,18 @@ def _is_revenue(categoria: str | None) -> bool:
     return categoria.strip().lower().startswith('receita')
 
 
-@cached(ttl_seconds=300)
+def _soma(totais: Dict, filtro) -> Tuple[int, float]:
+    """Soma (quantidade, valor) das chaves (categoria, status) aceitas pelo filtro."""
+    quantidade, valor = 0, 0.0
+    for (categoria, status), (q, v) in totais.items():
+        if filtro(categoria, status):
+            quantidade += q
+            valor += v
+    return quantidade, valor
+
+
+# Totais gerais dependem da tabela inteira; o padrão "até hoje" muda a cada dia
+@cached(ttl_seconds=ANALYTICS_TTL, tags=tags_periodo('contas_pagar'), diario=True)
 def kpis_global(db=None, data_inicio: Optional[date] = None, data_fim: Optional[date] = None) -> Dict:
     """Compute key KPIs: total contas, pendentes, vencidas, valor pendente,
     receita total (últimos 90 dias), despesa total (últimos 90 dias), saldo líquido.
@@ -39,32 +78,23 @@ def kpis_global(db=None, data_inicio: Optional[date] = None, data_fim: Optional[
         hoje = data_fim or date.today()
         d90 = data_inicio or (hoje - timedelta(days=90))
 
-        # Base query para período
-        base_query = db.query(ContaPagar).filter(ContaPagar.vencimento.between(d90, hoje))
-
-        total_contas = db.query(func.count(ContaPagar.id)).scalar() or 0
-        pendentes = db.query(func.count(ContaPagar.id)).filter(ContaPagar.status == 'Pendente').scalar() or 0
-        valor_pendente = db.query(func.sum(ContaPagar.valor)).filter(ContaPagar.status == 'Pendente').scalar() or 0.0
-        vencidas = db.query(func.count(ContaPagar.id)).filter(ContaPagar.vencimento < hoje, ContaPagar.status == 'Pendente').scalar() or 0
-
-        # Receita e despesa no período especificado
-        receitas_periodo = db.query(func.sum(ContaPagar.valor)).filter(
-            ContaPagar.vencimento.between(d90, hoje),
-            ContaPagar.categoria.isnot(None)
-        ).filter(ContaPagar.categoria.like('Receita%')).scalar() or 0.0
-
-        # COGS (Custo do Produto) - usado para margem de contribuição
-        cogs_periodo = db.query(func.sum(ContaPagar.valor)).filter(
-            ContaPagar.vencimento.between(d90, hoje),
-            ContaPagar.categoria == 'Despesa Venda - Custo Produto (Tiny)'
-        ).scalar() or 0.0
-
-        # Outras despesas (exclui receitas e COGS) para visão de custos operacionais
-        despesas_periodo = db.query(func.sum(ContaPagar.valor)).filter(
-            ContaPagar.vencimento.between(d90, hoje)
-        ).filter(~ContaPagar.categoria.like('Receita%')).filter(
-            ContaPagar.categoria != 'Despesa Venda - Custo Produto (Tiny)'
-        ).scalar() or 0.0
+        # Totais vêm do resumo mensal (contas_resumo_mensal); só meses parciais tocam contas_pagar
+        geral = resumo_por_periodo(db)
+        total_contas, _ = _soma(geral, lambda cat, st: True)
+        pendentes, valor_pendente = _soma(geral, lambda cat, st: st == 'Pendente')
+        vencidas, _ = _soma(
+            resumo_por_periodo(db, data_fim=hoje - timedelta(days=1), status='Pendente'),
+            lambda cat, st: True
+        )
+
+        # Receita, COGS (usado para margem de contribuição) e outras despesas no período
+        periodo = resumo_por_periodo(db, d90, hoje)
+        _, receitas_periodo = _soma(periodo, lambda cat, st: cat.lower().startswith('receita'))
+        _, cogs_periodo = _soma(periodo, lambda cat, st: cat == COGS_CATEGORIA)
+        _, despesas_periodo = _soma(
+            periodo,
+            lambda cat, st: cat and not cat.lower().startswith('receita') and cat != COGS_CATEGORIA
+        )
 
         # Saldo líquido tradicional (Receita - Todas as despesas incluindo COGS)
         saldo_periodo = float(receitas_periodo) - float(despesas_periodo) - float(cogs_periodo)
@@ -92,7 +122,7 @@ def kpis_global(db=None, data_inicio: Optional[date] = None, data_fim: Optional[
             db.close()
 
 
-@cached(ttl_seconds=300)
+@cached(ttl_seconds=ANALYTICS_TTL, tags=_tags_periodo)
 def categorias_sum(db=None, data_inicio: Optional[date] = None, data_fim: Optional[date] = None) -> List[Tuple[str, float]]:
     """Return list of (categoria, soma_valor) sorted desc.
     
@@ -101,29 +131,25 @@ def categorias_sum(db=None, data_inicio: Optional[date] = None, data_fim: Option
         data_inicio: Data inicial do período (opcional)
         data_fim: Data final do período (opcional)
     """
+    olap = _olap_backend()
+    if olap:
+        return olap.categorias_sum(data_inicio, data_fim)
     should_close = False
     if db is None:
         db = get_db()
         should_close = True
     try:
-        query = db.query(ContaPagar.categoria, func.sum(ContaPagar.valor).label('valor')).\
-            filter(ContaPagar.categoria.isnot(None))
-        
-        if data_inicio:
-            query = query.filter(ContaPagar.vencimento >= data_inicio)
-        if data_fim:
-            query = query.filter(ContaPagar.vencimento <= data_fim)
-        
-        rows = query.group_by(ContaPagar.categoria).\
-            order_by(func.sum(ContaPagar.valor).desc()).\
-            all()
-        return [(r[0], float(r[1] or 0.0)) for r in rows]
+        por_categoria = {}
+        for (categoria, _), (_, valor) in resumo_por_periodo(db, data_inicio, data_fim).items():
+            if categoria:
+                por_categoria[categoria] = por_categoria.get(categoria, 0.0) + valor
+        return sorted(por_categoria.items(), key=lambda item: item[1], reverse=True)
     finally:
         if should_close:
             db.close()
 
 
-@cached(ttl_seconds=300)
+@cached(ttl_seconds=ANALYTICS_TTL, tags=_tags_periodo)
 def top_fornecedores(db=None, limit: int = 5, data_inicio: Optional[date] = None, data_fim: Optional[date] = None) -> List[Tuple[str, float]]:
     """Top fornecedores por soma de valor.
     
@@ -133,6 +159,9 @@ def top_fornecedores(db=None, limit: int = 5, data_inicio: Optional[date] = None
         data_inicio: Data inicial do período (opcional)
         data_fim: Data final do período (opcional)
     """
+    olap = _olap_backend()
+    if olap:
+        return olap.top_fornecedores(limit, data_inicio, data_fim)
     should_close = False
     if db is None:
         db = get_db()
@@ -155,7 +184,7 @@ def top_fornecedores(db=None, limit: int = 5, data_inicio: Optional[date] = None
             db.close()
 
 
-@cached(ttl_seconds=300)
+@cached(ttl_seconds=ANALYTICS_TTL, tags=_tags_ano)
 def monthly_series(db=None, ano: Optional[int] = None) -> Dict:
     """Return monthly aggregated series for receita and despesa.
     Output: {
@@ -166,20 +195,22 @@ def monthly_series(db=None, ano: Optional[int] = None) -> Dict:
         db: Sessão de banco de dados (opcional)
         ano: Ano específico para filtrar (padrão: ano atual)
     """
+    olap = _olap_backend()
+    if olap:
+        return olap.monthly_series(ano)
     should_close = False
     if db is None:
         db = get_db()
         should_close = True
     try:
-        query = db.query(ContaPagar.mes, ContaPagar.categoria, func.sum(ContaPagar.valor).label('valor'))
+        query = db.query(ResumoMensal.mes, ResumoMensal.categoria,
+                         func.sum(ResumoMensal.valor_total).label('valor'))
         
         if ano:
-            data_inicio = date(ano, 1, 1)
-            data_fim = date(ano, 12, 31)
-            query = query.filter(ContaPagar.vencimento.between(data_inicio, data_fim))
+            query = query.filter(ResumoMensal.ano == ano)
         
-        rows = query.group_by(ContaPagar.mes, ContaPagar.categoria).\
-            order_by(ContaPagar.mes).\
+        rows = query.group_by(ResumoMensal.mes, ResumoMensal.categoria).\
+            order_by(ResumoMensal.mes).\
             all()
         receita = {i: 0.0 for i in range(1, 13)}
         despesa = {i: 0.0 for i in range(1, 13)}
@@ -209,13 +240,13 @@ def shopee_stats(db=None, days: int = 90) -> Dict:
     try:
         today = date.today()
         since = today - timedelta(days=days)
-        count = db.query(func.count(ContaPagar.id)).\
-            filter(ContaPagar.descricao.like('%Pedido Shopee%'), ContaPagar.vencimento >= since).\
-            scalar() or 0
-        total = db.query(func.sum(ContaPagar.valor)).\
-            filter(ContaPagar.descricao.like('%Pedido Shopee%'), ContaPagar.vencimento >= since).\
-            scalar() or 0.0
-        return {'count': int(count), 'total': float(total or 0.0)}
+        # Índice FTS5 (contas_fts) em vez de LIKE '%Pedido Shopee%' sobre a tabela inteira,
+        # quando o banco já tem o índice
+        count, total = db.query(func.count(ContaPagar.id), func.sum(ContaPagar.valor)).\
+            filter(contas_texto_filter(db, 'Pedido Shopee', colunas=('descricao',), frase=True),
+                   ContaPagar.vencimento >= since).\
+            one()
+        return {'count': int(count or 0), 'total': float(total or 0.0)}
     finally:
         if should_close:
             db.close()
@@ -0,0 +1,102 @@
+"""
+Backend analítico opcional com DuckDB sobre os snapshots Parquet.
+
+Responde categorias_sum, top_fornecedores e monthly_series lendo
+``<PARQUET_DIR>/contas_pagar`` (gerado por parquet_export.py) em vez do
+SQLite transacional. Ativado em analytics.py com ANALYTICS_BACKEND=duckdb;
+sem o pacote duckdb ou sem snapshot, analytics.py continua no SQLite.
+"""
+
+import logging
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .parquet_export import PARQUET_DIR
+
+logger = logging.getLogger('analytics_duckdb')
+
+try:
+    import duckdb  # type: ignore
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    duckdb = None
+    DUCKDB_AVAILABLE = False
+
+
+def _glob_contas(base_dir: Optional[str] = None) -> str:
+    return str(Path(base_dir or PARQUET_DIR) / 'contas_pagar' / '*' / '*' / '*.parquet')
+
+
+def disponivel(base_dir: Optional[str] = None) -> bool:
+    """True se duckdb está instalado e há snapshot de contas_pagar."""
+    return DUCKDB_AVAILABLE and any(Path(base_dir or PARQUET_DIR).glob('contas_pagar/ano=*/mes=*/*.parquet'))
+
+
+def _consulta(sql: str, params: list, base_dir: Optional[str]) -> list:
+    if not DUCKDB_AVAILABLE:
+        raise RuntimeError("duckdb não instalado (pip install duckdb)")
+    fonte = (
+        f"read_parquet('{_glob_contas(base_dir)}', hive_partitioning = true, "
+        "hive_types = {'ano': INTEGER, 'mes': INTEGER})"
+    )
+    with duckdb.connect() as conn:
+        return conn.execute(sql.format(contas=fonte), params).fetchall()
+
+
+def _filtro_periodo(data_inicio: Optional[date], data_fim: Optional[date]) -> Tuple[str, list]:
+    clausulas, params = [], []
+    if data_inicio:
+        # Filtro redundante em ano/mes permite podar partições inteiras
+        clausulas.append("(ano * 12 + mes) >= ? AND vencimento >= ?")
+        params += [data_inicio.year * 12 + data_inicio.month, data_inicio]
+    if data_fim:
+        clausulas.append("(ano * 12 + mes) <= ? AND vencimento <= ?")
+        params += [data_fim.year * 12 + data_fim.month, data_fim]
+    return " AND ".join(clausulas), params
+
+
+def categorias_sum(data_inicio: Optional[date] = None, data_fim: Optional[date] = None,
+                   base_dir: Optional[str] = None) -> List[Tuple[str, float]]:
+    """Mesmo retorno de analytics.categorias_sum."""
+    filtro, params = _filtro_periodo(data_inicio, data_fim)
+    sql = (
+        "SELECT categoria, SUM(valor) FROM {contas} WHERE categoria IS NOT NULL AND categoria <> ''"
+        + (f" AND {filtro}" if filtro else "")
+        + " GROUP BY categoria ORDER BY 2 DESC"
+    )
+    return [(r[0], float(r[1] or 0.0)) for r in _consulta(sql, params, base_dir)]
+
+
+def top_fornecedores(limit: int = 5, data_inicio: Optional[date] = None, data_fim: Optional[date] = None,
+                     base_dir: Optional[str] = None) -> List[Tuple[str, float]]:
+    """Mesmo retorno de analytics.top_fornecedores."""
+    filtro, params = _filtro_periodo(data_inicio, data_fim)
+    sql = (
+        "SELECT fornecedor, SUM(valor) FROM {contas}"
+        + (f" WHERE {filtro}" if filtro else "")
+        + " GROUP BY fornecedor ORDER BY 2 DESC LIMIT ?"
+    )
+    return [(r[0], float(r[1] or 0.0)) for r in _consulta(sql, params + [int(limit)], base_dir)]
+
+
+def monthly_series(ano: Optional[int] = None, base_dir: Optional[str] = None) -> Dict:
+    """Mesmo retorno de analytics.monthly_series."""
+    sql = (
+        "SELECT mes, "
+        "SUM(CASE WHEN lower(trim(categoria)) LIKE 'receita%' THEN valor ELSE 0 END), "
+        "SUM(CASE WHEN lower(trim(coalesce(categoria, ''))) LIKE 'receita%' THEN 0 ELSE valor END) "
+        "FROM {contas}" + (" WHERE ano = ?" if ano else "") + " GROUP BY mes"
+    )
+    receita = {m: 0.0 for m in range(1, 13)}
+    despesa = {m: 0.0 for m in range(1, 13)}
+    for mes, rec, desp in _consulta(sql, [ano] if ano else [], base_dir):
+        if 1 <= mes <= 12:
+            receita[mes] = float(rec or 0.0)
+            despesa[mes] = float(desp or 0.0)
+    return {
+        'mes': list(range(1, 13)),
+        'receita': [receita[m] for m in range(1, 13)],
+        'despesa': [despesa[m] for m in range(1, 13)],
+        'total': [receita[m] + despesa[m] for m in range(1, 13)]
+    }
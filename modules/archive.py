@@ -0,0 +1,276 @@
+"""
+Arquivamento anual de contas_pagar em bancos SQLite anexados.
+
+Contas encerradas (Pago/Cancelado) com vencimento anterior ao horizonte são
+movidas para ``<ARCHIVE_DIR>/contas_<ano>.db`` (mesmo esquema de contas_pagar).
+A tabela quente fica pequena: índices, cache de páginas, alertas e checagens
+de duplicidade passam a trabalhar só com os anos recentes.
+
+O resumo mensal (contas_resumo_mensal) continua cobrindo o histórico inteiro,
+então KPIs e séries mensais não mudam após o arquivamento. Relatórios que
+precisam das linhas antigas usam ``historico()``: os arquivos são anexados com
+ATTACH DATABASE e a view temporária ``contas_pagar_historico`` une tudo.
+
+Observações:
+    - Dedup (ux_contas_dedup_hash) só enxerga a tabela quente: o horizonte
+      deve ser maior que a janela de qualquer re-sincronização.
+    - Meses parciais em anos arquivados, em resumo_por_periodo, contam só as
+      linhas quentes; meses inteiros vêm do resumo e estão completos.
+    - Reexecutar é seguro: linhas já copiadas são sobrescritas pelo id.
+
+Uso:
+    python scripts/archive_contas.py --horizonte 2
+"""
+
+import logging
+import os
+import re
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import Column, MetaData, Table, create_engine, select
+from sqlalchemy.orm import Session
+
+from .cache import invalidate_tags, tags_escrita
+from .database import ContaPagar, engine, get_writer, resumo_incorpora
+
+logger = logging.getLogger('archive')
+
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', os.path.join('data', 'archive'))
+# Anos completos mantidos na tabela quente além do ano corrente
+ARCHIVE_HORIZON_YEARS = int(os.getenv('ARCHIVE_HORIZON_YEARS', '2'))
+STATUS_ENCERRADOS = ('Pago', 'Cancelado')
+
+VIEW_HISTORICO = 'contas_pagar_historico'
+# SQLite padrão permite 10 bancos anexados por conexão
+MAX_ANEXOS = 10
+
+_COLUNAS = [c.name for c in ContaPagar.__table__.columns]
+_ARQUIVO_RE = re.compile(r"^contas_(\d{4})\.db$")
+
+# Tabela Core sobre a view temporária (não faz parte de Base.metadata)
+contas_historico = Table(
+    VIEW_HISTORICO, MetaData(),
+    *[Column(c.name, c.type, primary_key=c.primary_key) for c in ContaPagar.__table__.columns]
+)
+
+
+def caminho_arquivo(ano: int, base_dir: Optional[str] = None) -> Path:
+    return Path(base_dir or ARCHIVE_DIR) / f"contas_{ano:04d}.db"
+
+
+def anos_arquivados(base_dir: Optional[str] = None) -> List[int]:
+    """Anos com arquivo em disco, em ordem crescente."""
+    base = Path(base_dir or ARCHIVE_DIR)
+    if not base.is_dir():
+        return []
+    return sorted(int(m.group(1)) for m in (_ARQUIVO_RE.match(p.name) for p in base.iterdir()) if m)
+
+
+def data_corte(horizonte_anos: Optional[int] = None, hoje: Optional[date] = None) -> date:
+    """Primeiro dia que permanece na tabela quente."""
+    horizonte = ARCHIVE_HORIZON_YEARS if horizonte_anos is None else horizonte_anos
+    return date((hoje or date.today()).year - horizonte, 1, 1)
+
+
+def _alias(ano: int) -> str:
+    return f"arq_{ano:04d}"
+
+
+def _prepara_arquivo(caminho: Path):
+    """Cria o arquivo do ano com o esquema de contas_pagar (idempotente)."""
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    destino = create_engine(f"sqlite:///{caminho}")
+    try:
+        ContaPagar.__table__.create(destino, checkfirst=True)
+        with destino.begin() as conn:
+            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_contas_vencimento ON contas_pagar (vencimento)")
+    finally:
+        destino.dispose()
+
+
+def _arquiva_ano(conn, ano: int, corte: date, base_dir: Optional[str]) -> int:
+    caminho = caminho_arquivo(ano, base_dir)
+    _prepara_arquivo(caminho)
+    alias = _alias(ano)
+    colunas = ", ".join(_COLUNAS)
+    conn.exec_driver_sql(f"ATTACH DATABASE ? AS {alias}", (str(caminho),))
+    conn.commit()
+    try:
+        with conn.begin():
+            max_id = conn.exec_driver_sql("SELECT MAX(id) FROM main.contas_pagar").scalar()
+            # Nunca move o maior id: sem AUTOINCREMENT ele seria reutilizado por uma conta nova
+            filtro = (
+                "vencimento >= ? AND vencimento < ? AND id < ? "
+                f"AND status IN ({', '.join('?' for _ in STATUS_ENCERRADOS)})"
+            )
+            fim = min(date(ano + 1, 1, 1), corte)
+            params = (date(ano, 1, 1).isoformat(), fim.isoformat(), max_id, *STATUS_ENCERRADOS)
+            movidas = conn.exec_driver_sql(
+                f"INSERT OR REPLACE INTO {alias}.contas_pagar ({colunas}) "
+                f"SELECT {colunas} FROM main.contas_pagar WHERE {filtro}", params
+            ).rowcount
+            # A trigger de DELETE desconta as linhas do resumo; somá-las antes mantém o histórico completo
+            resumo_incorpora(conn, 'main.contas_pagar', filtro, params)
+            conn.exec_driver_sql(f"DELETE FROM main.contas_pagar WHERE {filtro}", params)
+    finally:
+        conn.exec_driver_sql(f"DETACH DATABASE {alias}")
+        conn.commit()
+    return movidas
+
+
+def archive_contas(horizonte_anos: Optional[int] = None, hoje: Optional[date] = None, bind=None,
+                   base_dir: Optional[str] = None, dry_run: bool = False) -> Dict:
+    """Move contas encerradas anteriores ao horizonte para os arquivos anuais.
+
+    Args:
+        horizonte_anos: Anos completos mantidos além do corrente (padrão: ARCHIVE_HORIZON_YEARS).
+        hoje: Data de referência (testes).
+        bind: Engine alternativo (padrão: engine do módulo database).
+        base_dir: Diretório dos arquivos (padrão: ARCHIVE_DIR).
+        dry_run: Só conta as linhas elegíveis por ano.
+
+    Returns:
+        Dict com data de corte e linhas movidas por ano.
+    """
+    bind = bind or engine
+    corte = data_corte(horizonte_anos, hoje)
+    stats = {'corte': corte, 'anos': {}}
+
+    def _arquiva():
+        with bind.connect() as conn:
+            rows = conn.exec_driver_sql(
+                "SELECT CAST(strftime('%Y', vencimento) AS INTEGER), COUNT(*) FROM contas_pagar "
+                f"WHERE vencimento < ? AND status IN ({', '.join('?' for _ in STATUS_ENCERRADOS)}) "
+                "GROUP BY 1 ORDER BY 1",
+                (corte.isoformat(), *STATUS_ENCERRADOS)
+            ).fetchall()
+            conn.commit()
+            for ano, elegiveis in rows:
+                stats['anos'][ano] = elegiveis if dry_run else _arquiva_ano(conn, ano, corte, base_dir)
+        return stats
+
+    # Escritas no banco padrão passam pelo writer serializado do processo
+    resultado = get_writer().run(_arquiva) if bind is engine and not dry_run else _arquiva()
+    if any(resultado['anos'].values()) and not dry_run:
+        # Escrita fora do ORM: os hooks de sessão não veem o DELETE
+        invalidate_tags(tags_escrita('contas_pagar'))
+    logger.info(f"Arquivamento (corte {corte}): {resultado['anos']}")
+    return resultado
+
+
+def lotes_anos(anos: Iterable[int], tamanho: int = MAX_ANEXOS - 1) -> List[List[int]]:
+    """Divide ``anos`` em lotes que cabem numa conexão (o banco principal ocupa um anexo)."""
+    anos = list(anos)
+    return [anos[i:i + tamanho] for i in range(0, len(anos), tamanho)]
+
+
+def _anexa(conn, anos: Iterable[int], base_dir: Optional[str]) -> List[int]:
+    anos = [a for a in anos if caminho_arquivo(a, base_dir).exists()]
+    if len(anos) > MAX_ANEXOS - 1:
+        raise ValueError(f"Máximo de {MAX_ANEXOS - 1} anos arquivados por consulta (pedidos: {len(anos)}); "
+                         "use lotes_anos()")
+    for ano in anos:
+        conn.exec_driver_sql(f"ATTACH DATABASE ? AS {_alias(ano)}", (str(caminho_arquivo(ano, base_dir)),))
+    conn.commit()
+    return anos
+
+
+def _desanexa(conn, anos: Iterable[int]):
+    conn.rollback()
+    conn.exec_driver_sql(f"DROP VIEW IF EXISTS temp.{VIEW_HISTORICO}")
+    for ano in anos:
+        conn.exec_driver_sql(f"DETACH DATABASE {_alias(ano)}")
+    conn.commit()
+
+
+def _cria_view(conn, anos: Iterable[int]):
+    colunas = ", ".join(_COLUNAS)
+    partes = [f"SELECT {colunas} FROM main.contas_pagar"]
+    partes += [f"SELECT {colunas} FROM {_alias(ano)}.contas_pagar" for ano in anos]
+    conn.exec_driver_sql(f"DROP VIEW IF EXISTS temp.{VIEW_HISTORICO}")
+    conn.exec_driver_sql(f"CREATE TEMP VIEW {VIEW_HISTORICO} AS " + " UNION ALL ".join(partes))
+    conn.commit()
+
+
+@contextmanager
+def conexao_historico(bind=None, anos: Optional[Iterable[int]] = None, base_dir: Optional[str] = None):
+    """Conexão com os anos arquivados anexados e a view ``contas_pagar_historico``.
+
+    Args:
+        anos: Anos a anexar (padrão: todos em disco). Anexe só os necessários:
+            o SQLite limita a quantidade de bancos por conexão (MAX_ANEXOS - 1
+            anos); acima disso percorra ``lotes_anos()``.
+    """
+    bind = bind or engine
+    with bind.connect() as conn:
+        anexados = _anexa(conn, anos_arquivados(base_dir) if anos is None else anos, base_dir)
+        try:
+            _cria_view(conn, anexados)
+            yield conn
+        finally:
+            _desanexa(conn, anexados)
+
+
+@contextmanager
+def historico(bind=None, anos: Optional[Iterable[int]] = None, base_dir: Optional[str] = None):
+    """Sessão ORM sobre conexao_historico; consulte ``contas_historico`` (tabela Core da view)."""
+    with conexao_historico(bind, anos, base_dir) as conn:
+        db = Session(bind=conn)
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+def contas_por_periodo(data_inicio: date, data_fim: date, bind=None, base_dir: Optional[str] = None) -> List[Dict]:
+    """Contas (quentes e arquivadas) com vencimento em [data_inicio, data_fim], por vencimento."""
+    anos = [a for a in anos_arquivados(base_dir) if data_inicio.year <= a <= data_fim.year]
+    with historico(bind, anos, base_dir) as db:
+        rows = db.execute(
+            select(contas_historico)
+            .where(contas_historico.c.vencimento.between(data_inicio, data_fim))
+            .order_by(contas_historico.c.vencimento, contas_historico.c.id)
+        ).mappings().all()
+        return [dict(r) for r in rows]
+
+
+def rebuild_resumo_com_arquivo(bind=None, base_dir: Optional[str] = None) -> int:
+    """Como database.rebuild_resumo_mensal, somando também os anos arquivados.
+
+    Os anos arquivados são agregados em lotes de até MAX_ANEXOS - 1 numa tabela
+    temporária; o resumo é trocado numa única transação no fim.
+    """
+    bind = bind or engine
+    with bind.connect() as conn:
+        conn.exec_driver_sql("DROP TABLE IF EXISTS temp.resumo_arquivo")
+        conn.exec_driver_sql(
+            "CREATE TEMP TABLE resumo_arquivo (ano INTEGER, mes INTEGER, categoria TEXT, status TEXT, "
+            "quantidade INTEGER, valor_total REAL, PRIMARY KEY (ano, mes, categoria, status))"
+        )
+        conn.commit()
+        try:
+            for lote in lotes_anos(anos_arquivados(base_dir)):
+                anexados = _anexa(conn, lote, base_dir)
+                try:
+                    with conn.begin():
+                        for ano in anexados:
+                            resumo_incorpora(conn, f"{_alias(ano)}.contas_pagar", destino='temp.resumo_arquivo')
+                finally:
+                    _desanexa(conn, anexados)
+            with conn.begin():
+                conn.exec_driver_sql("DELETE FROM main.contas_resumo_mensal")
+                resumo_incorpora(conn, 'main.contas_pagar')
+                conn.exec_driver_sql(
+                    "INSERT INTO main.contas_resumo_mensal (ano, mes, categoria, status, quantidade, valor_total) "
+                    "SELECT ano, mes, categoria, status, quantidade, valor_total FROM temp.resumo_arquivo "
+                    "WHERE true ON CONFLICT (ano, mes, categoria, status) DO UPDATE SET "
+                    "quantidade = quantidade + excluded.quantidade, "
+                    "valor_total = valor_total + excluded.valor_total"
+                )
+                return conn.exec_driver_sql("SELECT COUNT(*) FROM main.contas_resumo_mensal").scalar() or 0
+        finally:
+            conn.exec_driver_sql("DROP TABLE IF EXISTS temp.resumo_arquivo")
+            conn.commit()
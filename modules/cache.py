@@ -1,9 +1,51 @@
 """
 Módulo de cache persistente com Redis para HUB Financeiro MLH.
 Substitui o cache em memória por uma solução persistente e escalável.
+
+Cache em dois níveis para funções (decorator ``cached``):
+    L1: LRU em memória do processo, com TTL e tamanho máximo (CACHE_L1_MAXSIZE).
+        Compartilhado por todas as sessões Streamlit do mesmo servidor.
+    L2: Redis, quando disponível (valores serializados por cache_codec). Sem
+        Redis instalado ou acessível, cache em disco (disk_cache.DiskCache,
+        SQLite com TTL e LRU), que persiste entre reinícios; force com
+        CACHE_BACKEND=redis|disk. Após uma falha de conexão o L2 fica
+        desligado por CACHE_L2_RETRY segundos.
+
+Chaves: ``mlh:<namespace>:<função>:<hash dos argumentos>``. O argumento ``db``
+(sessão SQLAlchemy) não entra na chave. Invalidação com ``invalidate_cache``
+por chave, prefixo ou namespace; ``clear_cache`` limpa os dois níveis.
+
+Tags: cada entrada pode declarar as tabelas/meses de que depende (ver
+``tags_periodo``). O índice tag -> chaves fica num SET Redis
+(``mlh:tag:<tag>``) e num dicionário local; ``invalidate_tags`` apaga só as
+entradas afetadas. database.py chama ``invalidate_tags`` após cada commit que
+altera contas_pagar e demais modelos, então os TTLs podem ser longos.
+
+Single-flight: ``single_flight`` garante uma só carga por chave quando muitas
+sessões erram o cache ao mesmo tempo (threads esperam o líder; processos
+esperam a lease ``mlh:lease:<chave>`` no Redis). Usado por cache_wrapper.
+
+Exemplo:
+    @cached(ttl_seconds=3600, tags=lambda a: tags_periodo('contas_pagar', a['data_inicio'], a['data_fim']))
+    def categorias_sum(db=None, data_inicio=None, data_fim=None): ...
+
+    invalidate_cache(namespace='analytics')
 """
 
+import inspect
+import logging
 import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from . import config
+from .cache_codec import decode, encode, hash_key
+from .disk_cache import DiskCache
 
 try:
     if os.getenv('TESTING'):
@@ -18,45 +60,105 @@ except ImportError:
     REDIS_AVAILABLE = False
     _redis_module = None
 
+logger = logging.getLogger('cache')
+
+# Chaves por MGET/pipeline (limita o tamanho de cada comando)
+CACHE_BATCH_SIZE = 500
+
+# redis | disk | auto (Redis se responder ao PING, senão cache em disco)
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'auto').lower()
+
 # Cache de cliente global para evitar múltiplas conexões
+_pools = {}
 _client_cache = None
+_binary_client_cache = None
+_fake_server = None
+_disk_cache = None
+
+
+def _disco(decode_responses: bool) -> DiskCache:
+    global _disk_cache
+    if _disk_cache is None:
+        _disk_cache = DiskCache()
+    return _disk_cache.with_decode(decode_responses)
+
+
+def _novo_cliente(decode_responses: bool):
+    global _fake_server
+    if CACHE_BACKEND == 'disk' or not REDIS_AVAILABLE:
+        return _disco(decode_responses)
+    if os.getenv('TESTING'):
+        # Clientes texto e binário precisam enxergar o mesmo servidor falso
+        if _fake_server is None:
+            _fake_server = _redis_module.FakeServer()
+        return _redis_module.FakeStrictRedis(server=_fake_server, decode_responses=decode_responses)
+    if _disk_cache is not None:
+        # O outro cliente (texto/binário) já caiu para o disco
+        return _disco(decode_responses)
+    client = _redis_module.Redis(connection_pool=_pool(decode_responses))
+    if CACHE_BACKEND == 'auto':
+        try:
+            client.ping()
+        except Exception as e:
+            logger.warning(f"Redis inacessível ({e}); usando cache em disco")
+            return _disco(decode_responses)
+    return client
+
+
+def _pool(decode_responses: bool):
+    """Pool de conexões do REDIS_URL (um por modo de decodificação)."""
+    if decode_responses not in _pools:
+        _pools[decode_responses] = _redis_module.ConnectionPool.from_url(
+            config.REDIS_URL,
+            max_connections=config.REDIS_MAX_CONNECTIONS,
+            socket_timeout=config.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=config.REDIS_CONNECT_TIMEOUT,
+            health_check_interval=30,
+            decode_responses=decode_responses,
+        )
+    return _pools[decode_responses]
+
+
+def cache_backend() -> str:
+    """'redis' ou 'disk': backend efetivo do L2."""
+    return 'disk' if isinstance(get_redis_binary_client(), DiskCache) else 'redis'
 
 
 def get_redis_client():
     """
-    Retorna um cliente Redis conectado ao localhost:6379 ou fake Redis em testes.
-    Usa cache de cliente global para reutilizar a mesma conexão.
-    
+    Retorna um cliente Redis (REDIS_URL, pool de até REDIS_MAX_CONNECTIONS
+    conexões com timeouts) ou fake Redis em testes. Sem Redis (não instalado ou inacessível) devolve o cache em disco
+    (DiskCache, mesma interface). Usa cache de cliente global para reutilizar
+    a mesma conexão.
+
     Returns:
-        redis.Redis: Cliente Redis configurado.
+        redis.Redis | DiskCache: Cliente configurado.
     """
     global _client_cache
-    
-    if not REDIS_AVAILABLE:
-        raise RuntimeError("Redis não está instalado. Execute: pip install redis")
-    
-    if _client_cache is not None:
-        return _client_cache
-    
-    if os.getenv('TESTING'):
-        _client_cache = _redis_module.FakeStrictRedis(decode_responses=True)
-    else:
-        _client_cache = _redis_module.Redis(host='localhost', port=6379, db=0, decode_responses=True)
-    
+
+    if _client_cache is None:
+        _client_cache = _novo_cliente(decode_responses=True)
     return _client_cache
 
 
+def get_redis_binary_client():
+    """Cliente sem decodificação (valores binários do cache L2)."""
+    global _binary_client_cache
+
+    if _binary_client_cache is None:
+        _binary_client_cache = _novo_cliente(decode_responses=False)
+    return _binary_client_cache
+
+
 def cache_set(key, value, expire=3600):
     """
     Salva um valor no cache Redis com tempo de expiração (segundos).
-    
+
     Args:
         key (str): Chave do cache.
         value (Any): Valor a ser armazenado.
         expire (int): Tempo de expiração em segundos (padrão: 3600).
     """
-    if not REDIS_AVAILABLE:
-        return  # Silenciosamente falha se Redis não está disponível
     try:
         client = get_redis_client()
         client.set(key, value, ex=expire)
@@ -67,15 +169,13 @@ def cache_set(key, value, expire=3600):
 def cache_get(key):
     """
     Recupera um valor do cache Redis.
-    
+
     Args:
         key (str): Chave do cache.
-    
+
     Returns:
         Any: Valor armazenado ou None se não encontrado/expirado.
     """
-    if not REDIS_AVAILABLE:
-        return None
     try:
         client = get_redis_client()
         return client.get(key)
@@ -84,14 +184,580 @@ def cache_get(key):
         return None
 
 
+def cache_set_value(key, value, expire=3600):
+    """Como ``cache_set``, mas serializa ``value`` com cache_codec (dates, Decimal, dataclasses)."""
+    try:
+        get_redis_binary_client().set(key, encode(value), ex=expire)
+    except Exception as e:
+        print(f"Erro ao salvar no cache: {e}")
+
+
+def cache_get_value(key, default=None):
+    """Lê um valor gravado por ``cache_set_value`` (aceita também JSON legado)."""
+    try:
+        bruto = get_redis_binary_client().get(key)
+        return default if bruto is None else decode(bruto)
+    except Exception as e:
+        print(f"Erro ao recuperar do cache: {e}")
+        return default
+
+
+def cache_get_many(keys: Iterable[str]) -> Dict[str, Any]:
+    """Lê várias chaves gravadas com ``cache_set_value``/``cache_set_many`` numa ida ao servidor (MGET).
+
+    Returns:
+        Dict só com as chaves encontradas.
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return {}
+    try:
+        client = get_redis_binary_client()
+        encontrados = {}
+        for i in range(0, len(keys), CACHE_BATCH_SIZE):
+            lote = keys[i:i + CACHE_BATCH_SIZE]
+            for key, bruto in zip(lote, client.mget(lote)):
+                if bruto is not None:
+                    encontrados[key] = decode(bruto)
+        return encontrados
+    except Exception as e:
+        print(f"Erro ao recuperar do cache: {e}")
+        return {}
+
+
+def cache_set_many(mapping: Dict[str, Any], expire=3600):
+    """Grava vários valores (cache_codec) com o mesmo TTL num pipeline."""
+    if not mapping:
+        return
+    try:
+        client = get_redis_binary_client()
+        itens = list(mapping.items())
+        for i in range(0, len(itens), CACHE_BATCH_SIZE):
+            pipe = client.pipeline(transaction=False)
+            for key, value in itens[i:i + CACHE_BATCH_SIZE]:
+                pipe.set(key, encode(value), ex=expire)
+            pipe.execute()
+    except Exception as e:
+        print(f"Erro ao salvar no cache: {e}")
+
+
 def cache_clear():
     """
     Limpa todo o cache Redis.
     """
-    if not REDIS_AVAILABLE:
-        return  # Silenciosamente falha se Redis não está disponível
     try:
         client = get_redis_client()
         client.flushdb()
     except Exception as e:
         print(f"Erro ao limpar cache: {e}")
+    _l1.clear()
+
+
+# --- Cache em dois níveis (decorator cached) ---
+
+CACHE_PREFIX = 'mlh:'
+CACHE_L1_MAXSIZE = int(os.getenv('CACHE_L1_MAXSIZE', '1024'))
+# TTL máximo no L1: limita quanto tempo outro processo pode ver um valor já invalidado
+CACHE_L1_MAX_TTL = int(os.getenv('CACHE_L1_MAX_TTL', '300'))
+CACHE_L2_RETRY = int(os.getenv('CACHE_L2_RETRY', '30'))
+
+_MISS = object()
+
+
+class LRUCache:
+    """LRU thread-safe com TTL por entrada."""
+
+    def __init__(self, maxsize: int = CACHE_L1_MAXSIZE):
+        self.maxsize = maxsize
+        self._dados: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default=_MISS):
+        with self._lock:
+            item = self._dados.get(key)
+            if item is None:
+                return default
+            expira, valor = item
+            if expira <= time.monotonic():
+                del self._dados[key]
+                return default
+            self._dados.move_to_end(key)
+            return valor
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._dados[key] = (time.monotonic() + ttl, value)
+            self._dados.move_to_end(key)
+            while len(self._dados) > self.maxsize:
+                self._dados.popitem(last=False)
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._dados.pop(key, None) is not None
+
+    def delete_prefix(self, prefix: str) -> int:
+        with self._lock:
+            chaves = [k for k in self._dados if k.startswith(prefix)]
+            for k in chaves:
+                del self._dados[k]
+            return len(chaves)
+
+    def clear(self):
+        with self._lock:
+            self._dados.clear()
+
+    def __len__(self):
+        return len(self._dados)
+
+
+_l1 = LRUCache()
+_l2_desligado_ate = 0.0
+_stats = {'l1_hits': 0, 'l2_hits': 0, 'misses': 0, 'l2_errors': 0}
+
+
+def _l2():
+    """Cliente binário do L2 (Redis ou disco) ou None (em espera após falha)."""
+    if time.monotonic() < _l2_desligado_ate:
+        return None
+    try:
+        return get_redis_binary_client()
+    except Exception:
+        return None
+
+
+def _l2_falhou(e: Exception):
+    global _l2_desligado_ate
+    _stats['l2_errors'] += 1
+    _l2_desligado_ate = time.monotonic() + CACHE_L2_RETRY
+    logger.warning(f"Redis indisponível, cache L2 desligado por {CACHE_L2_RETRY}s: {e}")
+
+
+def get_cached_value(key: str, default=None):
+    """Lê ``key`` do L1 e, se ausente, do L2 (promovendo para o L1)."""
+    valor = _l1.get(key)
+    if valor is not _MISS:
+        _stats['l1_hits'] += 1
+        return valor
+    client = _l2()
+    if client is not None:
+        try:
+            bruto = client.get(key)
+            if bruto is not None:
+                ttl = client.ttl(key)
+                valor = decode(bruto)
+                _l1.set(key, valor, min(ttl if ttl and ttl > 0 else CACHE_L1_MAX_TTL, CACHE_L1_MAX_TTL))
+                _stats['l2_hits'] += 1
+                return valor
+        except Exception as e:
+            _l2_falhou(e)
+    _stats['misses'] += 1
+    return default
+
+
+def set_cached_value(key: str, value: Any, ttl_seconds: int):
+    """Grava ``value`` nos dois níveis."""
+    _l1.set(key, value, min(ttl_seconds, CACHE_L1_MAX_TTL))
+    client = _l2()
+    if client is None:
+        return
+    try:
+        dados = encode(value)
+    except (TypeError, AttributeError, pickle.PicklingError) as e:
+        # Valor não serializável: só esta chave fica fora do L2 (o L2 continua ligado)
+        logger.warning(f"Valor de {key} não serializável, gravado só no L1: {e}")
+        return
+    try:
+        client.set(key, dados, ex=int(ttl_seconds))
+    except Exception as e:
+        _l2_falhou(e)
+
+
+def invalidate_cache(key: Optional[str] = None, prefix: Optional[str] = None,
+                     namespace: Optional[str] = None) -> int:
+    """Remove entradas dos dois níveis.
+
+    Args:
+        key: Chave completa (como devolvida por ``func.cache_key(...)``).
+        prefix: Prefixo após ``mlh:`` (ex.: 'analytics:kpis_global').
+        namespace: Namespace inteiro (ex.: 'analytics').
+
+    Returns:
+        Quantidade de entradas removidas do L1 (o L2 é limpo sem contagem).
+    """
+    if key is None and prefix is None and namespace is None:
+        raise ValueError("Informe key, prefix ou namespace")
+    removidas = 0
+    padroes = []
+    if key is not None:
+        removidas += int(_l1.delete(key))
+    if prefix is not None:
+        padroes.append(CACHE_PREFIX + prefix)
+    if namespace is not None:
+        padroes.append(f"{CACHE_PREFIX}{namespace}:")
+    for padrao in padroes:
+        removidas += _l1.delete_prefix(padrao)
+
+    client = _l2()
+    if client is not None:
+        try:
+            if key is not None:
+                client.delete(key)
+            for padrao in padroes:
+                _apaga_padrao(client, padrao + '*')
+        except Exception as e:
+            _l2_falhou(e)
+    return removidas
+
+
+def _apaga_padrao(client, padrao: str):
+    # SCAN em lotes: KEYS bloquearia o Redis inteiro
+    lote = []
+    for chave in client.scan_iter(match=padrao, count=500):
+        lote.append(chave)
+        if len(lote) >= 500:
+            client.delete(*lote)
+            lote = []
+    if lote:
+        client.delete(*lote)
+
+
+def clear_cache():
+    """Limpa todas as entradas do decorator ``cached`` (L1 e chaves ``mlh:*`` no Redis)."""
+    _l1.clear()
+    with _tags_lock:
+        _tag_index.clear()
+    client = _l2()
+    if client is not None:
+        try:
+            _apaga_padrao(client, CACHE_PREFIX + '*')
+        except Exception as e:
+            _l2_falhou(e)
+
+
+def cache_stats() -> Dict:
+    """Acertos por nível, faltas e tamanho atual do L1."""
+    total = _stats['l1_hits'] + _stats['l2_hits'] + _stats['misses']
+    return {
+        **_stats,
+        'l1_size': len(_l1),
+        'hit_rate': (_stats['l1_hits'] + _stats['l2_hits']) / total if total else 0.0,
+    }
+
+
+# --- Single-flight (proteção contra estouro de cache) ---
+
+LEASE_PREFIX = CACHE_PREFIX + 'lease:'
+# Validade da lease entre processos: limita a espera se o líder morrer
+CACHE_LEASE_MS = int(os.getenv('CACHE_LEASE_MS', '30000'))
+CACHE_LEASE_POLL = 0.05
+
+
+class _Voo:
+    """Carga em andamento de uma chave no processo (líder + threads à espera)."""
+
+    __slots__ = ('evento', 'valor', 'erro')
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.valor = None
+        self.erro = None
+
+
+_voos: Dict[str, _Voo] = {}
+_voos_lock = threading.Lock()
+
+
+def single_flight(key: str, carregar: Callable[[], Any], ler_cache: Callable[[], Any],
+                  lease_ms: Optional[int] = None) -> tuple:
+    """Executa ``carregar`` uma única vez por chave, entre threads e processos.
+
+    Threads do processo esperam o líder num Event; outros processos esperam a
+    lease ``mlh:lease:<key>`` (SET NX PX) e leem o valor com ``ler_cache``.
+    ``carregar`` deve gravar o resultado no cache antes de retornar.
+
+    Returns:
+        (valor, lider): ``lider`` é False quando o valor veio de outra carga.
+    """
+    lease_ms = lease_ms or CACHE_LEASE_MS
+    with _voos_lock:
+        voo = _voos.get(key)
+        lider = voo is None
+        if lider:
+            voo = _voos[key] = _Voo()
+    if not lider:
+        if not voo.evento.wait(lease_ms / 1000):
+            return carregar(), True
+        if voo.erro is not None:
+            raise voo.erro
+        return voo.valor, False
+    try:
+        voo.valor, lider = _voo_entre_processos(key, carregar, ler_cache, lease_ms)
+        return voo.valor, lider
+    except Exception as e:
+        voo.erro = e
+        raise
+    finally:
+        with _voos_lock:
+            _voos.pop(key, None)
+        voo.evento.set()
+
+
+def _voo_entre_processos(key: str, carregar: Callable[[], Any], ler_cache: Callable[[], Any],
+                         lease_ms: int) -> tuple:
+    client = _l2()
+    if client is None:
+        return carregar(), True
+    nome = LEASE_PREFIX + key
+    token = os.urandom(8).hex()
+    limite = time.monotonic() + 2 * lease_ms / 1000
+    while time.monotonic() < limite:
+        try:
+            obtida = client.set(nome, token, nx=True, px=lease_ms)
+        except Exception as e:
+            _l2_falhou(e)
+            break
+        if obtida:
+            try:
+                return carregar(), True
+            finally:
+                _libera_lease(client, nome, token)
+        valor = _espera_lider(client, nome, ler_cache)
+        if valor is not None:
+            return valor, False
+        # Líder terminou sem gravar (None ou erro) ou morreu: tenta assumir a lease
+    return carregar(), True
+
+
+def _espera_lider(client, nome: str, ler_cache: Callable[[], Any]):
+    """Espera a lease de outro processo sumir; devolve o valor se ele o gravou."""
+    try:
+        while client.exists(nome):
+            time.sleep(CACHE_LEASE_POLL)
+            valor = ler_cache()
+            if valor is not None:
+                return valor
+    except Exception as e:
+        _l2_falhou(e)
+    return ler_cache()
+
+
+def acquire_lease(key: str, lease_ms: Optional[int] = None) -> Optional[str]:
+    """Tenta obter a lease de carga de ``key`` sem esperar.
+
+    Returns:
+        Token para ``release_lease`` ou None se outro processo já está carregando.
+        Sem Redis a coordenação é só local e a lease é sempre concedida.
+    """
+    token = os.urandom(8).hex()
+    client = _l2()
+    if client is None:
+        return token
+    try:
+        if client.set(LEASE_PREFIX + key, token, nx=True, px=lease_ms or CACHE_LEASE_MS):
+            return token
+        return None
+    except Exception as e:
+        _l2_falhou(e)
+        return token
+
+
+def release_lease(key: str, token: str):
+    client = _l2()
+    if client is not None:
+        _libera_lease(client, LEASE_PREFIX + key, token)
+
+
+def _libera_lease(client, nome: str, token: str):
+    """Apaga a lease só se ainda for nossa (pode ter expirado e sido tomada)."""
+    if isinstance(client, DiskCache):
+        client.delete_if_equal(nome, token)
+        return
+    try:
+        with client.pipeline() as pipe:
+            pipe.watch(nome)
+            atual = pipe.get(nome)
+            if atual == token.encode():
+                pipe.multi()
+                pipe.delete(nome)
+                pipe.execute()
+    except Exception as e:
+        # WatchError: outro processo mexeu na lease; ela expira sozinha
+        logger.debug(f"Lease {nome} não liberada: {e}")
+
+
+# --- Tags (dependências de tabela/período) ---
+
+TAG_PREFIX = CACHE_PREFIX + 'tag:'
+# Validade dos SETs de tags no Redis (renovada a cada entrada nova)
+CACHE_TAG_TTL = int(os.getenv('CACHE_TAG_TTL', str(7 * 24 * 3600)))
+# Períodos mais longos que isso viram dependência da tabela inteira
+TAG_MAX_MESES = 36
+
+_tag_index: Dict[str, Set[str]] = {}
+_tag_geracao: Dict[str, int] = {}
+_tags_lock = threading.Lock()
+
+
+def tags_periodo(tabela: str, inicio: Optional[date] = None, fim: Optional[date] = None) -> List[str]:
+    """Tags de uma leitura de ``tabela`` no intervalo [inicio, fim].
+
+    Sempre inclui ``tabela`` (qualquer escrita sem mês conhecido invalida).
+    Intervalos fechados geram ``tabela:AAAA-MM`` por mês; abertos ou longos, ``tabela:*``.
+    """
+    tags = [tabela]
+    if inicio is None or fim is None or inicio > fim:
+        return tags + [f"{tabela}:*"]
+    meses = (fim.year - inicio.year) * 12 + fim.month - inicio.month + 1
+    if meses > TAG_MAX_MESES:
+        return tags + [f"{tabela}:*"]
+    ano, mes = inicio.year, inicio.month
+    for _ in range(meses):
+        tags.append(f"{tabela}:{ano:04d}-{mes:02d}")
+        ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+    return tags
+
+
+def tags_escrita(tabela: str, datas: Iterable[Optional[date]] = ()) -> Set[str]:
+    """Tags invalidadas por uma escrita em ``tabela`` nas datas informadas.
+
+    Sem datas (ou com alguma desconhecida) a escrita invalida a tabela inteira.
+    """
+    datas = list(datas)
+    if not datas or any(d is None for d in datas):
+        return {tabela}
+    return {f"{tabela}:*"} | {f"{tabela}:{d.year:04d}-{d.month:02d}" for d in datas}
+
+
+def register_tags(key: str, tags: Iterable[str], ttl_seconds: int = CACHE_TAG_TTL):
+    """Associa ``key`` às tags (índice local e SETs no Redis)."""
+    tags = set(tags)
+    if not tags:
+        return
+    with _tags_lock:
+        for tag in tags:
+            chaves = _tag_index.setdefault(tag, set())
+            chaves.add(key)
+            if len(chaves) > 4 * CACHE_L1_MAXSIZE:
+                # Remove chaves que já saíram do L1 (evita crescimento sem limite)
+                chaves.intersection_update(k for k in list(chaves) if _l1.get(k) is not _MISS)
+    client = _l2()
+    if client is not None:
+        try:
+            pipe = client.pipeline(transaction=False)
+            for tag in tags:
+                pipe.sadd(TAG_PREFIX + tag, key)
+                pipe.expire(TAG_PREFIX + tag, max(int(ttl_seconds), CACHE_TAG_TTL))
+            pipe.execute()
+        except Exception as e:
+            _l2_falhou(e)
+
+
+def invalidate_tags(tags: Iterable[str]) -> int:
+    """Apaga todas as entradas associadas a qualquer uma das tags.
+
+    Returns:
+        Quantidade de entradas removidas do L1.
+    """
+    tags = set(tags)
+    if not tags:
+        return 0
+    removidas = 0
+    with _tags_lock:
+        chaves = set()
+        for tag in tags:
+            chaves |= _tag_index.pop(tag, set())
+            _tag_geracao[tag] = _tag_geracao.get(tag, 0) + 1
+    for chave in chaves:
+        removidas += int(_l1.delete(chave))
+    client = _l2()
+    if client is not None:
+        try:
+            nomes = [TAG_PREFIX + t for t in tags]
+            pipe = client.pipeline(transaction=False)
+            for nome in nomes:
+                pipe.smembers(nome)
+            membros = set()
+            for resultado in pipe.execute():
+                membros |= set(resultado or ())
+            lista = list(membros)
+            for i in range(0, len(lista), 500):
+                client.delete(*lista[i:i + 500])
+            client.delete(*nomes)
+        except Exception as e:
+            _l2_falhou(e)
+    logger.debug(f"Tags invalidadas {sorted(tags)}: {removidas} entradas locais")
+    return removidas
+
+
+def _geracoes(tags: Iterable[str]) -> tuple:
+    with _tags_lock:
+        return tuple(_tag_geracao.get(t, 0) for t in tags)
+
+
+# Argumentos que não identificam o resultado (sessão de banco, instância)
+_ARGS_IGNORADOS = ('db', 'self')
+
+
+def _hash_argumentos(argumentos: Dict) -> str:
+    return hash_key(**argumentos)
+
+
+def _origem_leitura(db) -> Optional[str]:
+    """Snapshot de onde a sessão lê (``session.info['snapshot']``, ver snapshot.get_read_db)."""
+    info = getattr(db, 'info', None)
+    return info.get('snapshot') if isinstance(info, dict) else None
+
+
+def cached(ttl_seconds: int = 300, namespace: Optional[str] = None, tags=None, diario: bool = False):
+    """Decorator de cache em dois níveis para funções puras de leitura.
+
+    Args:
+        ttl_seconds: Validade da entrada.
+        namespace: Grupo para invalidação (padrão: nome do módulo, ex.: 'analytics').
+        tags: Lista de tags ou função ``(argumentos) -> tags`` (argumentos sem ``db``).
+        diario: Inclui a data de hoje na chave (funções cujo padrão é "até hoje").
+
+    Sessões abertas sobre um snapshot entram na chave pelo nome do snapshot: o
+    resultado lido de uma cópia antiga não é servido depois que sai uma nova.
+    A função decorada ganha ``cache_key(*args, **kwargs)`` e ``invalidate(*args, **kwargs)``;
+    a original fica em ``__wrapped__``.
+    """
+    def decorator(func: Callable) -> Callable:
+        assinatura = inspect.signature(func)
+        ns = namespace or func.__module__.rsplit('.', 1)[-1]
+        base = f"{CACHE_PREFIX}{ns}:{func.__name__}:"
+
+        def _argumentos(args, kwargs) -> Dict:
+            ligados = assinatura.bind(*args, **kwargs)
+            ligados.apply_defaults()
+            argumentos = {k: v for k, v in ligados.arguments.items() if k not in _ARGS_IGNORADOS}
+            snapshot = _origem_leitura(ligados.arguments.get('db'))
+            if snapshot:
+                argumentos['__snapshot__'] = snapshot
+            if diario:
+                argumentos['__dia__'] = date.today()
+            return argumentos
+
+        def cache_key(*args, **kwargs) -> str:
+            return base + _hash_argumentos(_argumentos(args, kwargs))
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            argumentos = _argumentos(args, kwargs)
+            key = base + _hash_argumentos(argumentos)
+            valor = get_cached_value(key, _MISS)
+            if valor is not _MISS:
+                return valor
+            entrada_tags = list(tags(argumentos) if callable(tags) else (tags or ()))
+            antes = _geracoes(entrada_tags)
+            valor = func(*args, **kwargs)
+            # Escrita concorrente invalidou uma das tags durante o cálculo: não guarda valor velho
+            if _geracoes(entrada_tags) == antes:
+                set_cached_value(key, valor, ttl_seconds)
+                register_tags(key, entrada_tags, ttl_seconds)
+            return valor
+
+        wrapper.cache_key = cache_key
+        wrapper.invalidate = lambda *args, **kwargs: invalidate_cache(key=cache_key(*args, **kwargs))
+        return wrapper
+    return decorator
@@ -0,0 +1,292 @@
+"""
+Codec binário dos valores de cache (Redis) e hash estável das chaves.
+
+Formato gravado: cabeçalho de 3 bytes + corpo.
+    byte 0: MAGIC (0xC1, nunca é o primeiro byte de pickle, msgpack ou JSON)
+    byte 1: serializador ('p' pickle protocolo 5, 'm' msgpack)
+    byte 2: compressão ('-' nenhuma, 'z' zlib, 's' zstd)
+
+Valores sem o cabeçalho são lidos como formato legado: pickle puro (cache L2
+antigo) ou JSON (cache_wrapper antigo), então a troca não exige limpar o Redis.
+
+Serializador padrão: msgpack quando instalado (com ganchos para date,
+datetime, Decimal, tuple, set e dataclasses), senão pickle protocolo 5, que
+já cobre esses tipos (ex.: NFeDoc). Force com ``CACHE_CODEC=pickle|msgpack``.
+
+Corpos com CACHE_COMPRESS_MIN bytes ou mais são comprimidos com zstd
+(``zstandard`` instalado) ou zlib; a versão comprimida só é usada se for menor.
+
+Uso:
+    dados = encode({'vencimento': date.today(), 'valor': Decimal('10.50')})
+    valor = decode(dados)
+    chave = hash_key('orders', shop_id=123)   # 32 caracteres hex
+"""
+
+import dataclasses
+import enum
+import hashlib
+import importlib
+import json
+import logging
+import operator
+import os
+import pickle
+import zlib
+from abc import ABC, abstractmethod
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger('cache_codec')
+
+MAGIC = 0xC1
+CACHE_COMPRESS_MIN = int(os.getenv('CACHE_COMPRESS_MIN', '1024'))
+# Níveis rápidos: o cache troca um pouco de taxa de compressão por latência
+ZLIB_LEVEL = 1
+ZSTD_LEVEL = 3
+
+# Dataclasses só são reconstruídas (msgpack) a partir destes pacotes
+DATACLASS_MODULOS = ('modules.',)
+
+
+class Codec(ABC):
+    """Serializador de valores de cache (sem cabeçalho nem compressão)."""
+
+    nome = ''
+    id = b''
+
+    @abstractmethod
+    def dumps(self, value: Any) -> bytes:
+        """Valor -> bytes."""
+
+    @abstractmethod
+    def loads(self, data: bytes) -> Any:
+        """Bytes -> valor."""
+
+
+class PickleCodec(Codec):
+    """Pickle protocolo 5: aceita qualquer objeto importável (dates, Decimal, dataclasses)."""
+
+    nome = 'pickle'
+    id = b'p'
+
+    def dumps(self, value: Any) -> bytes:
+        return pickle.dumps(value, protocol=5)
+
+    def loads(self, data: bytes) -> Any:
+        return pickle.loads(data)
+
+
+# Tipos de extensão msgpack
+_EXT_DATE = 1
+_EXT_DATETIME = 2
+_EXT_DECIMAL = 3
+_EXT_DATACLASS = 4
+_EXT_TUPLE = 5
+_EXT_SET = 6
+_EXT_TIME = 7
+
+
+class MsgpackCodec(Codec):
+    """msgpack com ganchos de tipo; mais compacto que pickle em dicts/listas de API."""
+
+    nome = 'msgpack'
+    id = b'm'
+
+    def __init__(self):
+        if not MSGPACK_AVAILABLE:
+            raise RuntimeError("msgpack não está instalado. Execute: pip install msgpack")
+
+    def _default(self, obj):
+        if isinstance(obj, datetime):
+            return msgpack.ExtType(_EXT_DATETIME, obj.isoformat().encode())
+        if isinstance(obj, date):
+            return msgpack.ExtType(_EXT_DATE, obj.isoformat().encode())
+        if isinstance(obj, time):
+            return msgpack.ExtType(_EXT_TIME, obj.isoformat().encode())
+        if isinstance(obj, Decimal):
+            return msgpack.ExtType(_EXT_DECIMAL, str(obj).encode())
+        if isinstance(obj, tuple):
+            return msgpack.ExtType(_EXT_TUPLE, self.dumps(list(obj)))
+        if isinstance(obj, (set, frozenset)):
+            return msgpack.ExtType(_EXT_SET, self.dumps(list(obj)))
+        if isinstance(obj, enum.Enum):
+            return obj.value
+        # strict_types: subclasses (OrderedDict, defaultdict...) chegam aqui
+        if isinstance(obj, dict):
+            return dict(obj)
+        if isinstance(obj, list):
+            return list(obj)
+        if isinstance(obj, str):
+            return str(obj)
+        if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+            cls = type(obj)
+            campos = {f.name: getattr(obj, f.name) for f in dataclasses.fields(obj)}
+            return msgpack.ExtType(_EXT_DATACLASS, self.dumps([cls.__module__, cls.__qualname__, campos]))
+        raise TypeError(f"Tipo não suportado pelo codec msgpack: {type(obj).__name__}")
+
+    def _ext_hook(self, code: int, data: bytes):
+        if code == _EXT_DATETIME:
+            return datetime.fromisoformat(data.decode())
+        if code == _EXT_DATE:
+            return date.fromisoformat(data.decode())
+        if code == _EXT_TIME:
+            return time.fromisoformat(data.decode())
+        if code == _EXT_DECIMAL:
+            return Decimal(data.decode())
+        if code == _EXT_TUPLE:
+            return tuple(self.loads(data))
+        if code == _EXT_SET:
+            return set(self.loads(data))
+        if code == _EXT_DATACLASS:
+            modulo, nome, campos = self.loads(data)
+            return _dataclass(modulo, nome)(**campos)
+        return msgpack.ExtType(code, data)
+
+    def dumps(self, value: Any) -> bytes:
+        # tuple vira ExtType (e não lista) para voltar como tuple
+        return msgpack.packb(value, default=self._default, use_bin_type=True, strict_types=True)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, ext_hook=self._ext_hook, raw=False, strict_map_key=False)
+
+
+def _dataclass(modulo: str, nome: str):
+    if not modulo.startswith(DATACLASS_MODULOS):
+        raise ValueError(f"Dataclass fora dos pacotes permitidos: {modulo}.{nome}")
+    alvo = importlib.import_module(modulo)
+    for parte in nome.split('.'):
+        alvo = getattr(alvo, parte)
+    if not dataclasses.is_dataclass(alvo):
+        raise ValueError(f"{modulo}.{nome} não é dataclass")
+    return alvo
+
+
+_CODECS: Dict[bytes, Codec] = {PickleCodec.id: PickleCodec()}
+if MSGPACK_AVAILABLE:
+    _CODECS[MsgpackCodec.id] = MsgpackCodec()
+_POR_NOME = {c.nome: c for c in _CODECS.values()}
+
+
+def get_codec(nome: Optional[str] = None) -> Codec:
+    """Codec pelo nome (padrão: CACHE_CODEC, senão msgpack se instalado, senão pickle)."""
+    nome = nome or os.getenv('CACHE_CODEC') or ('msgpack' if MSGPACK_AVAILABLE else 'pickle')
+    if nome not in _POR_NOME:
+        logger.warning(f"Codec de cache '{nome}' indisponível, usando pickle")
+        return _POR_NOME['pickle']
+    return _POR_NOME[nome]
+
+
+# --- Compressão ---
+
+_SEM_COMPRESSAO = b'-'
+_ZLIB = b'z'
+_ZSTD = b's'
+
+
+def _comprime(corpo: bytes) -> tuple:
+    if ZSTD_AVAILABLE:
+        return _ZSTD, zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(corpo)
+    return _ZLIB, zlib.compress(corpo, ZLIB_LEVEL)
+
+
+def _descomprime(tipo: bytes, corpo: bytes) -> bytes:
+    if tipo == _SEM_COMPRESSAO:
+        return corpo
+    if tipo == _ZLIB:
+        return zlib.decompress(corpo)
+    if tipo == _ZSTD:
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("Valor comprimido com zstd, mas zstandard não está instalado")
+        return zstandard.ZstdDecompressor().decompress(corpo)
+    raise ValueError(f"Compressão desconhecida: {tipo!r}")
+
+
+def encode(value: Any, codec: Optional[Codec] = None, compress_min: Optional[int] = None) -> bytes:
+    """Serializa ``value`` com cabeçalho, comprimindo corpos grandes."""
+    codec = codec or get_codec()
+    corpo = codec.dumps(value)
+    limite = CACHE_COMPRESS_MIN if compress_min is None else compress_min
+    compressao = _SEM_COMPRESSAO
+    if len(corpo) >= limite:
+        tipo, comprimido = _comprime(corpo)
+        if len(comprimido) < len(corpo):
+            compressao, corpo = tipo, comprimido
+    return bytes((MAGIC,)) + codec.id + compressao + corpo
+
+
+def decode(data) -> Any:
+    """Inverso de ``encode``; aceita também pickle puro e JSON (valores legados)."""
+    if isinstance(data, str):
+        return json.loads(data)
+    if not data or data[0] != MAGIC:
+        if data[:1] == b'\x80':
+            return pickle.loads(data)
+        return json.loads(data)
+    codec = _CODECS.get(data[1:2])
+    if codec is None:
+        raise ValueError(f"Codec desconhecido no cache: {data[1:2]!r}")
+    return codec.loads(_descomprime(data[2:3], data[3:]))
+
+
+# --- Hash de chaves ---
+
+# Tipos cujo repr() já é estável entre processos
+_ESTAVEIS = (type(None), bool, int, float, str, bytes)
+# Tipos exatos aceitos no caminho rápido de hash_key
+_SIMPLES = frozenset(_ESTAVEIS + (date, datetime, Decimal))
+_PRIMEIRO = operator.itemgetter(0)
+
+
+def _canonico(obj):
+    """Converte argumentos em estrutura com repr() estável (dicts/sets ordenados)."""
+    if isinstance(obj, _ESTAVEIS):
+        return obj
+    if type(obj) in (list, tuple):
+        return type(obj)(_canonico(item) for item in obj)
+    if isinstance(obj, dict):
+        itens = [(_canonico(k), _canonico(v)) for k, v in obj.items()]
+        # Chaves texto (kwargs, JSON) ordenam direto; mistas, pelo repr
+        itens.sort(key=_PRIMEIRO if all(type(k) is str for k, _ in itens) else repr)
+        return ('dict', itens)
+    if isinstance(obj, (date, time)):
+        # isoformat é bem mais barato que repr() de date/datetime
+        return (type(obj).__name__, obj.isoformat())
+    if isinstance(obj, Decimal):
+        return ('Decimal', str(obj))
+    if isinstance(obj, (set, frozenset)):
+        return ('set', sorted((_canonico(item) for item in obj), key=repr))
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return (type(obj).__qualname__, [(f.name, _canonico(getattr(obj, f.name))) for f in dataclasses.fields(obj)])
+    if isinstance(obj, (list, tuple)):  # namedtuple e afins
+        return (type(obj).__qualname__, [_canonico(item) for item in obj])
+    # Demais objetos (Enum incluso): repr() é estável se a classe definir __repr__
+    return (type(obj).__qualname__, repr(obj))
+
+
+def hash_key(*args, **kwargs) -> str:
+    """Hash BLAKE2b (128 bits, 32 caracteres hex) dos argumentos.
+
+    Estável entre processos e execuções (não usa ``hash()``); dicts e sets
+    independem da ordem de inserção.
+    """
+    if all(type(a) in _SIMPLES for a in args) and all(type(v) in _SIMPLES for v in kwargs.values()):
+        # Caso comum (ids, datas, filtros): repr() direto, sem percorrer a estrutura
+        texto = repr((args, sorted(kwargs.items())))
+    else:
+        texto = repr((_canonico(args), _canonico(kwargs)))
+    return hashlib.blake2b(texto.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
@@ -1,15 +1,36 @@
 """
 Wrapper de Cache para integração com APIs.
 Fornece decoradores e funções para cachear chamadas de API.
+
+Stale-while-revalidate: com ``soft_ttl`` (decorator) ou ``cache_soft_ttl``
+(CachedAPI), ``ttl`` passa a ser o TTL rígido. Depois do soft TTL o valor em
+cache é devolvido na hora e a atualização roda num pool de threads limitado
+(CACHE_REFRESH_WORKERS); só depois do TTL rígido a chamada bloqueia.
 """
 
-import json
-import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from functools import wraps
 from typing import Callable, Any, Optional
 
-from .cache import cache_get, cache_set, cache_clear
-from .metrics import measure_performance, record_cache_access
+from .cache import (
+    acquire_lease, cache_clear, cache_get_value, cache_set_value, invalidate_tags, register_tags,
+    release_lease, single_flight
+)
+from .cache_codec import hash_key
+from .metrics import (
+    measure_performance, record_cache_access, record_cache_coalesced, record_cache_refresh, record_cache_stale
+)
+
+logger = logging.getLogger('cache_wrapper')
+
+CACHE_REFRESH_WORKERS = int(os.getenv('CACHE_REFRESH_WORKERS', '4'))
+# Atualizações pendentes além disso são descartadas (o valor vencido continua servido)
+CACHE_REFRESH_QUEUE = int(os.getenv('CACHE_REFRESH_QUEUE', '32'))
 
 
 def generate_cache_key(*args, **kwargs) -> str:
@@ -21,30 +42,131 @@ def generate_cache_key(*args, **kwargs) -> str:
         **kwargs: Argumentos nomeados
     
     Returns:
-        str: Hash MD5 como chave de cache
+        str: Hash BLAKE2b de 32 caracteres (ver cache_codec.hash_key)
     """
-    # Cria string representando os argumentos
-    arg_string = json.dumps({
-        "args": [str(arg) for arg in args],
-        "kwargs": {k: str(v) for k, v in sorted(kwargs.items())}
-    }, sort_keys=True)
-    
-    # Retorna hash MD5 da string
-    return hashlib.md5(arg_string.encode()).hexdigest()
+    return hash_key(*args, **kwargs)
+
+
+def api_tag(key_prefix: str) -> str:
+    """Tag que agrupa as chaves de um prefixo (ver invalidate_api_cache)."""
+    return f"api:{key_prefix}"
+
+
+@dataclass
+class CacheEntry:
+    """Valor gravado com o momento da gravação (modo stale-while-revalidate)."""
+    valor: Any
+    gravado_em: float
+
+
+def _valor(entrada):
+    return entrada.valor if isinstance(entrada, CacheEntry) else entrada
+
+
+def _grava(cache_key: str, result, ttl: int, soft_ttl: Optional[int], tag: str):
+    if result is None:
+        return
+    entrada = CacheEntry(result, time.time()) if soft_ttl else result
+    cache_set_value(cache_key, entrada, expire=ttl)
+    register_tags(cache_key, [tag], ttl)
+
+
+def _carrega(cache_key: str, func: Callable[[], Any], ttl: int, tag: str, soft_ttl: Optional[int] = None):
+    """Falha de cache: uma única chamada à API por chave (ver cache.single_flight)."""
+    def carregar():
+        result = func()
+        _grava(cache_key, result, ttl, soft_ttl, tag)
+        return result
+
+    result, lider = single_flight(cache_key, carregar, lambda: _valor(cache_get_value(cache_key)))
+    if not lider:
+        record_cache_coalesced()
+    return result
+
+
+# --- Atualização em segundo plano ---
+_pool: Optional[ThreadPoolExecutor] = None
+_atualizando = set()
+_atualizando_lock = threading.Lock()
+
+
+def _agenda_atualizacao(cache_key: str, func: Callable[[], Any], ttl: int, soft_ttl: int, tag: str) -> bool:
+    """Agenda a atualização de ``cache_key`` (uma por chave; descarta se a fila estiver cheia)."""
+    global _pool
+    with _atualizando_lock:
+        if cache_key in _atualizando or len(_atualizando) >= CACHE_REFRESH_QUEUE:
+            return False
+        _atualizando.add(cache_key)
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=CACHE_REFRESH_WORKERS, thread_name_prefix='cache-refresh')
+    _pool.submit(_atualiza, cache_key, func, ttl, soft_ttl, tag)
+    return True
 
 
-def cached_api_call(ttl: int = 3600, key_prefix: str = ""):
+def _atualiza(cache_key: str, func: Callable[[], Any], ttl: int, soft_ttl: int, tag: str):
+    try:
+        # Outro processo já está atualizando (ou carregando) esta chave
+        token = acquire_lease(cache_key)
+        if token is None:
+            return
+        inicio = time.perf_counter()
+        try:
+            _grava(cache_key, func(), ttl, soft_ttl, tag)
+            record_cache_refresh(time.perf_counter() - inicio, ok=True)
+        except Exception as e:
+            record_cache_refresh(time.perf_counter() - inicio, ok=False)
+            logger.warning(f"Falha ao atualizar cache {cache_key}: {e}")
+        finally:
+            release_lease(cache_key, token)
+    finally:
+        with _atualizando_lock:
+            _atualizando.discard(cache_key)
+
+
+def wait_refreshes(timeout: float = 10.0) -> bool:
+    """Espera as atualizações em segundo plano terminarem (scripts e testes)."""
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        with _atualizando_lock:
+            if not _atualizando:
+                return True
+        time.sleep(0.01)
+    return False
+
+
+def _busca(cache_key: str, func: Callable[[], Any], ttl: int, soft_ttl: Optional[int], tag: str):
+    """Cache, valor vencido + atualização em segundo plano, ou carga bloqueante."""
+    entrada = cache_get_value(cache_key)
+    if entrada is not None:
+        record_cache_access(hit=True)
+        if isinstance(entrada, CacheEntry) and soft_ttl and time.time() - entrada.gravado_em >= soft_ttl:
+            record_cache_stale()
+            _agenda_atualizacao(cache_key, func, ttl, soft_ttl, tag)
+        return _valor(entrada)
+
+    # Cache miss - executa função (chamadas simultâneas esperam a primeira)
+    record_cache_access(hit=False)
+    return _carrega(cache_key, func, ttl, tag, soft_ttl)
+
+
+def cached_api_call(ttl: int = 3600, key_prefix: str = "", soft_ttl: Optional[int] = None):
     """
     Decorator para cachear resultados de chamadas de API.
     
     Args:
         ttl (int): Tempo de vida em cache (segundos). Padrão: 1 hora.
         key_prefix (str): Prefixo para chave de cache (ex: "shopee_orders_").
+        soft_ttl (int): Idade a partir da qual o valor é atualizado em segundo
+            plano, mas ainda servido; ``ttl`` vira o limite rígido (opcional).
     
     Exemplo:
         @cached_api_call(ttl=1800, key_prefix="shopee_")
         def get_shopee_orders(shop_id):
             return api_call(shop_id)
+        
+        @cached_api_call(ttl=6 * 3600, soft_ttl=600, key_prefix="shopee_catalogo_")
+        def get_shopee_catalog(shop_id):
+            return api_call(shop_id)
     """
     def decorator(func: Callable) -> Callable:
         @wraps(func)
@@ -52,22 +174,7 @@ def cached_api_call(ttl: int = 3600, key_prefix: str = ""):
         def wrapper(*args, **kwargs):
             # Gera chave de cache
             cache_key = f"{key_prefix}{generate_cache_key(*args, **kwargs)}"
-            
-            # Tenta recuperar do cache
-            cached_result = cache_get(cache_key)
-            if cached_result is not None:
-                record_cache_access(hit=True)
-                return json.loads(cached_result)
-            
-            # Cache miss - executa função
-            record_cache_access(hit=False)
-            result = func(*args, **kwargs)
-            
-            # Armazena resultado em cache
-            if result is not None:
-                cache_set(cache_key, json.dumps(result), expire=ttl)
-            
-            return result
+            return _busca(cache_key, lambda: func(*args, **kwargs), ttl, soft_ttl, api_tag(key_prefix))
         
         return wrapper
     return decorator
@@ -80,14 +187,11 @@ def invalidate_api_cache(key_prefix: str):
     Args:
         key_prefix (str): Prefixo das chaves a invalidar (ex: "shopee_").
     
-    Nota: Usa wildcard pattern. Redis deve estar disponível.
+    Nota: as chaves são registradas na tag ``api:<prefixo>`` ao serem gravadas;
+    só elas são apagadas (sem varrer o keyspace do Redis com KEYS).
     """
     try:
-        from .cache import get_redis_client
-        client = get_redis_client()
-        keys = client.keys(f"{key_prefix}*")
-        if keys:
-            client.delete(*keys)
+        invalidate_tags([api_tag(key_prefix)])
     except Exception as e:
         print(f"Erro ao invalidar cache: {e}")
 
@@ -101,6 +205,7 @@ class CachedAPI:
     """Classe base para APIs com suporte a cache."""
     
     cache_ttl = 3600  # 1 hora por padrão
+    cache_soft_ttl = None  # Com valor: stale-while-revalidate (cache_ttl vira o limite rígido)
     cache_prefix = ""
     
     def __init__(self):
@@ -128,10 +233,10 @@ class CachedAPI:
             return None
         
         key = self.get_cache_key(*args, **kwargs)
-        result = cache_get(key)
+        result = _valor(cache_get_value(key))
         if result:
             record_cache_access(hit=True)
-            return json.loads(result)
+            return result
         
         record_cache_access(hit=False)
         return None
@@ -142,4 +247,19 @@ class CachedAPI:
             return
         
         key = self.get_cache_key(*args, **kwargs)
-        cache_set(key, json.dumps(value), expire=self.cache_ttl)
+        _grava(key, value, self.cache_ttl, self.cache_soft_ttl, api_tag(self.cache_prefix))
+    
+    def get_or_fetch(self, fetch: Callable[[], Any], *args, **kwargs):
+        """
+        Valor em cache para os argumentos ou, na falha, resultado de ``fetch()``.
+        
+        Falhas simultâneas para os mesmos argumentos (threads ou processos)
+        chamam ``fetch`` uma só vez; as demais recebem o mesmo resultado.
+        Com ``cache_soft_ttl``, valores vencidos são servidos e atualizados
+        em segundo plano.
+        """
+        if not self.cache_enabled:
+            return fetch()
+        
+        key = self.get_cache_key(*args, **kwargs)
+        return _busca(key, fetch, self.cache_ttl, self.cache_soft_ttl, api_tag(self.cache_prefix))
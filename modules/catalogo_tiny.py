@@ -0,0 +1,316 @@
+"""
+Espelho local do catálogo de produtos do Tiny (tabela produtos_tiny).
+
+Cada consulta de custo ia à API (produtos.pesquisa.php), uma requisição por
+SKU. O espelho guarda codigo (SKU), id, nome, preco, preco_custo e GTIN de
+todos os produtos e as consultas de ``tiny_api`` com ``local_first`` (ou
+TINY_CATALOGO_LOCAL=1) respondem dele por um índice em memória.
+
+Atualização:
+- completa: percorre todas as páginas de ``listar_produtos``; produtos que
+  não apareceram ficam inativos (excluídos no Tiny);
+- incremental: só os produtos alterados desde a última sincronização
+  (``listar_produtos_alterados``), com CATALOGO_MARGEM_MIN de sobreposição.
+  Sem varredura completa registrada, com a última há mais de
+  CATALOGO_COMPLETO_DIAS ou com o endpoint de alterações indisponível, vira
+  completa.
+
+O início da última completa e o da última sincronização (completa ou
+incremental) ficam em marcas_sincronizacao e só avançam quando todas as
+páginas foram gravadas: uma execução que falhou no meio é refeita desde a
+marca anterior na próxima.
+
+O índice em memória confere a assinatura da tabela (linhas e última
+sincronização) no máximo a cada CATALOGO_VERIFICA_S segundos, então outro
+processo que sincronizou o espelho é enxergado sem consultar o banco a cada
+busca. Os nomes ficam também num índice de trigramas (``indice_nomes``),
+salvo em disco e reindexado só nos nomes que mudaram, para a busca
+aproximada de descrições (``buscar_por_nome`` / ``buscar_candidatos``).
+
+Uso:
+    sincronizar_catalogo()                 # incremental (ou completa na 1ª vez)
+    buscar_local(codigo='SKU-1')           # None se não estiver no espelho
+    buscar_candidatos(['CANECA AGATA 300ML', ...], k=3)
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, update
+
+from .database import (
+    ProdutoTiny, get_db, get_marca_sincronizacao, run_write, set_marca_sincronizacao, upsert_produtos_tiny
+)
+from .indice_nomes import IndiceTrigramas, normaliza
+from .tiny_api import _safe_float, listar_produtos, listar_produtos_alterados
+
+logger = logging.getLogger('catalogo_tiny')
+
+# Sobreposição entre incrementais (relógio do Tiny x local, alterações durante a varredura)
+CATALOGO_MARGEM_MIN = int(os.getenv('CATALOGO_MARGEM_MIN', '10'))
+# Idade máxima da última varredura completa antes de refazê-la (pega exclusões)
+CATALOGO_COMPLETO_DIAS = int(os.getenv('CATALOGO_COMPLETO_DIAS', '7'))
+# Intervalo entre verificações de mudança no espelho pelo índice em memória
+CATALOGO_VERIFICA_S = float(os.getenv('CATALOGO_VERIFICA_S', '30'))
+# Índice de trigramas dos nomes salvo entre execuções (modules/indice_nomes.py)
+CATALOGO_INDICE_PATH = os.getenv('CATALOGO_INDICE_PATH', os.path.join('data', 'cache', 'indice_nomes_tiny.pkl'))
+
+# Chaves em marcas_sincronizacao
+MARCA_COMPLETA = 'catalogo_tiny.completa'
+MARCA_SINCRONIZACAO = 'catalogo_tiny.sincronizacao'
+
+
+def _linha(prod_info: Dict[str, Any], agora: datetime) -> Optional[Dict[str, Any]]:
+    """Linha de produtos_tiny a partir de um item da API (None sem id)."""
+    produto_id = str(prod_info.get('id') or '').strip()
+    if not produto_id:
+        return None
+    return {
+        'produto_id': produto_id,
+        'codigo': str(prod_info.get('codigo') or '').strip() or None,
+        'nome': prod_info.get('nome'),
+        'preco': _safe_float(prod_info.get('preco')),
+        'preco_custo': _safe_float(prod_info.get('preco_custo')),
+        'gtin': str(prod_info.get('gtin') or '').strip() or None,
+        # Situação: A (ativo), I (inativo), E (excluído)
+        'ativo': (prod_info.get('situacao') or 'A') == 'A',
+        'data_sincronizacao': agora,
+    }
+
+
+def _varre(listar, agora: datetime, stats: Dict[str, Any]) -> bool:
+    """Grava todas as páginas de ``listar(page)``. False se alguma página falhou.
+
+    Só conta como lida a página com ``retorno.status == 'OK'`` (a listagem do
+    Tiny já repete bloqueios e trata "sem registros" como página vazia): sem
+    isso uma página com erro pareceria a última, vazia, e a varredura completa
+    desativaria os produtos que ela deixou de trazer.
+    """
+    page, total_paginas = 1, 1
+    while page <= total_paginas:
+        resp = listar(page)
+        retorno = resp.get('retorno') or {}
+        if 'error' in resp or str(retorno.get('status') or '').upper() != 'OK':
+            erro = resp.get('error') or retorno.get('erros') or f"status {retorno.get('status')!r}"
+            stats['erros'].append(f"página {page}: {erro}")
+            return False
+        total_paginas = int(retorno.get('numero_paginas') or 1)
+        linhas = [_linha(p.get('produto') or {}, agora) for p in retorno.get('produtos') or []]
+        stats['produtos'] += upsert_produtos_tiny([l for l in linhas if l])
+        stats['paginas'] += 1
+        page += 1
+    return True
+
+
+def _desativa_ausentes(antes: datetime) -> int:
+    """Marca inativos os produtos que a varredura completa não viu."""
+    def _write():
+        db = get_db()
+        try:
+            n = db.execute(
+                update(ProdutoTiny)
+                .where(ProdutoTiny.data_sincronizacao < antes, ProdutoTiny.ativo == True)
+                .values(ativo=False)
+            ).rowcount
+            db.commit()
+            return n or 0
+        finally:
+            db.close()
+    return run_write(_write)
+
+
+def _assinatura():
+    db = get_db()
+    try:
+        return tuple(db.query(func.count(ProdutoTiny.id), func.max(ProdutoTiny.data_sincronizacao)).one())
+    finally:
+        db.close()
+
+
+def ultima_sincronizacao() -> Optional[datetime]:
+    """Início da última sincronização concluída sem falhas (None se nunca houve)."""
+    return get_marca_sincronizacao(MARCA_SINCRONIZACAO) or get_marca_sincronizacao(MARCA_COMPLETA)
+
+
+def ultima_completa() -> Optional[datetime]:
+    """Início da última varredura completa concluída sem falhas (None se nunca houve)."""
+    return get_marca_sincronizacao(MARCA_COMPLETA)
+
+
+def sincronizar_catalogo(completo: Optional[bool] = None) -> Dict[str, Any]:
+    """Atualiza o espelho local do catálogo.
+
+    Args:
+        completo: True força a varredura completa, False força a incremental;
+            None decide pela idade da última completa (ver docstring do módulo).
+
+    Returns:
+        Dict com modo, páginas, produtos gravados, desativados, erros e duração.
+    """
+    inicio = time.perf_counter()
+    agora = datetime.now()
+    ultima = ultima_sincronizacao()
+    if completo is None:
+        completa = ultima_completa()
+        completo = completa is None or agora - completa > timedelta(days=CATALOGO_COMPLETO_DIAS)
+    stats: Dict[str, Any] = {'modo': 'completa' if completo else 'incremental',
+                             'paginas': 0, 'produtos': 0, 'desativados': 0, 'erros': []}
+
+    if not completo:
+        desde = (ultima or agora) - timedelta(minutes=CATALOGO_MARGEM_MIN)
+        if _varre(lambda page: listar_produtos_alterados(desde, page=page), agora, stats):
+            set_marca_sincronizacao(MARCA_SINCRONIZACAO, agora)
+        else:
+            logger.warning(f"Catálogo Tiny: alterações indisponíveis ({stats['erros'][-1]}); varredura completa")
+            stats['modo'] = 'completa'
+            completo = True
+    if completo and _varre(lambda page: listar_produtos(page=page, pesquisa=""), agora, stats):
+        stats['desativados'] = _desativa_ausentes(agora)
+        set_marca_sincronizacao(MARCA_COMPLETA, agora)
+        set_marca_sincronizacao(MARCA_SINCRONIZACAO, agora)
+
+    _indice.invalidar()
+    stats['duracao_s'] = round(time.perf_counter() - inicio, 2)
+    logger.info(f"Catálogo Tiny ({stats['modo']}): {stats['produtos']} produtos em {stats['paginas']} páginas, "
+                f"{stats['desativados']} desativados, {len(stats['erros'])} erros, {stats['duracao_s']}s")
+    return stats
+
+
+def _produto(row: ProdutoTiny) -> Dict[str, Any]:
+    """Produto no formato das consultas de ``tiny_api`` ('raw' com os campos do espelho)."""
+    raw = {
+        'id': row.produto_id,
+        'codigo': row.codigo,
+        'nome': row.nome,
+        'preco': row.preco,
+        'preco_custo': row.preco_custo,
+        'gtin': row.gtin,
+        'situacao': 'A' if row.ativo else 'I',
+    }
+    return {
+        'id': row.produto_id,
+        'codigo': row.codigo,
+        'nome': row.nome,
+        'preco': row.preco or 0.0,
+        'preco_custo': row.preco_custo or 0.0,
+        'raw': raw,
+    }
+
+
+class _IndiceLocal:
+    """Produtos ativos do espelho em memória, por codigo, id, GTIN e nome normalizado,
+    e o índice de trigramas dos nomes (salvo em CATALOGO_INDICE_PATH)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._por: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._nomes: Optional[IndiceTrigramas] = None
+        self._assinatura = None
+        self._verificado = 0.0
+
+    def invalidar(self):
+        with self._lock:
+            self._verificado = 0.0
+            self._assinatura = None
+
+    def _carrega(self, assinatura):
+        db = get_db()
+        try:
+            rows = db.query(ProdutoTiny).filter(ProdutoTiny.ativo == True).order_by(ProdutoTiny.id).all()
+            produtos = [_produto(r) for r in rows]
+        finally:
+            db.close()
+        por = {'codigo': {}, 'id': {}, 'gtin': {}, 'nome': {}}
+        for p in produtos:
+            chaves = {'codigo': p['codigo'], 'id': p['id'], 'gtin': p['raw']['gtin'],
+                      'nome': normaliza(p['nome'] or '')}
+            for campo, chave in chaves.items():
+                if chave:
+                    por[campo].setdefault(chave, p)
+        self._atualiza_nomes(produtos, assinatura)
+        return por
+
+    def _atualiza_nomes(self, produtos, assinatura):
+        """Leva o índice de trigramas ao estado do espelho; só nomes novos ou alterados são reindexados."""
+        if self._nomes is None:
+            self._nomes = IndiceTrigramas.carregar(CATALOGO_INDICE_PATH) or IndiceTrigramas()
+        if self._nomes.marca == assinatura:
+            return
+        ativos = set()
+        for p in produtos:
+            self._nomes.adicionar(p['id'], p['nome'] or '', p)
+            ativos.add(p['id'])
+        for doc_id in self._nomes.ids():
+            if doc_id not in ativos:
+                self._nomes.remover(doc_id)
+        self._nomes.marca = assinatura
+        try:
+            self._nomes.salvar(CATALOGO_INDICE_PATH)
+        except OSError as e:
+            logger.warning(f"Índice de nomes não salvo em {CATALOGO_INDICE_PATH}: {e}")
+
+    def indice(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        with self._lock:
+            if time.monotonic() - self._verificado < CATALOGO_VERIFICA_S:
+                return self._por
+            assinatura = _assinatura()
+            if assinatura != self._assinatura:
+                self._por = self._carrega(assinatura)
+                self._assinatura = assinatura
+            self._verificado = time.monotonic()
+            return self._por
+
+    def nomes(self) -> IndiceTrigramas:
+        self.indice()
+        return self._nomes or IndiceTrigramas()
+
+
+_indice = _IndiceLocal()
+
+
+def buscar_local(codigo: str = None, id_produto: str = None, gtin: str = None,
+                 nome: str = None) -> Optional[Dict[str, Any]]:
+    """Produto ativo do espelho pelo primeiro critério informado que existir nele.
+
+    ``nome`` compara o nome normalizado (sem acentos/caixa) por igualdade.
+
+    Returns:
+        Dict com id, codigo, nome, preco, preco_custo e raw; None se não encontrado.
+    """
+    por = _indice.indice()
+    criterios = (('codigo', codigo), ('id', id_produto), ('gtin', gtin),
+                 ('nome', normaliza(nome) if nome else None))
+    for campo, valor in criterios:
+        if valor:
+            produto = por.get(campo, {}).get(str(valor).strip())
+            if produto:
+                # Cópia: quem chama pode alterar o dict (ex.: pop('raw'))
+                return dict(produto)
+    return None
+
+
+def buscar_por_nome(descricao: str, k: int = 5, minimo: float = 0.0) -> List[Dict[str, Any]]:
+    """Os ``k`` produtos do espelho com nome mais parecido com ``descricao``.
+
+    Returns:
+        Produtos no formato de ``buscar_local`` com 'score' (Dice de trigramas, 0 a 1), melhor primeiro.
+    """
+    return [{**produto, 'score': nota} for nota, _, produto in _indice.nomes().buscar(descricao, k, minimo)]
+
+
+def buscar_candidatos(descricoes, k: int = 5, minimo: float = 0.0) -> Dict[str, List[Dict[str, Any]]]:
+    """``buscar_por_nome`` para um lote de descrições (itens de NF-e, pedidos Shopee) numa chamada."""
+    nomes = _indice.nomes()
+    return {
+        descricao: [{**produto, 'score': nota} for nota, _, produto in candidatos]
+        for descricao, candidatos in nomes.buscar_lote(descricoes, k, minimo).items()
+    }
+
+
+def produtos_locais() -> List[Dict[str, Any]]:
+    """Todos os produtos ativos do espelho."""
+    return [dict(p) for p in _indice.indice().get('id', {}).values()]
@@ -0,0 +1,164 @@
+"""
+Circuit breaker por endpoint para as APIs externas (Tiny, Shopee).
+
+Com a API fora do ar, cada chamada esperava 30-60 s de timeout e mais as
+retentativas; numa sincronização isso vira minutos por item. O circuito de
+cada endpoint abre depois de CIRCUIT_FAILURE_THRESHOLD falhas seguidas (erro
+de rede, timeout ou HTTP 5xx) e passa a recusar chamadas na hora com
+``CircuitOpenError``. Depois de CIRCUIT_PROBE_INTERVAL segundos fica meio
+aberto: uma única chamada de sonda passa; se der certo o circuito fecha, se
+falhar abre de novo.
+
+``CircuitOpenError`` é um ``requests.RequestException``, então os tratadores
+de erro de rede que já existem nas integrações devolvem o erro normalmente.
+
+Uso:
+    circuito = get_breaker('tiny', 'produtos.pesquisa.php')
+    circuito.permitir()               # CircuitOpenError se aberto
+    try:
+        resp = session.get(...)
+    except Exception:
+        circuito.falha()
+        raise
+    circuito.registra(resp.status_code)
+"""
+
+import logging
+import os
+import threading
+import time
+from enum import Enum
+from typing import Callable, Dict
+
+import requests
+
+from .metrics import record_circuit
+
+logger = logging.getLogger('circuit_breaker')
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+CIRCUIT_PROBE_INTERVAL = float(os.getenv('CIRCUIT_PROBE_INTERVAL', '30'))
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(requests.RequestException):
+    """Chamada recusada sem ir à rede: o circuito do endpoint está aberto."""
+
+
+class CircuitBreaker:
+    """Circuito de um endpoint (fechado / aberto / meio aberto).
+
+    Args:
+        nome: Identificação (ex.: "tiny:produtos.pesquisa.php").
+        limite_falhas: Falhas seguidas que abrem o circuito.
+        intervalo_sonda: Segundos aberto antes de deixar passar uma sonda.
+        relogio: Injetável para testes.
+    """
+
+    def __init__(self, nome: str, limite_falhas: int = CIRCUIT_FAILURE_THRESHOLD,
+                 intervalo_sonda: float = CIRCUIT_PROBE_INTERVAL,
+                 relogio: Callable[[], float] = time.monotonic):
+        self.nome = nome
+        self.limite_falhas = max(1, limite_falhas)
+        self.intervalo_sonda = intervalo_sonda
+        self._relogio = relogio
+        self._lock = threading.Lock()
+        self._estado = CircuitState.CLOSED
+        self._falhas = 0
+        self._aberto_ate = 0.0
+        # Início da sonda em andamento (None = nenhuma); sonda sem resposta vence no intervalo
+        self._sonda_desde = None
+        self._aberturas = 0
+        self._recusadas = 0
+
+    @property
+    def estado(self) -> CircuitState:
+        return self._estado
+
+    def permitir(self):
+        """Libera a chamada ou levanta ``CircuitOpenError``."""
+        with self._lock:
+            agora = self._relogio()
+            if self._estado == CircuitState.OPEN and agora >= self._aberto_ate:
+                self._estado = CircuitState.HALF_OPEN
+                self._sonda_desde = None
+            if self._estado == CircuitState.HALF_OPEN:
+                if self._sonda_desde is None or agora - self._sonda_desde > self.intervalo_sonda:
+                    self._sonda_desde = agora
+                    return
+            elif self._estado == CircuitState.CLOSED:
+                return
+            self._recusadas += 1
+            restante = max(0.0, self._aberto_ate - agora)
+        self._publica()
+        raise CircuitOpenError(f"Circuito {self.nome} aberto (nova tentativa em {restante:.0f}s)")
+
+    def sucesso(self):
+        with self._lock:
+            mudou = self._estado != CircuitState.CLOSED
+            self._estado = CircuitState.CLOSED
+            self._falhas = 0
+            self._sonda_desde = None
+        if mudou:
+            logger.info(f"Circuito {self.nome} fechado")
+            self._publica()
+
+    def falha(self):
+        with self._lock:
+            self._falhas += 1
+            self._sonda_desde = None
+            abriu = self._estado == CircuitState.HALF_OPEN or (
+                self._estado == CircuitState.CLOSED and self._falhas >= self.limite_falhas
+            )
+            if abriu:
+                self._estado = CircuitState.OPEN
+                self._aberto_ate = self._relogio() + self.intervalo_sonda
+                self._aberturas += 1
+        if abriu:
+            logger.warning(f"Circuito {self.nome} aberto após {self._falhas} falhas seguidas")
+            self._publica()
+
+    def registra(self, status_code):
+        """Resultado de uma resposta HTTP: 5xx conta como falha, o resto como sucesso."""
+        if isinstance(status_code, int) and status_code >= 500:
+            self.falha()
+        else:
+            self.sucesso()
+
+    def state(self) -> Dict:
+        with self._lock:
+            return {
+                "estado": self._estado.value,
+                "falhas_seguidas": self._falhas,
+                "aberturas": self._aberturas,
+                "recusadas": self._recusadas,
+                "reabre_em_s": round(max(0.0, self._aberto_ate - self._relogio()), 1)
+                if self._estado == CircuitState.OPEN else 0.0,
+            }
+
+    def _publica(self):
+        record_circuit(self.nome, self.state())
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(api: str, endpoint: str) -> CircuitBreaker:
+    """Circuito do processo para ``endpoint`` da ``api``."""
+    nome = f"{api}:{endpoint}"
+    with _breakers_lock:
+        if nome not in _breakers:
+            _breakers[nome] = CircuitBreaker(nome)
+        return _breakers[nome]
+
+
+def reset_breakers():
+    """Fecha todos os circuitos (testes e reconfiguração)."""
+    with _breakers_lock:
+        _breakers.clear()
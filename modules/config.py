@@ -11,6 +11,10 @@ SHOPEE_ACCESS_TOKEN = os.getenv('SHOPEE_ACCESS_TOKEN','')
 SHOPEE_REFRESH_TOKEN = os.getenv('SHOPEE_REFRESH_TOKEN','')
 SHOPEE_REDIRECT_URL = os.getenv('SHOPEE_REDIRECT_URL','http://localhost:8000/callback')
 DATABASE_URL = os.getenv('DATABASE_URL','sqlite:///hub_financeiro.db')
+REDIS_URL = os.getenv('REDIS_URL','redis://localhost:6379/0')
+REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS','20'))
+REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT','2'))
+REDIS_CONNECT_TIMEOUT = float(os.getenv('REDIS_CONNECT_TIMEOUT','1'))
 
 def get_env():
 	"""Retorna todas as variáveis de ambiente relevantes como dict."""
@@ -23,4 +27,5 @@ def get_env():
 		"SHOPEE_REFRESH_TOKEN": SHOPEE_REFRESH_TOKEN,
 		"SHOPEE_REDIRECT_URL": SHOPEE_REDIRECT_URL,
 		"DATABASE_URL": DATABASE_URL,
+		"REDIS_URL": REDIS_URL,
 	}
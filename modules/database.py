@@ -3,10 +3,16 @@ Módulo de banco de dados
 Gerencia conexão e operações com SQLite
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, Float, Date, DateTime, Boolean
-from sqlalchemy.orm import sessionmaker, declarative_base
-from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, Index, event, func, inspect, literal_column, or_, select, text, true
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from datetime import datetime, timedelta
+import hashlib
 import os
+import re
+
+from .cache import invalidate_tags, tags_escrita
+from .db_engine import build_engine, profile_from_env, is_memory_url, SerializedWriter, serialized
 
 # Base para modelos
 Base = declarative_base()
@@ -36,9 +42,29 @@ if DATABASE_URL.startswith("sqlite:///"):
                 # Evitar falha por permissão; logs mínimos para diagnóstico em CI
                 print(f"[DB] Aviso: não foi possível criar diretório '{db_dir}': {e}")
 
-engine = create_engine(DATABASE_URL, echo=False)
+# Perfil de engine (WAL, PRAGMAs, pool) definido por DB_PROFILE / DB_* (ver db_engine.py)
+ENGINE_PROFILE = profile_from_env()
+engine = build_engine(DATABASE_URL, ENGINE_PROFILE)
 SessionLocal = sessionmaker(bind=engine)
 
+# Writer único do processo: escritas dos helpers abaixo passam por uma só thread.
+# Desligado para SQLite em memória (cada thread veria um banco diferente) e outros SGBDs.
+_writer = SerializedWriter(
+    enabled=(
+        ENGINE_PROFILE.serialize_writes
+        and DATABASE_URL.startswith("sqlite")
+        and not is_memory_url(DATABASE_URL)
+    )
+)
+
+def get_writer() -> SerializedWriter:
+    """Retorna o writer serializado do processo."""
+    return _writer
+
+def run_write(fn, *args, **kwargs):
+    """Executa ``fn`` na thread de escrita e retorna seu resultado."""
+    return _writer.run(fn, *args, **kwargs)
+
 # Modelos
 
 class ContaPagar(Base):
@@ -59,6 +85,86 @@ class ContaPagar(Base):
     pdf_url = Column(String(500))
     observacoes = Column(String(1000))
     data_cadastro = Column(DateTime, default=datetime.now)
+    # Identificadores indexados para deduplicação (antes extraídos de observacoes via LIKE)
+    order_sn = Column(String(100))
+    dedup_hash = Column(String(64))
+
+    __table_args__ = (
+        Index("ix_contas_order_sn", "order_sn"),
+        Index("ux_contas_dedup_hash", "dedup_hash", unique=True),
+    )
+
+# --- Identificadores de deduplicação ---
+_SN_RE = re.compile(r"(?<![A-Za-z])SN:\s*([A-Za-z0-9_-]+)")
+_PEDIDO_SHOPEE_RE = re.compile(r"Pedido Shopee #\s*([A-Za-z0-9_-]+)")
+_HASH_RE = re.compile(r"HASH:\s*([0-9a-fA-F]+)")
+
+def make_dedup_hash(*parts) -> str:
+    """Hash determinístico (SHA256 truncado em 16 chars) das partes unidas por '|'."""
+    key = "|".join(str(p) for p in parts)
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+def shopee_dedup_hash(order_sn: str, categoria: str) -> str:
+    """Hash de uma linha de pedido Shopee: um registro por (pedido, categoria)."""
+    return make_dedup_hash("shopee", order_sn, categoria)
+
+def extract_order_sn(observacoes: str):
+    """Extrai o order_sn Shopee de observacoes ('SN:xxx' ou 'Pedido Shopee #xxx')."""
+    if not observacoes:
+        return None
+    m = _SN_RE.search(observacoes) or _PEDIDO_SHOPEE_RE.search(observacoes)
+    return m.group(1) if m else None
+
+def extract_dedup_hash(observacoes: str):
+    """Extrai o marcador 'HASH:xxx' gravado em observacoes."""
+    if not observacoes:
+        return None
+    m = _HASH_RE.search(observacoes)
+    return m.group(1) if m else None
+
+def _derive_dedup_columns(observacoes, categoria):
+    """Retorna (order_sn, dedup_hash) derivados de observacoes/categoria."""
+    order_sn = extract_order_sn(observacoes)
+    dedup_hash = extract_dedup_hash(observacoes)
+    if not dedup_hash and order_sn:
+        dedup_hash = shopee_dedup_hash(order_sn, categoria or "")
+    return order_sn, dedup_hash
+
+class ContaDuplicadaError(ValueError):
+    """Já existe conta com o mesmo dedup_hash (índice único ux_contas_dedup_hash)."""
+
+    def __init__(self, dedup_hash: str, conta_id=None):
+        self.dedup_hash = dedup_hash
+        self.conta_id = conta_id
+        super().__init__(f"Conta duplicada: já existe a conta {conta_id} com dedup_hash {dedup_hash}")
+
+@event.listens_for(ContaPagar, "before_insert")
+def _fill_dedup_columns(mapper, connection, target):
+    """Preenche order_sn e, de um marcador 'HASH:' explícito, dedup_hash.
+
+    dedup_hash não é derivado do SN aqui: contas lançadas à mão podem repetir o
+    SN de um pedido (ajuste, estorno) e esbarrariam no índice único. Só as
+    importações (add_contas_bulk / upsert_contas_bulk) derivam o hash do SN.
+    """
+    if not target.order_sn:
+        target.order_sn = extract_order_sn(target.observacoes)
+    if not target.dedup_hash:
+        target.dedup_hash = extract_dedup_hash(target.observacoes)
+
+class ResumoMensal(Base):
+    """Agregado de contas_pagar por (ano, mês de vencimento, categoria, status).
+
+    Mantido por triggers SQLite na mesma transação da escrita em contas_pagar
+    (ver ensure_resumo_mensal). Categoria/status nulos são gravados como ''.
+    """
+    __tablename__ = "contas_resumo_mensal"
+
+    ano = Column(Integer, primary_key=True, autoincrement=False)
+    mes = Column(Integer, primary_key=True, autoincrement=False)
+    categoria = Column(String(100), primary_key=True, default='')
+    status = Column(String(20), primary_key=True, default='')
+    quantidade = Column(Integer, nullable=False, default=0)
+    valor_total = Column(Float, nullable=False, default=0.0)
 
 class RegraM11(Base):
     """Modelo para regras de aprendizado M11"""
@@ -96,6 +202,23 @@ class ProdutoTiny(Base):
     estoque = Column(Integer)
     ativo = Column(Boolean, default=True)
     data_sincronizacao = Column(DateTime, default=datetime.now)
+    # Espelho do catálogo (modules/catalogo_tiny.py): codigo é o SKU
+    codigo = Column(String(100))
+    preco_custo = Column(Float)
+    gtin = Column(String(50))
+
+    __table_args__ = (
+        Index("ix_tiny_codigo", "codigo"),
+        Index("ix_tiny_gtin", "gtin"),
+    )
+
+class MarcaSincronizacao(Base):
+    """Marcas de tempo das sincronizações (ex.: última varredura completa do catálogo Tiny)"""
+    __tablename__ = "marcas_sincronizacao"
+
+    chave = Column(String(100), primary_key=True)
+    momento = Column(DateTime, nullable=False)
+    data_atualizacao = Column(DateTime, default=datetime.now, onupdate=datetime.now)
 
 class ContaReceber(Base):
     """Modelo para contas a receber"""
@@ -124,10 +247,67 @@ class RegraFornecedorCusto(Base):
     ultima_atualizacao = Column(DateTime, default=datetime.now)
     observacoes = Column(String(1000))
 
+# --- Invalidação do cache (tags) a cada commit ---
+# Modelo -> coluna de data usada nas tags de mês (None: só a tag da tabela)
+_CACHE_TAG_COLUNAS = {
+    ContaPagar: 'vencimento',
+    ContaReceber: 'vencimento',
+    PedidoShopee: 'create_time',
+    ProdutoTiny: None,
+    RegraM11: None,
+    RegraFornecedorCusto: None,
+}
+_TABELAS_CACHE = {m.__tablename__ for m in _CACHE_TAG_COLUNAS}
+
+def marcar_cache_tags(db, tags):
+    """Agenda a invalidação de ``tags`` para o commit da sessão ``db``."""
+    db.info.setdefault('cache_tags', set()).update(tags)
+
+def _tags_objeto(obj):
+    modelo = type(obj)
+    coluna = _CACHE_TAG_COLUNAS[modelo]
+    if coluna is None:
+        return tags_escrita(modelo.__tablename__)
+    historico = inspect(obj).attrs[coluna].history
+    # Data atual e, em updates, a anterior: as duas faixas mudaram
+    datas = list(historico.added or historico.unchanged or [None]) + list(historico.deleted or [])
+    return tags_escrita(modelo.__tablename__, datas)
+
+@event.listens_for(Session, "after_flush")
+def _coleta_cache_tags(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if type(obj) in _CACHE_TAG_COLUNAS and (obj not in session.dirty or session.is_modified(obj)):
+            marcar_cache_tags(session, _tags_objeto(obj))
+
+@event.listens_for(Session, "do_orm_execute")
+def _coleta_cache_tags_dml(orm_execute_state):
+    # INSERT/UPDATE/DELETE em lote via session.execute não passam pelo flush
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    tabela = getattr(orm_execute_state.statement, 'table', None)
+    if tabela is None or tabela.name not in _TABELAS_CACHE:
+        return
+    tags = orm_execute_state.execution_options.get('cache_tags')
+    marcar_cache_tags(orm_execute_state.session, tags if tags is not None else tags_escrita(tabela.name))
+
+@event.listens_for(Session, "after_commit")
+def _invalida_cache_tags(session):
+    tags = session.info.pop('cache_tags', None)
+    if tags:
+        invalidate_tags(tags)
+
+@event.listens_for(Session, "after_rollback")
+def _descarta_cache_tags(session):
+    session.info.pop('cache_tags', None)
+
 def init_database():
     """Inicializa o banco de dados criando todas as tabelas"""
     Base.metadata.create_all(engine)
+    migrate_contas_dedup_columns()
+    migrate_produtos_tiny_columns()
     ensure_indexes()
+    ensure_resumo_mensal()
+    ensure_contas_fts()
 
 def init_db():
     """Alias de compatibilidade"""
@@ -137,28 +317,401 @@ def get_db():
     """Retorna uma sessão do banco de dados (caller deve fechar manualmente)"""
     return SessionLocal()
 
-def ensure_indexes():
+# Índices secundários (ver modules/query_plans.py para a regressão de planos que os justifica)
+INDEX_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_contas_vencimento ON contas_pagar (vencimento)",
+    "CREATE INDEX IF NOT EXISTS ix_contas_categoria ON contas_pagar (categoria)",
+    "CREATE INDEX IF NOT EXISTS ix_contas_fornecedor ON contas_pagar (fornecedor)",
+    "CREATE INDEX IF NOT EXISTS ix_contas_mes ON contas_pagar (mes)",
+    "CREATE INDEX IF NOT EXISTS ix_contas_mes_vencimento ON contas_pagar (mes, vencimento)",
+    "CREATE INDEX IF NOT EXISTS ix_contas_status ON contas_pagar (status)",
+    "CREATE INDEX IF NOT EXISTS ix_contas_status_vencimento ON contas_pagar (status, vencimento)",
+    "CREATE INDEX IF NOT EXISTS ix_contas_descricao ON contas_pagar (descricao)",
+    "CREATE INDEX IF NOT EXISTS ix_contas_order_sn ON contas_pagar (order_sn)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_contas_dedup_hash ON contas_pagar (dedup_hash)",
+    "CREATE INDEX IF NOT EXISTS ix_regras_cnpj ON regras_m11 (cnpj)",
+    "CREATE INDEX IF NOT EXISTS ix_regras_ativo ON regras_m11 (ativo)",
+    "CREATE INDEX IF NOT EXISTS ix_shopee_order_sn ON pedidos_shopee (order_sn)",
+    "CREATE INDEX IF NOT EXISTS ix_shopee_status ON pedidos_shopee (order_status)",
+    "CREATE INDEX IF NOT EXISTS ix_tiny_produto_id ON produtos_tiny (produto_id)",
+    "CREATE INDEX IF NOT EXISTS ix_tiny_codigo ON produtos_tiny (codigo)",
+    "CREATE INDEX IF NOT EXISTS ix_tiny_gtin ON produtos_tiny (gtin)",
+    "CREATE INDEX IF NOT EXISTS ix_regras_custo_fornecedor ON regras_fornecedor_custo (fornecedor)",
+    "CREATE INDEX IF NOT EXISTS ix_regras_custo_ativo ON regras_fornecedor_custo (ativo)",
+]
+
+def ensure_indexes(bind=None):
     """Cria índices úteis para performance se não existirem."""
     try:
-        with engine.connect() as conn:
-            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_contas_vencimento ON contas_pagar (vencimento)")
-            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_contas_categoria ON contas_pagar (categoria)")
-            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_contas_fornecedor ON contas_pagar (fornecedor)")
-            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_contas_mes ON contas_pagar (mes)")
-            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_contas_status ON contas_pagar (status)")
-            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_contas_descricao ON contas_pagar (descricao)")
-            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_regras_cnpj ON regras_m11 (cnpj)")
-            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_regras_ativo ON regras_m11 (ativo)")
-            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_shopee_order_sn ON pedidos_shopee (order_sn)")
-            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_shopee_status ON pedidos_shopee (order_status)")
-            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_tiny_produto_id ON produtos_tiny (produto_id)")
-            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_regras_custo_fornecedor ON regras_fornecedor_custo (fornecedor)")
-            conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_regras_custo_ativo ON regras_fornecedor_custo (ativo)")
+        with (bind or engine).connect() as conn:
+            for ddl in INDEX_DDL:
+                conn.exec_driver_sql(ddl)
             conn.commit()
     except Exception as e:
         # Logging leve para evitar dependência circular
         print(f"[DB] Falha ao criar índices: {e}")
 
+def migrate_contas_dedup_columns(batch_size: int = 1000, force: bool = False, bind=None) -> dict:
+    """Adiciona order_sn/dedup_hash em bancos antigos e preenche a partir de observacoes.
+
+    O backfill roda em lotes (keyset por id) e só é executado quando as colunas
+    acabaram de ser criadas, ou quando ``force=True``. Linhas cujo hash já exista
+    em outra conta ficam com dedup_hash NULL (o índice único não é violado).
+
+    Args:
+        batch_size: Linhas lidas/atualizadas por transação.
+        force: Reexecuta o backfill mesmo se as colunas já existirem.
+        bind: Engine alternativo (padrão: engine do módulo).
+
+    Returns:
+        Dict com colunas adicionadas e quantidade de linhas atualizadas.
+    """
+    bind = bind or engine
+    stats = {'colunas_adicionadas': [], 'order_sn': 0, 'dedup_hash': 0}
+    existing = {c['name'] for c in inspect(bind).get_columns('contas_pagar')}
+    with bind.begin() as conn:
+        for col, ddl in (('order_sn', 'VARCHAR(100)'), ('dedup_hash', 'VARCHAR(64)')):
+            if col not in existing:
+                conn.exec_driver_sql(f"ALTER TABLE contas_pagar ADD COLUMN {col} {ddl}")
+                stats['colunas_adicionadas'].append(col)
+        conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_contas_order_sn ON contas_pagar (order_sn)")
+        conn.exec_driver_sql("CREATE UNIQUE INDEX IF NOT EXISTS ux_contas_dedup_hash ON contas_pagar (dedup_hash)")
+
+    if not (stats['colunas_adicionadas'] or force):
+        return stats
+
+    select_batch = text(
+        "SELECT id, observacoes, categoria FROM contas_pagar "
+        "WHERE id > :last_id AND observacoes IS NOT NULL "
+        "AND (order_sn IS NULL OR dedup_hash IS NULL) "
+        "ORDER BY id LIMIT :limit"
+    )
+    update_sn = text("UPDATE contas_pagar SET order_sn = :order_sn WHERE id = :id AND order_sn IS NULL")
+    update_hash = text(
+        "UPDATE contas_pagar SET dedup_hash = :dedup_hash WHERE id = :id AND dedup_hash IS NULL "
+        "AND NOT EXISTS (SELECT 1 FROM contas_pagar WHERE dedup_hash = :dedup_hash)"
+    )
+    last_id = 0
+    while True:
+        with bind.begin() as conn:
+            rows = conn.execute(select_batch, {'last_id': last_id, 'limit': batch_size}).fetchall()
+            if not rows:
+                break
+            sn_params, hash_params = [], []
+            for conta_id, observacoes, categoria in rows:
+                order_sn, dedup_hash = _derive_dedup_columns(observacoes, categoria)
+                if order_sn:
+                    sn_params.append({'id': conta_id, 'order_sn': order_sn})
+                if dedup_hash:
+                    hash_params.append({'id': conta_id, 'dedup_hash': dedup_hash})
+            if sn_params:
+                conn.execute(update_sn, sn_params)
+            # Um a um: o NOT EXISTS precisa enxergar os hashes gravados no mesmo lote
+            for params in hash_params:
+                stats['dedup_hash'] += conn.execute(update_hash, params).rowcount or 0
+            stats['order_sn'] += len(sn_params)
+            last_id = rows[-1][0]
+    if stats['order_sn'] or stats['dedup_hash']:
+        print(f"[DB] Backfill dedup: {stats['order_sn']} order_sn, {stats['dedup_hash']} dedup_hash")
+    return stats
+
+def migrate_produtos_tiny_columns(bind=None) -> list:
+    """Adiciona codigo/preco_custo/gtin em bancos criados antes do espelho do catálogo.
+
+    Returns:
+        Lista das colunas adicionadas.
+    """
+    bind = bind or engine
+    existing = {c['name'] for c in inspect(bind).get_columns('produtos_tiny')}
+    adicionadas = []
+    with bind.begin() as conn:
+        for col, ddl in (('codigo', 'VARCHAR(100)'), ('preco_custo', 'FLOAT'), ('gtin', 'VARCHAR(50)')):
+            if col not in existing:
+                conn.exec_driver_sql(f"ALTER TABLE produtos_tiny ADD COLUMN {col} {ddl}")
+                adicionadas.append(col)
+        conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_tiny_codigo ON produtos_tiny (codigo)")
+        conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_tiny_gtin ON produtos_tiny (gtin)")
+    return adicionadas
+
+# --- Resumo mensal (contas_resumo_mensal) ---
+def _resumo_chave(ref: str) -> str:
+    return (
+        f"CAST(strftime('%Y', {ref}.vencimento) AS INTEGER), "
+        f"CAST(strftime('%m', {ref}.vencimento) AS INTEGER), "
+        f"COALESCE({ref}.categoria, ''), COALESCE({ref}.status, '')"
+    )
+
+def _resumo_upsert(ref: str, sinal: str) -> str:
+    return (
+        "INSERT INTO contas_resumo_mensal (ano, mes, categoria, status, quantidade, valor_total) "
+        f"VALUES ({_resumo_chave(ref)}, {sinal}1, {sinal}{ref}.valor) "
+        "ON CONFLICT (ano, mes, categoria, status) DO UPDATE SET "
+        "quantidade = quantidade + excluded.quantidade, "
+        "valor_total = valor_total + excluded.valor_total;"
+    )
+
+def _resumo_limpa(ref: str) -> str:
+    return (
+        "DELETE FROM contas_resumo_mensal WHERE quantidade <= 0 "
+        f"AND (ano, mes, categoria, status) = ({_resumo_chave(ref)});"
+    )
+
+_RESUMO_TRIGGERS = {
+    'trg_contas_resumo_insert': (
+        "AFTER INSERT ON contas_pagar BEGIN " + _resumo_upsert('NEW', '') + " END"
+    ),
+    'trg_contas_resumo_update': (
+        "AFTER UPDATE OF vencimento, categoria, status, valor ON contas_pagar BEGIN "
+        + _resumo_upsert('OLD', '-') + _resumo_limpa('OLD') + _resumo_upsert('NEW', '') + " END"
+    ),
+    'trg_contas_resumo_delete': (
+        "AFTER DELETE ON contas_pagar BEGIN " + _resumo_upsert('OLD', '-') + _resumo_limpa('OLD') + " END"
+    ),
+}
+
+def resumo_incorpora(conn, origem: str = 'contas_pagar', where: str = None, params=(),
+                     destino: str = 'main.contas_resumo_mensal'):
+    """Soma ao resumo mensal os agregados das linhas de ``origem`` (mesmo esquema de contas_pagar).
+
+    ``origem`` pode ser qualificada por schema (ex.: ``arq.contas_pagar`` de um banco anexado);
+    ``destino`` é outra tabela com as colunas e a chave do resumo (ex.: temporária).
+    """
+    conn.exec_driver_sql(
+        f"INSERT INTO {destino} (ano, mes, categoria, status, quantidade, valor_total) "
+        f"SELECT {_resumo_chave(origem)}, COUNT(*), SUM(valor) FROM {origem} "
+        f"WHERE {where or 'true'} GROUP BY 1, 2, 3, 4 "
+        "ON CONFLICT (ano, mes, categoria, status) DO UPDATE SET "
+        "quantidade = quantidade + excluded.quantidade, "
+        "valor_total = valor_total + excluded.valor_total",
+        tuple(params)
+    )
+
+def _rebuild_resumo(conn, origens=('contas_pagar',)) -> int:
+    conn.exec_driver_sql("DELETE FROM main.contas_resumo_mensal")
+    for origem in origens:
+        resumo_incorpora(conn, origem)
+    return conn.exec_driver_sql("SELECT COUNT(*) FROM main.contas_resumo_mensal").scalar() or 0
+
+def ensure_resumo_mensal(bind=None) -> bool:
+    """Cria a tabela de resumo mensal e as triggers que a mantêm (SQLite).
+
+    Se o resumo estiver vazio e contas_pagar não (banco anterior às triggers),
+    o resumo é reconstruído na mesma transação em que as triggers são criadas.
+
+    Returns:
+        True se houve reconstrução.
+    """
+    bind = bind or engine
+    if bind.dialect.name != 'sqlite':
+        return False
+    ResumoMensal.__table__.create(bind, checkfirst=True)
+    with bind.begin() as conn:
+        for nome, corpo in _RESUMO_TRIGGERS.items():
+            conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {nome} {corpo}")
+        vazio = conn.exec_driver_sql("SELECT 1 FROM contas_resumo_mensal LIMIT 1").first() is None
+        if vazio and conn.exec_driver_sql("SELECT 1 FROM contas_pagar LIMIT 1").first() is not None:
+            linhas = _rebuild_resumo(conn)
+            print(f"[DB] Resumo mensal reconstruído: {linhas} linhas")
+            return True
+    return False
+
+def rebuild_resumo_mensal(bind=None) -> int:
+    """Recalcula contas_resumo_mensal a partir de contas_pagar (recuperação).
+
+    Returns:
+        Quantidade de linhas (ano, mês, categoria, status) no resumo.
+    """
+    bind = bind or engine
+    ensure_resumo_mensal(bind)
+    with bind.begin() as conn:
+        return _rebuild_resumo(conn)
+
+def _primeiro_dia_mes_seguinte(d):
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def _agrega_contas(db, inicio, fim, status):
+    query = db.query(ContaPagar.categoria, ContaPagar.status,
+                     func.count(ContaPagar.id), func.sum(ContaPagar.valor)).\
+        filter(ContaPagar.vencimento.between(inicio, fim))
+    if status:
+        query = query.filter(ContaPagar.status == status)
+    return query.group_by(ContaPagar.categoria, ContaPagar.status).all()
+
+def resumo_por_periodo(db, data_inicio=None, data_fim=None, status: str = None) -> dict:
+    """Agrega contas por (categoria, status) com vencimento em [data_inicio, data_fim].
+
+    Meses inteiros do intervalo são lidos de contas_resumo_mensal; apenas os dias
+    das pontas (meses parciais) consultam contas_pagar pelo índice de vencimento.
+    Limites None deixam o intervalo aberto naquele lado.
+
+    Returns:
+        {(categoria, status): (quantidade, valor)} com '' no lugar de nulos.
+    """
+    totais = {}
+
+    def acumula(rows):
+        for categoria, st, quantidade, valor in rows:
+            chave = (categoria or '', st or '')
+            q, v = totais.get(chave, (0, 0.0))
+            totais[chave] = (q + int(quantidade or 0), v + float(valor or 0.0))
+
+    # Primeiro e último dia cobertos por meses inteiros
+    cheio_ini = data_inicio
+    if data_inicio and data_inicio.day != 1:
+        cheio_ini = _primeiro_dia_mes_seguinte(data_inicio)
+    cheio_fim = data_fim
+    if data_fim and _primeiro_dia_mes_seguinte(data_fim) != data_fim + timedelta(days=1):
+        cheio_fim = data_fim.replace(day=1) - timedelta(days=1)
+
+    if cheio_ini and cheio_fim and cheio_ini > cheio_fim:
+        # Intervalo não cobre nenhum mês inteiro: tudo vem da tabela base
+        acumula(_agrega_contas(db, data_inicio, data_fim, status))
+        return totais
+
+    indice = ResumoMensal.ano * 12 + ResumoMensal.mes
+    query = db.query(ResumoMensal.categoria, ResumoMensal.status,
+                     func.sum(ResumoMensal.quantidade), func.sum(ResumoMensal.valor_total))
+    if cheio_ini:
+        query = query.filter(indice >= cheio_ini.year * 12 + cheio_ini.month)
+    if cheio_fim:
+        query = query.filter(indice <= cheio_fim.year * 12 + cheio_fim.month)
+    if status:
+        query = query.filter(ResumoMensal.status == status)
+    acumula(query.group_by(ResumoMensal.categoria, ResumoMensal.status).all())
+
+    if data_inicio and cheio_ini != data_inicio:
+        acumula(_agrega_contas(db, data_inicio, cheio_ini - timedelta(days=1), status))
+    if data_fim and cheio_fim != data_fim:
+        acumula(_agrega_contas(db, cheio_fim + timedelta(days=1), data_fim, status))
+    return totais
+
+# --- Busca textual (FTS5 sobre contas_pagar) ---
+# Tabela FTS5 de conteúdo externo: guarda só o índice invertido; o texto fica em contas_pagar.
+FTS_COLUNAS = ('fornecedor', 'categoria', 'descricao', 'observacoes')
+
+def _fts_valores(ref: str) -> str:
+    return ", ".join(f"{ref}.{c}" for c in FTS_COLUNAS)
+
+_FTS_DDL = (
+    f"CREATE VIRTUAL TABLE contas_fts USING fts5({', '.join(FTS_COLUNAS)}, "
+    "content='contas_pagar', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+)
+
+_FTS_INSERE = f"INSERT INTO contas_fts (rowid, {', '.join(FTS_COLUNAS)}) VALUES (NEW.id, {_fts_valores('NEW')});"
+_FTS_REMOVE = (
+    f"INSERT INTO contas_fts (contas_fts, rowid, {', '.join(FTS_COLUNAS)}) "
+    f"VALUES ('delete', OLD.id, {_fts_valores('OLD')});"
+)
+
+_FTS_TRIGGERS = {
+    'trg_contas_fts_insert': "AFTER INSERT ON contas_pagar BEGIN " + _FTS_INSERE + " END",
+    'trg_contas_fts_update': (
+        f"AFTER UPDATE OF {', '.join(FTS_COLUNAS)} ON contas_pagar BEGIN "
+        + _FTS_REMOVE + _FTS_INSERE + " END"
+    ),
+    'trg_contas_fts_delete': "AFTER DELETE ON contas_pagar BEGIN " + _FTS_REMOVE + " END",
+}
+
+def ensure_contas_fts(bind=None) -> bool:
+    """Cria o índice FTS5 contas_fts e as triggers que o sincronizam (SQLite).
+
+    Na criação o índice é populado a partir de contas_pagar ('rebuild').
+
+    Returns:
+        True se o índice foi criado agora.
+    """
+    bind = bind or engine
+    if bind.dialect.name != 'sqlite':
+        return False
+    with bind.begin() as conn:
+        existe = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'contas_fts'"
+        ).first() is not None
+        if not existe:
+            conn.exec_driver_sql(_FTS_DDL)
+            conn.exec_driver_sql("INSERT INTO contas_fts (contas_fts) VALUES ('rebuild')")
+        for nome, corpo in _FTS_TRIGGERS.items():
+            conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {nome} {corpo}")
+    return not existe
+
+def rebuild_contas_fts(bind=None):
+    """Reconstrói o índice FTS5 a partir de contas_pagar (recuperação)."""
+    bind = bind or engine
+    ensure_contas_fts(bind)
+    with bind.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO contas_fts (contas_fts) VALUES ('rebuild')")
+
+def _tem_fts(db) -> bool:
+    bind = db.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return False
+    return db.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'contas_fts'"
+    )).first() is not None
+
+def fts_query(texto: str, colunas=None, frase: bool = False):
+    """Converte texto livre em expressão MATCH do FTS5 (None se não houver termos).
+
+    Cada palavra vira um termo entre aspas com busca por prefixo ("energ" acha
+    "Energia"), todos obrigatórios; ``frase=True`` exige as palavras em sequência.
+    ``colunas`` restringe a busca a colunas de FTS_COLUNAS.
+    """
+    termos = re.findall(r"\w+", texto or "")
+    if not termos:
+        return None
+    if frase:
+        expr = '"' + " ".join(termos) + '"'
+    else:
+        expr = " ".join(f'"{t}"*' for t in termos)
+    if colunas:
+        invalidas = set(colunas) - set(FTS_COLUNAS)
+        if invalidas:
+            raise ValueError(f"Colunas sem índice textual: {sorted(invalidas)}")
+        expr = "{" + " ".join(colunas) + "} : (" + expr + ")"
+    return expr
+
+def contas_fts_filter(texto: str, colunas=None, frase: bool = False):
+    """Cláusula para .filter(): contas cujo texto casa com a busca no índice FTS5."""
+    expr = fts_query(texto, colunas, frase)
+    if expr is None:
+        return true()
+    fts = literal_column("contas_fts")
+    return ContaPagar.id.in_(
+        select(literal_column("rowid")).select_from(text("contas_fts")).where(fts.op("MATCH")(expr))
+    )
+
+def contas_texto_filter(db, texto: str, colunas=None, frase: bool = False):
+    """Como contas_fts_filter, com LIKE '%texto%' nas colunas se o banco não tiver contas_fts."""
+    if _tem_fts(db):
+        return contas_fts_filter(texto, colunas, frase)
+    termo = f"%{texto}%"
+    return or_(*(getattr(ContaPagar, c).like(termo) for c in (colunas or FTS_COLUNAS)))
+
+def search_contas(texto: str, limit: int = 50, colunas=None, frase: bool = False, db=None) -> list:
+    """Busca textual em contas_pagar; retorna ids ordenados por relevância (bm25).
+
+    Args:
+        texto: Palavras a buscar (ver fts_query).
+        limit: Máximo de ids.
+        colunas: Restringe a fornecedor/categoria/descricao/observacoes.
+        frase: Exige as palavras em sequência.
+        db: Sessão opcional.
+    """
+    expr = fts_query(texto, colunas, frase)
+    if expr is None:
+        return []
+    should_close = db is None
+    db = db or get_db()
+    try:
+        rows = db.execute(
+            text("SELECT rowid FROM contas_fts WHERE contas_fts MATCH :q ORDER BY rank LIMIT :limit"),
+            {'q': expr, 'limit': limit}
+        ).fetchall()
+        return [r[0] for r in rows]
+    finally:
+        if should_close:
+            db.close()
+
 # --- Funções de Regras (M11) ---
 def get_regra(cnpj: str):
     """Obtém regra por CNPJ, retorna dict ou None"""
@@ -179,6 +732,7 @@ def get_regra(cnpj: str):
     finally:
         db.close()
 
+@serialized(get_writer)
 def registrar_uso_cnpj(cnpj: str):
     """Incrementa contador de uso de uma regra; ativa se >=3"""
     db = get_db()
@@ -193,6 +747,7 @@ def registrar_uso_cnpj(cnpj: str):
     finally:
         db.close()
 
+@serialized(get_writer)
 def add_or_update_regra(cnpj: str, fornecedor: str, categoria: str):
     """Cria ou atualiza regra para CNPJ; ativa após 3 usos.
     Sempre incrementa contador quando chamada em contexto de criação de conta.
@@ -236,10 +791,65 @@ def count_regras_ativas():
 
 # --- Funções de ContaPagar helper ---
 from datetime import datetime as _dt
+from dataclasses import asdict as _asdict, is_dataclass as _is_dataclass
+
+def _parse_vencimento(venc):
+    """Converte vencimento (DD/MM/AAAA, YYYY-MM-DD, date ou vazio) em date."""
+    if isinstance(venc, str):
+        try:
+            # Tentar DD/MM/YYYY
+            return _dt.strptime(venc, '%d/%m/%Y').date()
+        except:
+            try:
+                # Tentar YYYY-MM-DD
+                return _dt.strptime(venc, '%Y-%m-%d').date()
+            except:
+                # fallback para hoje
+                return _dt.now().date()
+    if isinstance(venc, _dt):
+        return venc.date()
+    return venc if venc else _dt.now().date()
+
+def _conta_values(dados: dict, parse_date=_parse_vencimento, derivar_hash: bool = False) -> dict:
+    """Monta o dict de colunas de ContaPagar a partir dos campos aceitos por add_conta.
+
+    Com ``derivar_hash`` (importações), dedup_hash não informado é derivado do SN de
+    observacoes; sem ele, só um marcador 'HASH:' explícito é usado.
+    """
+    venc_date = parse_date(dados.get('vencimento'))
+    observacoes = dados.get('observacoes') or dados.get('observacao') or None
+    categoria = dados.get('categoria') or None
+    order_sn = dados.get('order_sn') or None
+    dedup_hash = dados.get('dedup_hash') or None
+    if not (order_sn and dedup_hash):
+        derived_sn, derived_hash = _derive_dedup_columns(observacoes, categoria)
+        order_sn = order_sn or derived_sn
+        dedup_hash = dedup_hash or (derived_hash if derivar_hash else extract_dedup_hash(observacoes))
+    return {
+        'mes': venc_date.month,
+        'vencimento': venc_date,
+        'fornecedor': (dados.get('fornecedor') or '').strip(),
+        'cnpj': dados.get('cnpj') or None,
+        'categoria': categoria,
+        'descricao': dados.get('descricao') or None,
+        'valor': float(dados.get('valor', 0.0) or 0.0),
+        'status': dados.get('status', 'Pendente'),
+        'data_pagamento': dados.get('data_pagamento') or None,
+        'linha_digitavel': dados.get('linha_digitavel') or None,
+        'pdf_url': dados.get('pdf_path') or dados.get('pdf_url') or None,
+        'observacoes': observacoes,
+        'order_sn': order_sn,
+        'dedup_hash': dedup_hash,
+    }
+
+@serialized(get_writer)
 def add_conta(dados: dict = None, **kwargs):
     """Adiciona uma conta a pagar a partir de dict ou kwargs.
     Campos esperados: vencimento (DD/MM/AAAA, YYYY-MM-DD ou date), fornecedor, cnpj, categoria,
-    descricao, valor (float), status, linha_digitavel, pdf_path/ pdf_url, observacoes, observacao.
+    descricao, valor (float), status, linha_digitavel, pdf_path/ pdf_url, observacoes, observacao,
+    order_sn, dedup_hash.
+    dedup_hash só é gravado se informado; se já existir, levanta ContaDuplicadaError.
+    Para muitas contas de uma vez use add_contas_bulk / upsert_contas_bulk.
     """
     # Aceitar tanto dict quanto kwargs
     if dados is None:
@@ -249,64 +859,348 @@ def add_conta(dados: dict = None, **kwargs):
     
     db = get_db()
     try:
-        venc = dados.get('vencimento')
-        if isinstance(venc, str):
-            try:
-                # Tentar DD/MM/YYYY
-                venc_date = _dt.strptime(venc, '%d/%m/%Y').date()
-            except:
-                try:
-                    # Tentar YYYY-MM-DD
-                    venc_date = _dt.strptime(venc, '%Y-%m-%d').date()
-                except:
-                    # fallback para hoje
-                    venc_date = _dt.now().date()
-        else:
-            venc_date = venc if venc else _dt.now().date()
-        
-        conta = ContaPagar(
-            mes=venc_date.month,
-            vencimento=venc_date,
-            fornecedor=dados.get('fornecedor','').strip(),
-            cnpj=dados.get('cnpj') or None,
-            categoria=dados.get('categoria') or None,
-            descricao=dados.get('descricao') or None,
-            valor=float(dados.get('valor',0.0)),
-            status=dados.get('status','Pendente'),
-            linha_digitavel=dados.get('linha_digitavel') or None,
-            pdf_url=dados.get('pdf_path') or dados.get('pdf_url') or None,
-            observacoes=dados.get('observacoes') or dados.get('observacao') or None
-        )
+        conta = ContaPagar(**_conta_values(dados))
         db.add(conta)
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            existente = conta.dedup_hash and db.query(ContaPagar.id).filter(
+                ContaPagar.dedup_hash == conta.dedup_hash).scalar()
+            if existente:
+                raise ContaDuplicadaError(conta.dedup_hash, existente) from None
+            raise
         return conta.id
     finally:
         db.close()
 
+BULK_CHUNK_SIZE = 500
+
+def _bulk_input_dict(item) -> dict:
+    """Aceita dict, entidade de domínio (dataclass Conta) ou modelo ContaPagar."""
+    if isinstance(item, dict):
+        return item
+    if _is_dataclass(item):
+        return _asdict(item)
+    if isinstance(item, ContaPagar):
+        return {c.name: getattr(item, c.name) for c in ContaPagar.__table__.columns}
+    raise TypeError(f"Conta em formato não suportado: {type(item).__name__}")
+
+def _dialect_insert(db):
+    """Retorna o insert() do dialeto (suporta ON CONFLICT) para a sessão."""
+    if db.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+def _write_contas_bulk(db, contas, chunk_size: int, update_fields) -> dict:
+    """Insere em lotes multi-VALUES na sessão informada (sem commit)."""
+    table = ContaPagar.__table__
+    agora = _dt.now()
+    datas = {}
+
+    def parse_date(venc):
+        # Datas se repetem muito em lotes de pedidos: cada string é convertida uma única vez
+        if not isinstance(venc, str):
+            return _parse_vencimento(venc)
+        if venc not in datas:
+            datas[venc] = _parse_vencimento(venc)
+        return datas[venc]
+
+    rows, skipped = [], []
+    by_hash = {}
+    for item in contas:
+        row = _conta_values(_bulk_input_dict(item), parse_date, derivar_hash=True)
+        row['data_cadastro'] = agora
+        dedup_hash = row['dedup_hash']
+        if dedup_hash and dedup_hash in by_hash:
+            if update_fields:
+                rows[by_hash[dedup_hash]] = row   # upsert: a última ocorrência vence
+            else:
+                skipped.append(row)
+            continue
+        if dedup_hash:
+            by_hash[dedup_hash] = len(rows)
+        rows.append(row)
+
+    insert = _dialect_insert(db)
+    ids = []
+    for i in range(0, len(rows), chunk_size):
+        chunk = rows[i:i + chunk_size]
+        # Insert puro: só os meses gravados; upsert pode tocar linhas de outro vencimento
+        tags = None if update_fields else tags_escrita('contas_pagar', [r['vencimento'] for r in chunk])
+        stmt = insert(table).values(chunk).execution_options(cache_tags=tags)
+        if update_fields:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['dedup_hash'],
+                set_={f: stmt.excluded[f] for f in update_fields},
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=['dedup_hash'])
+        returned = db.execute(stmt.returning(table.c.id, table.c.dedup_hash)).fetchall()
+        ids.extend(r[0] for r in returned)
+        if not update_fields:
+            gravados = {r[1] for r in returned if r[1]}
+            skipped.extend(r for r in chunk if r['dedup_hash'] and r['dedup_hash'] not in gravados)
+    return {'ids': ids, 'skipped': skipped}
+
+def _run_bulk(contas, chunk_size, update_fields, db):
+    if db is not None:
+        # Sessão do chamador: participa da transação dele (commit fica com quem chamou)
+        return _write_contas_bulk(db, contas, chunk_size, update_fields)
+
+    def _write():
+        own = get_db()
+        try:
+            result = _write_contas_bulk(own, contas, chunk_size, update_fields)
+            own.commit()
+            return result
+        except Exception:
+            own.rollback()
+            raise
+        finally:
+            own.close()
+    return run_write(_write)
+
+def add_contas_bulk(contas, chunk_size: int = BULK_CHUNK_SIZE, db=None) -> dict:
+    """Insere várias contas em uma única transação (INSERT ... ON CONFLICT DO NOTHING).
+
+    Args:
+        contas: Iterável de dicts (mesmos campos de add_conta) ou entidades Conta.
+        chunk_size: Linhas por instrução INSERT multi-VALUES.
+        db: Sessão opcional; se informada, o commit fica a cargo do chamador.
+
+    Returns:
+        {'ids': ids inseridos, 'skipped': linhas ignoradas por conflito de dedup_hash}
+    """
+    return _run_bulk(contas, chunk_size, None, db)
+
+def upsert_contas_bulk(contas, update_fields=('status', 'valor', 'data_pagamento', 'descricao', 'observacoes'),
+                       chunk_size: int = BULK_CHUNK_SIZE, db=None) -> dict:
+    """Como add_contas_bulk, mas atualiza ``update_fields`` quando o dedup_hash já existe.
+
+    Returns:
+        {'ids': ids inseridos ou atualizados, 'skipped': []}
+    """
+    if not update_fields:
+        raise ValueError("update_fields não pode ser vazio (use add_contas_bulk)")
+    return _run_bulk(contas, chunk_size, tuple(update_fields), db)
+
+PRODUTO_TINY_CAMPOS = ('codigo', 'nome', 'preco', 'preco_custo', 'gtin', 'ativo', 'data_sincronizacao')
+
+def upsert_produtos_tiny(produtos, chunk_size: int = BULK_CHUNK_SIZE, db=None) -> int:
+    """Grava produtos do catálogo Tiny (INSERT ... ON CONFLICT (produto_id) DO UPDATE).
+
+    Args:
+        produtos: Dicts com produto_id e os campos de PRODUTO_TINY_CAMPOS.
+        chunk_size: Linhas por instrução INSERT multi-VALUES.
+        db: Sessão opcional; se informada, o commit fica a cargo do chamador.
+
+    Returns:
+        Quantidade de linhas gravadas.
+    """
+    # O mesmo id pode aparecer em duas páginas se o catálogo mudar durante a varredura
+    rows = list({p['produto_id']: p for p in produtos if p.get('produto_id')}.values())
+    if not rows:
+        return 0
+
+    def _write(sessao):
+        table = ProdutoTiny.__table__
+        insert = _dialect_insert(sessao)
+        for i in range(0, len(rows), chunk_size):
+            stmt = insert(table).values(rows[i:i + chunk_size])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['produto_id'],
+                set_={f: stmt.excluded[f] for f in PRODUTO_TINY_CAMPOS if f in rows[0]},
+            )
+            sessao.execute(stmt)
+        return len(rows)
+
+    if db is not None:
+        return _write(db)
+
+    def _write_own():
+        own = get_db()
+        try:
+            total = _write(own)
+            own.commit()
+            return total
+        except Exception:
+            own.rollback()
+            raise
+        finally:
+            own.close()
+    return run_write(_write_own)
+
+def get_marca_sincronizacao(chave: str):
+    """Momento gravado em ``chave`` por ``set_marca_sincronizacao`` (None se nunca gravado)."""
+    db = get_db()
+    try:
+        marca = db.get(MarcaSincronizacao, chave)
+        return marca.momento if marca else None
+    finally:
+        db.close()
+
+def set_marca_sincronizacao(chave: str, momento: datetime):
+    """Grava (ou substitui) o momento de ``chave``."""
+    def _write():
+        db = get_db()
+        try:
+            db.merge(MarcaSincronizacao(chave=chave, momento=momento))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    run_write(_write)
+
+def _conta_to_dict(c) -> dict:
+    return {
+        'id': c.id,
+        'mes': c.mes,
+        'vencimento': c.vencimento.strftime('%Y-%m-%d') if c.vencimento else '',
+        'fornecedor': c.fornecedor,
+        'cnpj': c.cnpj or '',
+        'categoria': c.categoria or '',
+        'descricao': c.descricao or '',
+        'valor': c.valor,
+        'status': c.status,
+        'data_pagamento': c.data_pagamento.strftime('%Y-%m-%d') if c.data_pagamento else '',
+        'linha_digitavel': c.linha_digitavel or '',
+        'pdf_url': c.pdf_url or '',
+        'observacoes': c.observacoes or '',
+        'data_cadastro': c.data_cadastro.strftime('%Y-%m-%d %H:%M:%S') if c.data_cadastro else ''
+    }
+
 def get_all_contas():
-    """Retorna todas as contas como lista de dicts"""
+    """Retorna todas as contas como lista de dicts.
+    Carrega a tabela inteira; para telas use list_contas (paginação por keyset).
+    """
     db = get_db()
     try:
         contas = db.query(ContaPagar).all()
-        return [{
-            'id': c.id,
-            'mes': c.mes,
-            'vencimento': c.vencimento.strftime('%Y-%m-%d') if c.vencimento else '',
-            'fornecedor': c.fornecedor,
-            'cnpj': c.cnpj or '',
-            'categoria': c.categoria or '',
-            'descricao': c.descricao or '',
-            'valor': c.valor,
-            'status': c.status,
-            'data_pagamento': c.data_pagamento.strftime('%Y-%m-%d') if c.data_pagamento else '',
-            'linha_digitavel': c.linha_digitavel or '',
-            'pdf_url': c.pdf_url or '',
-            'observacoes': c.observacoes or '',
-            'data_cadastro': c.data_cadastro.strftime('%Y-%m-%d %H:%M:%S') if c.data_cadastro else ''
-        } for c in contas]
+        return [_conta_to_dict(c) for c in contas]
     finally:
         db.close()
 
+# Filtros aceitos por list_contas / count_contas
+_FILTROS_CONTAS = ('mes', 'status', 'categoria', 'categoria_contem', 'busca', 'data_inicio', 'data_fim')
+# Filtros que o resumo mensal consegue responder sem tocar contas_pagar. 'mes' fica
+# de fora: o resumo agrupa pelo mês do vencimento e list_contas filtra ContaPagar.mes
+_FILTROS_RESUMO = {'status', 'categoria'}
+
+def _filtros_ativos(filters) -> dict:
+    filters = {k: v for k, v in (filters or {}).items() if v not in (None, '')}
+    desconhecidos = set(filters) - set(_FILTROS_CONTAS)
+    if desconhecidos:
+        raise ValueError(f"Filtros não suportados: {sorted(desconhecidos)}")
+    return filters
+
+def _aplica_filtros_contas(query, filters: dict):
+    if 'mes' in filters:
+        query = query.filter(ContaPagar.mes == int(filters['mes']))
+    if 'status' in filters:
+        query = query.filter(ContaPagar.status == filters['status'])
+    if 'categoria' in filters:
+        query = query.filter(ContaPagar.categoria == filters['categoria'])
+    if 'categoria_contem' in filters:
+        query = query.filter(ContaPagar.categoria.like(f"%{filters['categoria_contem']}%"))
+    if 'busca' in filters:
+        if _tem_fts(query.session):
+            query = query.filter(contas_fts_filter(filters['busca']))
+        else:
+            termo = f"%{filters['busca']}%"
+            query = query.filter(ContaPagar.categoria.like(termo) | ContaPagar.fornecedor.like(termo))
+    if 'data_inicio' in filters:
+        query = query.filter(ContaPagar.vencimento >= filters['data_inicio'])
+    if 'data_fim' in filters:
+        query = query.filter(ContaPagar.vencimento <= filters['data_fim'])
+    return query
+
+def list_contas(filters: dict = None, after=None, limit: int = 50, db=None) -> dict:
+    """Lista contas paginando por keyset em (vencimento DESC, id DESC).
+
+    Só a janela pedida é lida do banco, independentemente do tamanho da tabela.
+
+    Args:
+        filters: Dict com mes, status, categoria, categoria_contem, busca
+            (texto livre no índice FTS5; LIKE em categoria/fornecedor sem FTS),
+            data_inicio, data_fim.
+        after: Cursor (vencimento, id) da última linha da página anterior.
+        limit: Tamanho da página.
+        db: Sessão opcional.
+
+    Returns:
+        {'items': [dicts como get_all_contas], 'next': cursor da próxima página ou None}
+    """
+    filters = _filtros_ativos(filters)
+    should_close = db is None
+    db = db or get_db()
+    try:
+        query = _aplica_filtros_contas(db.query(ContaPagar), filters)
+        if after:
+            venc, last_id = after
+            if isinstance(venc, str):
+                venc = _dt.strptime(venc, '%Y-%m-%d').date()
+            # vencimento <= venc é redundante, mas deixa o SQLite buscar direto no índice
+            query = query.filter(
+                ContaPagar.vencimento <= venc,
+                (ContaPagar.vencimento < venc) |
+                ((ContaPagar.vencimento == venc) & (ContaPagar.id < last_id))
+            )
+        rows = query.order_by(ContaPagar.vencimento.desc(), ContaPagar.id.desc()).\
+            limit(limit + 1).all()
+        proximo = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            proximo = (rows[-1].vencimento, rows[-1].id)
+        return {'items': [_conta_to_dict(c) for c in rows], 'next': proximo}
+    finally:
+        if should_close:
+            db.close()
+
+def count_contas(filters: dict = None, db=None) -> dict:
+    """Total de contas e soma de valor para os filtros de list_contas.
+
+    Filtros só por status/categoria são respondidos pelo resumo mensal;
+    os demais (inclusive mês) usam COUNT/SUM em contas_pagar.
+
+    Returns:
+        {'total': int, 'valor_total': float}
+    """
+    filters = _filtros_ativos(filters)
+    should_close = db is None
+    db = db or get_db()
+    try:
+        if set(filters) <= _FILTROS_RESUMO:
+            query = db.query(func.sum(ResumoMensal.quantidade), func.sum(ResumoMensal.valor_total))
+            if 'status' in filters:
+                query = query.filter(ResumoMensal.status == filters['status'])
+            if 'categoria' in filters:
+                query = query.filter(ResumoMensal.categoria == filters['categoria'])
+        else:
+            query = _aplica_filtros_contas(
+                db.query(func.count(ContaPagar.id), func.sum(ContaPagar.valor)), filters
+            )
+        total, valor = query.one()
+        return {'total': int(total or 0), 'valor_total': float(valor or 0.0)}
+    finally:
+        if should_close:
+            db.close()
+
+def list_categorias(db=None) -> list:
+    """Categorias em uso (ordenadas), lidas do resumo mensal em vez de DISTINCT em contas_pagar."""
+    should_close = db is None
+    db = db or get_db()
+    try:
+        rows = db.query(ResumoMensal.categoria).filter(ResumoMensal.categoria != '').distinct().all()
+        return sorted(r[0] for r in rows)
+    finally:
+        if should_close:
+            db.close()
+
 # Alias para compatibilidade
 Conta = ContaPagar
 
@@ -333,6 +1227,7 @@ def get_regra_custo(fornecedor: str):
     finally:
         db.close()
 
+@serialized(get_writer)
 def add_or_update_regra_custo(fornecedor: str, formula: str, ativo: bool = True, observacoes: str = None):
     """Cria ou atualiza regra de custo para fornecedor"""
     if not fornecedor or not formula:
@@ -384,6 +1279,7 @@ def list_regras_custo(apenas_ativas: bool = False):
     finally:
         db.close()
 
+@serialized(get_writer)
 def delete_regra_custo(fornecedor: str):
     """Remove regra de custo por fornecedor"""
     db = get_db()
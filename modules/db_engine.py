@@ -0,0 +1,245 @@
+"""
+Perfis de engine SQLite para o HUB Financeiro.
+
+Streamlit, scripts de sincronização e a API FastAPI abrem o mesmo arquivo
+SQLite ao mesmo tempo. O perfil ``production`` liga WAL, ajusta PRAGMAs em
+toda nova conexão, dimensiona o pool por processo e serializa as escritas
+em uma única thread, para que leitores nunca esperem por escritores.
+O perfil ``legacy`` reproduz o ``create_engine(url)`` original e serve de
+base de comparação (ver ``scripts/benchmark_sqlite_profile.py``).
+
+Variáveis de ambiente:
+    DB_PROFILE            production (padrão) | legacy
+    DB_MMAP_SIZE          bytes para PRAGMA mmap_size
+    DB_CACHE_SIZE         PRAGMA cache_size (negativo = KiB)
+    DB_BUSY_TIMEOUT_MS    PRAGMA busy_timeout em milissegundos
+    DB_POOL_SIZE          conexões mantidas no pool por processo
+    DB_MAX_OVERFLOW       conexões extras permitidas sob pico
+    DB_SERIALIZE_WRITES   1/0 para ligar/desligar o writer único
+"""
+
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, replace
+from functools import wraps
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('db_engine')
+
+
+def _default_pool_size() -> int:
+    """Tamanho de pool proporcional aos núcleos disponíveis (5 a 16)."""
+    return max(5, min(16, (os.cpu_count() or 1) * 2))
+
+
+@dataclass(frozen=True)
+class EngineProfile:
+    """Configuração de conexão/pool aplicada ao engine SQLite."""
+    name: str
+    journal_mode: Optional[str] = None
+    synchronous: Optional[str] = None
+    mmap_size: Optional[int] = None
+    cache_size: Optional[int] = None
+    busy_timeout_ms: Optional[int] = None
+    temp_store: Optional[str] = None
+    pool_size: Optional[int] = None
+    max_overflow: Optional[int] = None
+    pool_timeout: Optional[float] = None
+    serialize_writes: bool = False
+
+    def pragmas(self) -> Dict[str, Any]:
+        """PRAGMAs a executar em cada conexão nova (apenas os definidos)."""
+        values = {
+            'journal_mode': self.journal_mode,
+            'synchronous': self.synchronous,
+            'mmap_size': self.mmap_size,
+            'cache_size': self.cache_size,
+            'busy_timeout': self.busy_timeout_ms,
+            'temp_store': self.temp_store,
+        }
+        return {k: v for k, v in values.items() if v is not None}
+
+
+PROFILES: Dict[str, EngineProfile] = {
+    'legacy': EngineProfile(name='legacy'),
+    'production': EngineProfile(
+        name='production',
+        journal_mode='WAL',
+        synchronous='NORMAL',
+        mmap_size=256 * 1024 * 1024,   # 256 MiB
+        cache_size=-64000,             # ~64 MiB
+        busy_timeout_ms=5000,
+        temp_store='MEMORY',
+        pool_size=_default_pool_size(),
+        max_overflow=10,
+        pool_timeout=30.0,
+        serialize_writes=True,
+    ),
+}
+
+
+def _env_int(name: str) -> Optional[int]:
+    raw = os.getenv(name)
+    if raw is None or raw == '':
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        logger.warning(f"[DB] Valor inválido para {name}: {raw!r} (ignorado)")
+        return None
+
+
+def profile_from_env() -> EngineProfile:
+    """Monta o perfil ativo a partir de DB_PROFILE e dos overrides DB_*."""
+    name = (os.getenv('DB_PROFILE') or 'production').strip().lower()
+    profile = PROFILES.get(name)
+    if profile is None:
+        logger.warning(f"[DB] DB_PROFILE desconhecido '{name}', usando 'production'")
+        profile = PROFILES['production']
+
+    overrides = {}
+    for env_name, field_name in (
+        ('DB_MMAP_SIZE', 'mmap_size'),
+        ('DB_CACHE_SIZE', 'cache_size'),
+        ('DB_BUSY_TIMEOUT_MS', 'busy_timeout_ms'),
+        ('DB_POOL_SIZE', 'pool_size'),
+        ('DB_MAX_OVERFLOW', 'max_overflow'),
+    ):
+        value = _env_int(env_name)
+        if value is not None:
+            overrides[field_name] = value
+    serialize = os.getenv('DB_SERIALIZE_WRITES')
+    if serialize is not None and serialize != '':
+        overrides['serialize_writes'] = serialize.strip().lower() in ('1', 'true', 'yes', 'on')
+    return replace(profile, **overrides) if overrides else profile
+
+
+def is_memory_url(url: str) -> bool:
+    """True para SQLite em memória (sem arquivo compartilhável entre threads)."""
+    return url in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in url
+
+
+def build_engine(url: str, profile: Optional[EngineProfile] = None, **kwargs) -> Engine:
+    """Cria o engine aplicando o perfil informado (ou o do ambiente).
+
+    Para URLs que não são SQLite o perfil é ignorado e apenas ``kwargs``
+    repassados ao ``create_engine``.
+    """
+    profile = profile or profile_from_env()
+    kwargs.setdefault('echo', False)
+    if not url.startswith('sqlite') or profile.name == 'legacy':
+        return create_engine(url, **kwargs)
+
+    connect_args = dict(kwargs.pop('connect_args', {}) or {})
+    # Conexões do pool circulam entre threads do Streamlit e do writer
+    connect_args.setdefault('check_same_thread', False)
+    if profile.busy_timeout_ms is not None:
+        connect_args.setdefault('timeout', profile.busy_timeout_ms / 1000.0)
+
+    if not is_memory_url(url):
+        if profile.pool_size is not None:
+            kwargs.setdefault('pool_size', profile.pool_size)
+        if profile.max_overflow is not None:
+            kwargs.setdefault('max_overflow', profile.max_overflow)
+        if profile.pool_timeout is not None:
+            kwargs.setdefault('pool_timeout', profile.pool_timeout)
+
+    engine = create_engine(url, connect_args=connect_args, **kwargs)
+    pragmas = profile.pragmas()
+
+    @event.listens_for(engine, 'connect')
+    def _apply_pragmas(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        try:
+            for key, value in pragmas.items():
+                cursor.execute(f"PRAGMA {key}={value}")
+        finally:
+            cursor.close()
+
+    return engine
+
+
+class SerializedWriter:
+    """Executa operações de escrita em uma única thread dedicada.
+
+    SQLite aceita apenas um escritor por vez; enfileirar as escritas do
+    processo evita disputas de lock entre threads e deixa o WAL livre para
+    os leitores. Chamadas feitas de dentro da própria thread do writer são
+    executadas diretamente (evita deadlock em escritas aninhadas).
+    """
+
+    def __init__(self, enabled: bool = True, name: str = 'db-writer'):
+        self.enabled = enabled
+        self.name = name
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            future, fn, args, kwargs = item
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:  # propaga para quem aguarda
+                    future.set_exception(e)
+            self._queue.task_done()
+
+    def in_writer_thread(self) -> bool:
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Agenda ``fn`` na thread do writer e retorna um Future."""
+        if not self.enabled or self.in_writer_thread():
+            future: Future = Future()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            return future
+        self._ensure_started()
+        future = Future()
+        self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def run(self, fn: Callable, *args, **kwargs):
+        """Executa ``fn`` serializado e aguarda o resultado."""
+        if not self.enabled or self.in_writer_thread():
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, **kwargs).result()
+
+    def shutdown(self, wait: bool = True):
+        """Encerra a thread após drenar a fila."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            if wait:
+                thread.join()
+
+
+def serialized(writer_getter: Callable[[], SerializedWriter]):
+    """Decorator que roteia a função pelo writer retornado por ``writer_getter``."""
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return writer_getter().run(func, *args, **kwargs)
+        return wrapper
+    return decorator
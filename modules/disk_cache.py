@@ -0,0 +1,359 @@
+"""
+Cache em disco (SQLite) usado no lugar do Redis quando ele não existe.
+
+Instalações desktop (Windows) não têm Redis; sem este backend cada consulta
+de SKU no Tiny e cada chamada Shopee voltava à rede. ``DiskCache`` implementa
+o subconjunto da API do cliente redis-py usado por ``modules.cache`` (get/set
+com ex/px/nx, ttl, delete, exists, incr/decr, scan_iter, sets, pipeline), então
+o cache em dois níveis, as tags, as leases de single-flight e a cota
+compartilhada de APIs (``modules.quota``) funcionam igual.
+
+Características:
+    - TTL por entrada (expiradas são ignoradas na leitura e apagadas na limpeza).
+    - LRU limitado por tamanho (CACHE_DISK_MAX_MB): ao passar do limite, as
+      entradas menos acessadas são removidas até sobrar 90% do limite.
+    - Vários processos: WAL + busy_timeout; escritas condicionais (NX, leases)
+      em transação ``BEGIN IMMEDIATE``.
+    - Sobrevive a reinícios (arquivo em CACHE_DISK_PATH).
+
+Uso:
+    disco = DiskCache('data/cache/cache.db')
+    disco.set('chave', b'valor', ex=60)
+    disco.get('chave')
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+logger = logging.getLogger('disk_cache')
+
+CACHE_DISK_PATH = os.getenv('CACHE_DISK_PATH', os.path.join('data', 'cache', 'cache.db'))
+CACHE_DISK_MAX_MB = float(os.getenv('CACHE_DISK_MAX_MB', '256'))
+
+# Limpeza (expiradas + LRU) a cada N escritas do processo
+LIMPEZA_A_CADA = 200
+# Leitura só regrava accessed_at se a marca for mais velha que isso (evita escrita por leitura)
+TOQUE_MINIMO = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_cache_accessed ON cache (accessed_at);
+CREATE INDEX IF NOT EXISTS ix_cache_expires ON cache (expires_at) WHERE expires_at IS NOT NULL;
+CREATE TABLE IF NOT EXISTS cache_sets (
+    name TEXT NOT NULL,
+    member BLOB NOT NULL,
+    expires_at REAL,
+    PRIMARY KEY (name, member)
+) WITHOUT ROWID;
+"""
+
+
+def _bytes(valor) -> bytes:
+    """Converte como o redis-py: str em UTF-8, números pelo texto."""
+    if isinstance(valor, bytes):
+        return valor
+    if isinstance(valor, memoryview):
+        return valor.tobytes()
+    return str(valor).encode('utf-8')
+
+
+def _expira_em(ex=None, px=None) -> Optional[float]:
+    if px is not None:
+        return time.time() + px / 1000
+    if ex is not None:
+        return time.time() + ex
+    return None
+
+
+class DiskCache:
+    """Backend SQLite com interface compatível (parcial) com redis.Redis.
+
+    Args:
+        path: Arquivo do cache (compartilhado entre processos).
+        max_bytes: Tamanho máximo somado dos valores.
+        decode_responses: Como no redis-py: leituras devolvem str em vez de bytes.
+    """
+
+    def __init__(self, path: str = CACHE_DISK_PATH, max_bytes: Optional[int] = None,
+                 decode_responses: bool = False):
+        self.path = str(path)
+        self.max_bytes = int(max_bytes if max_bytes is not None else CACHE_DISK_MAX_MB * 1024 * 1024)
+        self.decode_responses = decode_responses
+        self._local = threading.local()
+        self._escritas = 0
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+
+    def with_decode(self, decode_responses: bool) -> 'DiskCache':
+        """Outra visão do mesmo arquivo (cliente texto x binário)."""
+        return DiskCache(self.path, self.max_bytes, decode_responses)
+
+    # --- Conexão ---
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transacao(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _saida(self, valor: Optional[bytes]):
+        if valor is None or not self.decode_responses:
+            return valor
+        return valor.decode('utf-8')
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # --- Strings ---
+
+    def ping(self) -> bool:
+        self._conn().execute("SELECT 1")
+        return True
+
+    def get(self, key: str):
+        agora = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, accessed_at FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, agora)
+        ).fetchone()
+        if row is None:
+            return None
+        if agora - row[1] > TOQUE_MINIMO:
+            conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (agora, key))
+        return self._saida(row[0])
+
+    def mget(self, keys: Iterable[str], *args) -> List:
+        chaves = list(keys) if not isinstance(keys, str) else [keys]
+        chaves += list(args)
+        agora = time.time()
+        encontrados = {}
+        for i in range(0, len(chaves), 500):
+            lote = chaves[i:i + 500]
+            marcas = ', '.join('?' for _ in lote)
+            for key, value in self._conn().execute(
+                f"SELECT key, value FROM cache WHERE key IN ({marcas}) AND (expires_at IS NULL OR expires_at > ?)",
+                (*lote, agora)
+            ):
+                encontrados[key] = value
+        return [self._saida(encontrados.get(k)) for k in chaves]
+
+    def set(self, key: str, value, ex=None, px=None, nx: bool = False):
+        dados = _bytes(value)
+        agora = time.time()
+        expira = _expira_em(ex, px)
+        with self._transacao() as conn:
+            if nx:
+                existe = conn.execute(
+                    "SELECT 1 FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, agora)
+                ).fetchone()
+                if existe:
+                    return None
+            conn.execute(
+                "INSERT INTO cache (key, value, expires_at, accessed_at, size) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at, "
+                "accessed_at = excluded.accessed_at, size = excluded.size",
+                (key, dados, expira, agora, len(dados))
+            )
+        self._depois_de_escrever()
+        return True
+
+    def ttl(self, key: str) -> int:
+        row = self._conn().execute(
+            "SELECT expires_at FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        if row is None:
+            return -2
+        if row[0] is None:
+            return -1
+        return max(int(row[0] - time.time()), 0)
+
+    def exists(self, *keys: str) -> int:
+        agora = time.time()
+        return sum(
+            1 for k in keys
+            if self._conn().execute(
+                "SELECT 1 FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (k, agora)
+            ).fetchone()
+        )
+
+    def delete(self, *keys: str) -> int:
+        if not keys:
+            return 0
+        removidas = 0
+        with self._transacao() as conn:
+            for i in range(0, len(keys), 500):
+                lote = [k.decode() if isinstance(k, bytes) else k for k in keys[i:i + 500]]
+                marcas = ', '.join('?' for _ in lote)
+                removidas += conn.execute(f"DELETE FROM cache WHERE key IN ({marcas})", lote).rowcount
+                conn.execute(f"DELETE FROM cache_sets WHERE name IN ({marcas})", lote)
+        return removidas
+
+    def delete_if_equal(self, key: str, value) -> bool:
+        """Apaga ``key`` só se o valor for ``value`` (liberação atômica de lease)."""
+        with self._transacao() as conn:
+            return conn.execute("DELETE FROM cache WHERE key = ? AND value = ?", (key, _bytes(value))).rowcount > 0
+
+    def incr(self, name: str, amount: int = 1) -> int:
+        """Soma ``amount`` ao inteiro em ``name`` (0 se ausente); mantém o TTL, como no Redis."""
+        agora = time.time()
+        with self._transacao() as conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (name, agora)
+            ).fetchone()
+            valor = (int(row[0]) if row else 0) + amount
+            dados = _bytes(valor)
+            conn.execute(
+                "INSERT INTO cache (key, value, expires_at, accessed_at, size) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at, "
+                "accessed_at = excluded.accessed_at, size = excluded.size",
+                (name, dados, row[1] if row else None, agora, len(dados))
+            )
+        return valor
+
+    def decr(self, name: str, amount: int = 1) -> int:
+        return self.incr(name, -amount)
+
+    def scan_iter(self, match: str = '*', count: int = 500):
+        # GLOB do SQLite tem a mesma sintaxe dos padrões do Redis (*, ?, [...])
+        rows = self._conn().execute(
+            "SELECT key FROM cache WHERE key GLOB ? AND (expires_at IS NULL OR expires_at > ?)",
+            (match, time.time())
+        ).fetchall()
+        for (key,) in rows:
+            yield key if self.decode_responses else key.encode('utf-8')
+
+    def flushdb(self):
+        with self._transacao() as conn:
+            conn.execute("DELETE FROM cache")
+            conn.execute("DELETE FROM cache_sets")
+        return True
+
+    # --- Sets (índice de tags) ---
+
+    def sadd(self, name: str, *members) -> int:
+        with self._transacao() as conn:
+            expira = conn.execute("SELECT MAX(expires_at) FROM cache_sets WHERE name = ?", (name,)).fetchone()[0]
+            return sum(
+                conn.execute(
+                    "INSERT OR IGNORE INTO cache_sets (name, member, expires_at) VALUES (?, ?, ?)",
+                    (name, _bytes(m), expira)
+                ).rowcount
+                for m in members
+            )
+
+    def smembers(self, name: str) -> set:
+        rows = self._conn().execute(
+            "SELECT member FROM cache_sets WHERE name = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (name, time.time())
+        ).fetchall()
+        return {self._saida(r[0]) for r in rows}
+
+    def expire(self, name: str, seconds: int) -> bool:
+        expira = time.time() + seconds
+        with self._transacao() as conn:
+            n = conn.execute("UPDATE cache SET expires_at = ? WHERE key = ?", (expira, name)).rowcount
+            n += conn.execute("UPDATE cache_sets SET expires_at = ? WHERE name = ?", (expira, name)).rowcount
+        return n > 0
+
+    def pipeline(self, transaction: bool = False) -> '_Pipeline':
+        return _Pipeline(self)
+
+    # --- Manutenção ---
+
+    def _depois_de_escrever(self):
+        self._escritas += 1
+        if self._escritas % LIMPEZA_A_CADA == 0:
+            try:
+                self.cleanup()
+            except sqlite3.OperationalError as e:
+                # Outro processo está limpando/escrevendo; tenta na próxima rodada
+                logger.debug(f"Limpeza do cache em disco adiada: {e}")
+
+    def size_bytes(self) -> int:
+        return self._conn().execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+    def cleanup(self) -> dict:
+        """Remove expiradas e, acima de ``max_bytes``, as menos acessadas (até 90% do limite)."""
+        agora = time.time()
+        with self._transacao() as conn:
+            expiradas = conn.execute("DELETE FROM cache WHERE expires_at <= ?", (agora,)).rowcount
+            conn.execute("DELETE FROM cache_sets WHERE expires_at <= ?", (agora,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+            despejadas = 0
+            if total > self.max_bytes:
+                alvo = total - int(self.max_bytes * 0.9)
+                liberado = 0
+                chaves = []
+                for key, size in conn.execute("SELECT key, size FROM cache ORDER BY accessed_at"):
+                    chaves.append(key)
+                    liberado += size
+                    if liberado >= alvo:
+                        break
+                for i in range(0, len(chaves), 500):
+                    lote = chaves[i:i + 500]
+                    despejadas += conn.execute(
+                        f"DELETE FROM cache WHERE key IN ({', '.join('?' for _ in lote)})", lote
+                    ).rowcount
+        if expiradas or despejadas:
+            logger.debug(f"Cache em disco: {expiradas} expiradas, {despejadas} despejadas (LRU)")
+        return {'expiradas': expiradas, 'despejadas': despejadas}
+
+
+class _Pipeline:
+    """Acumula comandos e executa em ordem (sem ida e volta de rede, basta enfileirar)."""
+
+    def __init__(self, cache: DiskCache):
+        self._cache = cache
+        self._comandos = []
+
+    def __getattr__(self, nome):
+        metodo = getattr(self._cache, nome)
+
+        def enfileira(*args, **kwargs):
+            self._comandos.append((metodo, args, kwargs))
+            return self
+        return enfileira
+
+    def execute(self) -> list:
+        comandos, self._comandos = self._comandos, []
+        return [metodo(*args, **kwargs) for metodo, args, kwargs in comandos]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._comandos = []
+        return False
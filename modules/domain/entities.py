@@ -22,6 +22,8 @@ class Conta:
     pdf_url: Optional[str] = None
     observacoes: Optional[str] = None
     data_cadastro: datetime = field(default_factory=datetime.now)
+    order_sn: Optional[str] = None
+    dedup_hash: Optional[str] = None
     
     def is_revenue(self) -> bool:
         """Identifica se é receita baseado na categoria"""
@@ -35,8 +35,8 @@ class ContaRepository(ABC):
         pass
     
     @abstractmethod
-    def find_duplicates(self, fornecedor: str, valor: float, vencimento: date, tolerance_days: int = 3) -> Optional[Conta]:
-        """Busca duplicatas baseado em fornecedor, valor e vencimento"""
+    def find_duplicates(self, dedup_hash: str) -> List[Conta]:
+        """Busca duplicatas pelo hash de deduplicação"""
         pass
 
 class RegraRepository(ABC):
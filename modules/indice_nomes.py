@@ -0,0 +1,147 @@
+"""
+Índice de trigramas para busca aproximada de nomes de produto.
+
+Substitui a comparação com ``difflib.SequenceMatcher`` candidato a candidato:
+cada nome normalizado (sem acentos, caixa e espaços repetidos) vira um
+conjunto de trigramas de caracteres e o índice invertido trigrama -> ids
+devolve, para uma descrição, só os produtos que compartilham algum trigrama.
+A nota é o coeficiente de Dice entre os conjuntos (2·|A∩B| / (|A|+|B|), de
+0 a 1), insensível à ordem das palavras ("CANECA AZUL 300ML" x "Caneca 300ml
+azul").
+
+O índice é atualizado por item (``adicionar``/``remover``) e pode ser salvo e
+carregado do disco (pickle) para não ser reconstruído a cada processo.
+
+Uso:
+    indice = IndiceTrigramas()
+    indice.adicionar('101', 'Caneca Ágata 300ml', {'codigo': 'SKU-1'})
+    indice.buscar('caneca agata', k=3)   # [(0.71, '101', {'codigo': 'SKU-1'})]
+"""
+
+import heapq
+import logging
+import os
+import pickle
+import unicodedata
+from collections import Counter
+from itertools import chain
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger('indice_nomes')
+
+# Muda quando o formato salvo em disco muda (arquivo antigo é descartado)
+INDICE_VERSAO = 1
+
+
+def normaliza(texto: str) -> str:
+    """Remove acentos, normaliza espaços e caixa."""
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(ch for ch in texto if not unicodedata.combining(ch))
+    return " ".join(texto.lower().split())
+
+
+def trigramas(texto: str) -> frozenset:
+    """Trigramas de cada palavra do texto normalizado (com bordas: "  ca", "ca ")."""
+    grams = set()
+    for palavra in normaliza(texto).split():
+        palavra = f"  {palavra} "
+        grams.update(palavra[i:i + 3] for i in range(len(palavra) - 2))
+    return frozenset(grams)
+
+
+def similaridade(a: str, b: str) -> float:
+    """Dice entre os trigramas de ``a`` e ``b`` (0 a 1)."""
+    ta, tb = trigramas(a), trigramas(b)
+    if not ta or not tb:
+        return 0.0
+    return 2 * len(ta & tb) / (len(ta) + len(tb))
+
+
+class IndiceTrigramas:
+    """Índice invertido de trigramas sobre nomes, com dados associados a cada id."""
+
+    def __init__(self):
+        self._postings: Dict[str, set] = {}
+        # id -> (nome normalizado, quantidade de trigramas, dados)
+        self._docs: Dict[str, Tuple[str, int, Any]] = {}
+        # Marca livre do dono do índice (ex.: até onde o espelho já foi lido)
+        self.marca: Any = None
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, doc_id) -> bool:
+        return doc_id in self._docs
+
+    def ids(self) -> List[str]:
+        return list(self._docs)
+
+    def adicionar(self, doc_id: str, nome: str, dados: Any = None):
+        """Inclui ou atualiza ``doc_id``; trigramas só são recalculados se o nome mudou."""
+        atual = self._docs.get(doc_id)
+        nome_norm = normaliza(nome)
+        if atual and atual[0] == nome_norm:
+            self._docs[doc_id] = (nome_norm, atual[1], dados)
+            return
+        if atual:
+            self.remover(doc_id)
+        grams = trigramas(nome_norm)
+        for g in grams:
+            self._postings.setdefault(g, set()).add(doc_id)
+        self._docs[doc_id] = (nome_norm, len(grams), dados)
+
+    def remover(self, doc_id: str):
+        atual = self._docs.pop(doc_id, None)
+        if not atual:
+            return
+        for g in trigramas(atual[0]):
+            ids = self._postings.get(g)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self._postings[g]
+
+    def buscar(self, texto: str, k: int = 5, minimo: float = 0.0) -> List[Tuple[float, str, Any]]:
+        """Os ``k`` nomes mais parecidos com ``texto``: lista de (nota, id, dados), melhor primeiro."""
+        grams = trigramas(texto)
+        if not grams:
+            return []
+        # Trigramas em comum por id, contados só sobre as listas dos trigramas da consulta
+        comuns = Counter(chain.from_iterable(self._postings[g] for g in grams if g in self._postings))
+        n, docs = len(grams), self._docs
+        notas = ((2 * inter / (n + docs[doc_id][1]), doc_id) for doc_id, inter in comuns.items())
+        melhores = heapq.nlargest(k, (x for x in notas if x[0] >= minimo), key=lambda x: x[0])
+        return [(round(nota, 4), doc_id, docs[doc_id][2]) for nota, doc_id in melhores]
+
+    def buscar_lote(self, textos: Iterable[str], k: int = 5,
+                    minimo: float = 0.0) -> Dict[str, List[Tuple[float, str, Any]]]:
+        """``buscar`` para várias descrições (ex.: itens de uma NF-e); repetidas são buscadas uma vez."""
+        return {texto: self.buscar(texto, k=k, minimo=minimo) for texto in dict.fromkeys(textos)}
+
+    def salvar(self, caminho: str):
+        """Grava o índice em ``caminho`` (escrita atômica)."""
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(temporario, 'wb') as f:
+            pickle.dump({'versao': INDICE_VERSAO, 'marca': self.marca,
+                         'postings': self._postings, 'docs': self._docs}, f, protocol=5)
+        os.replace(temporario, caminho)
+
+    @classmethod
+    def carregar(cls, caminho: str) -> Optional['IndiceTrigramas']:
+        """Índice salvo em ``caminho``; None se não existir, for ilegível ou de outra versão."""
+        try:
+            with open(caminho, 'rb') as f:
+                estado = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Índice de nomes em {caminho} ilegível ({e}); será reconstruído")
+            return None
+        if not isinstance(estado, dict) or estado.get('versao') != INDICE_VERSAO:
+            return None
+        indice = cls()
+        indice.marca = estado['marca']
+        indice._postings = estado['postings']
+        indice._docs = estado['docs']
+        return indice
@@ -30,7 +30,9 @@ class SQLAlchemyContaRepository(ContaRepository):
             linha_digitavel=model.linha_digitavel,
             pdf_url=model.pdf_url,
             observacoes=model.observacoes,
-            data_cadastro=model.data_cadastro
+            data_cadastro=model.data_cadastro,
+            order_sn=model.order_sn,
+            dedup_hash=model.dedup_hash
         )
     
     def _to_model(self, entity: Conta) -> ContaPagar:
@@ -49,7 +51,9 @@ class SQLAlchemyContaRepository(ContaRepository):
             linha_digitavel=entity.linha_digitavel,
             pdf_url=entity.pdf_url,
             observacoes=entity.observacoes,
-            data_cadastro=entity.data_cadastro
+            data_cadastro=entity.data_cadastro,
+            order_sn=entity.order_sn,
+            dedup_hash=entity.dedup_hash
         )
     
     def add(self, conta: Conta) -> Conta:
@@ -84,9 +88,9 @@ class SQLAlchemyContaRepository(ContaRepository):
         return [self._to_entity(m) for m in models]
     
     def find_duplicates(self, dedup_hash: str) -> List[Conta]:
-        """Busca por duplicatas usando o hash armazenado em observacoes."""
+        """Busca por duplicatas usando a coluna indexada dedup_hash."""
         models = self.session.query(ContaPagar).filter(
-            ContaPagar.observacoes.like(f"%HASH:{dedup_hash}%")
+            ContaPagar.dedup_hash == dedup_hash
         ).all()
         return [self._to_entity(m) for m in models]
 
@@ -109,6 +113,8 @@ class SQLAlchemyContaRepository(ContaRepository):
         model.pdf_url = conta.pdf_url
         model.observacoes = conta.observacoes
         model.data_cadastro = conta.data_cadastro
+        model.order_sn = conta.order_sn
+        model.dedup_hash = conta.dedup_hash
         self.session.flush()
         return self._to_entity(model)
 
@@ -20,7 +20,9 @@ class MetricsCollector:
     
     def __init__(self):
         self.metrics = {}
-        self.cache_stats = {"hits": 0, "misses": 0}
+        self.cache_stats = {"hits": 0, "misses": 0, "coalesced": 0, "stale": 0, "refresh_errors": 0}
+        self.rate_limits = {}
+        self.circuits = {}
     
     def record_execution_time(self, function_name: str, duration: float, metadata: Dict = None):
         """
@@ -53,6 +55,28 @@ class MetricsCollector:
         """Registra uma falha de cache."""
         self.cache_stats["misses"] += 1
     
+    def record_cache_coalesced(self):
+        """Registra uma falha de cache atendida pela carga de outra chamada (single-flight)."""
+        self.cache_stats["coalesced"] += 1
+    
+    def record_cache_stale(self):
+        """Registra um valor vencido (soft TTL) servido enquanto é atualizado em segundo plano."""
+        self.cache_stats["stale"] += 1
+    
+    def record_cache_refresh(self, duration: float, ok: bool):
+        """Registra a duração de uma atualização em segundo plano (função "cache_refresh")."""
+        self.record_execution_time("cache_refresh", duration, {"ok": ok})
+        if not ok:
+            self.cache_stats["refresh_errors"] += 1
+    
+    def record_rate_limit(self, name: str, state: Dict):
+        """Registra o estado atual de um limitador de requisições (ex.: "tiny")."""
+        self.rate_limits[name] = state
+    
+    def record_circuit(self, name: str, state: Dict):
+        """Registra o estado de um circuit breaker (ex.: "tiny:produtos.pesquisa.php")."""
+        self.circuits[name] = state
+    
     def get_stats(self, function_name: str = None) -> Dict:
         """
         Retorna estatísticas de performance.
@@ -86,9 +110,16 @@ class MetricsCollector:
         stats["cache"] = {
             "hits": self.cache_stats["hits"],
             "misses": self.cache_stats["misses"],
+            "coalesced": self.cache_stats["coalesced"],
+            "stale": self.cache_stats["stale"],
+            "refresh_errors": self.cache_stats["refresh_errors"],
             "hit_rate": (self.cache_stats["hits"] / (self.cache_stats["hits"] + self.cache_stats["misses"]))
                         if (self.cache_stats["hits"] + self.cache_stats["misses"]) > 0 else 0
         }
+        if self.rate_limits:
+            stats["rate_limits"] = {name: dict(state) for name, state in self.rate_limits.items()}
+        if self.circuits:
+            stats["circuits"] = {name: dict(state) for name, state in self.circuits.items()}
         
         return stats
     
@@ -106,7 +137,9 @@ class MetricsCollector:
     def clear_metrics(self):
         """Limpa todas as métricas coletadas."""
         self.metrics = {}
-        self.cache_stats = {"hits": 0, "misses": 0}
+        self.cache_stats = {"hits": 0, "misses": 0, "coalesced": 0, "stale": 0, "refresh_errors": 0}
+        self.rate_limits = {}
+        self.circuits = {}
 
 
 # Instância global do collector
@@ -157,6 +190,31 @@ def record_cache_access(hit: bool):
         _metrics_collector.record_cache_miss()
 
 
+def record_cache_coalesced():
+    """Registra uma falha de cache resolvida pela carga de outra chamada (single-flight)."""
+    _metrics_collector.record_cache_coalesced()
+
+
+def record_cache_stale():
+    """Registra um valor vencido servido (stale-while-revalidate)."""
+    _metrics_collector.record_cache_stale()
+
+
+def record_cache_refresh(duration: float, ok: bool = True):
+    """Registra a latência de uma atualização de cache em segundo plano."""
+    _metrics_collector.record_cache_refresh(duration, ok)
+
+
+def record_rate_limit(name: str, state: Dict):
+    """Registra o estado de um limitador de requisições de API."""
+    _metrics_collector.record_rate_limit(name, state)
+
+
+def record_circuit(name: str, state: Dict):
+    """Registra o estado de um circuit breaker de API."""
+    _metrics_collector.record_circuit(name, state)
+
+
 def get_metrics(function_name: str = None) -> Dict:
     """
     Retorna métricas coletadas.
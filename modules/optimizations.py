@@ -34,39 +34,35 @@ class QueryOptimizer:
     @staticmethod
     def create_index_for_common_queries():
         """
-        Cria índices em colunas frequentemente consultadas.
+        Lista os índices das consultas quentes (modules.database.INDEX_DDL).
         
-        Colunas recomendadas para índice:
-        - payable_accounts: (shop_id, status, due_date)
-        - orders: (shop_id, status, date)
-        - products: (category, status)
+        Aplicados automaticamente por init_database(); os planos são
+        verificados por modules/query_plans.py.
         """
+        from .database import INDEX_DDL
         logger.info("Executar estas queries no banco de dados:")
-        queries = [
-            "CREATE INDEX IF NOT EXISTS idx_payables_shop_status ON payables(shop_id, status);",
-            "CREATE INDEX IF NOT EXISTS idx_orders_shop_date ON orders(shop_id, order_date);",
-            "CREATE INDEX IF NOT EXISTS idx_products_category ON products(category) WHERE status='active';",
-            "CREATE INDEX IF NOT EXISTS idx_syncs_api ON syncs(api, last_sync);"
-        ]
-        for query in queries:
-            print(f"  {query}")
+        for query in INDEX_DDL:
+            print(f"  {query};")
     
     @staticmethod
     def optimize_frequently_used_queries():
         """
-        Optimizações recomendadas para queries mais usadas:
+        Consultas mais usadas e a forma otimizada de cada uma:
         
-        1. Evitar N+1 queries - usar JOIN em vez de loops
-        2. Usar agregações no DB em vez de na aplicação
-        3. Paginar resultados grandes
+        1. Totais vêm do resumo mensal (contas_resumo_mensal), não de COUNT/SUM em contas_pagar
+        2. Listagens paginam por keyset em (vencimento, id)
+        3. Busca textual usa o índice FTS5 (contas_fts)
         """
         optimizations = [
-            ("Payables por Status", 
-             "SELECT status, COUNT(*) FROM payables GROUP BY status;"),
-            ("Receita Total por Shopee",
-             "SELECT SUM(amount) FROM orders WHERE shop_id=? AND status='completed';"),
-            ("Top 10 Produtos Mais Vendidos",
-             "SELECT product_id, SUM(quantity) as total FROM order_items GROUP BY product_id ORDER BY total DESC LIMIT 10;")
+            ("Contas por Status",
+             "SELECT status, SUM(quantidade) FROM contas_resumo_mensal GROUP BY status;"),
+            ("Página de Contas (keyset)",
+             "SELECT * FROM contas_pagar WHERE vencimento <= ? AND (vencimento < ? OR (vencimento = ? AND id < ?)) "
+             "ORDER BY vencimento DESC, id DESC LIMIT 51;"),
+            ("Contas Vencidas",
+             "SELECT * FROM contas_pagar WHERE status = 'Pendente' AND vencimento < ? ORDER BY vencimento;"),
+            ("Busca Textual",
+             "SELECT rowid FROM contas_fts WHERE contas_fts MATCH ? ORDER BY rank LIMIT 50;"),
         ]
         return optimizations
 
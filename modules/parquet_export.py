@@ -0,0 +1,233 @@
+"""
+Exportação de snapshots Parquet particionados por ano/mês.
+
+Copia contas_pagar, pedidos_shopee e produtos_tiny para arquivos Parquet em
+layout Hive (``<tabela>/ano=AAAA/mes=MM/part-0.parquet``), que podem ser lidos
+por DuckDB (ver analytics_duckdb.py) sem concorrer com as escritas do SQLite.
+
+Cada arquivo guarda nos metadados a assinatura da partição: linhas, maior id
+e um resumo do conteúdo de todas as colunas (``_resumo_conteudo``), então
+lançamentos tardios, exclusões e updates (status, valor, upsert) mudam a
+assinatura. Um mês encerrado só é regravado se a assinatura no banco mudou ou
+se ainda está na janela de PARQUET_JANELA_DIAS da sincronização (o resumo é
+barato, não um hash: a janela regrava por garantia os meses que a
+sincronização ainda altera). O mês corrente e partições novas são sempre
+escritos; partições de meses que ficaram sem linhas são removidas. Use
+``force=True`` para regravar tudo.
+"""
+
+import json
+import logging
+import os
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, String, and_, func, select
+
+from .database import Base, engine
+
+logger = logging.getLogger('parquet_export')
+
+PARQUET_DIR = os.getenv('PARQUET_DIR', os.path.join('data', 'parquet'))
+
+# Tabela -> coluna de data usada para particionar
+TABELAS = {
+    'contas_pagar': 'vencimento',
+    'pedidos_shopee': 'create_time',
+    'produtos_tiny': 'data_sincronizacao',
+}
+
+# Meses que tocam os últimos N dias são sempre regravados (janela de sincronização
+# do Tiny/Shopee, que atualiza pedidos já gravados)
+PARQUET_JANELA_DIAS = int(os.getenv('PARQUET_JANELA_DIAS', '30'))
+
+# Partição para linhas sem data (regravada a cada execução)
+SEM_DATA = (0, 0)
+
+_CHAVE_ASSINATURA = b'hub.assinatura'
+# Primo do resumo de conteúdo (mantém as somas inteiras do SQLite longe de overflow)
+_PRIMO = 1000000007
+
+
+def _tipo_arrow(coluna) -> pa.DataType:
+    tipo = coluna.type
+    if isinstance(tipo, Boolean):
+        return pa.bool_()
+    if isinstance(tipo, Integer):
+        return pa.int64()
+    if isinstance(tipo, Float):
+        return pa.float64()
+    if isinstance(tipo, DateTime):
+        return pa.timestamp('us')
+    if isinstance(tipo, Date):
+        return pa.date32()
+    return pa.string()
+
+
+def schema_arrow(table) -> pa.Schema:
+    """Schema Parquet fixo a partir do modelo (partições vazias/nulas não mudam os tipos)."""
+    return pa.schema([(c.name, _tipo_arrow(c)) for c in table.columns])
+
+
+def _caminho_particao(base: Path, nome: str, ano: int, mes: int) -> Path:
+    return base / nome / f"ano={ano:04d}" / f"mes={mes:02d}" / "part-0.parquet"
+
+
+def _resumo_conteudo(table):
+    """Inteiro por linha que muda quando qualquer coluna da linha muda.
+
+    O SQLite não tem função de hash: números entram pelo valor (centavos),
+    datas pelos segundos e textos pelo tamanho e por três caracteres (início,
+    meio e fim). Cada coluna tem peso próprio e a linha é multiplicada pelo id,
+    então trocar valores entre colunas ou linhas também muda a soma.
+    """
+    partes = []
+    for peso, c in enumerate(table.columns, start=1):
+        if isinstance(c.type, (Boolean, Integer)):
+            valor = func.cast(c, Integer)
+        elif isinstance(c.type, Float):
+            valor = func.cast(func.round(c * 100), Integer)
+        elif isinstance(c.type, (Date, DateTime)):
+            valor = func.cast(func.julianday(c) * 86400, Integer)
+        else:
+            t = func.cast(c, String)
+            meio = func.substr(t, func.cast(func.length(t) * 0.5, Integer) + 1)
+            valor = (func.length(t) * 65536 + func.unicode(t) * 256
+                     + func.unicode(meio) * 16 + func.unicode(func.substr(t, -1)))
+        partes.append(func.coalesce(valor, -1) * peso)
+    return (sum(partes) % _PRIMO) * (table.c.id % _PRIMO) % _PRIMO
+
+
+def _particoes(conn, table, coluna) -> Dict[tuple, list]:
+    """(ano, mes) -> assinatura [linhas, maior id, resumo do conteúdo] de cada partição."""
+    ano = func.cast(func.strftime('%Y', coluna), Integer)
+    mes = func.cast(func.strftime('%m', coluna), Integer)
+    rows = conn.execute(
+        select(ano, mes, func.count(), func.max(table.c.id), func.sum(_resumo_conteudo(table)))
+        .select_from(table).group_by(ano, mes)
+    ).fetchall()
+    return {
+        ((a, m) if a is not None else SEM_DATA): [n, max_id, conteudo]
+        for a, m, n, max_id, conteudo in sorted(rows, key=lambda r: (r[0] or 0, r[1] or 0))
+    }
+
+
+def _remove_orfas(base: Path, nome: str, existentes: set) -> List[str]:
+    """Apaga os arquivos de partições que não têm mais linhas no banco."""
+    removidas = []
+    for caminho in sorted((base / nome).glob('ano=*/mes=*/part-0.parquet')):
+        try:
+            chave = (int(caminho.parent.parent.name[4:]), int(caminho.parent.name[4:]))
+        except ValueError:
+            continue
+        if chave in existentes:
+            continue
+        caminho.unlink()
+        for pasta in (caminho.parent, caminho.parent.parent):
+            if not any(pasta.iterdir()):
+                pasta.rmdir()
+        removidas.append(f"{chave[0]:04d}-{chave[1]:02d}")
+    return removidas
+
+
+def _assinatura_gravada(caminho: Path) -> Optional[list]:
+    """Assinatura salva nos metadados do arquivo (None se ausente ou ilegível)."""
+    try:
+        metadados = pq.read_schema(caminho).metadata or {}
+        return json.loads(metadados[_CHAVE_ASSINATURA])
+    except (OSError, KeyError, ValueError, pa.ArrowException):
+        return None
+
+
+def _limites(ano: int, mes: int):
+    inicio = date(ano, mes, 1)
+    fim = date(ano + 1, 1, 1) if mes == 12 else date(ano, mes + 1, 1)
+    return inicio, fim
+
+
+def export_table(nome: str, destino: Optional[str] = None, bind=None, force: bool = False,
+                 hoje: Optional[date] = None) -> Dict:
+    """Exporta uma tabela para Parquet particionado por ano/mês.
+
+    Args:
+        nome: Uma das chaves de TABELAS.
+        destino: Diretório base (padrão: PARQUET_DIR).
+        bind: Engine alternativo (padrão: engine do módulo database).
+        force: Regrava também partições de meses encerrados sem mudança.
+        hoje: Data de referência do mês corrente e da janela (testes).
+
+    Returns:
+        Dict com partições escritas, puladas, removidas e linhas exportadas.
+    """
+    if nome not in TABELAS:
+        raise ValueError(f"Tabela sem exportação Parquet: {nome}")
+    bind = bind or engine
+    base = Path(destino or PARQUET_DIR)
+    table = Base.metadata.tables[nome]
+    schema = schema_arrow(table)
+    hoje = hoje or date.today()
+    inicio_janela = hoje - timedelta(days=PARQUET_JANELA_DIAS)
+    janela = (inicio_janela.year, inicio_janela.month)
+
+    stats = {'tabela': nome, 'escritas': [], 'puladas': 0, 'removidas': [], 'linhas': 0}
+    existentes = set()
+    for conexao, table, incluir in _fontes(nome, bind, table):
+        coluna = table.c[TABELAS[nome]]
+        with conexao as conn:
+            for (ano, mes), assinatura in _particoes(conn, table, coluna).items():
+                if not incluir(ano):
+                    continue
+                existentes.add((ano, mes))
+                caminho = _caminho_particao(base, nome, ano, mes)
+                encerrada = (ano, mes) != SEM_DATA and (ano, mes) < janela
+                if encerrada and not force and _assinatura_gravada(caminho) == assinatura:
+                    stats['puladas'] += 1
+                    continue
+
+                if (ano, mes) == SEM_DATA:
+                    filtro = coluna.is_(None)
+                else:
+                    inicio, fim = _limites(ano, mes)
+                    filtro = and_(coluna >= inicio, coluna < fim)
+                rows = conn.execute(select(table).where(filtro).order_by(table.c.id)).mappings().all()
+
+                caminho.parent.mkdir(parents=True, exist_ok=True)
+                temporario = caminho.with_suffix('.parquet.tmp')
+                metadados = {_CHAVE_ASSINATURA: json.dumps(assinatura).encode()}
+                pq.write_table(pa.Table.from_pylist([dict(r) for r in rows], schema=schema.with_metadata(metadados)),
+                               temporario)
+                os.replace(temporario, caminho)  # leitores nunca veem arquivo pela metade
+
+                stats['escritas'].append(f"{ano:04d}-{mes:02d}")
+                stats['linhas'] += len(rows)
+    stats['removidas'] = _remove_orfas(base, nome, existentes)
+    logger.info(
+        f"Parquet {nome}: {len(stats['escritas'])} partições escritas, "
+        f"{stats['puladas']} puladas, {len(stats['removidas'])} removidas, {stats['linhas']} linhas"
+    )
+    return stats
+
+
+def _fontes(nome: str, bind, table) -> List[tuple]:
+    """(conexão, tabela, filtro de ano) que juntas cobrem cada partição uma única vez.
+
+    contas_pagar inclui os anos movidos para data/archive (ver archive.py), anexados
+    em lotes de até MAX_ANEXOS - 1: cada lote responde pelos seus anos e a última
+    fonte, só com a tabela quente, pelos anos que não foram arquivados.
+    """
+    if nome != 'contas_pagar':
+        return [(bind.connect(), table, lambda ano: True)]
+    from .archive import anos_arquivados, conexao_historico, contas_historico, lotes_anos
+    arquivados = anos_arquivados()
+    fontes = [(conexao_historico(bind, lote), contas_historico, lambda ano, lote=set(lote): ano in lote)
+              for lote in lotes_anos(arquivados)]
+    fontes.append((conexao_historico(bind, []), contas_historico, lambda ano: ano not in arquivados))
+    return fontes
+
+
+def export_all(destino: Optional[str] = None, bind=None, force: bool = False) -> List[Dict]:
+    """Exporta todas as tabelas de TABELAS."""
+    return [export_table(nome, destino=destino, bind=bind, force=force) for nome in TABELAS]
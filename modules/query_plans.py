@@ -0,0 +1,356 @@
+"""
+Regressão de planos de consulta e sugestão de índices (SQLite).
+
+Executa as consultas "quentes" do sistema (analytics, páginas Streamlit,
+repositórios e helpers de database.py) contra uma massa sintética grande,
+captura o SQL realmente emitido pelo ORM e roda ``EXPLAIN QUERY PLAN`` em
+cada instrução. Varreduras completas e B-trees temporárias são apontadas e,
+para cada uma, um índice composto (ou parcial) é sugerido e testado.
+
+Uso:
+    from modules.query_plans import run_advisor
+    for r in run_advisor():
+        print(r.nome, r.problemas, r.sugestoes)
+
+tests/test_query_plans.py falha quando uma consulta quente passa a varrer a tabela.
+"""
+
+import logging
+import os
+import random
+import re
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.orm import Session
+
+from .database import (
+    Base, ContaPagar, RegraM11, count_contas, ensure_contas_fts, ensure_indexes,
+    ensure_resumo_mensal, list_categorias, list_contas, resumo_por_periodo, search_contas
+)
+
+logger = logging.getLogger('query_plans')
+
+# Tabelas pequenas por construção: varrê-las (ou ordená-las) não é regressão
+TABELAS_PEQUENAS = {'contas_resumo_mensal', 'regras_m11', 'regras_fornecedor_custo', 'sqlite_master'}
+
+# Data de referência fixa para a massa sintética e as consultas
+HOJE = date(2025, 6, 15)
+
+FORNECEDORES = [
+    "Fornecedor ABC Ltda", "Energia Eletrica SA", "Telecom Brasil", "Agua e Saneamento",
+    "Internet Fibra", "Aluguel Comercial", "Marketing Digital", "Shopee", "Tiny ERP",
+]
+CATEGORIAS = [
+    "Receita Shopee", "Despesa Venda - Frete Shopee", "Despesa Venda - Custo Produto (Tiny)",
+    "Energia", "Telecomunicacoes", "Aluguel", "Marketing", "Pedido Tiny ERP",
+]
+
+
+@dataclass(frozen=True)
+class HotQuery:
+    """Consulta monitorada: ``executar(session)`` dispara o código real."""
+    nome: str
+    executar: Callable[[Session], Any]
+    # Problemas aceitos (ex.: agregação que precisa ler o período inteiro)
+    permitido: FrozenSet[str] = frozenset()
+
+
+@dataclass
+class PlanReport:
+    nome: str
+    sql: str
+    plano: List[str]
+    problemas: List[str]
+    sugestoes: List[Dict] = field(default_factory=list)
+
+    @property
+    def regressoes(self) -> List[str]:
+        return [p for p in self.problemas if p not in self.permitido]
+
+    permitido: FrozenSet[str] = frozenset()
+
+
+def _analytics(nome: str):
+    # Import tardio: analytics depende de modules.cache; chama a função sem o cache
+    from . import analytics
+    fn = getattr(analytics, nome)
+    return getattr(fn, '__wrapped__', fn)
+
+
+def _repo_contas(db):
+    from .infrastructure.sqlalchemy_repositories import SQLAlchemyContaRepository
+    return SQLAlchemyContaRepository(db)
+
+
+def _detect_duplicate(db):
+    from .validation import detect_duplicate_conta
+    return detect_duplicate_conta(db, "Energia Eletrica SA", 500.0, HOJE)
+
+
+def _pagina_interna(db, filters=None):
+    # Cursor fixo no meio da massa: só a consulta da página entra no relatório
+    return list_contas(filters, after=(HOJE - timedelta(days=365), 10 ** 9), limit=50, db=db)
+
+
+DIA = timedelta(days=1)
+GRUPO = frozenset({'temp-btree:GROUP BY'})
+
+HOT_QUERIES: List[HotQuery] = [
+    # database.py
+    # Sem filtro, a primeira página percorre ix_contas_vencimento e para no LIMIT
+    HotQuery("list_contas: primeira página", lambda db: list_contas(limit=50, db=db),
+             frozenset({'scan-index:contas_pagar'})),
+    HotQuery("list_contas: página interna (keyset)", _pagina_interna),
+    HotQuery("list_contas: status", lambda db: _pagina_interna(db, {'status': 'Pendente'})),
+    HotQuery("list_contas: mês", lambda db: list_contas({'mes': 3}, limit=50, db=db)),
+    # Casamentos do FTS chegam fora de ordem: ordenar o resultado é inevitável
+    HotQuery("list_contas: busca FTS", lambda db: list_contas({'busca': 'energia'}, limit=50, db=db),
+             frozenset({'temp-btree:ORDER BY'})),
+    # Varre o índice de vencimento de trás para frente até achar 10 linhas (LIMIT)
+    HotQuery("list_contas: últimos Shopee", lambda db: list_contas({'categoria_contem': 'Shopee'}, limit=10, db=db),
+             frozenset({'scan-index:contas_pagar'})),
+    HotQuery("count_contas: sem filtro", lambda db: count_contas(db=db)),
+    HotQuery("count_contas: status+mês", lambda db: count_contas({'status': 'Pago', 'mes': 2}, db=db)),
+    HotQuery("count_contas: busca FTS", lambda db: count_contas({'busca': 'aluguel'}, db=db)),
+    HotQuery("resumo_por_periodo: 90 dias", lambda db: resumo_por_periodo(db, HOJE - 90 * DIA, HOJE), GRUPO),
+    HotQuery("search_contas", lambda db: search_contas("telecom brasil", db=db)),
+    HotQuery("list_categorias", lambda db: list_categorias(db=db)),
+    # analytics.py
+    HotQuery("analytics.kpis_global", lambda db: _analytics('kpis_global')(db, HOJE - 90 * DIA, HOJE), GRUPO),
+    HotQuery("analytics.categorias_sum", lambda db: _analytics('categorias_sum')(db, HOJE - 90 * DIA, HOJE), GRUPO),
+    HotQuery("analytics.monthly_series", lambda db: _analytics('monthly_series')(db, 2024)),
+    HotQuery("analytics.shopee_stats", lambda db: _analytics('shopee_stats')(db, 90)),
+    HotQuery("analytics.cogs_fill_rate", lambda db: _analytics('cogs_fill_rate')(db, HOJE - 90 * DIA, HOJE)),
+    # Agregação por fornecedor no período: lê o intervalo inteiro por definição
+    HotQuery("analytics.top_fornecedores", lambda db: _analytics('top_fornecedores')(db, 5, HOJE - 90 * DIA, HOJE),
+             frozenset({'temp-btree:GROUP BY', 'temp-btree:ORDER BY'})),
+    # pages/1_📊_Dashboard.py
+    HotQuery("dashboard: contas por status", lambda db: db.query(ContaPagar.status, func.count(ContaPagar.id)).filter(
+        ContaPagar.vencimento.between(HOJE - 90 * DIA, HOJE), ContaPagar.categoria == "Energia"
+    ).group_by(ContaPagar.status).all(), GRUPO),
+    HotQuery("dashboard/alertas: próximos vencimentos", lambda db: db.query(ContaPagar).filter(
+        ContaPagar.vencimento.between(HOJE, HOJE + 7 * DIA), ContaPagar.status == "Pendente"
+    ).order_by(ContaPagar.vencimento).all()),
+    # pages/8_🔔_Alertas.py
+    HotQuery("alertas: vencidas", lambda db: db.query(ContaPagar).filter(
+        ContaPagar.vencimento < HOJE, ContaPagar.status == "Pendente"
+    ).order_by(ContaPagar.vencimento).limit(200).all()),
+    # pages/2_💳_Contas_Pagar.py (cadastro)
+    HotQuery("validation.detect_duplicate_conta", _detect_duplicate),
+    # Repositórios
+    HotQuery("repo: get_by_id", lambda db: _repo_contas(db).get_by_id(123)),
+    HotQuery("repo: find_duplicates", lambda db: _repo_contas(db).find_duplicates("abc123")),
+    HotQuery("repo: get_overdue", lambda db: _repo_contas(db).get_overdue(HOJE - 365 * DIA)),
+    HotQuery("repo: regra por CNPJ", lambda db: db.query(RegraM11).filter(RegraM11.cnpj == "12345678000199").first()),
+    # Sincronizações (checagem de pedido já importado)
+    HotQuery("sync: pedido por order_sn", lambda db: db.query(ContaPagar.id).filter(
+        ContaPagar.order_sn == "SN000123").first()),
+]
+
+
+def seed_synthetic(bind, linhas: int = 50000, seed: int = 42):
+    """Popula contas_pagar/regras_m11 com massa sintética (5 anos até HOJE) e roda ANALYZE."""
+    rnd = random.Random(seed)
+    inicio = HOJE - timedelta(days=5 * 365)
+    tabela = ContaPagar.__table__
+    lote = []
+    with bind.begin() as conn:
+        for i in range(linhas):
+            venc = inicio + timedelta(days=rnd.randint(0, 5 * 365 + 60))
+            categoria = rnd.choice(CATEGORIAS)
+            shopee = 'Shopee' in categoria
+            lote.append({
+                'mes': venc.month, 'vencimento': venc, 'valor': round(rnd.uniform(5, 5000), 2),
+                'fornecedor': "Shopee" if shopee else rnd.choice(FORNECEDORES),
+                'categoria': categoria,
+                'status': 'Pendente' if venc >= HOJE - 30 * DIA and rnd.random() < 0.7 else rnd.choice(['Pago', 'Pago', 'Pendente']),
+                'descricao': f"Pedido Shopee #{i}" if shopee and rnd.random() < 0.5 else f"Conta {i}",
+                'observacoes': f"SN:SN{i:06d} | buyer:x" if shopee else None,
+                'order_sn': f"SN{i:06d}" if shopee else None,
+                'dedup_hash': f"{i:016x}",
+            })
+            if len(lote) == 5000:
+                conn.execute(tabela.insert(), lote)
+                lote = []
+        if lote:
+            conn.execute(tabela.insert(), lote)
+        conn.execute(RegraM11.__table__.insert(), [
+            {'cnpj': f"{n:014d}", 'fornecedor': f"F{n}", 'categoria': 'Outros', 'ativo': n % 2 == 0}
+            for n in range(500)
+        ])
+        conn.exec_driver_sql("ANALYZE")
+
+
+def build_synthetic_engine(path: Optional[str] = None, linhas: int = 50000):
+    """Cria um banco SQLite com o esquema completo (índices, resumo, FTS) e massa sintética."""
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix='.db', prefix='query_plans_')
+        os.close(fd)
+    bind = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind)
+    ensure_indexes(bind)
+    ensure_resumo_mensal(bind)
+    ensure_contas_fts(bind)
+    seed_synthetic(bind, linhas)
+    return bind
+
+
+@contextmanager
+def capture_queries(bind):
+    """Coleta (sql, parâmetros) de todo SELECT executado no engine durante o bloco."""
+    capturadas = []
+
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            capturadas.append((statement, parameters))
+
+    event.listen(bind, 'before_cursor_execute', _antes)
+    try:
+        yield capturadas
+    finally:
+        event.remove(bind, 'before_cursor_execute', _antes)
+
+
+def explain(conn, sql: str, params=()) -> List[str]:
+    """Linhas 'detail' de EXPLAIN QUERY PLAN."""
+    return [r[-1] for r in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params or ()).fetchall()]
+
+
+_SCAN_RE = re.compile(r"^SCAN (\w+)(?: AS \w+)?( USING (?:COVERING )?INDEX \w+)?( VIRTUAL TABLE)?")
+_ACESSO_RE = re.compile(r"^(?:SCAN|SEARCH) (\w+)")
+_TEMP_RE = re.compile(r"^USE TEMP B-TREE FOR (?:LAST TERM OF |RIGHT PART OF )?(ORDER BY|GROUP BY|DISTINCT)")
+
+
+def plan_problems(plano: List[str]) -> List[str]:
+    """Classifica o plano: 'scan:<tabela>', 'scan-index:<tabela>' ou 'temp-btree:<cláusula>'.
+
+    B-trees temporárias só contam quando o plano toca alguma tabela grande.
+    """
+    problemas, grandes = [], False
+    for linha in plano:
+        acesso = _ACESSO_RE.match(linha)
+        if acesso and acesso.group(1) not in TABELAS_PEQUENAS and 'VIRTUAL TABLE' not in linha:
+            grandes = True
+        scan = _SCAN_RE.match(linha)
+        if scan and not scan.group(3) and scan.group(1) not in TABELAS_PEQUENAS:
+            problemas.append(f"{'scan-index' if scan.group(2) else 'scan'}:{scan.group(1)}")
+            continue
+        temp = _TEMP_RE.match(linha)
+        if temp:
+            problemas.append(f"temp-btree:{temp.group(1)}")
+    if not grandes:
+        problemas = [p for p in problemas if not p.startswith('temp-btree')]
+    return sorted(set(problemas))
+
+
+def _colunas(sql: str, tabela: str, padrao: str) -> List[str]:
+    vistos = []
+    for col in re.findall(padrao.format(t=re.escape(tabela)), sql, flags=re.IGNORECASE):
+        if col not in vistos:
+            vistos.append(col)
+    return vistos
+
+
+def suggest_index(sql: str, tabela: str) -> Optional[Dict]:
+    """Propõe índice composto: igualdades, depois a coluna de ORDER BY (ou do intervalo),
+    depois colunas de GROUP BY e agregadas para o índice cobrir a consulta.
+
+    Predicados ``IS NOT NULL`` viram índice parcial.
+    """
+    sql = " ".join(sql.split())
+    iguais = _colunas(sql, tabela, r"\b{t}\.(\w+)\s*(?:=\s*\?|IN\s*\()")
+    intervalos = _colunas(sql, tabela, r"\b{t}\.(\w+)\s*(?:<|>|BETWEEN\b)")
+    agrupa = re.search(r"GROUP BY (.+?)(?: HAVING| ORDER BY| LIMIT|$)", sql)
+    ordena = re.search(r"ORDER BY (.+?)(?: LIMIT|$)", sql)
+    grupo = _colunas(agrupa.group(1), tabela, r"\b{t}\.(\w+)") if agrupa else []
+    ordem = _colunas(ordena.group(1), tabela, r"\b{t}\.(\w+)") if ordena and not agrupa else []
+    agregadas = _colunas(sql, tabela, r"\b(?:sum|avg|min|max)\(\s*{t}\.(\w+)")
+    parcial = _colunas(sql, tabela, r"\b{t}\.(\w+) IS NOT NULL")
+
+    chave = []
+    for col in iguais + (ordem[:1] or intervalos[:1]) + grupo + agregadas:
+        if col not in chave and col != 'id':
+            chave.append(col)
+    chave = chave[:4]
+    if not chave:
+        return None
+    nome = f"ix_{tabela}_{'_'.join(chave)}"[:60]
+    ddl = f"CREATE INDEX IF NOT EXISTS {nome} ON {tabela} ({', '.join(chave)})"
+    if parcial:
+        ddl += " WHERE " + " AND ".join(f"{c} IS NOT NULL" for c in parcial)
+    return {'nome': nome, 'ddl': ddl}
+
+
+def _testa_sugestao(bind, sql: str, params, ddl: str) -> List[str]:
+    """Cria o índice numa transação descartada e devolve os problemas restantes."""
+    with bind.connect() as conn:
+        trans = conn.begin()
+        try:
+            conn.exec_driver_sql(ddl)
+            return plan_problems(explain(conn, sql, params))
+        finally:
+            trans.rollback()
+
+
+def run_advisor(bind=None, linhas: int = 50000, queries: Optional[List[HotQuery]] = None) -> List[PlanReport]:
+    """Executa as consultas quentes, analisa os planos e sugere índices.
+
+    Args:
+        bind: Engine já populado (padrão: banco sintético temporário com ``linhas`` contas).
+        linhas: Tamanho da massa sintética quando ``bind`` não é informado.
+        queries: Subconjunto de HOT_QUERIES.
+
+    Returns:
+        Um PlanReport por instrução SQL capturada.
+    """
+    criado = bind is None
+    bind = bind or build_synthetic_engine(linhas=linhas)
+    relatorios = []
+    try:
+        for hq in queries or HOT_QUERIES:
+            with Session(bind) as db, capture_queries(bind) as capturadas:
+                try:
+                    hq.executar(db)
+                except Exception as e:
+                    logger.warning(f"Consulta '{hq.nome}' falhou: {e}")
+                    relatorios.append(PlanReport(hq.nome, '', [], [f"erro:{type(e).__name__}"], permitido=hq.permitido))
+                    continue
+            with bind.connect() as conn:
+                for sql, params in capturadas:
+                    plano = explain(conn, sql, params)
+                    rel = PlanReport(hq.nome, sql, plano, plan_problems(plano), permitido=hq.permitido)
+                    for problema in rel.problemas:
+                        tabela = problema.split(':', 1)[1] if problema.startswith('scan') else 'contas_pagar'
+                        sugestao = suggest_index(sql, tabela)
+                        if sugestao and sugestao not in rel.sugestoes:
+                            restantes = _testa_sugestao(bind, sql, params, sugestao['ddl'])
+                            sugestao['resolve'] = sorted(set(rel.problemas) - set(restantes))
+                            rel.sugestoes.append(sugestao)
+                    relatorios.append(rel)
+    finally:
+        if criado:
+            caminho = bind.url.database
+            bind.dispose()
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+    return relatorios
+
+
+def format_report(relatorios: List[PlanReport]) -> str:
+    """Relatório texto (usado por scripts/database_optimization.py)."""
+    linhas = []
+    for rel in relatorios:
+        status = "❌" if rel.regressoes else ("⚠️" if rel.problemas else "✅")
+        linhas.append(f"{status} {rel.nome}")
+        for passo in rel.plano:
+            linhas.append(f"     {passo}")
+        for sug in rel.sugestoes:
+            linhas.append(f"     💡 {sug['ddl']}  (resolve: {', '.join(sug['resolve']) or 'nada'})")
+    return "\n".join(linhas)
@@ -0,0 +1,151 @@
+"""
+Cota de APIs compartilhada entre processos (Streamlit, scripts CLI, workers).
+
+As cotas do Tiny e da Shopee são do token, não do processo: com o app e um
+script de sincronização rodando juntos, cada um se limitando sozinho somava
+mais que a cota e o token era bloqueado. ``QuotaCoordinator`` distribui
+permissões por janela fixa (QUOTA_WINDOW segundos) com contadores no L2 do
+cache (Redis, ou o cache em disco SQLite quando não há Redis), então todos os
+processos que enxergam o mesmo L2 gastam um único orçamento por API e token.
+
+Justiça: na primeira metade da janela cada processo ativo (pediu permissão na
+janela atual ou na anterior) fica com no máximo a sua parte (orçamento /
+processos); na segunda metade a sobra fica para quem precisar. Com o L2 fora
+do ar a permissão é concedida (coordenação só local, como nas leases de
+single-flight); a falha desliga o L2 pela espera CACHE_L2_RETRY do cache, e
+nesse intervalo nenhuma chamada tenta o Redis de novo.
+
+Uso:
+    get_quota('tiny').acquire(token, por_minuto=54)
+"""
+
+import logging
+import math
+import os
+import socket
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from .cache import CACHE_PREFIX, _l2, _l2_falhou
+from .cache_codec import hash_key
+from .metrics import record_rate_limit
+
+logger = logging.getLogger('quota')
+
+QUOTA_PREFIX = CACHE_PREFIX + 'quota:'
+QUOTA_WINDOW = int(os.getenv('QUOTA_WINDOW', '60'))
+# Orçamento (req/min) quando o chamador não informa um; 0 = sem cota compartilhada
+QUOTA_PER_MIN = {
+    'tiny': int(os.getenv('TINY_QUOTA_PER_MIN', '0')),
+    'shopee': int(os.getenv('SHOPEE_QUOTA_PER_MIN', '600')),
+}
+
+_PROCESSO = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class QuotaCoordinator:
+    """Permissões de uma API divididas entre os processos que usam o mesmo token.
+
+    Args:
+        api: Nome da API (chave em QUOTA_PER_MIN e nas métricas).
+        janela: Duração da janela em segundos.
+        cliente: Fábrica do cliente L2 (padrão: o L2 do cache, que respeita CACHE_L2_RETRY;
+            se a fábrica devolver None a permissão é concedida sem coordenação).
+        processo: Identificador deste processo (padrão: host:pid).
+        relogio/dormir: Injetáveis para testes.
+    """
+
+    def __init__(self, api: str, janela: int = QUOTA_WINDOW, cliente: Callable = _l2,
+                 processo: str = _PROCESSO, relogio: Callable[[], float] = time.time,
+                 dormir: Callable[[float], None] = time.sleep):
+        self.api = api
+        self.janela = janela
+        self.processo = processo
+        self._cliente = cliente
+        # Falhas do L2 do cache entram na espera dele (as de um cliente injetado, não)
+        self._l2_do_cache = cliente is _l2
+        self._relogio = relogio
+        self._dormir = dormir
+        self._estado: Dict = {"esperas": 0, "espera_total_s": 0.0}
+        self._avisou = False
+
+    def acquire(self, token: str, por_minuto: Optional[int] = None) -> float:
+        """Espera uma permissão do orçamento compartilhado. Retorna os segundos esperados."""
+        por_minuto = por_minuto or QUOTA_PER_MIN.get(self.api, 0)
+        if not por_minuto:
+            return 0.0
+        orcamento = max(1, int(por_minuto * self.janela / 60))
+        esperado = 0.0
+        while True:
+            espera = self._tenta(hash_key(self.api, token)[:16], orcamento)
+            if espera is None:
+                break
+            self._dormir(espera)
+            esperado += espera
+        if esperado:
+            self._estado["esperas"] += 1
+            self._estado["espera_total_s"] = round(self._estado["espera_total_s"] + esperado, 2)
+        record_rate_limit(f"{self.api} (cota entre processos)", dict(self._estado))
+        return esperado
+
+    def _tenta(self, chave_token: str, orcamento: int) -> Optional[float]:
+        """None se a permissão foi concedida; senão segundos até valer tentar de novo."""
+        agora = self._relogio()
+        indice = int(agora // self.janela)
+        inicio = indice * self.janela
+        base = f"{QUOTA_PREFIX}{self.api}:{chave_token}:"
+        total, meus, processos = f"{base}{indice}", f"{base}{indice}:{self.processo}", f"{base}{indice}:procs"
+        try:
+            client = self._cliente()
+            if client is None:
+                return None
+            pipe = client.pipeline(transaction=False)
+            pipe.incr(total).expire(total, self.janela * 2)
+            pipe.incr(meus).expire(meus, self.janela * 2)
+            pipe.sadd(processos, self.processo).expire(processos, self.janela * 2)
+            pipe.smembers(processos).smembers(f"{base}{indice - 1}:procs")
+            usadas, _, minhas, _, _, _, atuais, anteriores = pipe.execute()
+        except Exception as e:
+            if self._l2_do_cache:
+                _l2_falhou(e)
+            if not self._avisou:
+                logger.warning(f"Cota compartilhada de {self.api} indisponível ({e}); limitando só localmente")
+                self._avisou = True
+            return None
+
+        ativos = max(1, len(set(atuais) | set(anteriores)))
+        parte = math.ceil(orcamento / ativos)
+        segunda_metade = agora - inicio >= self.janela / 2
+        self._estado.update({
+            "cota_por_janela": orcamento,
+            "usadas_na_janela": min(usadas, orcamento),
+            "processos": ativos,
+            "parte_do_processo": parte,
+        })
+        if usadas <= orcamento and (minhas <= parte or segunda_metade):
+            return None
+
+        # Devolve o que reservou; espera a janela seguinte ou a metade desta (sobras)
+        try:
+            client.pipeline(transaction=False).decr(total).decr(meus).execute()
+        except Exception as e:
+            logger.debug(f"Cota de {self.api}: contador não devolvido: {e}")
+        if usadas > orcamento or segunda_metade:
+            return inicio + self.janela - agora + 0.01
+        return inicio + self.janela / 2 - agora + 0.01
+
+    def state(self) -> Dict:
+        return dict(self._estado)
+
+
+_quotas: Dict[str, QuotaCoordinator] = {}
+_quotas_lock = threading.Lock()
+
+
+def get_quota(api: str, **kwargs) -> QuotaCoordinator:
+    """Coordenador de cota do processo para a API ``api``."""
+    with _quotas_lock:
+        if api not in _quotas:
+            _quotas[api] = QuotaCoordinator(api, **kwargs)
+        return _quotas[api]
@@ -0,0 +1,188 @@
+"""
+Limitador de requisições adaptativo (token bucket) para APIs externas.
+
+A taxa se calibra pela própria API: no Tiny, ``x-limit-api`` informa quantas
+requisições por minuto o token pode fazer e ``x-remaining-api`` quantas ainda
+restam na janela atual. O limitador usa ``RATE_LIMIT_MARGIN`` desse limite e
+nunca deixa acumular mais permissões do que a API diz que restam.
+
+Bloqueios (HTTP 429 ou ``codigo_erro=6`` no Tiny) cortam a taxa pela metade e
+suspendem as permissões por uma pausa que dobra a cada bloqueio seguido; cada
+resposta normal devolve 10% do teto à taxa (AIMD). Enquanto a API não informar
+o limite e nada for bloqueado, as requisições não são seguradas.
+
+Uso:
+    limiter = get_limiter('tiny')
+    limiter.acquire()                 # bloqueia até haver permissão
+    resp = session.get(...)
+    limiter.observe(resp.headers.get('x-limit-api'), resp.headers.get('x-remaining-api'))
+    if resp.status_code == 429:
+        limiter.throttled()
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from .metrics import record_rate_limit
+
+# Limite (req/min) assumido antes da API informar o seu; vazio = sem limite até calibrar
+RATE_LIMIT_PER_MIN = int(os.getenv('RATE_LIMIT_PER_MIN', '0')) or None
+# Limite assumido quando há bloqueio sem nenhum cabeçalho de cota
+RATE_LIMIT_FALLBACK_PER_MIN = 30
+# Fração do limite da API efetivamente usada (folga para a janela do servidor)
+RATE_LIMIT_MARGIN = float(os.getenv('RATE_LIMIT_MARGIN', '0.9'))
+# Requisições que podem sair em rajada após um período ocioso
+RATE_LIMIT_BURST = int(os.getenv('RATE_LIMIT_BURST', '5'))
+# Pausa após o primeiro bloqueio (segundos); dobra a cada bloqueio seguido
+RATE_LIMIT_PAUSE = float(os.getenv('RATE_LIMIT_PAUSE', '2'))
+RATE_LIMIT_MAX_PAUSE = 60.0
+
+
+def _inteiro(valor) -> Optional[int]:
+    try:
+        return int(str(valor).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveRateLimiter:
+    """Token bucket com taxa ajustada pelos cabeçalhos de cota e pelos bloqueios.
+
+    Args:
+        nome: Identificação nas métricas (ex.: "tiny").
+        por_minuto: Limite inicial (req/min); None = sem limite até a API informar.
+        margem: Fração do limite da API usada.
+        burst: Capacidade do balde.
+        pausa: Pausa após o primeiro bloqueio.
+        relogio/dormir: Injetáveis para testes.
+    """
+
+    def __init__(self, nome: str, por_minuto: Optional[int] = RATE_LIMIT_PER_MIN,
+                 margem: float = RATE_LIMIT_MARGIN, burst: int = RATE_LIMIT_BURST,
+                 pausa: float = RATE_LIMIT_PAUSE, relogio: Callable[[], float] = time.monotonic,
+                 dormir: Callable[[float], None] = time.sleep):
+        self.nome = nome
+        self.margem = margem
+        self.burst = max(1, burst)
+        self.pausa = pausa
+        self._relogio = relogio
+        self._dormir = dormir
+        self._lock = threading.Lock()
+        self._limite: Optional[int] = None
+        self._restantes: Optional[int] = None
+        # Taxas em requisições por segundo; None = sem limite
+        self._teto: Optional[float] = por_minuto * margem / 60.0 if por_minuto else None
+        self._taxa = self._teto
+        self._tokens = float(self.burst)
+        # Instante até o qual o balde está reposto (no futuro durante uma pausa)
+        self._marca = relogio()
+        self._bloqueios_seguidos = 0
+        self._permissoes = 0
+        self._bloqueios = 0
+        self._espera_total = 0.0
+
+    def _repoe(self, agora: float):
+        if self._taxa and agora > self._marca:
+            self._tokens = min(float(self.burst), self._tokens + (agora - self._marca) * self._taxa)
+        self._marca = max(self._marca, agora)
+
+    def acquire(self) -> float:
+        """Reserva uma permissão e espera por ela. Retorna os segundos esperados."""
+        with self._lock:
+            agora = self._relogio()
+            self._repoe(agora)
+            espera = self._marca - agora
+            if self._taxa:
+                self._tokens -= 1
+                if self._tokens < 0:
+                    espera += -self._tokens / self._taxa
+            self._permissoes += 1
+            self._espera_total += espera
+        if espera > 0:
+            self._dormir(espera)
+        return espera
+
+    def espera_estimada(self) -> float:
+        """Segundos até haver permissão livre, sem reservá-la."""
+        with self._lock:
+            agora = self._relogio()
+            self._repoe(agora)
+            espera = self._marca - agora
+            if self._taxa and self._tokens < 1:
+                espera += (1 - self._tokens) / self._taxa
+            return max(0.0, espera)
+
+    def observe(self, limite=None, restantes=None):
+        """Calibra com os cabeçalhos de cota de uma resposta não bloqueada."""
+        limite, restantes = _inteiro(limite), _inteiro(restantes)
+        with self._lock:
+            self._repoe(self._relogio())
+            if limite and limite > 0:
+                novo_teto = limite * self.margem / 60.0
+                if limite != self._limite:
+                    # Limite novo (ou primeiro): usa tudo, salvo se vem de bloqueios seguidos
+                    self._taxa = novo_teto if not self._bloqueios_seguidos else min(self._taxa or novo_teto, novo_teto)
+                self._limite, self._teto = limite, novo_teto
+            if self._teto:
+                self._bloqueios_seguidos = 0
+                self._taxa = min(self._teto, (self._taxa or self._teto) + self._teto / 10)
+            if restantes is not None:
+                self._restantes = restantes
+                # A cota é do token: outros processos também gastam a mesma janela
+                reserva = max(1, round((self._limite or 0) * (1 - self.margem)))
+                self._tokens = min(self._tokens, float(restantes - reserva))
+        self._publica()
+
+    def throttled(self, espera: Optional[float] = None) -> float:
+        """Registra um bloqueio da API; retorna a pausa aplicada às próximas permissões."""
+        with self._lock:
+            agora = self._relogio()
+            self._repoe(agora)
+            self._bloqueios += 1
+            self._bloqueios_seguidos += 1
+            if not self._teto:
+                self._teto = RATE_LIMIT_FALLBACK_PER_MIN * self.margem / 60.0
+            self._taxa = max(1 / 60.0, (self._taxa or self._teto) / 2)
+            if not espera:
+                espera = min(RATE_LIMIT_MAX_PAUSE, self.pausa * 2 ** (self._bloqueios_seguidos - 1))
+            self._tokens = min(self._tokens, 0.0)
+            self._marca = max(self._marca, agora + espera)
+        self._publica()
+        return espera
+
+    def cota_por_min(self) -> Optional[int]:
+        """Parte do limite informado pela API que pode ser usada (None se ainda não informado)."""
+        return int(self._limite * self.margem) if self._limite else None
+
+    def state(self) -> Dict:
+        """Estado atual (exibido na página de Métricas)."""
+        with self._lock:
+            agora = self._relogio()
+            return {
+                "limite_api": self._limite,
+                "restantes_api": self._restantes,
+                "taxa_por_min": round(self._taxa * 60, 1) if self._taxa else None,
+                "teto_por_min": round(self._teto * 60, 1) if self._teto else None,
+                "tokens": round(self._tokens, 2),
+                "pausa_restante_s": round(max(0.0, self._marca - agora), 2),
+                "permissoes": self._permissoes,
+                "bloqueios": self._bloqueios,
+                "espera_total_s": round(self._espera_total, 2),
+            }
+
+    def _publica(self):
+        record_rate_limit(self.nome, self.state())
+
+
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(nome: str, **kwargs) -> AdaptiveRateLimiter:
+    """Limitador compartilhado do processo para a API ``nome``."""
+    with _limiters_lock:
+        if nome not in _limiters:
+            _limiters[nome] = AdaptiveRateLimiter(nome, **kwargs)
+        return _limiters[nome]
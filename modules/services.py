@@ -55,6 +55,7 @@ class ContaService:
                 self.regra_repo.add_or_update(cnpj, fornecedor, categoria)
         
         # Verificar duplicata via hash determinístico
+        dedup_hash = None
         if fornecedor and valor and vencimento:
             dedup_hash = self.generate_dedup_hash(dados.get('external_id') or fornecedor, valor, vencimento)
             duplicates = self.conta_repo.find_duplicates(dedup_hash)
@@ -77,7 +78,9 @@ class ContaService:
             linha_digitavel=dados.get('linha_digitavel'),
             pdf_url=dados.get('pdf_path') or dados.get('pdf_url'),
             observacoes=dados.get('observacoes') or dados.get('observacao'),
-            data_cadastro=datetime.now()
+            data_cadastro=datetime.now(),
+            order_sn=dados.get('order_sn'),
+            dedup_hash=dedup_hash
         )
         
         saved = self.conta_repo.add(conta)
@@ -1,10 +1,36 @@
 import time, hmac, hashlib, requests, json, os, re
 import logging
 from . import config
+from .circuit_breaker import get_breaker
+from .quota import get_quota
 
 logger = logging.getLogger('shopee_api')
 HOST = "https://partner.shopeemobile.com"
 
+
+def _aguarda_cota():
+    """Permissão da cota da loja, compartilhada com os outros processos (app, scripts)."""
+    get_quota('shopee').acquire(f"{config.SHOPEE_PARTNER_ID}:{config.SHOPEE_SHOP_ID}")
+
+
+def _requisicao(metodo: str, path: str, url: str, cota: bool = True, **kwargs):
+    """GET/POST passando pelo circuit breaker do ``path`` (e pela cota da loja).
+
+    Com o circuito aberto levanta ``CircuitOpenError`` (um RequestException) na hora.
+    """
+    circuito = get_breaker('shopee', path)
+    circuito.permitir()
+    if cota:
+        _aguarda_cota()
+    enviar = requests.get if metodo == 'get' else requests.post
+    try:
+        r = enviar(url, **kwargs)
+    except Exception:
+        circuito.falha()
+        raise
+    circuito.registra(r.status_code)
+    return r
+
 def _generate_sign(path, timestamp, access_token="", shop_id=""):
     """
     Generate HMAC-SHA256 signature for Shopee API v2
@@ -128,7 +154,7 @@ def _refresh_access_token():
         "partner_id": int(partner_id)
     }
     try:
-        r = requests.post(url, json=body, timeout=30)
+        r = _requisicao('post', path, url, cota=False, json=body, timeout=30)
         data = r.json() if r.headers.get('content-type','').startswith('application/json') else {"raw": r.text}
         if r.status_code != 200 or (isinstance(data, dict) and data.get('error')):
             logger.error(f"Falha no refresh token: HTTP {r.status_code} - {data}")
@@ -188,7 +214,7 @@ def listar_produtos(page_size=20, offset=0):
     try:
         logger.debug(f'Shopee API: listing products (page_size={page_size}, offset={offset})')
         def do_request(p):
-            r_local = requests.get(url, params=p, timeout=30)
+            r_local = _requisicao('get', path, url, params=p, timeout=30)
             try:
                 data_local = r_local.json()
             except Exception:
@@ -290,7 +316,7 @@ def listar_pedidos(time_from=None, time_to=None, cursor: str = '', page_size: in
     
     try:
         def do_request(params_local):
-            r_local = requests.get(url, params=params_local, timeout=30)
+            r_local = _requisicao('get', path, url, params=params_local, timeout=30)
             # Não usar raise_for_status para capturar corpo em erros
             try:
                 data_local = r_local.json()
@@ -384,7 +410,7 @@ def obter_detalhe_pedido(order_sn: str):
     }
 
     try:
-        r = requests.get(url, params=params, timeout=30)
+        r = _requisicao('get', path, url, params=params, timeout=30)
         try:
             data = r.json()
         except Exception:
@@ -12,7 +12,8 @@ class CachedShopeeAPI(CachedAPI):
     """Wrapper de Shopee API com suporte a cache."""
     
     cache_prefix = "shopee_"
-    cache_ttl = 3600  # 1 hora
+    cache_ttl = 3600  # 1 hora (limite rígido)
+    cache_soft_ttl = 600  # Após 10 min serve o valor e atualiza em segundo plano
     
     def __init__(self):
         super().__init__()
@@ -31,25 +32,20 @@ class CachedShopeeAPI(CachedAPI):
         Returns:
             list: Lista de pedidos.
         """
-        # Tenta recuperar do cache
-        cached = self.get_cached(shop_id, start_date, end_date)
-        if cached is not None:
-            return cached
+        def buscar():
+            # TODO: Implementar chamada real à API Shopee
+            # Por enquanto, retorna dados simulados
+            return {
+                "shop_id": shop_id,
+                "orders": [
+                    {"order_id": 1, "status": "completed", "total": 100},
+                    {"order_id": 2, "status": "cancelled", "total": 50}
+                ],
+                "count": 2
+            }
         
-        # TODO: Implementar chamada real à API Shopee
-        # Por enquanto, retorna dados simulados
-        result = {
-            "shop_id": shop_id,
-            "orders": [
-                {"order_id": 1, "status": "completed", "total": 100},
-                {"order_id": 2, "status": "cancelled", "total": 50}
-            ],
-            "count": 2
-        }
-        
-        # Armazena em cache
-        self.set_cached(result, shop_id, start_date, end_date)
-        return result
+        # Cache ou, na falha, uma única chamada mesmo com várias sessões simultâneas
+        return self.get_or_fetch(buscar, shop_id, start_date, end_date)
     
     @measure_performance()
     def get_products(self, shop_id, limit=100):
@@ -63,25 +59,19 @@ class CachedShopeeAPI(CachedAPI):
         Returns:
             list: Lista de produtos.
         """
-        # Tenta recuperar do cache
-        cached = self.get_cached(shop_id, limit)
-        if cached is not None:
-            return cached
-        
-        # TODO: Implementar chamada real à API Shopee
-        # Por enquanto, retorna dados simulados
-        result = {
-            "shop_id": shop_id,
-            "products": [
-                {"product_id": i, "name": f"Produto {i}", "price": 100 + i}
-                for i in range(min(limit, 10))
-            ],
-            "total": min(limit, 10)
-        }
+        def buscar():
+            # TODO: Implementar chamada real à API Shopee
+            # Por enquanto, retorna dados simulados
+            return {
+                "shop_id": shop_id,
+                "products": [
+                    {"product_id": i, "name": f"Produto {i}", "price": 100 + i}
+                    for i in range(min(limit, 10))
+                ],
+                "total": min(limit, 10)
+            }
         
-        # Armazena em cache
-        self.set_cached(result, shop_id, limit)
-        return result
+        return self.get_or_fetch(buscar, shop_id, limit)
     
     @measure_performance()
     def get_shop_info(self, shop_id):
@@ -94,21 +84,16 @@ class CachedShopeeAPI(CachedAPI):
         Returns:
             dict: Informações da loja.
         """
-        # Cache de 24 horas para info estática
-        cached = self.get_cached(shop_id)
-        if cached is not None:
-            return cached
-        
-        # TODO: Implementar chamada real à API Shopee
-        result = {
-            "shop_id": shop_id,
-            "shop_name": f"Loja {shop_id}",
-            "rating": 4.5,
-            "follower_count": 1000
-        }
+        def buscar():
+            # TODO: Implementar chamada real à API Shopee
+            return {
+                "shop_id": shop_id,
+                "shop_name": f"Loja {shop_id}",
+                "rating": 4.5,
+                "follower_count": 1000
+            }
         
-        self.set_cached(result, shop_id)
-        return result
+        return self.get_or_fetch(buscar, shop_id)
 
 
 # Exemplo de uso com decorator
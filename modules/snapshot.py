@@ -0,0 +1,247 @@
+"""
+Snapshots online do banco SQLite com a API de backup do sqlite3.
+
+``take_snapshot()`` copia o banco num único passo do backup: em WAL esse passo
+só mantém uma transação de leitura, então a sincronização continua gravando
+enquanto a cópia é feita. (Em passos de poucas páginas o backup recomeça a
+cada escrita de outra conexão e nunca termina durante a sincronização.) A
+cópia é gravada em arquivo temporário e renomeada no fim, de modo que um
+snapshot em disco está sempre completo e consistente.
+
+Retenção (``rotate``): os SNAPSHOT_KEEP_RECENT mais novos, o mais novo de cada
+um dos últimos SNAPSHOT_KEEP_DAILY dias e de cada uma das últimas
+SNAPSHOT_KEEP_WEEKLY semanas.
+
+Com SNAPSHOT_READS=1, ``get_read_db()`` devolve uma sessão somente leitura
+sobre o snapshot mais recente (se tiver menos de SNAPSHOT_MAX_AGE segundos);
+Dashboard, Alertas e a exportação Excel usam essa sessão e não disputam o
+arquivo com a sincronização. Sem snapshot recente, a leitura cai no banco
+principal.
+
+Uso:
+    python scripts/snapshot_db.py            # cron: snapshot + rotação
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from . import database
+
+logger = logging.getLogger('snapshot')
+
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', os.path.join('data', 'snapshots'))
+SNAPSHOT_READS = os.getenv('SNAPSHOT_READS', '0').lower() in ('1', 'true', 'yes')
+SNAPSHOT_MAX_AGE = int(os.getenv('SNAPSHOT_MAX_AGE', '900'))
+SNAPSHOT_INTERVAL = int(os.getenv('SNAPSHOT_INTERVAL', '300'))
+SNAPSHOT_KEEP_RECENT = int(os.getenv('SNAPSHOT_KEEP_RECENT', '6'))
+SNAPSHOT_KEEP_DAILY = int(os.getenv('SNAPSHOT_KEEP_DAILY', '7'))
+SNAPSHOT_KEEP_WEEKLY = int(os.getenv('SNAPSHOT_KEEP_WEEKLY', '4'))
+
+_FORMATO = '%Y%m%d-%H%M%S'
+_PREFIXO = 'snapshot_'
+
+
+def source_path(url: Optional[str] = None) -> str:
+    """Caminho do arquivo SQLite de DATABASE_URL (sqlite:///caminho)."""
+    url = url or database.DATABASE_URL
+    if not url.startswith('sqlite:///') or database.is_memory_url(url):
+        raise ValueError(f"Snapshot só suporta banco SQLite em arquivo: {url}")
+    return url.replace('sqlite:///', '', 1)
+
+
+def _nome(momento: datetime) -> str:
+    return f"{_PREFIXO}{momento.strftime(_FORMATO)}.db"
+
+
+def _momento(caminho: Path) -> Optional[datetime]:
+    try:
+        return datetime.strptime(caminho.stem[len(_PREFIXO):], _FORMATO)
+    except ValueError:
+        return None
+
+
+def list_snapshots(base_dir: Optional[str] = None) -> List[Path]:
+    """Snapshots completos em disco, do mais novo para o mais antigo."""
+    base = Path(base_dir or SNAPSHOT_DIR)
+    if not base.is_dir():
+        return []
+    snaps = [p for p in base.glob(f'{_PREFIXO}*.db') if _momento(p)]
+    return sorted(snaps, key=_momento, reverse=True)
+
+
+def latest_snapshot(base_dir: Optional[str] = None, max_age: Optional[int] = None,
+                    agora: Optional[datetime] = None) -> Optional[Path]:
+    """Snapshot mais novo; None se não houver ou se for mais velho que ``max_age`` segundos."""
+    snaps = list_snapshots(base_dir)
+    if not snaps:
+        return None
+    if max_age is not None and (agora or datetime.now()) - _momento(snaps[0]) > timedelta(seconds=max_age):
+        return None
+    return snaps[0]
+
+
+def take_snapshot(origem: Optional[str] = None, base_dir: Optional[str] = None,
+                  agora: Optional[datetime] = None) -> Dict:
+    """Copia o banco para ``<base_dir>/snapshot_<AAAAMMDD-HHMMSS>.db``.
+
+    Args:
+        origem: Arquivo SQLite (padrão: o de DATABASE_URL).
+        base_dir: Diretório dos snapshots (padrão: SNAPSHOT_DIR).
+        agora: Momento usado no nome (testes).
+
+    Returns:
+        Dict com caminho, páginas copiadas, passos e duração.
+    """
+    origem = origem or source_path()
+    base = Path(base_dir or SNAPSHOT_DIR)
+    base.mkdir(parents=True, exist_ok=True)
+    destino = base / _nome(agora or datetime.now())
+    temporario = destino.with_suffix('.db.tmp')
+
+    stats = {'caminho': destino, 'paginas': 0, 'passos': 0}
+
+    def _progresso(status, restantes, total):
+        stats['passos'] += 1
+        stats['paginas'] = total
+
+    inicio = time.perf_counter()
+    src = sqlite3.connect(origem)
+    dst = sqlite3.connect(temporario)
+    try:
+        # Passo único: em WAL só segura uma leitura e não reinicia com as escritas da sincronização
+        src.backup(dst, pages=-1, progress=_progresso)
+        # Snapshot é um arquivo único e autocontido (sem -wal ao lado)
+        dst.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        dst.close()
+        src.close()
+    os.replace(temporario, destino)
+    stats['segundos'] = round(time.perf_counter() - inicio, 3)
+    logger.info(f"Snapshot {destino.name}: {stats['paginas']} páginas em {stats['passos']} passos ({stats['segundos']}s)")
+    return stats
+
+
+def rotate(base_dir: Optional[str] = None, recent: int = None, daily: int = None, weekly: int = None,
+           agora: Optional[datetime] = None) -> List[Path]:
+    """Remove snapshots fora da política de retenção; retorna os removidos."""
+    recent = SNAPSHOT_KEEP_RECENT if recent is None else recent
+    daily = SNAPSHOT_KEEP_DAILY if daily is None else daily
+    weekly = SNAPSHOT_KEEP_WEEKLY if weekly is None else weekly
+    hoje = (agora or datetime.now()).date()
+
+    snaps = list_snapshots(base_dir)
+    manter = set(snaps[:recent])
+    dias, semanas = set(), set()
+    for snap in snaps:  # do mais novo para o mais antigo: o primeiro de cada dia/semana fica
+        dia = _momento(snap).date()
+        semana = dia.isocalendar()[:2]
+        if (hoje - dia).days < daily and dia not in dias:
+            dias.add(dia)
+            manter.add(snap)
+        if (hoje - dia).days < weekly * 7 and semana not in semanas:
+            semanas.add(semana)
+            manter.add(snap)
+
+    removidos = []
+    for snap in snaps:
+        if snap in manter:
+            continue
+        try:
+            snap.unlink()
+            removidos.append(snap)
+        except OSError as e:
+            # Windows: snapshot ainda aberto por um leitor; tenta de novo na próxima rotação
+            logger.warning(f"Não foi possível remover {snap.name}: {e}")
+    return removidos
+
+
+# --- Leituras a partir do snapshot ---
+_engines: Dict[str, object] = {}
+_engines_lock = threading.Lock()
+
+
+def _engine_leitura(caminho: Path):
+    chave = str(caminho)
+    with _engines_lock:
+        if chave not in _engines:
+            # Snapshot anterior deixa de receber sessões novas; sem dispose(), porque
+            # sessões abertas ainda podem estar lendo dele (o engine é coletado quando fecharem)
+            _engines.clear()
+            _engines[chave] = create_engine(
+                f"sqlite:///file:{caminho.resolve()}?mode=ro&uri=true",
+                connect_args={'check_same_thread': False}
+            )
+        return _engines[chave]
+
+
+def get_read_db(max_age: Optional[int] = None, base_dir: Optional[str] = None):
+    """Sessão para leituras pesadas: snapshot recente com SNAPSHOT_READS=1, senão o banco principal."""
+    if SNAPSHOT_READS:
+        snap = latest_snapshot(base_dir, SNAPSHOT_MAX_AGE if max_age is None else max_age)
+        if snap is not None:
+            sessao = sessionmaker(bind=_engine_leitura(snap))()
+            # @cached usa o nome do snapshot na chave (cache.py, _origem_leitura)
+            sessao.info['snapshot'] = snap.name
+            return sessao
+    return database.get_db()
+
+
+def snapshot_and_rotate(base_dir: Optional[str] = None) -> Dict:
+    stats = take_snapshot(base_dir=base_dir)
+    stats['removidos'] = rotate(base_dir)
+    return stats
+
+
+class SnapshotScheduler:
+    """Thread daemon que tira snapshot a cada ``intervalo`` segundos (um por processo)."""
+
+    def __init__(self, intervalo: int = SNAPSHOT_INTERVAL, base_dir: Optional[str] = None):
+        self.intervalo = intervalo
+        self.base_dir = base_dir
+        self._parar = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='db-snapshot', daemon=True)
+            self._thread.start()
+        return self
+
+    def _loop(self):
+        while not self._parar.is_set():
+            snap = latest_snapshot(self.base_dir, self.intervalo)
+            if snap is None:
+                try:
+                    snapshot_and_rotate(self.base_dir)
+                except Exception as e:
+                    logger.error(f"Falha no snapshot: {e}")
+            self._parar.wait(self.intervalo)
+
+    def stop(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+_agendador: Optional[SnapshotScheduler] = None
+
+
+def iniciar_agendador() -> Optional[SnapshotScheduler]:
+    """Inicia (uma vez por processo) o agendador quando SNAPSHOT_READS está ligado."""
+    global _agendador
+    if not SNAPSHOT_READS:
+        return None
+    with _engines_lock:
+        if _agendador is None:
+            _agendador = SnapshotScheduler().start()
+    return _agendador
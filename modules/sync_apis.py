@@ -4,8 +4,8 @@ Importa pedidos completos com todas as informações financeiras
 """
 import logging
 from datetime import datetime, timedelta
-from .shopee_api import listar_pedidos, get_access_token
-from .database import add_conta, get_all_contas, SessionLocal, Conta
+from .shopee_api import listar_pedidos, get_access_token, _requisicao
+from .database import add_contas_bulk, get_all_contas, SessionLocal, Conta
 import time
 
 logger = logging.getLogger('sync_apis')
@@ -21,7 +21,6 @@ def get_shopee_order_details(order_sn_list):
         Lista de pedidos com detalhes completos
     """
     from . import config
-    import requests
     import hmac
     import hashlib
     
@@ -58,7 +57,8 @@ def get_shopee_order_details(order_sn_list):
     
     try:
         logger.debug(f'Shopee: buscando detalhes de {len(order_sn_list)} pedidos')
-        r = requests.get(url, params=params, timeout=30)
+        # Circuit breaker e cota da loja compartilhados com shopee_api
+        r = _requisicao('get', path, url, params=params, timeout=30)
         r.raise_for_status()
         
         data = r.json()
@@ -137,9 +137,9 @@ def sync_shopee_pedidos(dias_atras=15):
             batch = order_sn_list[i:i+50]
             details = get_shopee_order_details(batch)
             all_details.extend(details)
-            time.sleep(0.5)  # Rate limiting
         
-        # 3. Processar cada pedido e criar registro financeiro
+        # 3. Processar cada pedido e montar o registro financeiro
+        contas = []
         for pedido in all_details:
             try:
                 order_sn = pedido.get('order_sn', '')
@@ -199,21 +199,26 @@ Receita Líquida: R$ {receita_liquida:.2f}"""
                     'status': 'Pago' if order_status in ['COMPLETED', 'SHIPPED'] else 'Pendente',
                     'observacao': observacao,
                     'linha_digitavel': order_sn,
-                    'descricao': f'{qtd_itens} itens'
+                    'descricao': f'{qtd_itens} itens',
+                    'order_sn': order_sn
                 }
-                
-                conta_id = add_conta(**conta_data)
-                if conta_id:
-                    total_importados += 1
-                    pedidos_processados.append(f"Pedido {order_sn} - R$ {receita_liquida:.2f}")
-                    logger.info(f"Pedido Shopee {order_sn} importado (ID: {conta_id}, Líquido: R$ {receita_liquida:.2f})")
-                else:
-                    total_erros += 1
+                contas.append(conta_data)
                     
             except Exception as e:
                 logger.error(f"Erro ao processar pedido Shopee {order_sn}: {e}")
                 total_erros += 1
         
+        # 4. Gravar todos os pedidos em uma única transação (pedidos já importados são ignorados)
+        if contas:
+            resultado = add_contas_bulk(contas)
+            ignorados = {r['order_sn'] for r in resultado['skipped']}
+            for conta_data in contas:
+                if conta_data['order_sn'] in ignorados:
+                    continue
+                total_importados += 1
+                pedidos_processados.append(f"Pedido {conta_data['order_sn']} - R$ {conta_data['valor']:.2f}")
+            logger.info(f"Pedidos Shopee gravados: {total_importados} novos, {len(ignorados)} já existentes")
+        
     except Exception as e:
         logger.error(f"Erro na sincronização Shopee: {e}", exc_info=True)
         total_erros += 1
@@ -1,26 +1,305 @@
-def _normalize_text(s: str) -> str:
-    """Remove acentos, normaliza espaços e caixa para matching mais robusto."""
-    import unicodedata
-    s = unicodedata.normalize("NFKD", s)
-    s = "".join(ch for ch in s if not unicodedata.combining(ch))
-    s = s.lower().strip()
-    return " ".join(s.split())
-
-
-def _rate_limit_sleep():
-    """Aguarda tempo mínimo entre chamadas à API para respeitar rate limit."""
-    time.sleep(0.2)  # 200ms entre chamadas
+"""
+Integração com a API v2 do Tiny ERP.
+
+Todas as operações passam por ``TinyClient`` (``get_client()``): uma única
+``requests.Session`` com pool de conexões keep-alive (TINY_POOL_SIZE), então
+chamadas em lote não refazem o handshake TCP+TLS com api.tiny.com.br. O
+cliente injeta token e formato, aplica timeouts e decodifica as respostas.
+O token é lido de ``config.TINY_API_TOKEN`` a cada chamada.
+
+O ritmo das requisições é do limitador adaptativo ``rate_limiter`` ("tiny"),
+calibrado pelos cabeçalhos x-limit-api/x-remaining-api e pelos bloqueios
+(HTTP 429 / codigo_erro=6), e pela cota do token dividida entre processos
+(``quota``: app, scripts e workers gastam o mesmo orçamento). Cada endpoint
+tem um circuit breaker: com o Tiny fora do ar as chamadas falham na hora em
+vez de esperar timeouts. As operações de escrita repetem tentativas por
+``_com_retentativas``.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
 
+import requests
+from requests.adapters import HTTPAdapter
 
-import requests, json
-import time
-import logging
-from typing import Any, Dict
 from . import config
+from .cache import cache_get_many, cache_set_many
+from .circuit_breaker import CircuitOpenError, get_breaker
+from .indice_nomes import similaridade
+from .quota import get_quota
+from .rate_limiter import AdaptiveRateLimiter, get_limiter
 
 logger = logging.getLogger('tiny_api')
 BASE_URL = "https://api.tiny.com.br/api2"
-TOKEN = config.TINY_API_TOKEN
+# Conexões keep-alive mantidas para api.tiny.com.br (threads de sincronização em paralelo)
+TINY_POOL_SIZE = int(os.getenv('TINY_POOL_SIZE', '10'))
+TINY_TIMEOUT = 30
+# Consultas de produto respondem primeiro do espelho local (modules/catalogo_tiny.py)
+TINY_LOCAL_FIRST = os.getenv('TINY_CATALOGO_LOCAL', '0') == '1'
+# Nota mínima (Dice de trigramas, 0 a 1) para aceitar um produto pelo nome
+NOME_LIMIAR = 0.6
+
+
+class TinyClient:
+    """Cliente HTTP do Tiny ERP sobre uma ``requests.Session`` compartilhada.
+
+    Args:
+        token: Token fixo (padrão: ``config.TINY_API_TOKEN`` lido a cada chamada).
+        base_url: URL base da API v2.
+        pool_size: Conexões mantidas abertas no pool.
+        timeout: Timeout padrão (segundos).
+        limiter: Limitador de requisições (padrão: ``get_limiter('tiny')``).
+    """
+
+    def __init__(self, token: Optional[str] = None, base_url: str = BASE_URL,
+                 pool_size: int = TINY_POOL_SIZE, timeout: float = TINY_TIMEOUT,
+                 limiter: Optional[AdaptiveRateLimiter] = None):
+        self._token = token
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.limiter = limiter or get_limiter('tiny')
+        self.session = requests.Session()
+        # Retentativas ficam com as operações (regras de rate limit do Tiny), não com o adapter
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    @property
+    def token(self) -> str:
+        return self._token if self._token is not None else config.TINY_API_TOKEN
+
+    def url(self, endpoint: str) -> str:
+        return f"{self.base_url}/{endpoint}"
+
+    def _com_token(self, campos: Optional[Dict], formato: Optional[str]) -> Dict:
+        base = {"token": self.token}
+        if formato:
+            base["formato"] = formato
+        return {**base, **(campos or {})}
+
+    def aguarda_permissao(self) -> float:
+        """Espera o limitador do processo e a cota compartilhada do token. Retorna os segundos parados."""
+        espera = self.limiter.acquire()
+        return espera + get_quota('tiny').acquire(self.token, self.limiter.cota_por_min())
+
+    def requisicao(self, metodo: str, endpoint: str, params: Optional[Dict] = None,
+                   data: Optional[Dict] = None, json: Any = None, formato: Optional[str] = "json",
+                   timeout: Optional[float] = None, token_no_corpo: bool = False
+                   ) -> Tuple[requests.Response, float]:
+        """Requisição ao Tiny passando pelo circuito do endpoint, limitador e cota.
+
+        Com ``token_no_corpo`` token e formato vão no formulário em vez da URL.
+
+        Returns:
+            (resposta, segundos parados esperando permissão).
+
+        Raises:
+            CircuitOpenError: O endpoint está fora do ar (sem ir à rede).
+        """
+        if token_no_corpo:
+            data = self._com_token(data, formato)
+        else:
+            params = self._com_token(params, formato)
+        kwargs = {"params": params} if params is not None else {}
+        if data is not None:
+            kwargs["data"] = data
+        if json is not None:
+            kwargs["json"] = json
+
+        circuito = get_breaker('tiny', endpoint)
+        circuito.permitir()
+        espera = self.aguarda_permissao()
+        enviar = self.session.get if metodo == "get" else self.session.post
+        try:
+            resp = enviar(self.url(endpoint), timeout=timeout or self.timeout, **kwargs)
+        except Exception:
+            circuito.falha()
+            raise
+        circuito.registra(resp.status_code)
+        # Bloqueio (429 ou codigo_erro=6 com HTTP 200) não pode calibrar o limitador como resposta normal
+        if self.bloqueio(resp):
+            self.limiter.throttled(_inteiro_ou_none(getattr(resp, "headers", None), "retry-after"))
+        else:
+            self.limiter.observe(*self.limites(resp))
+        return resp, espera
+
+    def get(self, endpoint: str, params: Optional[Dict] = None, formato: Optional[str] = "json",
+            timeout: Optional[float] = None) -> requests.Response:
+        """GET em ``endpoint`` com token e formato nos parâmetros da URL."""
+        return self.requisicao("get", endpoint, params=params, formato=formato, timeout=timeout)[0]
+
+    def post(self, endpoint: str, params: Optional[Dict] = None, data: Optional[Dict] = None,
+             json: Any = None, formato: Optional[str] = "json", timeout: Optional[float] = None,
+             token_no_corpo: bool = False) -> requests.Response:
+        """POST em ``endpoint``; com ``token_no_corpo`` token e formato vão no formulário."""
+        return self.requisicao("post", endpoint, params=params, data=data, json=json, formato=formato,
+                               timeout=timeout, token_no_corpo=token_no_corpo)[0]
+
+    @staticmethod
+    def decode(resp) -> Dict[str, Any]:
+        """Corpo JSON da resposta; texto bruto em ``mensagem`` quando não é JSON."""
+        try:
+            data = resp.json()
+        except Exception:
+            return {"erro": True, "mensagem": resp.text}
+        return data if isinstance(data, dict) else {"erro": True, "mensagem": resp.text}
+
+    @staticmethod
+    def bloqueio(resp, data: Optional[Dict] = None) -> bool:
+        """True quando a API recusou por excesso de requisições (429 ou codigo_erro=6).
+
+        ``data`` é o corpo já interpretado; sem ele a resposta é decodificada aqui.
+        A mensagem só é examinada em respostas de erro (nomes de produto com
+        "limite" não contam como bloqueio).
+        """
+        if resp.status_code == 429:
+            return True
+        if data is None:
+            data = TinyClient.decode(resp)
+        retorno = data.get("retorno") if isinstance(data, dict) else None
+        if isinstance(retorno, dict):
+            if retorno.get("codigo_erro") in (6, "6"):
+                return True
+            if str(retorno.get("status") or "").upper() != "ERRO":
+                return False
+            msg = str(retorno.get("erros") or "")
+        else:
+            # Corpo que não é JSON (formato XML ou texto)
+            msg = str(data)
+            if re.search(r"<codigo_erro>\s*6\s*</codigo_erro>", msg):
+                return True
+            if resp.status_code < 400:
+                return False
+        msg = msg.lower()
+        return "limite" in msg or "muitas" in msg or "muitos" in msg
+
+    @staticmethod
+    def limites(resp) -> Tuple[Optional[str], Optional[str]]:
+        """Cabeçalhos x-limit-api e x-remaining-api (None se ausentes)."""
+        headers = getattr(resp, "headers", None) or {}
+        return headers.get("x-limit-api"), headers.get("x-remaining-api")
+
+    def close(self):
+        self.session.close()
+
+
+def _inteiro_ou_none(headers, nome: str) -> Optional[int]:
+    try:
+        return int((headers or {}).get(nome))
+    except (TypeError, ValueError):
+        return None
+
+
+_client: Optional[TinyClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> TinyClient:
+    """Cliente compartilhado do processo (uma Session para todas as operações)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = TinyClient()
+    return _client
+
+
+def _com_retentativas(metodo: str, endpoint: str, interpretar: Callable, operacao: str,
+                      max_retries: int = 3, base_sleep: float = 1.0, repetir_falhas: bool = True,
+                      **kwargs) -> Dict[str, Any]:
+    """Envia uma requisição ao Tiny com até ``max_retries`` tentativas.
+
+    ``interpretar(resp)`` devolve ``(ok, data)``. Bloqueios por excesso de
+    requisições vão para o limitador, que segura as próximas permissões de todo
+    o processo; outras falhas esperam ``base_sleep`` e repetem (só se
+    ``repetir_falhas``); erros de rede sempre repetem. Com o circuito do
+    endpoint aberto desiste na hora, sem esperar.
+
+    Returns:
+        Dict com resp, data, ok, tentativa, waited (segundos parados) e erro.
+    """
+    client = get_client()
+    tentativa = 0
+    waited = 0.0
+    resp = data = erro = None
+    ok = False
+    while tentativa < max_retries:
+        tentativa += 1
+        try:
+            resp, espera = client.requisicao(metodo, endpoint, **kwargs)
+            waited += espera
+        except CircuitOpenError as e:
+            erro = str(e)
+            logger.warning(f"Tiny {operacao}: {e}")
+            break
+        except requests.RequestException as e:
+            erro = str(e)
+            logger.warning(f"Tiny {operacao}: erro de rede na tentativa {tentativa}: {e}")
+            if tentativa < max_retries:
+                time.sleep(base_sleep)
+                waited += base_sleep
+            continue
+        erro = None
+        ok, data = interpretar(resp)
+        if ok:
+            break
+        if TinyClient.bloqueio(resp, data):
+            # O cliente já registrou o bloqueio visto no corpo bruto; a pausa acontece no próximo acquire
+            if not TinyClient.bloqueio(resp):
+                client.limiter.throttled()
+            logger.warning(f"Tiny {operacao}: bloqueio por excesso de requisições (tentativa {tentativa})")
+        elif not repetir_falhas:
+            break
+        elif tentativa < max_retries:
+            time.sleep(base_sleep)
+            waited += base_sleep
+    return {"resp": resp, "data": data, "ok": ok, "tentativa": tentativa, "waited": waited, "erro": erro}
+
+
+def _listagem(endpoint: str, params: Dict[str, Any], chave: str, operacao: str) -> Dict[str, Any]:
+    """Uma página de listagem do Tiny, com as retentativas de ``_com_retentativas``.
+
+    Bloqueios (429 / codigo_erro=6) esperam a pausa do limitador e repetem a
+    página. "A consulta não retornou registros" (codigo_erro 20) vira página
+    vazia; qualquer outra resposta sem ``retorno.status == 'OK'`` é erro.
+
+    Returns:
+        Corpo da resposta ou {'error': ..., 'retorno': {chave: []}}
+    """
+    def interpretar(resp):
+        data = TinyClient.decode(resp)
+        retorno = data.get('retorno')
+        retorno = retorno if isinstance(retorno, dict) else {}
+        status = str(retorno.get('status') or '').upper()
+        if resp.status_code == 200 and status == 'OK':
+            return True, data
+        if status == 'ERRO' and str(retorno.get('codigo_erro')) == '20':
+            return True, {'retorno': {'status': 'OK', chave: [], 'numero_paginas': 1}}
+        return False, data
+
+    try:
+        r = _com_retentativas("get", endpoint, interpretar, operacao, params=params)
+    except Exception as e:
+        logger.error(f'Tiny {operacao}: erro inesperado: {e}', exc_info=True)
+        return {'error': str(e), 'retorno': {chave: []}}
+    if r['ok']:
+        return r['data']
+    resp, data = r['resp'], r['data'] if isinstance(r['data'], dict) else {}
+    retorno = data.get('retorno') if isinstance(data.get('retorno'), dict) else {}
+    if r['erro']:
+        erro = r['erro']
+    elif TinyClient.bloqueio(resp, data):
+        erro = f"bloqueio por excesso de requisições após {r['tentativa']} tentativas"
+    else:
+        erro = str(retorno.get('erros') or retorno.get('codigo_erro') or f"HTTP {resp.status_code}")
+    logger.error(f'Tiny {operacao}: página {params.get("pagina")} não lida: {erro}')
+    return {'error': erro, 'retorno': {chave: []}}
+
 
 def listar_produtos(page=1, pesquisa=""):
     """Lista produtos do Tiny ERP com error handling robusto
@@ -30,41 +309,58 @@ def listar_produtos(page=1, pesquisa=""):
         pesquisa: Nome ou código do produto (obrigatório na API, use "" para listar todos)
     
     Returns:
-        Dict com retorno.produtos ou error
+        Dict com retorno.produtos ou error (inclusive retorno.status 'Erro' e
+        bloqueios que persistiram após as retentativas)
     """
     if not config.TINY_API_TOKEN:
         logger.warning('TINY_API_TOKEN not configured')
         return {'error': 'Token não configurado', 'retorno': {'produtos': []}}
     
     params = {
-        "token": config.TINY_API_TOKEN, 
-        "formato": "json", 
         "pagina": page,
         "pesquisa": pesquisa  # Obrigatório na API Tiny
     }
     
-    try:
-        logger.debug(f'Tiny API: produtos página {page}')
-        r = requests.get(f"{BASE_URL}/produtos.pesquisa.php", params=params, timeout=30)
-        r.raise_for_status()
-        
-        data = r.json()
+    logger.debug(f'Tiny API: produtos página {page}')
+    data = _listagem("produtos.pesquisa.php", params, 'produtos', 'produtos.pesquisa')
+    if 'error' not in data:
         retorno = data.get('retorno', {})
-        produtos = retorno.get('produtos', [])
-        logger.info(f'Tiny API: {len(produtos)} produtos retornados (página {page}/{retorno.get("numero_paginas", 1)})')
-        return data
-    
-    except requests.exceptions.Timeout:
-        logger.error('Tiny API timeout')
-        return {'error': 'Timeout na requisição', 'retorno': {'produtos': []}}
-    except requests.exceptions.RequestException as e:
-        logger.error(f'Tiny API error: {e}', exc_info=True)
-        return {'error': str(e), 'retorno': {'produtos': []}}
-    except Exception as e:
-        logger.error(f'Unexpected error: {e}', exc_info=True)
-        return {'error': 'Erro inesperado', 'retorno': {'produtos': []}}
+        logger.info(f'Tiny API: {len(retorno.get("produtos") or [])} produtos retornados '
+                    f'(página {page}/{retorno.get("numero_paginas", 1)})')
+    return data
+
+def listar_produtos_alterados(desde, page=1):
+    """Lista produtos incluídos/alterados desde ``desde`` (lista.atualizacoes.produtos.php).
 
-def obter_produto_por_sku(sku: str):
+    Args:
+        desde: datetime ou string "dd/mm/yyyy HH:MM:SS".
+        page: Número da página.
+
+    Returns:
+        Dict com retorno.produtos (vazio quando nada mudou) ou error
+    """
+    if not config.TINY_API_TOKEN:
+        logger.warning('TINY_API_TOKEN not configured')
+        return {'error': 'Token não configurado', 'retorno': {'produtos': []}}
+
+    if hasattr(desde, 'strftime'):
+        desde = desde.strftime('%d/%m/%Y %H:%M:%S')
+    data = _listagem("lista.atualizacoes.produtos.php", {"dataAlteracao": desde, "pagina": page},
+                     'produtos', 'lista.atualizacoes.produtos')
+    if 'error' not in data:
+        retorno = data.get('retorno', {})
+        logger.info(f'Tiny API: {len(retorno.get("produtos") or [])} produtos alterados desde {desde} '
+                    f'(página {page}/{retorno.get("numero_paginas", 1)})')
+    return data
+
+def _produto_local(codigo: str, local_first: Optional[bool]) -> Optional[Dict[str, Any]]:
+    """Produto do espelho local (catalogo_tiny) quando o modo local está ativo."""
+    if not (TINY_LOCAL_FIRST if local_first is None else local_first) or not codigo:
+        return None
+    from .catalogo_tiny import buscar_local
+    return buscar_local(codigo=codigo)
+
+def obter_produto_por_sku(sku: str, local_first: Optional[bool] = None):
     """Obtém detalhes de um produto do Tiny ERP pelo SKU (código).
 
     Retorna dict com campos relevantes quando encontrado:
@@ -73,19 +369,20 @@ def obter_produto_por_sku(sku: str):
     - codigo
     - nome
     Caso não encontrado, retorna {'error': '...'}.
+    Com ``local_first`` (padrão: TINY_CATALOGO_LOCAL) responde do espelho
+    local quando o SKU está nele.
     """
+    local = _produto_local(sku, local_first)
+    if local:
+        return local
     if not config.TINY_API_TOKEN:
         logger.warning('TINY_API_TOKEN not configured')
         return {'error': 'Token não configurado'}
 
-    params = {
-        "token": config.TINY_API_TOKEN,
-        "formato": "json",
-        "pesquisa": sku,
-    }
+    params = {"pesquisa": sku}
 
     try:
-        r = requests.get(f"{BASE_URL}/produtos.pesquisa.php", params=params, timeout=30)
+        r = get_client().get("produtos.pesquisa.php", params=params)
         r.raise_for_status()
         data = r.json()
         produtos = (data.get('retorno') or {}).get('produtos') or []
@@ -104,23 +401,65 @@ def obter_produto_por_sku(sku: str):
         logger.error(f'Erro ao obter produto por SKU {sku}: {e}', exc_info=True)
         return {'error': str(e)}
 
-def obter_produto_detalhado(codigo: str) -> Dict[str, Any]:
+# Cache de produtos por SKU (sincronizações consultam as mesmas centenas de SKUs)
+SKU_CACHE_PREFIX = "tiny_sku:"
+SKU_CACHE_TTL = 6 * 3600
+SKU_CACHE_TTL_NAO_ENCONTRADO = 3600
+
+
+def obter_produtos_por_skus(skus) -> Dict[str, Dict[str, Any]]:
+    """Produtos por SKU em lote: uma leitura (MGET) no cache e API só para os que faltam.
+
+    Returns:
+        Dict sku -> resultado no formato de ``obter_produto_por_sku`` (sem 'raw').
+    """
+    skus = [s for s in dict.fromkeys(skus) if s]
+    em_cache = cache_get_many(SKU_CACHE_PREFIX + s for s in skus)
+    resultado = {s: em_cache[SKU_CACHE_PREFIX + s] for s in skus if SKU_CACHE_PREFIX + s in em_cache}
+
+    encontrados, nao_encontrados = {}, {}
+    for sku in skus:
+        if sku in resultado:
+            continue
+        produto = obter_produto_por_sku(sku)
+        produto.pop('raw', None)
+        resultado[sku] = produto
+        if 'error' not in produto:
+            encontrados[SKU_CACHE_PREFIX + sku] = produto
+        elif produto['error'] == 'Produto não encontrado':
+            # Negativo com TTL curto; erros de rede/token não são cacheados
+            nao_encontrados[SKU_CACHE_PREFIX + sku] = produto
+    cache_set_many(encontrados, expire=SKU_CACHE_TTL)
+    cache_set_many(nao_encontrados, expire=SKU_CACHE_TTL_NAO_ENCONTRADO)
+    logger.info(f'Tiny SKUs: {len(skus)} pedidos, {len(em_cache)} do cache, {len(skus) - len(em_cache)} da API')
+    return resultado
+
+
+def custos_por_sku(skus) -> Dict[str, float]:
+    """preco_custo por SKU (0.0 quando o produto não existe ou não tem custo)."""
+    return {
+        sku: (produto.get('preco_custo') or 0.0) if isinstance(produto, dict) else 0.0
+        for sku, produto in obter_produtos_por_skus(skus).items()
+    }
+
+
+def obter_produto_detalhado(codigo: str, local_first: Optional[bool] = None) -> Dict[str, Any]:
     """Obtém um produto detalhado pelo código (SKU) usando produtos.obter.
 
     Retorna dict com campos relevantes incluindo preco_custo se presentes.
+    No modo local (``local_first``) o 'raw' traz só os campos do espelho.
     """
+    local = _produto_local(codigo, local_first)
+    if local:
+        return local
     if not config.TINY_API_TOKEN:
         logger.warning('TINY_API_TOKEN not configured')
         return {'error': 'Token não configurado'}
 
-    params = {
-        "token": config.TINY_API_TOKEN,
-        "formato": "json",
-        "codigo": codigo,
-    }
+    params = {"codigo": codigo}
 
     try:
-        r = requests.get(f"{BASE_URL}/produtos.obter.php", params=params, timeout=30)
+        r = get_client().get("produtos.obter.php", params=params)
         r.raise_for_status()
         data = r.json()
         produto = (data.get('retorno') or {}).get('produto') or {}
@@ -137,7 +476,7 @@ def obter_produto_detalhado(codigo: str) -> Dict[str, Any]:
         logger.error(f'Erro ao obter produto detalhado {codigo}: {e}', exc_info=True)
         return {'error': str(e)}
 
-def obter_produto_por_sku_ou_nome(sku: str = "", descricao: str = ""):
+def obter_produto_por_sku_ou_nome(sku: str = "", descricao: str = "", local_first: Optional[bool] = None):
     """Obtém detalhes de um produto do Tiny ERP tentando primeiro pelo SKU (codigo)
     e, se não encontrar, tentando pelo nome/descrição.
 
@@ -149,7 +488,19 @@ def obter_produto_por_sku_ou_nome(sku: str = "", descricao: str = ""):
        - Se múltiplos resultados, tenta match exato pelo campo 'codigo'.
     2) Se não encontrado, pesquisa por 'descricao' (nome parcial).
        - Se múltiplos resultados, tenta o primeiro cujo 'nome' contenha a descrição (case-insensitive).
+    Com ``local_first`` o espelho local é consultado antes (SKU exato ou nome
+    com nota >= NOME_LIMIAR no índice de trigramas do catálogo inteiro); a API
+    só é chamada se ele não tiver o produto.
     """
+    if TINY_LOCAL_FIRST if local_first is None else local_first:
+        from .catalogo_tiny import buscar_local, buscar_por_nome
+        local = buscar_local(codigo=sku) if sku else None
+        if not local and descricao:
+            candidatos = buscar_por_nome(descricao, k=1, minimo=NOME_LIMIAR)
+            local = candidatos[0] if candidatos else None
+        if local:
+            return local
+
     if not config.TINY_API_TOKEN:
         logger.warning('TINY_API_TOKEN not configured')
         return {'error': 'Token não configurado'}
@@ -167,8 +518,7 @@ def obter_produto_por_sku_ou_nome(sku: str = "", descricao: str = ""):
     # 1) Tentar por SKU
     if sku:
         try:
-            params = {"token": config.TINY_API_TOKEN, "formato": "json", "pesquisa": sku}
-            r = requests.get(f"{BASE_URL}/produtos.pesquisa.php", params=params, timeout=30)
+            r = get_client().get("produtos.pesquisa.php", params={"pesquisa": sku})
             r.raise_for_status()
             data = r.json()
             produtos = (data.get('retorno') or {}).get('produtos') or []
@@ -186,27 +536,22 @@ def obter_produto_por_sku_ou_nome(sku: str = "", descricao: str = ""):
     # 2) Tentar por descrição/nome
     if descricao:
         try:
-            params = {"token": config.TINY_API_TOKEN, "formato": "json", "pesquisa": descricao}
-            r = requests.get(f"{BASE_URL}/produtos.pesquisa.php", params=params, timeout=30)
+            r = get_client().get("produtos.pesquisa.php", params={"pesquisa": descricao})
             r.raise_for_status()
             data = r.json()
             produtos = (data.get('retorno') or {}).get('produtos') or []
-            # Fuzzy match com normalização de texto
+            # Fuzzy match por trigramas (indice_nomes) sobre os resultados da pesquisa
             if produtos:
-                from difflib import SequenceMatcher
-                desc_norm = _normalize_text(str(descricao))
                 melhor = None
                 melhor_score = 0.0
                 for p in produtos:
                     prod_info = p.get('produto') or {}
-                    nome = str(prod_info.get('nome') or '')
-                    nome_norm = _normalize_text(nome)
-                    score = SequenceMatcher(None, desc_norm, nome_norm).ratio()
+                    score = similaridade(str(descricao), str(prod_info.get('nome') or ''))
                     if score > melhor_score:
                         melhor_score = score
                         melhor = prod_info
                 # Threshold conservador
-                if melhor and melhor_score >= 0.6:
+                if melhor and melhor_score >= NOME_LIMIAR:
                     return _from_prod_info(melhor)
                 # Fallback: primeiro resultado
                 return _from_prod_info(produtos[0].get('produto') or {})
@@ -242,90 +587,42 @@ def atualizar_preco_custo(codigo: str, preco_custo: Any, max_retries: int = 3, b
     Retorna dict com chaves: ok, status_code, data, text, tentativa, waited, x_limit_api, x_remaining_api
     """
     import json as _json
-    url = f"{BASE_URL}/produto.alterar.php"
-    params = {"token": TOKEN, "formato": "json"}
     produto_payload = {
         "codigo": str(codigo).strip(),
         # Tiny aceita preco_custo no alterar produto
         "preco_custo": _format_preco_custo(preco_custo),
     }
 
-    tentativa = 0
-    waited = 0.0
-    result = None
-    while tentativa < max_retries:
-        tentativa += 1
-        try:
-            # Tiny espera 'produto' como campo de formulário contendo JSON em string
-            resp = requests.post(
-                url,
-                params=params,
-                data={"produto": _json.dumps(produto_payload)},
-                timeout=20
-            )
-            # Captura limites se presentes
-            x_limit_api = resp.headers.get("x-limit-api")
-            x_remaining_api = resp.headers.get("x-remaining-api")
-
-            try:
-                data = resp.json()
-            except Exception:
-                data = {"erro": True, "mensagem": resp.text}
-
-            status = (data.get("status") or data.get("retorno", {}).get("status") or "").upper()
-            erros = data.get("erro") or data.get("retorno", {}).get("erros")
-
-            ok = bool(status == "OK" and not erros)
-            result = {
-                "ok": ok,
-                "status_code": resp.status_code,
-                "data": data,
-                "text": resp.text[:2000],
-                "tentativa": tentativa,
-                "waited": waited,
-                "x_limit_api": x_limit_api,
-                "x_remaining_api": x_remaining_api,
-            }
-
-            # Logging detalhado para auditoria
-            retorno = data.get("retorno", {}) if isinstance(data, dict) else {}
-            status_proc = retorno.get("status_processamento")
-            status_txt = retorno.get("status") or data.get("status")
-            codigo_erro = retorno.get("codigo_erro")
-            if ok:
-                logger.info(f"Tiny produto.alterar OK codigo={codigo} preco_custo={produto_payload['preco_custo']} status_proc={status_proc} x-limit={x_limit_api} x-remain={x_remaining_api}")
-            else:
-                logger.warning(f"Tiny produto.alterar Falha codigo={codigo} status={status_txt} cod_erro={codigo_erro} http={resp.status_code} x-limit={x_limit_api} x-remain={x_remaining_api} resp={str(data)[:500]}")
-
-            if ok:
-                return result
-
-            # Heurística de rate limit: HTTP 429, mensagens, ou codigo_erro=6
-            msg = str(data)
-            codigo_erro = data.get("retorno", {}).get("codigo_erro")
-            is_rate = (
-                resp.status_code == 429
-                or ("limite" in msg.lower() or "rate" in msg.lower() or "muitas" in msg.lower())
-                or (codigo_erro in (6, "6"))
-            )
-            sleep_s = base_sleep * (2 ** (tentativa - 1)) if is_rate else base_sleep
-            time.sleep(sleep_s)
-            waited += sleep_s
-        except requests.RequestException as e:
-            logging.exception("Erro de rede ao atualizar preco_custo no Tiny: %s", e)
-            time.sleep(base_sleep)
-            waited += base_sleep
-
-    # Última resposta falhou
+    def interpretar(resp):
+        data = TinyClient.decode(resp)
+        status = (data.get("status") or data.get("retorno", {}).get("status") or "").upper()
+        erros = data.get("erro") or data.get("retorno", {}).get("erros")
+        ok = bool(status == "OK" and not erros)
+
+        # Logging detalhado para auditoria
+        x_limit_api, x_remaining_api = TinyClient.limites(resp)
+        retorno = data.get("retorno", {})
+        if ok:
+            logger.info(f"Tiny produto.alterar OK codigo={codigo} preco_custo={produto_payload['preco_custo']} status_proc={retorno.get('status_processamento')} x-limit={x_limit_api} x-remain={x_remaining_api}")
+        else:
+            logger.warning(f"Tiny produto.alterar Falha codigo={codigo} status={retorno.get('status') or data.get('status')} cod_erro={retorno.get('codigo_erro')} http={resp.status_code} x-limit={x_limit_api} x-remain={x_remaining_api} resp={str(data)[:500]}")
+        return ok, data
+
+    # Tiny espera 'produto' como campo de formulário contendo JSON em string
+    r = _com_retentativas("post", "produto.alterar.php", interpretar, "produto.alterar",
+                          max_retries, base_sleep,
+                          data={"produto": _json.dumps(produto_payload)}, timeout=20)
+    resp = r["resp"]
+    x_limit_api, x_remaining_api = TinyClient.limites(resp) if resp is not None else (None, None)
     return {
-        "ok": False,
-        "status_code": result.get("status_code") if result else None,
-        "data": result.get("data") if result else None,
-        "text": result.get("text") if result else None,
-        "tentativa": tentativa,
-        "waited": waited,
-        "x_limit_api": (result or {}).get("x_limit_api"),
-        "x_remaining_api": (result or {}).get("x_remaining_api"),
+        "ok": r["ok"],
+        "status_code": resp.status_code if resp is not None else None,
+        "data": r["data"],
+        "text": resp.text[:2000] if resp is not None else r["erro"],
+        "tentativa": r["tentativa"],
+        "waited": r["waited"],
+        "x_limit_api": x_limit_api,
+        "x_remaining_api": x_remaining_api,
     }
 
 def informar_custo(id_produto: str, custo: Any, quantidade: float = 0.0001, max_retries: int = 3, base_sleep: float = 1.0) -> Dict[str, Any]:
@@ -343,9 +640,8 @@ def informar_custo(id_produto: str, custo: Any, quantidade: float = 0.0001, max_
     Returns:
         Dict com chaves: ok, status_code, data, tentativa, waited, x_limit_api, x_remaining_api
     """
-    url = f"{BASE_URL}/produto.atualizar.estoque.php"
-    params = {"token": TOKEN, "formato": "XML"}
-    
+    import xml.etree.ElementTree as ET
+
     # Formata valores - garante quantidade mínima > 0
     custo_fmt = _format_preco_custo(custo)
     qtd_real = max(float(quantidade), 0.0001)  # Força mínimo de 0.0001
@@ -360,112 +656,66 @@ def informar_custo(id_produto: str, custo: Any, quantidade: float = 0.0001, max_
     <operacao>B</operacao>
 </estoque>"""
 
-    tentativa = 0
-    waited = 0.0
-    result = None
-    
     # Log do payload para debug
     logger.info(f"informar_custo: idProduto={id_produto}, quantidade={qtd_fmt}, custo={custo_fmt}")
-    
-    while tentativa < max_retries:
-        tentativa += 1
-        _rate_limit_sleep()
-        
-        try:
-            resp = requests.post(
-                url,
-                params=params,
-                data={"estoque": estoque_xml},  # Envia XML no campo 'estoque'
-                timeout=30
-            )
-            
-            x_limit_api = resp.headers.get("x-limit-api")
-            x_remaining_api = resp.headers.get("x-remaining-api")
-
-            # Resposta é XML, não JSON
-            import xml.etree.ElementTree as ET
-            try:
-                root = ET.fromstring(resp.text)
-                status_elem = root.find('.//status')
-                status = status_elem.text.upper() if status_elem is not None else ""
-                
-                # Verifica se há erros
-                erros_elem = root.find('.//erros')
-                has_errors = erros_elem is not None and len(erros_elem) > 0
-                
-                data = {
-                    "status": status,
-                    "xml_response": resp.text,
-                    "parsed": True
-                }
-            except Exception as parse_err:
-                logger.warning(f"Erro ao parsear XML: {parse_err}")
-                data = {"erro": True, "mensagem": resp.text}
-                status = ""
-                has_errors = True
-
-            ok = bool(status == "OK" and not has_errors)
-            result = {
-                "ok": ok,
-                "status_code": resp.status_code,
-                "data": data,
-                "tentativa": tentativa,
-                "waited": waited,
-                "x_limit_api": x_limit_api,
-                "x_remaining_api": x_remaining_api,
-            }
 
-            status_txt = data.get("status", "")
+    def interpretar(resp):
+        # Resposta é XML, não JSON
+        try:
+            root = ET.fromstring(resp.text)
+            status_elem = root.find('.//status')
+            status = status_elem.text.upper() if status_elem is not None else ""
             
-            if ok:
-                logger.info(f"✓ Custo informado: idProduto={id_produto}, custo={custo_fmt}, quantidade={qtd_fmt}")
-            else:
-                logger.warning(f"Tentativa {tentativa} falhou: status={status_txt}, http={resp.status_code}, resp={str(data)[:300]}")
-
-            if ok:
-                return result
-
-            # Heurística de rate limit (simplificada para XML)
-            msg = str(data)
-            is_rate = (
-                resp.status_code == 429
-                or ("limite" in msg.lower() or "rate" in msg.lower() or "muitas" in msg.lower())
-            )
+            # Verifica se há erros
+            erros_elem = root.find('.//erros')
+            has_errors = erros_elem is not None and len(erros_elem) > 0
             
-            # Se não é a última tentativa, aguarda
-            if tentativa < max_retries:
-                sleep_s = base_sleep * (2 ** (tentativa - 1)) if is_rate else base_sleep
-                time.sleep(sleep_s)
-                waited += sleep_s
-
-        except Exception as e:
-            logger.error(f"Erro na tentativa {tentativa}: {e}")
-            result = {
-                "ok": False,
-                "status_code": 0,
-                "data": str(e),
-                "tentativa": tentativa,
-                "waited": waited,
-                "x_limit_api": None,
-                "x_remaining_api": None
+            codigo_erro = root.findtext('.//codigo_erro')
+            data = {
+                "status": status,
+                "xml_response": resp.text,
+                "parsed": True,
+                "retorno": {"codigo_erro": codigo_erro} if codigo_erro else {},
             }
-            
-            # Se não é a última tentativa, aguarda
-            if tentativa < max_retries:
-                sleep_s = base_sleep * (2 ** (tentativa - 1))
-                time.sleep(sleep_s)
-                waited += sleep_s
-    
-    # Se chegou aqui, esgotou tentativas
-    logger.error(f"✗ Falha ao informar custo após {tentativa} tentativas: idProduto={id_produto}")
-    return result or {
-        "ok": False,
-        "status_code": 0,
-        "data": "Esgotadas todas as tentativas",
-        "tentativa": tentativa,
-        "waited": waited,
-        "x_limit_api": None,
-        "x_remaining_api": None
+        except Exception as parse_err:
+            logger.warning(f"Erro ao parsear XML: {parse_err}")
+            data = {"erro": True, "mensagem": resp.text}
+            status = ""
+            has_errors = True
+
+        ok = bool(status == "OK" and not has_errors)
+        if ok:
+            logger.info(f"✓ Custo informado: idProduto={id_produto}, custo={custo_fmt}, quantidade={qtd_fmt}")
+        else:
+            logger.warning(f"Falha ao informar custo: status={data.get('status', '')}, http={resp.status_code}, resp={str(data)[:300]}")
+        return ok, data
+
+    r = _com_retentativas("post", "produto.atualizar.estoque.php", interpretar, "produto.atualizar.estoque",
+                          max_retries, base_sleep,
+                          data={"estoque": estoque_xml},  # Envia XML no campo 'estoque'
+                          formato="XML", timeout=30)
+    resp = r["resp"]
+    if not r["ok"]:
+        logger.error(f"✗ Falha ao informar custo após {r['tentativa']} tentativas: idProduto={id_produto}")
+    if resp is None:
+        return {
+            "ok": False,
+            "status_code": 0,
+            "data": r["erro"] or "Esgotadas todas as tentativas",
+            "tentativa": r["tentativa"],
+            "waited": r["waited"],
+            "x_limit_api": None,
+            "x_remaining_api": None
+        }
+    x_limit_api, x_remaining_api = TinyClient.limites(resp)
+    return {
+        "ok": r["ok"],
+        "status_code": resp.status_code,
+        "data": r["data"],
+        "tentativa": r["tentativa"],
+        "waited": r["waited"],
+        "x_limit_api": x_limit_api,
+        "x_remaining_api": x_remaining_api,
     }
 
 
@@ -478,13 +728,14 @@ def listar_pedidos(page=1, data_inicial=None, data_final=None):
         data_final: Data final no formato dd/mm/yyyy
     
     Returns:
-        Dict com retorno.pedidos ou error
+        Dict com retorno.pedidos ou error (inclusive retorno.status 'Erro' e
+        bloqueios que persistiram após as retentativas)
     """
     if not config.TINY_API_TOKEN:
         logger.warning('TINY_API_TOKEN not configured')
         return {'error': 'Token não configurado', 'retorno': {'pedidos': []}}
     
-    params = {"token": config.TINY_API_TOKEN, "formato": "json", "pagina": page}
+    params = {"pagina": page}
     
     # Pelo menos um parâmetro de filtro é obrigatório na API Tiny
     if not data_inicial and not data_final:
@@ -500,20 +751,13 @@ def listar_pedidos(page=1, data_inicial=None, data_final=None):
     if data_final:
         params['dataFinal'] = data_final
     
-    try:
-        logger.debug(f'Tiny API: pedidos página {page} ({data_inicial} a {data_final})')
-        r = requests.get(f"{BASE_URL}/pedidos.pesquisa.php", params=params, timeout=30)
-        r.raise_for_status()
-        
-        data = r.json()
+    logger.debug(f'Tiny API: pedidos página {page} ({data_inicial} a {data_final})')
+    data = _listagem("pedidos.pesquisa.php", params, 'pedidos', 'pedidos.pesquisa')
+    if 'error' not in data:
         retorno = data.get('retorno', {})
-        pedidos = retorno.get('pedidos', [])
-        logger.info(f'Tiny API: {len(pedidos)} pedidos retornados (página {page}/{retorno.get("numero_paginas", 1)})')
-        return data
-    
-    except Exception as e:
-        logger.error(f'Erro ao listar pedidos: {e}', exc_info=True)
-        return {'error': str(e), 'retorno': {'pedidos': []}}
+        logger.info(f'Tiny API: {len(retorno.get("pedidos") or [])} pedidos retornados '
+                    f'(página {page}/{retorno.get("numero_paginas", 1)})')
+    return data
 
 def atualizar_precos_em_massa(precos: list, max_retries: int = 3, base_sleep: float = 1.0) -> Dict[str, Any]:
     """Atualiza preços usando produto.atualizar.precos (em massa).
@@ -521,54 +765,36 @@ def atualizar_precos_em_massa(precos: list, max_retries: int = 3, base_sleep: fl
     Argumento 'precos' deve seguir o layout da API v2 (cada item com identificação do produto e preços/listas).
     Útil para zerar preços atuais ao enviar preco=0 em listas específicas quando desejado.
     """
-    url = f"{BASE_URL}/produto.atualizar.precos.php"
-    params = {"token": TOKEN, "formato": "json"}
-    payload = {"precos": precos}
-    tentativa = 0
-    waited = 0.0
-    last = None
-    while tentativa < max_retries:
-        tentativa += 1
-        try:
-            resp = requests.post(url, params=params, json=payload, timeout=30)
-            x_limit_api = resp.headers.get("x-limit-api")
-            x_remaining_api = resp.headers.get("x-remaining-api")
-            try:
-                data = resp.json()
-            except Exception:
-                data = {"erro": True, "mensagem": resp.text}
-            retorno = data.get("retorno", {})
-            status_txt = (retorno.get("status") or data.get("status") or "").upper()
-            status_proc = retorno.get("status_processamento")
-            codigo_erro = retorno.get("codigo_erro")
-            registros = retorno.get("registros") or []
-            ok = status_txt in ("OK", "PARCIAL") and not codigo_erro
-            last = {
-                "ok": ok,
-                "status_code": resp.status_code,
-                "data": data,
-                "text": resp.text[:2000],
-                "tentativa": tentativa,
-                "waited": waited,
-                "x_limit_api": x_limit_api,
-                "x_remaining_api": x_remaining_api,
-                "registros": registros,
-            }
-            if ok:
-                logger.info(f"Tiny produto.atualizar.precos status={status_txt} proc={status_proc} x-limit={x_limit_api} x-remain={x_remaining_api}")
-                return last
-            else:
-                logger.warning(f"Tiny produto.atualizar.precos falha status={status_txt} cod_erro={codigo_erro} http={resp.status_code} resp={str(data)[:500]}")
-                msg = str(data)
-                is_rate = resp.status_code == 429 or (codigo_erro in (6, "6")) or ("muitos" in msg.lower())
-                sleep_s = base_sleep * (2 ** (tentativa - 1)) if is_rate else base_sleep
-                time.sleep(sleep_s)
-                waited += sleep_s
-        except requests.RequestException as e:
-            logger.exception("Erro de rede ao atualizar preços em massa: %s", e)
-            time.sleep(base_sleep)
-            waited += base_sleep
-    return last or {"ok": False, "tentativa": tentativa, "waited": waited}
+    def interpretar(resp):
+        data = TinyClient.decode(resp)
+        retorno = data.get("retorno", {})
+        status_txt = (retorno.get("status") or data.get("status") or "").upper()
+        codigo_erro = retorno.get("codigo_erro")
+        ok = status_txt in ("OK", "PARCIAL") and not codigo_erro
+        x_limit_api, x_remaining_api = TinyClient.limites(resp)
+        if ok:
+            logger.info(f"Tiny produto.atualizar.precos status={status_txt} proc={retorno.get('status_processamento')} x-limit={x_limit_api} x-remain={x_remaining_api}")
+        else:
+            logger.warning(f"Tiny produto.atualizar.precos falha status={status_txt} cod_erro={codigo_erro} http={resp.status_code} resp={str(data)[:500]}")
+        return ok, data
+
+    r = _com_retentativas("post", "produto.atualizar.precos.php", interpretar, "produto.atualizar.precos",
+                          max_retries, base_sleep, json={"precos": precos}, timeout=30)
+    resp = r["resp"]
+    if resp is None:
+        return {"ok": False, "tentativa": r["tentativa"], "waited": r["waited"]}
+    x_limit_api, x_remaining_api = TinyClient.limites(resp)
+    return {
+        "ok": r["ok"],
+        "status_code": resp.status_code,
+        "data": r["data"],
+        "text": resp.text[:2000],
+        "tentativa": r["tentativa"],
+        "waited": r["waited"],
+        "x_limit_api": x_limit_api,
+        "x_remaining_api": x_remaining_api,
+        "registros": r["data"].get("retorno", {}).get("registros") or [],
+    }
 
 def incluir_nota_xml(xml_str: str, lancar_estoque: bool = True, lancar_contas: bool = False, origem: str = "N", max_retries: int = 3, base_sleep: float = 1.0) -> Dict[str, Any]:
     """Inclui uma Nota Fiscal via XML no Tiny e opcionalmente lança estoque/contas.
@@ -581,68 +807,53 @@ def incluir_nota_xml(xml_str: str, lancar_estoque: bool = True, lancar_contas: b
 
     Retorna dict com ok, idNotaFiscal (se OK), dados de retorno e headers de limites.
     """
-    url = f"{BASE_URL}/incluir.nota.xml.php"
-    params = {"token": TOKEN, "formato": "json"}
     data = {
         "xml": xml_str,
         "lancarContas": "S" if lancar_contas else "N",
         "lancarEstoque": "S" if lancar_estoque else "N",
         "origemLancamentos": origem,
     }
-    tentativa = 0
-    waited = 0.0
-    last = None
-    while tentativa < max_retries:
-        tentativa += 1
-        try:
-            resp = requests.post(url, params=params, data=data, timeout=60)
-            x_limit_api = resp.headers.get("x-limit-api")
-            x_remaining_api = resp.headers.get("x-remaining-api")
-            try:
-                body = resp.json()
-            except Exception:
-                body = {"erro": True, "mensagem": resp.text}
-            retorno = body.get("retorno", {})
-            status_txt = (retorno.get("status") or body.get("status") or "").upper()
-            codigo_erro = retorno.get("codigo_erro")
-            id_nota = retorno.get("idNotaFiscal")
-            ok = status_txt == "OK" and not codigo_erro and bool(id_nota)
-            last = {
-                "ok": ok,
-                "status_code": resp.status_code,
-                "data": body,
-                "text": resp.text[:2000],
-                "tentativa": tentativa,
-                "waited": waited,
-                "x_limit_api": x_limit_api,
-                "x_remaining_api": x_remaining_api,
-                "idNotaFiscal": id_nota,
-            }
-            if ok:
-                logger.info(f"Tiny incluir.nota.xml OK idNotaFiscal={id_nota} x-limit={x_limit_api} x-remain={x_remaining_api}")
-                return last
-            else:
-                logger.warning(f"Tiny incluir.nota.xml falha status={status_txt} cod_erro={codigo_erro} http={resp.status_code} resp={str(body)[:500]}")
-                is_rate = resp.status_code == 429 or (codigo_erro in (6, "6"))
-                sleep_s = base_sleep * (2 ** (tentativa - 1)) if is_rate else base_sleep
-                time.sleep(sleep_s)
-                waited += sleep_s
-        except requests.RequestException as e:
-            logger.exception("Erro de rede ao incluir nota via XML: %s", e)
-            time.sleep(base_sleep)
-            waited += base_sleep
-    return last or {"ok": False, "tentativa": tentativa, "waited": waited}
+
+    def interpretar(resp):
+        body = TinyClient.decode(resp)
+        retorno = body.get("retorno", {})
+        status_txt = (retorno.get("status") or body.get("status") or "").upper()
+        codigo_erro = retorno.get("codigo_erro")
+        id_nota = retorno.get("idNotaFiscal")
+        ok = status_txt == "OK" and not codigo_erro and bool(id_nota)
+        x_limit_api, x_remaining_api = TinyClient.limites(resp)
+        if ok:
+            logger.info(f"Tiny incluir.nota.xml OK idNotaFiscal={id_nota} x-limit={x_limit_api} x-remain={x_remaining_api}")
+        else:
+            logger.warning(f"Tiny incluir.nota.xml falha status={status_txt} cod_erro={codigo_erro} http={resp.status_code} resp={str(body)[:500]}")
+        return ok, body
+
+    r = _com_retentativas("post", "incluir.nota.xml.php", interpretar, "incluir.nota.xml",
+                          max_retries, base_sleep, data=data, timeout=60)
+    resp = r["resp"]
+    if resp is None:
+        return {"ok": False, "tentativa": r["tentativa"], "waited": r["waited"]}
+    x_limit_api, x_remaining_api = TinyClient.limites(resp)
+    return {
+        "ok": r["ok"],
+        "status_code": resp.status_code,
+        "data": r["data"],
+        "text": resp.text[:2000],
+        "tentativa": r["tentativa"],
+        "waited": r["waited"],
+        "x_limit_api": x_limit_api,
+        "x_remaining_api": x_remaining_api,
+        "idNotaFiscal": r["data"].get("retorno", {}).get("idNotaFiscal"),
+    }
 
 def buscar_nota_por_chave(chave: str) -> Dict[str, Any]:
     """
     Busca uma nota fiscal no Tiny pela chave de acesso.
     Retorna o ID da nota se encontrada.
     """
-    url = f"{BASE_URL}/notas.fiscais.pesquisa.php"
-    params = {"token": TOKEN, "formato": "json", "chaveAcesso": chave}
     try:
-        resp = requests.post(url, params=params, timeout=60)
-        data = resp.json() if resp.status_code == 200 else {}
+        resp = get_client().post("notas.fiscais.pesquisa.php", params={"chaveAcesso": chave}, timeout=60)
+        data = TinyClient.decode(resp) if resp.status_code == 200 else {}
         retorno = data.get('retorno', {})
         if retorno.get('status') == 'OK':
             notas = retorno.get('notas_fiscais', [])
@@ -659,34 +870,15 @@ def nota_fiscal_lancar_estoque(id_nota: int, max_retries: int = 3, base_sleep: f
     Lança estoque para uma Nota Fiscal já existente no Tiny.
     Endpoint: nota.fiscal.lancar.estoque.php
     """
-    url = f"{get_base_url()}/nota.fiscal.lancar.estoque.php"
-    params = { 'token': get_token(), 'id': id_nota }
-    attempt = 0
-    last_error = None
-    headers = {}
-    while attempt <= max_retries:
-        try:
-            resp = requests.post(url, data=params, timeout=60)
-            headers = dict(resp.headers)
-            text = resp.text
-            status_code = resp.status_code
-            data = {}
-            try:
-                data = resp.json()
-            except Exception:
-                pass
-            if status_code == 200 and data.get('retorno', {}).get('status') == 'OK':
-                return { 'ok': True, 'status_code': status_code, 'text': text, 'data': data, 'headers': headers }
-            # Rate limit / bloqueios
-            codigo_erro = data.get('retorno', {}).get('codigo_erro')
-            if status_code == 429 or codigo_erro == 6:
-                sleep_time = base_sleep * (2 ** attempt)
-                time.sleep(sleep_time)
-                attempt += 1
-                continue
-            return { 'ok': False, 'status_code': status_code, 'text': text, 'data': data, 'headers': headers }
-        except Exception as e:
-            last_error = str(e)
-            time.sleep(base_sleep * (2 ** attempt))
-            attempt += 1
-    return { 'ok': False, 'status_code': None, 'text': last_error or '', 'data': {}, 'headers': headers }
+    def interpretar(resp):
+        data = TinyClient.decode(resp)
+        return resp.status_code == 200 and data.get('retorno', {}).get('status') == 'OK', data
+
+    # Este endpoint recebe token e id no corpo do formulário; só bloqueios e erros de rede repetem
+    r = _com_retentativas("post", "nota.fiscal.lancar.estoque.php", interpretar, "nota.fiscal.lancar.estoque",
+                          max_retries + 1, base_sleep, repetir_falhas=False,
+                          data={'id': id_nota}, timeout=60, token_no_corpo=True)
+    resp = r["resp"]
+    if resp is None:
+        return { 'ok': False, 'status_code': None, 'text': r["erro"] or '', 'data': {}, 'headers': {} }
+    return { 'ok': r["ok"], 'status_code': resp.status_code, 'text': resp.text, 'data': r["data"], 'headers': dict(resp.headers) }
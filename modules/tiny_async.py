@@ -0,0 +1,160 @@
+"""
+Cliente assíncrono (asyncio) do Tiny ERP com concorrência limitada.
+
+Lotes grandes (300 itens de uma NF-e, auditoria de 2.000 SKUs) esperavam
+cada requisição terminar antes de enviar a próxima: o tempo total era a soma
+das latências. ``AsyncTinyClient`` dispara as operações de ``tiny_api`` em
+paralelo, com no máximo TINY_ASYNC_CONCURRENCY requisições em andamento, e o
+lote termina no tempo que a cota permite.
+
+As chamadas rodam num pool de threads próprio sobre a mesma ``TinyClient``
+(sessão keep-alive, limitador adaptativo, cota entre processos, circuit
+breakers e retentativas das operações de escrita), então o paralelismo nunca
+passa do ritmo que o limitador libera. O semáforo é ligado ao limitador:
+durante uma pausa por bloqueio as tarefas esperam no event loop, sem ocupar
+threads.
+
+Para páginas Streamlit e scripts (código síncrono) use os wrappers:
+    resultados = em_paralelo('atualizar_preco_custo', [('SKU1', 10.5), ('SKU2', 3)])
+    produtos = obter_produtos_paralelo(['SKU1', 'SKU2'])
+
+Em código assíncrono:
+    async with AsyncTinyClient() as tiny:
+        r = await asyncio.gather(*(tiny.atualizar_preco_custo(c, v) for c, v in itens))
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from . import tiny_api
+
+logger = logging.getLogger('tiny_async')
+
+# Requisições ao Tiny em andamento ao mesmo tempo (acima do pool só esperariam conexão)
+TINY_ASYNC_CONCURRENCY = int(os.getenv('TINY_ASYNC_CONCURRENCY', str(tiny_api.TINY_POOL_SIZE)))
+
+
+class AsyncTinyClient:
+    """Operações do Tiny como corrotinas, com no máximo ``concorrencia`` em andamento.
+
+    Args:
+        concorrencia: Requisições simultâneas (padrão: TINY_ASYNC_CONCURRENCY).
+
+    As operações usam o ``TinyClient`` compartilhado (``tiny_api.get_client()``),
+    e é o limitador dele que as tarefas aguardam.
+    """
+
+    def __init__(self, concorrencia: int = TINY_ASYNC_CONCURRENCY):
+        self.concorrencia = max(1, concorrencia)
+        self._semaforo: Optional[asyncio.Semaphore] = None
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.concorrencia, thread_name_prefix='tiny-async')
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+
+    async def executar(self, operacao: Callable, *args, **kwargs):
+        """Roda ``operacao`` (função síncrona de ``tiny_api``) respeitando concorrência e limitador."""
+        if self._semaforo is None:
+            # Criado aqui: o semáforo pertence ao event loop em que o cliente é usado
+            self._semaforo = asyncio.Semaphore(self.concorrencia)
+        async with self._semaforo:
+            espera = tiny_api.get_client().limiter.espera_estimada()
+            if espera > 0:
+                await asyncio.sleep(espera)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, lambda: operacao(*args, **kwargs))
+
+    async def pesquisar_produto(self, sku: str, **kwargs) -> Dict[str, Any]:
+        """``tiny_api.obter_produto_por_sku`` (produtos.pesquisa.php)."""
+        return await self.executar(tiny_api.obter_produto_por_sku, sku, **kwargs)
+
+    async def obter_produto(self, codigo: str, **kwargs) -> Dict[str, Any]:
+        """``tiny_api.obter_produto_detalhado`` (produtos.obter.php)."""
+        return await self.executar(tiny_api.obter_produto_detalhado, codigo, **kwargs)
+
+    async def atualizar_preco_custo(self, codigo: str, preco_custo: Any, **kwargs) -> Dict[str, Any]:
+        """``tiny_api.atualizar_preco_custo`` (produto.alterar.php)."""
+        return await self.executar(tiny_api.atualizar_preco_custo, codigo, preco_custo, **kwargs)
+
+    async def informar_custo(self, id_produto: str, custo: Any, **kwargs) -> Dict[str, Any]:
+        """``tiny_api.informar_custo`` (produto.atualizar.estoque.php)."""
+        return await self.executar(tiny_api.informar_custo, id_produto, custo, **kwargs)
+
+    async def listar_pedidos(self, page: int = 1, data_inicial=None, data_final=None) -> Dict[str, Any]:
+        """``tiny_api.listar_pedidos`` (pedidos.pesquisa.php)."""
+        return await self.executar(tiny_api.listar_pedidos, page, data_inicial, data_final)
+
+    async def incluir_nota_xml(self, xml_str: str, **kwargs) -> Dict[str, Any]:
+        """``tiny_api.incluir_nota_xml`` (incluir.nota.xml.php)."""
+        return await self.executar(tiny_api.incluir_nota_xml, xml_str, **kwargs)
+
+
+def rodar(corrotina: Awaitable):
+    """Executa ``corrotina`` a partir de código síncrono.
+
+    Se a thread já tem um event loop rodando, executa num loop novo em outra thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(corrotina)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, corrotina).result()
+
+
+def em_paralelo(operacao: str, itens: Iterable, concorrencia: int = TINY_ASYNC_CONCURRENCY) -> List[Any]:
+    """Chama a operação ``operacao`` de ``AsyncTinyClient`` para cada item, em paralelo.
+
+    Args:
+        operacao: Nome do método (ex.: 'atualizar_preco_custo', 'pesquisar_produto').
+        itens: Argumentos de cada chamada: tupla (posicionais), dict (nomeados) ou valor único.
+        concorrencia: Requisições simultâneas.
+
+    Returns:
+        Resultados na ordem dos itens; uma exceção levantada fica no lugar do resultado.
+    """
+    itens = list(itens)
+    if not itens:
+        return []
+
+    async def _lote():
+        async with AsyncTinyClient(concorrencia) as tiny:
+            metodo = getattr(tiny, operacao)
+            chamadas = []
+            for item in itens:
+                if isinstance(item, dict):
+                    chamadas.append(metodo(**item))
+                elif isinstance(item, tuple):
+                    chamadas.append(metodo(*item))
+                else:
+                    chamadas.append(metodo(item))
+            return await asyncio.gather(*chamadas, return_exceptions=True)
+
+    resultados = rodar(_lote())
+    falhas = sum(isinstance(r, BaseException) for r in resultados)
+    if falhas:
+        logger.warning(f"Tiny {operacao}: {falhas}/{len(itens)} chamadas levantaram exceção")
+    return resultados
+
+
+def obter_produtos_paralelo(skus: Iterable[str], concorrencia: int = TINY_ASYNC_CONCURRENCY) -> Dict[str, Any]:
+    """Produtos por SKU (formato de ``obter_produto_por_sku``) buscados em paralelo."""
+    skus = [s for s in dict.fromkeys(skus) if s]
+    return dict(zip(skus, em_paralelo('pesquisar_produto', skus, concorrencia)))
+
+
+def atualizar_precos_custo_paralelo(custos: Dict[str, Any],
+                                    concorrencia: int = TINY_ASYNC_CONCURRENCY) -> Dict[str, Any]:
+    """``atualizar_preco_custo`` para cada SKU -> custo, em paralelo. Retorna SKU -> resultado."""
+    itens = list(custos.items())
+    return dict(zip((c for c, _ in itens), em_paralelo('atualizar_preco_custo', itens, concorrencia)))
@@ -1,7 +1,7 @@
 import streamlit as st
 import logging
 from modules.sync_apis import sync_shopee_pedidos, get_sync_stats
-from modules.database import get_all_contas
+from modules.database import list_contas
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -80,8 +80,7 @@ st.divider()
 
 # Últimos pedidos importados
 st.subheader("📝 Últimos 10 Pedidos Shopee")
-contas = get_all_contas()
-contas_shopee = [c for c in contas if 'Shopee' in c.get('categoria', '')]
+contas_shopee = list_contas({'categoria_contem': 'Shopee'}, limit=10)['items']
 
 if contas_shopee:
     import pandas as pd
@@ -92,7 +91,7 @@ if contas_shopee:
         'Data': c['vencimento'],
         'Status': c['status'],
         'Order SN': c['linha_digitavel']
-    } for c in contas_shopee[-10:][::-1]])  # Últimos 10, ordem reversa
+    } for c in contas_shopee])  # Mais recentes primeiro
     
     st.dataframe(df, use_container_width=True, hide_index=True)
 else:
@@ -42,13 +42,15 @@ def render_page():
         return
     
     # Tabs para diferentes visualizações
-    tab1, tab2, tab3 = st.tabs(["Performance de Funções", "Estatísticas de Cache", "Exportar Dados"])
+    tab1, tab2, tab_limites, tab3 = st.tabs(
+        ["Performance de Funções", "Estatísticas de Cache", "Limites de API", "Exportar Dados"]
+    )
     
     with tab1:
         st.subheader("Performance de Funções")
         
         # Filtrar apenas métricas de funções (não cache)
-        function_metrics = {k: v for k, v in metrics.items() if k != "cache" and v}
+        function_metrics = {k: v for k, v in metrics.items() if k not in ("cache", "rate_limits", "circuits") and v}
         
         if function_metrics:
             # Dataframe com métricas de funções
@@ -136,7 +138,22 @@ def render_page():
                     total,
                     delta=None
                 )
-            
+
+            # Proteções contra estouro e stale-while-revalidate
+            col5, col6, col7 = st.columns(3)
+            with col5:
+                st.metric("Falhas Coalescidas", cache_stats.get("coalesced", 0))
+            with col6:
+                st.metric("Valores Vencidos Servidos", cache_stats.get("stale", 0))
+            with col7:
+                refresh = metrics.get("cache_refresh") or {}
+                st.metric(
+                    "Atualização em 2º Plano (média)",
+                    f"{refresh.get('avg_duration', 0):.2f}s",
+                    delta=f"{cache_stats.get('refresh_errors', 0)} falhas" if cache_stats.get("refresh_errors") else None,
+                    delta_color="inverse"
+                )
+
             # Gráfico de hits vs misses
             fig = go.Figure(data=[
                 go.Bar(
@@ -150,6 +167,90 @@ def render_page():
         else:
             st.info("ℹ️ Nenhuma estatística de cache disponível.")
     
+    with tab_limites:
+        st.subheader("Limites de API")
+        
+        rate_limits = metrics.get("rate_limits", {})
+        
+        if rate_limits:
+            for nome, estado in rate_limits.items():
+                st.markdown(f"**{nome}**")
+                if "processos" in estado:
+                    # Cota dividida entre processos (app, scripts, workers)
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        st.metric(
+                            "Usadas na Janela",
+                            f"{estado.get('usadas_na_janela', 0)}/{estado.get('cota_por_janela', 0)}"
+                        )
+                    with col2:
+                        st.metric(
+                            "Processos Ativos",
+                            estado.get("processos", 1),
+                            delta=f"parte: {estado.get('parte_do_processo', 0)}",
+                            delta_color="off"
+                        )
+                    with col3:
+                        st.metric(
+                            "Espera pela Cota",
+                            f"{estado.get('espera_total_s', 0):.1f}s",
+                            delta=f"{estado.get('esperas', 0)} esperas",
+                            delta_color="off"
+                        )
+                    continue
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.metric(
+                        "Taxa Atual (req/min)",
+                        estado.get("taxa_por_min") or "sem limite",
+                        delta=f"teto {estado['teto_por_min']}" if estado.get("teto_por_min") else None,
+                        delta_color="off"
+                    )
+                with col2:
+                    st.metric(
+                        "Cota Restante",
+                        estado.get("restantes_api") if estado.get("restantes_api") is not None else "-",
+                        delta=f"de {estado['limite_api']}/min" if estado.get("limite_api") else None,
+                        delta_color="off"
+                    )
+                with col3:
+                    st.metric("Bloqueios (429 / código 6)", estado.get("bloqueios", 0))
+                with col4:
+                    st.metric(
+                        "Tempo Aguardando",
+                        f"{estado.get('espera_total_s', 0):.1f}s",
+                        delta=f"{estado.get('permissoes', 0)} requisições",
+                        delta_color="off"
+                    )
+                if estado.get("pausa_restante_s"):
+                    st.warning(f"⏸️ Pausado por mais {estado['pausa_restante_s']:.0f}s após bloqueio da API")
+        else:
+            st.info("ℹ️ Nenhuma chamada a APIs externas registrada ainda.")
+        
+        st.markdown("---")
+        st.subheader("Circuit Breakers")
+        circuits = metrics.get("circuits", {})
+        
+        if circuits:
+            rotulos = {"closed": "🟢 Fechado", "half_open": "🟡 Meio aberto", "open": "🔴 Aberto"}
+            abertos = [nome for nome, estado in circuits.items() if estado.get("estado") == "open"]
+            if abertos:
+                st.error(f"❌ Endpoints fora do ar (chamadas recusadas na hora): {', '.join(abertos)}")
+            df_circuitos = pd.DataFrame([
+                {
+                    "Endpoint": nome,
+                    "Estado": rotulos.get(estado.get("estado"), estado.get("estado")),
+                    "Falhas Seguidas": estado.get("falhas_seguidas", 0),
+                    "Aberturas": estado.get("aberturas", 0),
+                    "Chamadas Recusadas": estado.get("recusadas", 0),
+                    "Nova Sonda em (s)": estado.get("reabre_em_s", 0),
+                }
+                for nome, estado in sorted(circuits.items())
+            ])
+            st.dataframe(df_circuitos, use_container_width=True)
+        else:
+            st.info("ℹ️ Nenhum circuito mudou de estado (todas as APIs respondendo).")
+    
     with tab3:
         st.subheader("Exportar Dados de Métricas")
         
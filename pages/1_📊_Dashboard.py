@@ -7,13 +7,23 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta, date
-from modules.database import get_db, ContaPagar
+from modules.database import ContaPagar, init_database, list_categorias, count_contas
 from modules.analytics import kpis_global, categorias_sum, top_fornecedores, monthly_series, shopee_stats, cogs_fill_rate
 from modules.cache import clear_cache, invalidate_cache
+from modules.snapshot import get_read_db, iniciar_agendador
 from sqlalchemy import func
 
 st.set_page_config(page_title="Dashboard", page_icon="📊", layout="wide")
 
+@st.cache_resource
+def _preparar_banco():
+    # Uma vez por processo: tabelas, índices, resumo mensal e índice FTS5
+    init_database()
+    # Snapshots de leitura (SNAPSHOT_READS=1; ver modules/snapshot.py)
+    iniciar_agendador()
+
+_preparar_banco()
+
 st.title("📊 Dashboard - Visão Geral")
 st.caption("Visão consolidada com receita vs despesas, tendências e destaques")
 
@@ -49,9 +59,9 @@ with st.sidebar:
             data_fim = st.date_input("Até", value=hoje)
     
     # Filtro de categoria
-    db = get_db()
-    categorias_disponiveis = db.query(ContaPagar.categoria).distinct().all()
-    categorias_list = ["Todas"] + sorted([c[0] for c in categorias_disponiveis if c[0]])
+    # Leitura pesada: snapshot recente quando SNAPSHOT_READS=1
+    db = get_read_db()
+    categorias_list = ["Todas"] + list_categorias(db)
     categoria_filtro = st.selectbox("Categoria", categorias_list)
     
     # Filtro de status
@@ -69,7 +79,7 @@ kpis = kpis_global(db, data_inicio=data_inicio, data_fim=data_fim)
 col1, col2, col3, col4 = st.columns(4)
 
 # Total de contas (sem filtro de período para total geral)
-total_contas = db.query(func.count(ContaPagar.id)).scalar() or 0
+total_contas = count_contas(db=db)['total']
 
 # Contas pendentes
 contas_pendentes = kpis['pendentes']
@@ -5,14 +5,26 @@ Gestão de Contas a Pagar
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-from modules.database import get_db, ContaPagar, get_regra, add_or_update_regra, RegraM11
+from modules.database import (
+    get_db, ContaPagar, get_regra, add_or_update_regra, RegraM11, list_contas, count_contas, init_database
+)
 from modules.export_utils import export_to_excel, get_export_filename
 from modules.validation import normalize_cnpj, detect_duplicate_conta
+from modules.snapshot import get_read_db
 
 st.set_page_config(page_title="Contas a Pagar", page_icon="💳", layout="wide")
 
+@st.cache_resource
+def _preparar_banco():
+    # Uma vez por processo: tabelas, índices, resumo mensal e índice FTS5
+    init_database()
+
+_preparar_banco()
+
 st.title("💳 Contas a Pagar")
 
+CONTAS_POR_PAGINA = 50
+
 # Tabs
 tab1, tab2 = st.tabs(["📋 Lista de Contas", "➕ Nova Conta"])
 
@@ -41,35 +53,32 @@ with tab1:
     with col3:
         filtro_categoria = st.text_input("Buscar categoria/fornecedor")
     
-    # Buscar contas
-    db = get_db()
-    query = db.query(ContaPagar)
+    # Buscar contas (apenas a página visível; paginação por keyset)
+    filtros = {
+        'mes': int(filtro_mes.split(" ")[0]) if filtro_mes != "Todos" else None,
+        'status': filtro_status if filtro_status != "Todos" else None,
+        'busca': filtro_categoria or None,
+    }
+    # Filtros mudaram: volta para a primeira página
+    if st.session_state.get('contas_filtros') != filtros:
+        st.session_state['contas_filtros'] = filtros
+        st.session_state['contas_cursores'] = [None]
+    cursores = st.session_state['contas_cursores']
     
-    if filtro_mes != "Todos":
-        mes_num = int(filtro_mes.split(" ")[0])
-        query = query.filter(ContaPagar.mes == mes_num)
-    
-    if filtro_status != "Todos":
-        query = query.filter(ContaPagar.status == filtro_status)
-    
-    if filtro_categoria:
-        query = query.filter(
-            (ContaPagar.categoria.like(f"%{filtro_categoria}%")) |
-            (ContaPagar.fornecedor.like(f"%{filtro_categoria}%"))
-        )
-    
-    contas = query.order_by(ContaPagar.vencimento.desc()).all()
+    pagina = list_contas(filtros, after=cursores[-1], limit=CONTAS_POR_PAGINA)
+    totais = count_contas(filtros)
+    contas = pagina['items']
     
     if contas:
         df = pd.DataFrame([{
-            'ID': c.id,
-            'Mês': f"M{c.mes}",
-            'Vencimento': c.vencimento.strftime('%d/%m/%Y'),
-            'Fornecedor': c.fornecedor,
-            'CNPJ': c.cnpj or '-',
-            'Categoria': c.categoria or '-',
-            'Valor': c.valor,
-            'Status': c.status
+            'ID': c['id'],
+            'Mês': f"M{c['mes']}",
+            'Vencimento': datetime.strptime(c['vencimento'], '%Y-%m-%d').strftime('%d/%m/%Y'),
+            'Fornecedor': c['fornecedor'],
+            'CNPJ': c['cnpj'] or '-',
+            'Categoria': c['categoria'] or '-',
+            'Valor': c['valor'],
+            'Status': c['status']
         } for c in contas])
         
         # Formatar valor como moeda
@@ -77,17 +86,31 @@ with tab1:
         
         st.dataframe(df, use_container_width=True, hide_index=True)
         
+        # Navegação entre páginas
+        num_paginas = max(1, -(-totais['total'] // CONTAS_POR_PAGINA))
+        nav1, nav2, nav3 = st.columns([1, 2, 1])
+        with nav1:
+            if st.button("⬅️ Anterior", disabled=len(cursores) == 1, use_container_width=True):
+                cursores.pop()
+                st.rerun()
+        with nav2:
+            st.caption(f"Página {len(cursores)} de {num_paginas}")
+        with nav3:
+            if st.button("Próxima ➡️", disabled=pagina['next'] is None, use_container_width=True):
+                cursores.append(pagina['next'])
+                st.rerun()
+        
         # Estatísticas
         col1, col2, col3 = st.columns(3)
         with col1:
-            total = sum(c.valor for c in contas)
-            st.metric("💰 Valor Total", f"R$ {total:,.2f}")
+            st.metric("💰 Valor Total", f"R$ {totais['valor_total']:,.2f}")
         with col2:
-            st.metric("📊 Total de Contas", len(contas))
+            st.metric("📊 Total de Contas", totais['total'])
         with col3:
             # Export button
             if st.button("📥 Exportar para Excel", use_container_width=True):
-                db_export = get_db()
+                # Exportação completa lê do snapshot (se habilitado), sem disputar com a sync
+                db_export = get_read_db()
                 all_contas = db_export.query(ContaPagar).all()
                 all_regras = db_export.query(RegraM11).all()
                 db_export.close()
@@ -104,8 +127,6 @@ with tab1:
                 )
     else:
         st.info("Nenhuma conta encontrada com os filtros selecionados")
-    
-    db.close()
 
 # TAB 2: Nova conta
 with tab2:
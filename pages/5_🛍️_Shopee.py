@@ -1,7 +1,7 @@
 import streamlit as st
 from modules.shopee_api import listar_pedidos, listar_produtos
 from modules import config
-from modules.database import get_db, ContaPagar, init_database
+from modules.database import get_db, ContaPagar, init_database, contas_texto_filter
 import subprocess, sys, os, time, datetime
 
 st.title("🛍️ Shopee Integration")
@@ -131,8 +131,9 @@ with col_sync2:
         init_database()
         db = get_db()
         try:
-            total_contas = db.query(ContaPagar).filter(ContaPagar.descricao.like('%Pedido Shopee%')).count()
-            ultimos_30 = db.query(ContaPagar).filter(ContaPagar.descricao.like('%Pedido Shopee%'), ContaPagar.vencimento >= (datetime.date.today() - datetime.timedelta(days=30))).count()
+            pedido_shopee = contas_texto_filter(db, 'Pedido Shopee', colunas=('descricao',), frase=True)
+            total_contas = db.query(ContaPagar).filter(pedido_shopee).count()
+            ultimos_30 = db.query(ContaPagar).filter(pedido_shopee, ContaPagar.vencimento >= (datetime.date.today() - datetime.timedelta(days=30))).count()
             st.info(f"Total de pedidos Shopee no banco: {total_contas}\nÚltimos 30 dias: {ultimos_30}")
         finally:
             db.close()
@@ -3,7 +3,8 @@ Alert system for upcoming payments and overdue accounts
 """
 import streamlit as st
 from datetime import datetime, timedelta
-from modules.database import get_db, ContaPagar
+from modules.database import ContaPagar
+from modules.snapshot import get_read_db
 import logging
 
 logger = logging.getLogger('alerts')
@@ -11,7 +12,7 @@ logger = logging.getLogger('alerts')
 st.set_page_config(page_title="Alertas", page_icon="🔔", layout="wide")
 st.title("🔔 Alertas e Notificações")
 
-db = get_db()
+db = get_read_db()
 hoje = datetime.now().date()
 
 # Vencidas
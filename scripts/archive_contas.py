@@ -0,0 +1,46 @@
+"""
+Arquiva contas encerradas antigas em bancos SQLite anuais (data/archive/contas_<ano>.db).
+
+Mantém na tabela quente o ano corrente e os ``--horizonte`` anos anteriores;
+contas Pago/Cancelado mais antigas são movidas. KPIs e séries mensais não
+mudam (o resumo mensal cobre o histórico); relatórios antigos leem a view
+contas_pagar_historico via modules.archive.historico().
+
+Uso:
+    python scripts/archive_contas.py [--horizonte 2] [--dry-run] [--dir data/archive]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules.archive import ARCHIVE_DIR, ARCHIVE_HORIZON_YEARS, archive_contas
+from modules.database import init_database
+
+
+def run(horizonte: int = ARCHIVE_HORIZON_YEARS, dry_run: bool = False, base_dir: str = ARCHIVE_DIR):
+    print("=" * 60)
+    print(f"🗄️  ARQUIVAMENTO DE CONTAS ({'simulação' if dry_run else 'execução'})")
+    print("=" * 60)
+    init_database()
+    inicio = time.perf_counter()
+    stats = archive_contas(horizonte_anos=horizonte, base_dir=base_dir, dry_run=dry_run)
+    print(f"Corte: {stats['corte']} (mantidos {horizonte} anos + ano corrente)")
+    for ano, linhas in stats['anos'].items():
+        print(f"  ✓ {ano}: {linhas} contas {'elegíveis' if dry_run else 'arquivadas'}")
+    if not stats['anos']:
+        print("  Nenhuma conta encerrada antes do corte")
+    print(f"✅ Concluído em {time.perf_counter() - inicio:.2f}s")
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--horizonte', type=int, default=ARCHIVE_HORIZON_YEARS,
+                        help='anos completos mantidos além do corrente')
+    parser.add_argument('--dry-run', action='store_true', help='só conta as linhas elegíveis')
+    parser.add_argument('--dir', default=ARCHIVE_DIR, help='diretório dos arquivos anuais')
+    args = parser.parse_args()
+    run(args.horizonte, args.dry_run, args.dir)
@@ -0,0 +1,139 @@
+"""
+Benchmark do codec de cache: JSON (caminho antigo do cache_wrapper) vs cache_codec.
+
+Mede tempo de encode/decode e bytes gravados para um payload sintético no
+formato de pedidos Shopee, e o custo de gerar chaves (MD5 sobre json.dumps vs
+hash_key). O caminho JSON não aceita date/Decimal: o payload dele usa strings
+e floats, como o código antigo precisava fazer.
+
+Uso:
+    python scripts/benchmark_cache_codec.py [--pedidos 500] [--repeticoes 200]
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import sys
+import timeit
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules.cache_codec import (
+    CACHE_COMPRESS_MIN, MSGPACK_AVAILABLE, ZSTD_AVAILABLE, decode, encode, get_codec, hash_key
+)
+
+
+def payload_shopee(pedidos: int, tipado: bool) -> dict:
+    """Resposta no formato get_order_detail; ``tipado`` usa datetime/Decimal."""
+    random.seed(42)
+    inicio = datetime(2025, 1, 1)
+    lista = []
+    for i in range(pedidos):
+        criado = inicio + timedelta(minutes=random.randint(0, 500000))
+        itens = []
+        for j in range(random.randint(1, 4)):
+            preco = Decimal(random.randint(500, 50000)) / 100
+            itens.append({
+                'item_id': 10_000_000 + i * 10 + j,
+                'item_sku': f"SKU-{random.randint(1, 800):04d}",
+                'model_quantity_purchased': random.randint(1, 5),
+                'model_discounted_price': preco if tipado else float(preco),
+            })
+        total = sum(Decimal(str(it['model_discounted_price'])) * it['model_quantity_purchased'] for it in itens)
+        lista.append({
+            'order_sn': f"2501{i:010d}",
+            'order_status': random.choice(['COMPLETED', 'SHIPPED', 'READY_TO_SHIP', 'CANCELLED']),
+            'create_time': criado if tipado else criado.isoformat(),
+            'ship_by_date': criado.date() if tipado else criado.date().isoformat(),
+            'total_amount': total if tipado else float(total),
+            'buyer_username': f"comprador_{random.randint(1, 5000)}",
+            'item_list': itens,
+        })
+    return {'response': {'order_list': lista, 'more': False}, 'request_id': 'bench'}
+
+
+def _tempo(func, repeticoes: int) -> float:
+    """Milissegundos por chamada (melhor de 3)."""
+    return min(timeit.repeat(func, number=repeticoes, repeat=3)) / repeticoes * 1000
+
+
+def benchmark(pedidos: int, repeticoes: int) -> list:
+    texto = payload_shopee(pedidos, tipado=False)
+    tipado = payload_shopee(pedidos, tipado=True)
+
+    json_bytes = json.dumps(texto).encode()
+    resultados = [{
+        'caminho': 'json (antigo)',
+        'bytes': len(json_bytes),
+        'encode_ms': _tempo(lambda: json.dumps(texto).encode(), repeticoes),
+        'decode_ms': _tempo(lambda: json.loads(json_bytes), repeticoes),
+    }]
+    codecs = ['pickle'] + (['msgpack'] if MSGPACK_AVAILABLE else [])
+    for nome in codecs:
+        codec = get_codec(nome)
+        for rotulo, limite in (('', 10 ** 12), (' + compressão', CACHE_COMPRESS_MIN)):
+            dados = encode(tipado, codec, compress_min=limite)
+            assert decode(dados) == tipado
+            resultados.append({
+                'caminho': f"{nome}{rotulo}",
+                'bytes': len(dados),
+                'encode_ms': _tempo(lambda: encode(tipado, codec, compress_min=limite), repeticoes),
+                'decode_ms': _tempo(lambda: decode(dados), repeticoes),
+            })
+    return resultados
+
+
+def benchmark_chaves(repeticoes: int) -> dict:
+    args = ('orders', 123456)
+    kwargs = {'time_from': date(2025, 1, 1), 'time_to': date(2025, 1, 31), 'status': 'COMPLETED'}
+
+    def md5_json():
+        arg_string = json.dumps({
+            "args": [str(a) for a in args],
+            "kwargs": {k: str(v) for k, v in sorted(kwargs.items())}
+        }, sort_keys=True)
+        return hashlib.md5(arg_string.encode()).hexdigest()
+
+    n = repeticoes * 100
+    return {
+        'md5_json_us': _tempo(md5_json, n) * 1000,
+        'hash_key_us': _tempo(lambda: hash_key(*args, **kwargs), n) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON vs cache_codec")
+    parser.add_argument('--pedidos', type=int, default=500)
+    parser.add_argument('--repeticoes', type=int, default=200)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("📦 BENCHMARK - CODEC DE CACHE")
+    print("=" * 60)
+    print(f"Pedidos: {args.pedidos} | msgpack: {'sim' if MSGPACK_AVAILABLE else 'não'} | "
+          f"zstd: {'sim' if ZSTD_AVAILABLE else 'não (zlib)'}")
+    print()
+
+    resultados = benchmark(args.pedidos, args.repeticoes)
+    base = resultados[0]
+    print(f"{'Caminho':<26}{'Bytes':>10}{'Encode ms':>12}{'Decode ms':>12}")
+    for r in resultados:
+        print(f"{r['caminho']:<26}{r['bytes']:>10}{r['encode_ms']:>12.3f}{r['decode_ms']:>12.3f}")
+
+    melhor = min(resultados[1:], key=lambda r: r['encode_ms'] + r['decode_ms'])
+    print()
+    print(f"✅ Mais rápido: {melhor['caminho']} "
+          f"({(base['encode_ms'] + base['decode_ms']) / (melhor['encode_ms'] + melhor['decode_ms']):.1f}x o JSON, "
+          f"{melhor['bytes'] / base['bytes']:.0%} dos bytes)")
+
+    chaves = benchmark_chaves(args.repeticoes)
+    print(f"🔑 Chaves: md5(json) {chaves['md5_json_us']:.2f}µs | hash_key {chaves['hash_key_us']:.2f}µs")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark de concorrência SQLite - perfil production vs legacy.
+
+Executa leitores (agregações no estilo do dashboard) e escritores (inserts
+de contas, como as sincronizações) em paralelo sobre um arquivo temporário
+e compara vazão, latência de leitura e erros "database is locked" entre o
+perfil atual (WAL + PRAGMAs + writer único) e o ``create_engine`` padrão.
+
+Uso:
+    python scripts/benchmark_sqlite_profile.py [--seconds 5] [--readers 4] [--writers 4]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from modules.database import Base, ContaPagar
+from modules.db_engine import PROFILES, SerializedWriter, build_engine
+
+CATEGORIAS = ["Receita Shopee", "Despesa Venda - Frete Shopee", "Aluguel", "Energia", "Marketing"]
+
+
+def _nova_conta(i: int) -> ContaPagar:
+    venc = date.today() - timedelta(days=random.randint(0, 365))
+    return ContaPagar(
+        mes=venc.month,
+        vencimento=venc,
+        fornecedor=f"Fornecedor {i % 50}",
+        categoria=random.choice(CATEGORIAS),
+        descricao=f"Benchmark {i}",
+        valor=round(random.uniform(10, 5000), 2),
+        status=random.choice(["Pendente", "Pago"]),
+    )
+
+
+def run_profile(profile_name: str, seconds: float, readers: int, writers: int, seed_rows: int) -> dict:
+    """Roda o cenário concorrente para um perfil e retorna as estatísticas."""
+    profile = PROFILES[profile_name]
+    tmp_dir = tempfile.mkdtemp(prefix=f"bench_{profile_name}_")
+    url = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+    engine = build_engine(url, profile)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    writer = SerializedWriter(enabled=profile.serialize_writes, name=f"bench-writer-{profile_name}")
+
+    with Session() as s:
+        s.add_all(_nova_conta(i) for i in range(seed_rows))
+        s.commit()
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    stats = {"reads": 0, "writes": 0, "read_errors": 0, "write_errors": 0, "read_latencies": []}
+
+    def reader():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                with Session() as s:
+                    s.query(ContaPagar.categoria, func.sum(ContaPagar.valor)).group_by(ContaPagar.categoria).all()
+                    s.query(func.count(ContaPagar.id)).filter(ContaPagar.status == "Pendente").scalar()
+                elapsed = time.perf_counter() - start
+                with lock:
+                    stats["reads"] += 1
+                    stats["read_latencies"].append(elapsed)
+            except OperationalError:
+                with lock:
+                    stats["read_errors"] += 1
+
+    def _insert(i: int):
+        with Session() as s:
+            s.add(_nova_conta(i))
+            s.commit()
+
+    def writer_loop(worker: int):
+        i = 0
+        while not stop.is_set():
+            i += 1
+            try:
+                writer.run(_insert, worker * 1_000_000 + i)
+                with lock:
+                    stats["writes"] += 1
+            except OperationalError:
+                with lock:
+                    stats["write_errors"] += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer_loop, args=(w,)) for w in range(writers)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    writer.shutdown()
+    engine.dispose()
+
+    lat = sorted(stats.pop("read_latencies")) or [0.0]
+    stats.update({
+        "profile": profile_name,
+        "reads_per_s": stats["reads"] / seconds,
+        "writes_per_s": stats["writes"] / seconds,
+        "read_p50_ms": lat[len(lat) // 2] * 1000,
+        "read_p95_ms": lat[min(len(lat) - 1, int(len(lat) * 0.95))] * 1000,
+    })
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seed-rows", type=int, default=20_000)
+    args = parser.parse_args(argv)
+
+    print("=" * 78)
+    print(f"🏁 BENCHMARK SQLite: {args.readers} leitores x {args.writers} escritores, {args.seconds:.0f}s por perfil")
+    print("=" * 78)
+    results = [
+        run_profile(name, args.seconds, args.readers, args.writers, args.seed_rows)
+        for name in ("legacy", "production")
+    ]
+    header = f"{'perfil':<12}{'leituras/s':>12}{'escritas/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'erros L':>9}{'erros E':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['profile']:<12}{r['reads_per_s']:>12.1f}{r['writes_per_s']:>12.1f}"
+            f"{r['read_p50_ms']:>10.2f}{r['read_p95_ms']:>10.2f}{r['read_errors']:>9}{r['write_errors']:>9}"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    main()
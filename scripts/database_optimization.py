@@ -5,8 +5,11 @@ Cria índices e otimiza queries para melhor performance.
 
 import sqlite3
 import logging
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
 logger = logging.getLogger(__name__)
 
 
@@ -27,107 +30,33 @@ class DatabaseOptimization:
             self.db_path = db_url
     
     def create_indexes(self):
-        """Cria índices recomendados para melhor performance."""
-        
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        indexes = [
-            # Índices para tabela payables
-            (
-                "idx_payables_shop_status",
-                "CREATE INDEX IF NOT EXISTS idx_payables_shop_status ON payables(shop_id, status);"
-            ),
-            (
-                "idx_payables_due_date",
-                "CREATE INDEX IF NOT EXISTS idx_payables_due_date ON payables(due_date) WHERE status='pending';"
-            ),
-            (
-                "idx_payables_created",
-                "CREATE INDEX IF NOT EXISTS idx_payables_created ON payables(created_at DESC);"
-            ),
-            
-            # Índices para tabela orders
-            (
-                "idx_orders_shop_date",
-                "CREATE INDEX IF NOT EXISTS idx_orders_shop_date ON orders(shop_id, order_date DESC);"
-            ),
-            (
-                "idx_orders_status",
-                "CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);"
-            ),
-            
-            # Índices para tabela products
-            (
-                "idx_products_category",
-                "CREATE INDEX IF NOT EXISTS idx_products_category ON products(category);"
-            ),
-            (
-                "idx_products_status",
-                "CREATE INDEX IF NOT EXISTS idx_products_status ON products(status) WHERE status='active';"
-            ),
-            
-            # Índices para tabela syncs
-            (
-                "idx_syncs_api_date",
-                "CREATE INDEX IF NOT EXISTS idx_syncs_api_date ON syncs(api, last_sync DESC);"
-            ),
-        ]
-        
-        created_count = 0
-        for idx_name, query in indexes:
-            try:
-                cursor.execute(query)
-                logger.info(f"✅ Índice criado: {idx_name}")
-                created_count += 1
-            except sqlite3.Error as e:
-                logger.warning(f"⚠️  Erro ao criar índice {idx_name}: {e}")
-        
-        conn.commit()
-        conn.close()
-        
-        logger.info(f"📊 Total de índices criados: {created_count}")
-        return created_count
+        """Cria os índices de modules.database.INDEX_DDL (mesmos do init_database)."""
+        from sqlalchemy import create_engine
+        from modules.database import INDEX_DDL, ensure_indexes, migrate_contas_dedup_columns
+
+        bind = create_engine(f"sqlite:///{self.db_path}")
+        try:
+            # Bancos antigos ainda sem order_sn/dedup_hash
+            migrate_contas_dedup_columns(bind=bind)
+            ensure_indexes(bind)
+        finally:
+            bind.dispose()
+
+        logger.info(f"📊 Total de índices verificados: {len(INDEX_DDL)}")
+        return len(INDEX_DDL)
     
-    def analyze_query_plans(self):
-        """Analisa planos de execução de queries frequentes."""
-        
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        queries = [
-            ("Payables por Status", 
-             "SELECT status, COUNT(*) as count FROM payables GROUP BY status;"),
-            
-            ("Receita Total por Shop",
-             "SELECT shop_id, SUM(amount) as total FROM orders WHERE status='completed' GROUP BY shop_id;"),
-            
-            ("Produtos com Estoque Baixo",
-             "SELECT product_id, quantity FROM products WHERE quantity < 10 AND status='active';"),
-            
-            ("Últimos Pedidos",
-             "SELECT * FROM orders WHERE shop_id=? ORDER BY order_date DESC LIMIT 100;"),
-        ]
-        
+    def analyze_query_plans(self, linhas: int = 50000):
+        """Analisa os planos das consultas quentes numa massa sintética (modules/query_plans.py)."""
+        from modules.query_plans import format_report, run_advisor
+
+        relatorios = run_advisor(linhas=linhas)
         print("\n📈 ANÁLISE DE QUERY PLANS:\n")
-        for query_name, query in queries:
-            print(f"Query: {query_name}")
-            print(f"SQL: {query}")
-            
-            try:
-                cursor.execute(f"EXPLAIN QUERY PLAN {query}")
-                plan = cursor.fetchall()
-                for row in plan:
-                    print(f"  {row}")
-            except Exception as e:
-                print(f"  Erro: {e}")
-            
-            print()
-        
-        conn.close()
+        print(format_report(relatorios))
+        return relatorios
     
     def get_statistics(self):
         """Retorna estatísticas do banco de dados."""
+        from modules.database import Base
         
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
@@ -135,23 +64,18 @@ class DatabaseOptimization:
         # Tamanho do arquivo
         db_size = Path(self.db_path).stat().st_size / (1024 * 1024)  # MB
         
-        # Contagem de registros por tabela
-        tables = [
-            "payables", "orders", "products", "order_items", 
-            "syncs", "logs", "audit_logs"
-        ]
-        
         stats = {
             "file_size_mb": round(db_size, 2),
             "tables": {}
         }
         
-        for table in tables:
+        # Contagem de registros por tabela do modelo
+        for table in Base.metadata.tables:
             try:
                 cursor.execute(f"SELECT COUNT(*) FROM {table};")
                 count = cursor.fetchone()[0]
                 stats["tables"][table] = count
-            except:
+            except sqlite3.Error:
                 pass
         
         conn.close()
@@ -208,7 +132,7 @@ def run_database_optimization():
     optimizer.create_indexes()
     
     # 2. Analisar queries
-    print("\n2️⃣  Analisando planos de execução de queries...")
+    print("\n2️⃣  Analisando planos de execução de queries (massa sintética)...")
     optimizer.analyze_query_plans()
     
     # 3. Estatísticas
@@ -0,0 +1,44 @@
+"""
+Exporta snapshots Parquet (particionados por ano/mês) para análises pesadas.
+
+Grava contas_pagar, pedidos_shopee e produtos_tiny em PARQUET_DIR
+(padrão data/parquet). Meses encerrados já exportados e sem alteração no
+banco são pulados (os da janela PARQUET_JANELA_DIAS são sempre regravados)
+e partições de meses que ficaram sem linhas são removidas;
+use --force para regravar tudo. Com ANALYTICS_BACKEND=duckdb, o Dashboard lê
+categorias, top fornecedores e série mensal desses arquivos.
+
+Uso:
+    python scripts/export_parquet.py [--force] [--dir data/parquet]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules.database import init_database
+from modules.parquet_export import PARQUET_DIR, export_all
+
+
+def run(destino: str = PARQUET_DIR, force: bool = False):
+    init_database()
+    print("=" * 60)
+    print(f"📦 EXPORTAÇÃO PARQUET → {destino}")
+    print("=" * 60)
+    inicio = time.perf_counter()
+    resultados = export_all(destino=destino, force=force)
+    for r in resultados:
+        print(f"  ✓ {r['tabela']}: {len(r['escritas'])} partições escritas, "
+              f"{r['puladas']} puladas, {r['linhas']} linhas")
+    print(f"✅ Concluído em {time.perf_counter() - inicio:.2f}s")
+    return resultados
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Exporta snapshots Parquet particionados")
+    parser.add_argument('--dir', default=PARQUET_DIR, help="Diretório de destino")
+    parser.add_argument('--force', action='store_true', help="Regrava partições já exportadas")
+    args = parser.parse_args()
+    run(args.dir, args.force)
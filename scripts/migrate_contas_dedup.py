@@ -0,0 +1,30 @@
+"""
+Migração: colunas indexadas order_sn / dedup_hash em contas_pagar.
+
+Adiciona as colunas (se faltarem), cria os índices e preenche os valores
+a partir de observacoes ('SN:...', 'Pedido Shopee #...', 'HASH:...') em lotes.
+init_database() já executa a migração quando as colunas são criadas; este
+script força o backfill completo (ex.: após importar dados antigos).
+
+Uso:
+    python scripts/migrate_contas_dedup.py [batch_size]
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules.database import init_database, migrate_contas_dedup_columns
+
+
+def run(batch_size: int = 1000):
+    init_database()
+    stats = migrate_contas_dedup_columns(batch_size=batch_size, force=True)
+    print(f"Colunas adicionadas: {stats['colunas_adicionadas'] or 'nenhuma'}")
+    print(f"order_sn preenchidos: {stats['order_sn']}")
+    print(f"dedup_hash preenchidos: {stats['dedup_hash']}")
+    return stats
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
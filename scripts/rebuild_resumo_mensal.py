@@ -0,0 +1,31 @@
+"""
+Reconstrução do resumo mensal (contas_resumo_mensal).
+
+O resumo é mantido por triggers a cada INSERT/UPDATE/DELETE em contas_pagar.
+Use este script para recuperação: após restaurar um backup antigo, editar o
+banco com triggers desligadas ou suspeitar de divergência nos totais.
+Anos arquivados (scripts/archive_contas.py) também entram na soma.
+
+Uso:
+    python scripts/rebuild_resumo_mensal.py
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules.archive import rebuild_resumo_com_arquivo
+from modules.database import init_database
+
+
+def run():
+    init_database()
+    inicio = time.perf_counter()
+    linhas = rebuild_resumo_com_arquivo()
+    print(f"Resumo mensal reconstruído: {linhas} linhas em {time.perf_counter() - inicio:.2f}s")
+    return linhas
+
+
+if __name__ == '__main__':
+    run()
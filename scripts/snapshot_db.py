@@ -0,0 +1,38 @@
+"""
+Snapshot online do banco (API de backup do SQLite) com rotação.
+
+Pode rodar durante a sincronização: em WAL a cópia só mantém uma transação de
+leitura e não bloqueia os escritores. Retenção configurada por SNAPSHOT_KEEP_RECENT,
+SNAPSHOT_KEEP_DAILY e SNAPSHOT_KEEP_WEEKLY (ver modules/snapshot.py).
+
+Uso (ex.: cron a cada 5 minutos):
+    python scripts/snapshot_db.py [--dir data/snapshots] [--sem-rotacao]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules.snapshot import SNAPSHOT_DIR, rotate, take_snapshot
+
+
+def run(base_dir: str = SNAPSHOT_DIR, rotacionar: bool = True):
+    print("=" * 60)
+    print(f"📸 SNAPSHOT DO BANCO → {base_dir}")
+    print("=" * 60)
+    stats = take_snapshot(base_dir=base_dir)
+    print(f"  ✓ {stats['caminho'].name}: {stats['paginas']} páginas em {stats['passos']} passos "
+          f"({stats['segundos']}s)")
+    if rotacionar:
+        removidos = rotate(base_dir)
+        print(f"  ✓ Rotação: {len(removidos)} snapshot(s) removido(s)")
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Snapshot online do banco SQLite com rotação")
+    parser.add_argument('--dir', default=SNAPSHOT_DIR, help="Diretório dos snapshots")
+    parser.add_argument('--sem-rotacao', action='store_true', help="Não remove snapshots antigos")
+    args = parser.parse_args()
+    run(args.dir, not args.sem_rotacao)
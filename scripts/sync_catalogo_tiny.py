@@ -0,0 +1,44 @@
+"""
+Sincroniza o espelho local do catálogo Tiny (produtos_tiny).
+
+Na primeira execução (ou com --completo) percorre todas as páginas de
+produtos; nas seguintes busca só os produtos alterados desde a última
+sincronização. Com TINY_CATALOGO_LOCAL=1 as consultas de custo por SKU
+respondem do espelho. Agende a cada poucos minutos (cron/Task Scheduler).
+
+Uso:
+    python scripts/sync_catalogo_tiny.py [--completo | --incremental]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules.catalogo_tiny import sincronizar_catalogo
+from modules.database import init_database
+
+
+def run(completo=None):
+    init_database()
+    print("=" * 60)
+    print("🗂️  CATÁLOGO TINY → produtos_tiny")
+    print("=" * 60)
+    stats = sincronizar_catalogo(completo=completo)
+    print(f"  ✓ Modo: {stats['modo']}")
+    print(f"  ✓ {stats['produtos']} produtos gravados em {stats['paginas']} páginas")
+    print(f"  ✓ {stats['desativados']} produtos desativados")
+    for erro in stats['erros']:
+        print(f"  ⚠️ {erro}")
+    print(f"✅ Concluído em {stats['duracao_s']:.2f}s")
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sincroniza o espelho local do catálogo Tiny")
+    modo = parser.add_mutually_exclusive_group()
+    modo.add_argument('--completo', action='store_true', help="Percorre todas as páginas de produtos")
+    modo.add_argument('--incremental', action='store_true', help="Só produtos alterados desde a última sincronização")
+    args = parser.parse_args()
+    stats = run(True if args.completo else False if args.incremental else None)
+    sys.exit(1 if stats['erros'] else 0)
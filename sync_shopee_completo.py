@@ -13,9 +13,10 @@ from datetime import datetime, timedelta
 import time
 import sys
 import logging
-from modules.database import init_database, get_db, ContaPagar
+from collections import Counter
+from modules.database import init_database, get_db, ContaPagar, shopee_dedup_hash, add_contas_bulk
 from modules.shopee_api import listar_pedidos, obter_detalhe_pedido
-from modules.tiny_api import obter_produto_por_sku
+from modules.tiny_api import custos_por_sku
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('sync_shopee_completo')
@@ -29,17 +30,51 @@ def _parse_date(ts: int):
     except Exception:
         return datetime.now().date()
 
-def _import_order_completo(order_sn: str, db):
-    """Importa um pedido completo com receitas e despesas separadas."""
+def _detalhe_pedido(order_sn: str, db):
+    """Detalhe do pedido na Shopee; None se já importado, sem detalhes ou com erro."""
     try:
+        # Verificar se já foi importado (índice em order_sn) antes de gastar chamadas de API
+        dup = db.query(ContaPagar.id).filter(ContaPagar.order_sn == order_sn).first()
+        if dup:
+            logger.info(f"⏭️  Pedido {order_sn}: já importado")
+            return None
+
         # Buscar detalhes completos
         det = obter_detalhe_pedido(order_sn)
         order = det.get('order', {})
         
         if not order or 'error' in det:
             logger.warning(f"⚠️  Pedido {order_sn}: sem detalhes ou erro")
-            return 0
-        
+            return None
+        return order
+    except Exception as e:
+        logger.error(f"❌ Erro ao buscar pedido {order_sn}: {e}", exc_info=True)
+        return None
+
+def _skus_pedido(order: dict):
+    """SKUs dos itens do pedido (para buscar custos no Tiny)."""
+    return [
+        item.get('model_sku') or item.get('item_sku')
+        for item in order.get('item_list', [])
+        if item.get('model_sku') or item.get('item_sku')
+    ]
+
+def _import_order_completo(order_sn: str, db):
+    """Monta os registros de um pedido isolado (busca detalhe e custos)."""
+    order = _detalhe_pedido(order_sn, db)
+    if order is None:
+        return []
+    return _registros_pedido(order_sn, order, custos_por_sku(_skus_pedido(order)))
+
+def _registros_pedido(order_sn: str, order: dict, custos: dict):
+    """Monta os registros (receitas e despesas separadas) de um pedido completo.
+
+    ``custos`` traz o preco_custo do Tiny por SKU, resolvido em lote para a
+    página inteira (obter_produtos_por_skus: MGET no cache + API só nos que faltam).
+    Não grava nada: as linhas de todos os pedidos da página são inseridas juntas
+    com add_contas_bulk.
+    """
+    try:
         # Dados básicos
         create_time = order.get('create_time')
         buyer_username = order.get('buyer_username', '')
@@ -65,41 +100,38 @@ def _import_order_completo(order_sn: str, db):
             qtd = item.get('model_quantity_purchased', 1)
             preco = float(item.get('model_discounted_price', 0))
             items_descricao.append(f"{qtd}x {nome} (R${preco:.2f})")
-            # Obter SKU para buscar custo no Tiny
+            # Custo no Tiny pelo SKU (já resolvido para a página)
             sku = item.get('model_sku') or item.get('item_sku') or ''
             if sku:
-                tin = obter_produto_por_sku(sku)
-                preco_custo = tin.get('preco_custo', 0.0) if isinstance(tin, dict) else 0.0
+                preco_custo = custos.get(sku, 0.0)
                 if preco_custo and qtd:
                     custo_total_itens += float(preco_custo) * float(qtd)
         
         produtos_desc = " | ".join(items_descricao[:3])  # Máximo 3 itens
         
-        # Verificar se já foi importado
-        dup = db.query(ContaPagar).filter(
-            ContaPagar.observacoes.like(f"%SN:{order_sn}%")
-        ).first()
-        if dup:
-            logger.info(f"⏭️  Pedido {order_sn}: já importado")
-            return 0
-        
-        registros_criados = 0
+        registros = []
+
+        def _registro(**campos):
+            # Campos comuns + chaves de deduplicação indexadas (uma linha por pedido/categoria)
+            campos.update(
+                mes=vencimento.month,
+                vencimento=vencimento,
+                cnpj=None,
+                status=order_status,
+                order_sn=order_sn,
+                dedup_hash=shopee_dedup_hash(order_sn, campos['categoria']),
+            )
+            registros.append(campos)
         
         # 1. RECEITA - Valor total do pedido
         if total_amount > 0:
-            receita = ContaPagar(
-                mes=vencimento.month,
-                vencimento=vencimento,
+            _registro(
                 fornecedor=f"Shopee - {buyer_username}" if buyer_username else "Shopee",
-                cnpj=None,
                 categoria="Receita Shopee",
                 descricao=f"Pedido {order_sn} - {produtos_desc}",
                 valor=total_amount,
-                status=order_status,
                 observacoes=f"SN:{order_sn} | buyer:{buyer_username} | status:{order_status} | payment:{order.get('payment_method', 'N/A')}"
             )
-            db.add(receita)
-            registros_criados += 1
             logger.info(f"  💰 Receita: R$ {total_amount:.2f}")
         
         # 2. DESPESA - Taxa de Comissão Shopee
@@ -107,64 +139,43 @@ def _import_order_completo(order_sn: str, db):
         if invoice_total > 0 and invoice_products > 0:
             taxa_comissao = invoice_total - invoice_products
             if taxa_comissao > 0:
-                desp_comissao = ContaPagar(
-                    mes=vencimento.month,
-                    vencimento=vencimento,
+                _registro(
                     fornecedor="Shopee",
-                    cnpj=None,
                     categoria="Despesa Venda - Taxa Comissão Shopee",
                     descricao=f"Taxa Comissão - Pedido {order_sn}",
                     valor=taxa_comissao,
-                    status=order_status,
                     observacoes=f"SN:{order_sn} | NF:{invoice_data.get('number', 'N/A')} | Base: R${invoice_products:.2f}"
                 )
-                db.add(desp_comissao)
-                registros_criados += 1
                 logger.info(f"  📉 Taxa Comissão: R$ {taxa_comissao:.2f}")
         
         # 3. DESPESA - Frete (quando o vendedor paga)
         # Se actual_shipping_fee > 0, é custo do vendedor
         if actual_shipping_fee > 0:
-            desp_frete = ContaPagar(
-                mes=vencimento.month,
-                vencimento=vencimento,
+            _registro(
                 fornecedor="Shopee",
-                cnpj=None,
                 categoria="Despesa Venda - Frete Shopee",
                 descricao=f"Frete - Pedido {order_sn}",
                 valor=actual_shipping_fee,
-                status=order_status,
                 observacoes=f"SN:{order_sn} | Carrier:{order.get('shipping_carrier', 'N/A')}"
             )
-            db.add(desp_frete)
-            registros_criados += 1
             logger.info(f"  🚚 Frete: R$ {actual_shipping_fee:.2f}")
         
         # 4. DESPESA - Custo do Produto (Tiny)
         if custo_total_itens > 0:
-            desp_custo = ContaPagar(
-                mes=vencimento.month,
-                vencimento=vencimento,
+            _registro(
                 fornecedor="Tiny ERP",
-                cnpj=None,
                 categoria="Despesa Venda - Custo Produto (Tiny)",
                 descricao=f"Custo Produtos - Pedido {order_sn}",
                 valor=custo_total_itens,
-                status=order_status,
                 observacoes=f"SN:{order_sn} | Itens: {len(item_list)}"
             )
-            db.add(desp_custo)
-            registros_criados += 1
             logger.info(f"  🧾 Custo Produtos (Tiny): R$ {custo_total_itens:.2f}")
 
-        # Commit
-        db.commit()
-        logger.info(f"✅ Pedido {order_sn}: {registros_criados} registros criados")
-        return registros_criados
+        return registros
         
     except Exception as e:
         logger.error(f"❌ Erro ao processar pedido {order_sn}: {e}", exc_info=True)
-        return 0
+        return []
 
 def sync_shopee_completo(dias: int = 30):
     """Sincroniza pedidos Shopee dos últimos N dias com receitas e despesas."""
@@ -225,18 +236,33 @@ def sync_shopee_completo(dias: int = 30):
                 
                 logger.info(f"  Página {page_num}: {len(orders)} pedidos encontrados")
                 
-                # Processar cada pedido
+                # Processar cada pedido: detalhes, custos de todos os SKUs da página em lote, registros
+                registros_pagina = []
+                pedidos = []
                 db = get_db()
                 try:
                     for order in orders:
                         order_sn = order.get('order_sn')
                         if order_sn:
-                            registros = _import_order_completo(order_sn, db)
-                            if registros > 0:
-                                total_pedidos += 1
-                                total_registros += registros
+                            detalhe = _detalhe_pedido(order_sn, db)
+                            if detalhe is not None:
+                                pedidos.append((order_sn, detalhe))
                 finally:
                     db.close()
+                custos = custos_por_sku(sku for _, detalhe in pedidos for sku in _skus_pedido(detalhe))
+                for order_sn, detalhe in pedidos:
+                    registros_pagina.extend(_registros_pedido(order_sn, detalhe, custos))
+
+                # Uma transação por página (INSERT ... ON CONFLICT DO NOTHING em lotes):
+                # reimportações concorrentes não duplicam linhas
+                if registros_pagina:
+                    resultado = add_contas_bulk(registros_pagina)
+                    por_pedido = Counter(r['order_sn'] for r in registros_pagina)
+                    por_pedido.subtract(r['order_sn'] for r in resultado['skipped'])
+                    criados = len(resultado['ids'])
+                    total_pedidos += sum(1 for n in por_pedido.values() if n > 0)
+                    total_registros += criados
+                    logger.info(f"  ✅ Página {page_num}: {criados} registros criados")
                 
                 # Verificar cursor repetido (proteção contra loop)
                 if next_cursor and next_cursor == last_cursor:
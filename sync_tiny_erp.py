@@ -1,11 +1,14 @@
 """
 Script de sincronização Tiny ERP
 Importa pedidos do Tiny ERP e alimenta o banco de dados local como Contas a Pagar
+Páginas são buscadas em paralelo (TINY_SYNC_WORKERS) enquanto as já recebidas são gravadas
 """
+import os
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from modules.tiny_api import listar_produtos, listar_pedidos
-from modules.database import get_db, ContaPagar, add_or_update_regra, init_database
+from modules.database import add_contas_bulk, add_or_update_regra, init_database, make_dedup_hash
 from modules.validation import normalize_cnpj, parse_valor
 from modules.observability import get_metrics, track_duration
 import logging
@@ -16,13 +19,114 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Páginas de pedidos buscadas em paralelo (o ritmo continua com o limitador/cota do Tiny)
+TINY_SYNC_WORKERS = int(os.getenv('TINY_SYNC_WORKERS', '4'))
+
+
+def _contas_da_pagina(pedidos, stats):
+    """Converte os pedidos de uma página em contas para add_contas_bulk."""
+    contas_pagina = []
+    for item in pedidos:
+        pedido = item.get('pedido', {})
+        stats['pedidos_processados'] += 1
+        
+        try:
+            # Extrair dados do pedido
+            numero = pedido.get('numero')
+            numero_ecommerce = pedido.get('numero_ecommerce', '')
+            data_pedido_str = pedido.get('data_pedido', '')
+            cliente = pedido.get('nome', '')
+            valor = float(pedido.get('valor', 0))
+            situacao = pedido.get('situacao', 'Pendente')
+            vendedor = pedido.get('nome_vendedor', '')
+            
+            # Parse data
+            if data_pedido_str:
+                try:
+                    data_pedido = datetime.strptime(data_pedido_str, '%d/%m/%Y').date()
+                except:
+                    data_pedido = datetime.now().date()
+            else:
+                data_pedido = datetime.now().date()
+            
+            # Hash de deduplicação: conflitos no índice único são ignorados na inserção em lote
+            dedup_hash = make_dedup_hash(numero, valor, data_pedido.isoformat())
+            
+            contas_pagina.append({
+                'vencimento': data_pedido,
+                'fornecedor': cliente if cliente else f"Pedido Tiny #{numero}",
+                'cnpj': None,  # Tiny pedidos não retornam CNPJ na listagem
+                'categoria': "Pedido Tiny ERP",
+                'descricao': f"Pedido #{numero} - {numero_ecommerce} - Vendedor: {vendedor}".strip(),
+                'valor': valor,
+                'status': situacao if situacao else "Pendente",
+                'observacoes': f"Importado do Tiny ERP em {datetime.now().strftime('%d/%m/%Y %H:%M:%S')} | HASH:{dedup_hash}",
+                'dedup_hash': dedup_hash
+            })
+            
+        except Exception as e:
+            logger.error(f"❌ Erro ao processar pedido #{pedido.get('numero')}: {e}")
+            stats['erros'] += 1
+            get_metrics().counter_inc('tiny_errors', labels={'source': 'tiny'})
+    return contas_pagina
+
+
+def _processa_pagina(page, resp, stats):
+    """Consumidor: valida a resposta de uma página, converte e grava (uma transação por página).
+
+    Só é lida a página com retorno.status 'OK'; as demais entram em
+    stats['paginas_com_erro'] e contam em stats['erros'].
+    """
+    retorno = resp.get('retorno') or {}
+    if 'error' in resp or str(retorno.get('status') or '').upper() != 'OK':
+        erro = resp.get('error') or retorno.get('erros') or f"status {retorno.get('status')!r}"
+        logger.error(f"❌ Erro ao buscar pedidos (página {page}): {erro}")
+        stats['erros'] += 1
+        stats['paginas_com_erro'].append(page)
+        return
+    
+    pedidos = retorno.get('pedidos') or []
+    if not pedidos:
+        logger.info(f"ℹ️ Nenhum pedido na página {page}")
+        return
+    
+    logger.info(f"✅ Página {page}: {len(pedidos)} pedidos retornados")
+    contas_pagina = _contas_da_pagina(pedidos, stats)
+    
+    # Uma transação por página, em lotes multi-VALUES
+    try:
+        resultado = add_contas_bulk(contas_pagina)
+        criadas = len(resultado['ids'])
+        duplicadas = len(resultado['skipped'])
+        stats['contas_criadas'] += criadas
+        stats['contas_duplicadas'] += duplicadas
+        if criadas:
+            get_metrics().counter_inc('tiny_orders_imported', criadas, labels={'source': 'tiny'})
+        if duplicadas:
+            logger.debug(f"⚠️ {duplicadas} pedidos Tiny já existentes ignorados")
+            get_metrics().counter_inc('tiny_duplicates_skipped', duplicadas, labels={'source': 'tiny'})
+        stats['paginas_processadas'] += 1
+        logger.info(f"💾 Página {page} processada e salva")
+        
+    except Exception as e:
+        logger.error(f"❌ Erro ao processar página {page}: {e}")
+        stats['erros'] += 1
+        stats['paginas_com_erro'].append(page)
+
+
 @track_duration('sync_tiny_duration', labels={'source': 'tiny'})
-def sync_pedidos_tiny(dias=30):
+def sync_pedidos_tiny(dias=30, workers=TINY_SYNC_WORKERS):
     """
     Sincroniza pedidos do Tiny ERP dos últimos N dias
     
+    A primeira página informa numero_paginas; as demais são buscadas em
+    paralelo por até ``workers`` threads (produtoras) enquanto esta thread
+    (consumidora) converte e grava cada página assim que chega, então a
+    busca das próximas páginas se sobrepõe às escritas no banco.
+    
     Args:
         dias: Quantidade de dias para buscar (padrão 30)
+        workers: Páginas buscadas ao mesmo tempo (padrão TINY_SYNC_WORKERS)
     
     Returns:
         Dict com estatísticas da sincronização
@@ -45,115 +149,44 @@ def sync_pedidos_tiny(dias=30):
         'contas_criadas': 0,
         'contas_duplicadas': 0,
         'erros': 0,
-        'regras_criadas': 0
+        'regras_criadas': 0,
+        'paginas_processadas': 0,
+        'paginas_com_erro': []
     }
     
-    page = 1
-    total_paginas = 1
+    def buscar(page):
+        return listar_pedidos(page=page, data_inicial=data_inicial_str, data_final=data_final_str)
     
-    while page <= total_paginas:
-        logger.info(f"📄 Processando página {page}/{total_paginas}...")
-        
-        # Buscar pedidos
-        resp = listar_pedidos(page=page, data_inicial=data_inicial_str, data_final=data_final_str)
-        
-        if 'error' in resp:
-            logger.error(f"❌ Erro ao buscar pedidos: {resp['error']}")
-            stats['erros'] += 1
-            break
-        
-        retorno = resp.get('retorno', {})
-        pedidos = retorno.get('pedidos', [])
-        total_paginas = retorno.get('numero_paginas', 1)
-        
-        if not pedidos:
-            logger.info("ℹ️ Nenhum pedido encontrado")
-            break
-        
-        logger.info(f"✅ {len(pedidos)} pedidos retornados")
-        
-        # Processar cada pedido
-        db = get_db()
-        try:
-            for item in pedidos:
-                pedido = item.get('pedido', {})
-                stats['pedidos_processados'] += 1
-                
+    # Página 1 sozinha: sem ela não se sabe quantas páginas existem
+    logger.info("📄 Buscando página 1...")
+    primeira = buscar(1)
+    retorno = primeira.get('retorno') or {}
+    # Página 1 com erro (já repetida pelo cliente): sem o total não há o que buscar, e o erro fica nas stats
+    total_paginas = int(retorno.get('numero_paginas') or 1) if 'error' not in primeira else 1
+    
+    if total_paginas > 1:
+        logger.info(f"📄 {total_paginas} páginas; buscando as demais com {workers} threads")
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='tiny-pedidos') as executor:
+            futuros = {executor.submit(buscar, page): page for page in range(2, total_paginas + 1)}
+            _processa_pagina(1, primeira, stats)
+            # Consome na ordem de chegada; as threads seguem buscando enquanto a página é gravada
+            for futuro in as_completed(futuros):
+                page = futuros[futuro]
                 try:
-                    # Extrair dados do pedido
-                    numero = pedido.get('numero')
-                    numero_ecommerce = pedido.get('numero_ecommerce', '')
-                    data_pedido_str = pedido.get('data_pedido', '')
-                    cliente = pedido.get('nome', '')
-                    valor = float(pedido.get('valor', 0))
-                    situacao = pedido.get('situacao', 'Pendente')
-                    vendedor = pedido.get('nome_vendedor', '')
-                    
-                    # Parse data
-                    if data_pedido_str:
-                        try:
-                            data_pedido = datetime.strptime(data_pedido_str, '%d/%m/%Y').date()
-                        except:
-                            data_pedido = datetime.now().date()
-                    else:
-                        data_pedido = datetime.now().date()
-                    
-                    # Verificar se já existe (evitar duplicatas por hash)
-                    import hashlib
-                    dedup_key = f"{numero}|{valor}|{data_pedido.isoformat()}"
-                    dedup_hash = hashlib.sha256(dedup_key.encode()).hexdigest()[:16]
-                    
-                    existing = db.query(ContaPagar).filter(
-                        ContaPagar.observacoes.like(f"%HASH:{dedup_hash}%")
-                    ).first()
-                    
-                    if existing:
-                        logger.debug(f"⚠️ Pedido Tiny #{numero} já existe (hash {dedup_hash})")
-                        stats['contas_duplicadas'] += 1
-                        get_metrics().counter_inc('tiny_duplicates_skipped', labels={'source': 'tiny'})
-                        continue
-                    
-                    # Criar conta a pagar
-                    nova_conta = ContaPagar(
-                        mes=data_pedido.month,
-                        vencimento=data_pedido,
-                        fornecedor=cliente if cliente else f"Pedido Tiny #{numero}",
-                        cnpj=None,  # Tiny pedidos não retornam CNPJ na listagem
-                        categoria="Pedido Tiny ERP",
-                        descricao=f"Pedido #{numero} - {numero_ecommerce} - Vendedor: {vendedor}".strip(),
-                        valor=valor,
-                        status=situacao if situacao else "Pendente",
-                        linha_digitavel=None,
-                        pdf_url=None,
-                        observacoes=f"Importado do Tiny ERP em {datetime.now().strftime('%d/%m/%Y %H:%M:%S')} | HASH:{dedup_hash}"
-                    )
-                    
-                    db.add(nova_conta)
-                    stats['contas_criadas'] += 1
-                    logger.debug(f"✅ Conta criada: {cliente} - R$ {valor:.2f}")
-                    get_metrics().counter_inc('tiny_orders_imported', labels={'source': 'tiny'})
-                    
+                    resp = futuro.result()
                 except Exception as e:
-                    logger.error(f"❌ Erro ao processar pedido #{pedido.get('numero')}: {e}")
-                    stats['erros'] += 1
-                    get_metrics().counter_inc('tiny_errors', labels={'source': 'tiny'})
-            
-            db.commit()
-            logger.info(f"💾 Página {page} processada e salva")
-            
-        except Exception as e:
-            logger.error(f"❌ Erro ao processar página {page}: {e}")
-            db.rollback()
-            stats['erros'] += 1
-        finally:
-            db.close()
-        
-        page += 1
+                    resp = {'error': str(e)}
+                _processa_pagina(page, resp, stats)
+    else:
+        _processa_pagina(1, primeira, stats)
     
     # Resumo
     logger.info("\n" + "=" * 60)
     logger.info("📊 RESUMO DA SINCRONIZAÇÃO TINY ERP")
     logger.info("=" * 60)
+    logger.info(f"Páginas processadas: {stats['paginas_processadas']}/{total_paginas}")
+    if stats['paginas_com_erro']:
+        logger.info(f"Páginas não importadas: {sorted(stats['paginas_com_erro'])}")
     logger.info(f"Pedidos processados: {stats['pedidos_processados']}")
     logger.info(f"Contas criadas: {stats['contas_criadas']}")
     logger.info(f"Contas duplicadas (ignoradas): {stats['contas_duplicadas']}")
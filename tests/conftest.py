@@ -31,3 +31,12 @@ def _init_db_session():
     from modules.database import init_database
     init_database()
     yield
+
+
+@pytest.fixture(autouse=True)
+def _fecha_circuitos():
+    """Falhas simuladas em um teste não podem deixar circuitos abertos para o próximo."""
+    from modules.circuit_breaker import reset_breakers
+    reset_breakers()
+    yield
+    reset_breakers()
@@ -1,5 +1,6 @@
 import pytest
 from datetime import datetime
+from unittest.mock import patch
 
 @pytest.fixture
 def sample_cnpj():
@@ -89,3 +90,32 @@ def mock_nfe_data():
             }
         ]
     }
+
+@pytest.fixture
+def sqlite_engine(tmp_path):
+    """Empty SQLite file database with every model table (Base.metadata)"""
+    from sqlalchemy import create_engine
+    from modules.database import Base
+    engine = create_engine(f"sqlite:///{tmp_path / 'teste.db'}", connect_args={'check_same_thread': False})
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def sqlite_sessionmaker(sqlite_engine):
+    """Session factory bound to sqlite_engine"""
+    from sqlalchemy.orm import sessionmaker
+    return sessionmaker(bind=sqlite_engine)
+
+@pytest.fixture
+def sqlite_session(sqlite_sessionmaker):
+    """Session on sqlite_engine, closed after the test"""
+    session = sqlite_sessionmaker()
+    yield session
+    session.close()
+
+@pytest.fixture
+def sqlite_session_local(sqlite_sessionmaker):
+    """modules.database.SessionLocal pointing at sqlite_engine (get_db, add_conta, run_write...)"""
+    with patch('modules.database.SessionLocal', sqlite_sessionmaker):
+        yield sqlite_sessionmaker
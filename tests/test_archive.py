@@ -0,0 +1,113 @@
+"""
+Testes do arquivamento anual de contas em bancos SQLite anexados.
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import func, select
+
+from modules.archive import (
+    anos_arquivados, archive_contas, contas_historico, contas_por_periodo, historico,
+    rebuild_resumo_com_arquivo
+)
+from modules.database import (
+    ContaPagar, ResumoMensal, ensure_contas_fts, ensure_resumo_mensal, search_contas
+)
+
+HOJE = date(2025, 6, 15)
+
+
+@pytest.fixture
+def engine(sqlite_engine, sqlite_session):
+    ensure_resumo_mensal(sqlite_engine)
+    ensure_contas_fts(sqlite_engine)
+    s = sqlite_session
+    for ano in (2020, 2021, 2022, 2023, 2024, 2025):
+        for mes, status in ((1, 'Pago'), (3, 'Cancelado'), (5, 'Pendente')):
+            s.add(ContaPagar(mes=mes, vencimento=date(ano, mes, 10), valor=float(ano - 2000 + mes),
+                             fornecedor=f"Fornecedor {ano}", categoria="Energia", status=status))
+    s.commit()
+    return sqlite_engine
+
+
+def _resumo(engine):
+    with engine.connect() as conn:
+        return {tuple(r[:4]): (r[4], round(r[5], 2)) for r in conn.execute(select(ResumoMensal.__table__))}
+
+
+def test_archive_moves_closed_rows_before_horizon(engine, tmp_path):
+    base = tmp_path / 'arquivo'
+    stats = archive_contas(horizonte_anos=2, hoje=HOJE, bind=engine, base_dir=str(base))
+
+    assert stats['corte'] == date(2023, 1, 1)
+    assert stats['anos'] == {2020: 2, 2021: 2, 2022: 2}
+    assert anos_arquivados(str(base)) == [2020, 2021, 2022]
+    with engine.connect() as conn:
+        restantes = conn.execute(select(ContaPagar.vencimento, ContaPagar.status)).fetchall()
+    # Pendentes antigas continuam na tabela quente
+    assert all(v >= date(2023, 1, 1) or st == 'Pendente' for v, st in restantes)
+    assert len(restantes) == 18 - 6
+
+
+def test_archive_keeps_monthly_summary_complete(engine, tmp_path):
+    antes = _resumo(engine)
+    archive_contas(horizonte_anos=2, hoje=HOJE, bind=engine, base_dir=str(tmp_path))
+    assert _resumo(engine) == antes
+    assert rebuild_resumo_com_arquivo(engine, base_dir=str(tmp_path)) == len(antes)
+    assert _resumo(engine) == antes
+
+
+def test_archive_is_idempotent_and_dry_run_writes_nothing(engine, tmp_path):
+    previa = archive_contas(horizonte_anos=2, hoje=HOJE, bind=engine, base_dir=str(tmp_path), dry_run=True)
+    assert previa['anos'] == {2020: 2, 2021: 2, 2022: 2}
+    assert anos_arquivados(str(tmp_path)) == []
+
+    archive_contas(horizonte_anos=2, hoje=HOJE, bind=engine, base_dir=str(tmp_path))
+    novamente = archive_contas(horizonte_anos=2, hoje=HOJE, bind=engine, base_dir=str(tmp_path))
+    assert novamente['anos'] == {}
+
+
+def test_unified_view_reads_hot_and_archived_rows(engine, tmp_path):
+    archive_contas(horizonte_anos=2, hoje=HOJE, bind=engine, base_dir=str(tmp_path))
+
+    with historico(engine, base_dir=str(tmp_path)) as db:
+        total = db.execute(select(func.count()).select_from(contas_historico)).scalar()
+    assert total == 18
+
+    contas = contas_por_periodo(date(2021, 1, 1), date(2023, 12, 31), bind=engine, base_dir=str(tmp_path))
+    assert [c['vencimento'].year for c in contas] == [2021] * 3 + [2022] * 3 + [2023] * 3
+    assert contas[0]['vencimento'] == date(2021, 1, 10)
+
+    # A conexão volta ao pool sem os bancos anexados
+    with engine.connect() as conn:
+        assert 'arq_2020' not in [r[1] for r in conn.exec_driver_sql("PRAGMA database_list")]
+
+
+def test_archived_rows_leave_fts_index(engine, sqlite_session, tmp_path):
+    assert len(search_contas("Fornecedor 2020", db=sqlite_session)) == 3
+    sqlite_session.rollback()
+    archive_contas(horizonte_anos=2, hoje=HOJE, bind=engine, base_dir=str(tmp_path))
+    [restante] = search_contas("Fornecedor 2020", db=sqlite_session)
+    assert sqlite_session.get(ContaPagar, restante).status == 'Pendente'
+
+
+def test_more_archived_years_than_attach_limit(engine, sqlite_session, tmp_path, monkeypatch):
+    from modules import archive, parquet_export
+
+    s = sqlite_session
+    for ano in range(2008, 2020):
+        s.add(ContaPagar(mes=2, vencimento=date(ano, 2, 10), valor=1.0, fornecedor="Antigo",
+                         categoria="Energia", status='Pago'))
+    s.commit()
+    antes = _resumo(engine)
+    base = tmp_path / 'arquivo'
+    archive_contas(horizonte_anos=2, hoje=HOJE, bind=engine, base_dir=str(base))
+    assert len(anos_arquivados(str(base))) == 15 > archive.MAX_ANEXOS - 1
+
+    assert rebuild_resumo_com_arquivo(engine, base_dir=str(base)) == len(antes)
+    assert _resumo(engine) == antes
+
+    monkeypatch.setattr(archive, 'ARCHIVE_DIR', str(base))
+    r = parquet_export.export_table('contas_pagar', destino=str(tmp_path / 'parquet'), bind=engine, hoje=HOJE)
+    assert r['linhas'] == 18 + 12
+    assert len(r['escritas']) == len(set(r['escritas'])) == 12 + 6 * 3
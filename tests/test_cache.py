@@ -3,7 +3,16 @@ Testes automatizados para o módulo de cache persistente com Redis.
 """
 
 import time
+from datetime import date
+
+import pytest
+
+from modules import cache as cache_mod
 from modules.cache import cache_set, cache_get, cache_clear
+from modules.cache import LRUCache, cached, clear_cache, invalidate_cache, get_cached_value, cache_stats
+from modules.cache import invalidate_tags, register_tags, tags_escrita, tags_periodo
+from modules.cache import cache_get_many, cache_set_many, get_redis_binary_client, set_cached_value
+from modules.database import ContaPagar, add_contas_bulk
 
 def test_cache_set_and_get():
     """
@@ -41,3 +50,204 @@ def test_cache_clear():
     result2 = cache_get('key2')
     assert result1 is None, "key1 deveria ter sido deletada"
     assert result2 is None, "key2 deveria ter sido deletada"
+
+
+# --- Cache em dois níveis (decorator cached) ---
+
+
+@pytest.fixture
+def chamadas():
+    clear_cache()
+    contador = {'n': 0}
+    yield contador
+    clear_cache()
+
+
+def test_lru_evicts_least_recently_used_and_expires():
+    lru = LRUCache(maxsize=2)
+    lru.set('a', 1, ttl=60)
+    lru.set('b', 2, ttl=60)
+    assert lru.get('a') == 1  # 'a' passa a ser o mais recente
+    lru.set('c', 3, ttl=60)
+    assert lru.get('b', None) is None
+    assert lru.get('a') == 1 and lru.get('c') == 3
+    lru.set('d', 4, ttl=-1)
+    assert lru.get('d', None) is None
+
+
+def test_cached_ignores_db_argument(chamadas):
+    @cached(ttl_seconds=60)
+    def soma(db=None, a=1, b=2):
+        chamadas['n'] += 1
+        return a + b
+
+    assert soma(object(), 1, b=2) == 3
+    assert soma(object(), a=1) == 3  # outra sessão, mesmos argumentos efetivos
+    assert chamadas['n'] == 1
+    assert soma(None, 5) == 7
+    assert chamadas['n'] == 2
+    assert soma.__wrapped__(None, 1) == 3
+    assert soma.cache_key(None, 1).startswith('mlh:test_cache:soma:')
+
+
+def test_cached_falls_back_to_l2_when_l1_is_cold(chamadas):
+    @cached(ttl_seconds=60)
+    def valor():
+        chamadas['n'] += 1
+        return {'data': date_hoje()}
+
+    primeiro = valor()
+    cache_mod._l1.clear()  # outro processo: L1 vazio, Redis compartilhado
+    assert valor() == primeiro
+    assert chamadas['n'] == 1
+    assert cache_stats()['l2_hits'] >= 1
+
+
+def test_invalidate_by_key_prefix_and_namespace(chamadas):
+    @cached(ttl_seconds=60, namespace='relatorios')
+    def total(ano):
+        chamadas['n'] += 1
+        return ano
+
+    @cached(ttl_seconds=60, namespace='outros')
+    def outro():
+        chamadas['n'] += 1
+        return 0
+
+    total(2024), total(2025), outro()
+    assert chamadas['n'] == 3
+
+    total.invalidate(2024)
+    total(2024), total(2025)
+    assert chamadas['n'] == 4
+
+    invalidate_cache(prefix='relatorios:total')
+    total(2025)
+    assert chamadas['n'] == 5
+
+    invalidate_cache(namespace='relatorios')
+    total(2025), outro()
+    assert chamadas['n'] == 6
+    assert get_cached_value(outro.cache_key()) == 0
+
+    with pytest.raises(ValueError):
+        invalidate_cache()
+
+
+def test_cached_survives_redis_outage(chamadas, monkeypatch):
+    class RedisFora:
+        def get(self, *a, **k):
+            raise ConnectionError("sem redis")
+        set = delete = ttl = get
+
+    monkeypatch.setattr(cache_mod, 'get_redis_binary_client', lambda: RedisFora())
+    monkeypatch.setattr(cache_mod, '_l2_desligado_ate', 0.0)
+
+    @cached(ttl_seconds=60)
+    def f():
+        chamadas['n'] += 1
+        return 'ok'
+
+    assert f() == 'ok' and f() == 'ok'
+    assert chamadas['n'] == 1  # L1 continua servindo
+    assert cache_mod._l2_desligado_ate > 0
+
+
+def test_unserializable_value_skips_only_its_l2_write(chamadas, caplog):
+    cache_mod._l2_desligado_ate = 0.0
+
+    def nao_serializavel():  # pickle não serializa funções locais
+        return None
+
+    set_cached_value('mlh:teste:funcao', nao_serializavel, 60)
+    assert get_cached_value('mlh:teste:funcao') is nao_serializavel  # L1 guarda o objeto
+    assert 'não serializável' in caplog.text
+    assert cache_mod._l2_desligado_ate == 0.0  # L2 continua ligado para as outras chaves
+
+    set_cached_value('mlh:teste:ok', {'a': 1}, 60)
+    cache_mod._l1.clear()
+    assert get_cached_value('mlh:teste:ok') == {'a': 1}
+    assert get_cached_value('mlh:teste:funcao') is None
+
+
+def date_hoje():
+    return date.today()
+
+
+# --- Invalidação por tags ---
+
+
+def test_tags_periodo_and_escrita():
+    assert tags_periodo('contas_pagar', date(2024, 11, 5), date(2025, 1, 2)) == [
+        'contas_pagar', 'contas_pagar:2024-11', 'contas_pagar:2024-12', 'contas_pagar:2025-01'
+    ]
+    assert tags_periodo('contas_pagar', None, date(2025, 1, 1)) == ['contas_pagar', 'contas_pagar:*']
+    assert tags_periodo('contas_pagar', date(2000, 1, 1), date(2025, 1, 1)) == ['contas_pagar', 'contas_pagar:*']
+    assert tags_escrita('contas_pagar', [date(2025, 6, 1)]) == {'contas_pagar:*', 'contas_pagar:2025-06'}
+    assert tags_escrita('contas_pagar', [date(2025, 6, 1), None]) == {'contas_pagar'}
+    assert tags_escrita('regras_m11') == {'regras_m11'}
+
+
+def test_invalidate_tags_removes_only_tagged_keys_from_both_levels(chamadas):
+    cache_mod.set_cached_value('mlh:t:a', 1, 60)
+    cache_mod.set_cached_value('mlh:t:b', 2, 60)
+    register_tags('mlh:t:a', ['contas_pagar:2025-06'])
+    register_tags('mlh:t:b', ['contas_pagar:2025-07'])
+
+    assert invalidate_tags(['contas_pagar:2025-06']) == 1
+    cache_mod._l1.clear()
+    assert get_cached_value('mlh:t:a') is None
+    assert get_cached_value('mlh:t:b') == 2  # ainda no Redis
+
+
+def test_commits_invalidate_only_affected_months(chamadas, sqlite_sessionmaker):
+    @cached(ttl_seconds=3600, tags=lambda a: tags_periodo('contas_pagar', a['inicio'], a['fim']))
+    def total(db, inicio, fim):
+        chamadas['n'] += 1
+        return db.query(ContaPagar).filter(ContaPagar.vencimento.between(inicio, fim)).count()
+
+    junho = (date(2025, 6, 1), date(2025, 6, 30))
+    db = sqlite_sessionmaker()
+    try:
+        assert total(db, *junho) == 0
+
+        db.add(ContaPagar(mes=7, vencimento=date(2025, 7, 10), fornecedor='F', valor=1.0))
+        db.commit()
+        assert total(db, *junho) == 0 and chamadas['n'] == 1  # julho não afeta junho
+
+        db.add(ContaPagar(mes=6, vencimento=date(2025, 6, 10), fornecedor='F', valor=1.0))
+        db.rollback()
+        assert total(db, *junho) == 0 and chamadas['n'] == 1  # rollback não invalida
+
+        db.add(ContaPagar(mes=6, vencimento=date(2025, 6, 10), fornecedor='F', valor=1.0))
+        db.commit()
+        assert total(db, *junho) == 1 and chamadas['n'] == 2
+
+        # Update movendo a conta de junho para agosto invalida as duas faixas
+        conta = db.query(ContaPagar).filter_by(mes=6).one()
+        conta.vencimento = date(2025, 8, 1)
+        db.commit()
+        assert total(db, *junho) == 0 and chamadas['n'] == 3
+
+        add_contas_bulk([{'vencimento': '2025-06-20', 'fornecedor': 'B', 'valor': 2.0}], db=db)
+        db.commit()
+        assert total(db, *junho) == 1 and chamadas['n'] == 4
+
+        # UPDATE em lote sem datas conhecidas invalida a tabela inteira
+        db.query(ContaPagar).update({ContaPagar.status: 'Pago'})
+        db.commit()
+        total(db, *junho)
+        assert chamadas['n'] == 5
+    finally:
+        db.close()
+
+
+def test_cache_get_many_and_set_many_roundtrip():
+    cache_clear()
+    cache_set_many({f"sku:{i}": {'preco_custo': i / 2, 'venc': date(2025, 1, 1)} for i in range(1200)}, expire=60)
+
+    valores = cache_get_many([f"sku:{i}" for i in range(0, 1300, 100)])
+    assert set(valores) == {f"sku:{i}" for i in range(0, 1200, 100)}
+    assert valores['sku:300'] == {'preco_custo': 150.0, 'venc': date(2025, 1, 1)}
+    assert 0 < get_redis_binary_client().ttl('sku:0') <= 60
+    assert cache_get_many([]) == {}
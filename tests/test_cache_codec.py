@@ -0,0 +1,68 @@
+"""
+Testes do codec binário de cache (cache_codec) e do hash de chaves.
+"""
+import json
+import pickle
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from modules.cache_codec import (
+    MAGIC, MSGPACK_AVAILABLE, PickleCodec, decode, encode, get_codec, hash_key
+)
+from modules.nfe_parser import NFeDoc, NFeItem
+
+
+def _nfe() -> NFeDoc:
+    item = NFeItem(codigo='1', descricao='Panela', ncm='7323', cfop='5102', quantidade=2.0,
+                   vUnCom=10.5, vProd=21.0, ipi=0.0, ipi_aliq=0.0, st=0.0, icms=0.0,
+                   pis=0.0, cofins=0.0, sku='789')
+    return NFeDoc(numero='123', serie='1', chave='0' * 44, emitente='Fornecedor', destinatario='MLH',
+                  vFrete=5.0, vSeguro=0.0, vDesc=0.0, vOutro=0.0, itens=[item])
+
+
+def _codecs():
+    return ['pickle'] + (['msgpack'] if MSGPACK_AVAILABLE else [])
+
+
+@pytest.mark.parametrize('nome', _codecs())
+def test_roundtrip_types_json_cannot_encode(nome):
+    valor = {
+        'vencimento': date(2025, 1, 31),
+        'criado': datetime(2025, 1, 31, 12, 30),
+        'valor': Decimal('1234.56'),
+        'ids': (1, 2, 3),
+        'nfe': _nfe(),
+    }
+    with pytest.raises(TypeError):
+        json.dumps(valor)
+    assert decode(encode(valor, get_codec(nome))) == valor
+
+
+def test_large_values_are_compressed_small_ones_are_not():
+    pequeno = encode({'a': 1})
+    grande = encode({'pedidos': [{'order_sn': f"2501{i:010d}", 'status': 'COMPLETED'} for i in range(500)]})
+    assert pequeno[0] == MAGIC and pequeno[2:3] == b'-'
+    assert grande[2:3] in (b'z', b's')
+    assert len(grande) < len(PickleCodec().dumps(decode(grande)))
+    assert decode(grande)['pedidos'][499]['order_sn'] == '25010000000499'
+
+
+def test_decode_accepts_legacy_json_and_pickle():
+    assert decode('{"a": [1, 2]}') == {'a': [1, 2]}
+    assert decode(b'{"a": [1, 2]}') == {'a': [1, 2]}
+    assert decode(pickle.dumps({'b': date(2025, 1, 1)})) == {'b': date(2025, 1, 1)}
+
+
+def test_hash_key_is_stable_and_type_aware():
+    chave = hash_key('orders', 123, time_from=date(2025, 1, 1), status='COMPLETED')
+    assert len(chave) == 32
+    assert chave == hash_key('orders', 123, status='COMPLETED', time_from=date(2025, 1, 1))
+    assert chave != hash_key('orders', '123', time_from=date(2025, 1, 1), status='COMPLETED')
+    # Dicts e sets independem da ordem de inserção
+    assert hash_key({'a': 1, 'b': {2, 3}}) == hash_key({'b': {3, 2}, 'a': 1})
+    assert hash_key(_nfe()) == hash_key(_nfe())
+    # Valor fixo: a chave não pode mudar entre processos (não depende de hash())
+    assert hash_key('orders', 1) == '714473d75bb72193cac0ee8c378a3d4e'
+    assert hash_key('x') != hash_key('x', None)
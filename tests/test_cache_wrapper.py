@@ -191,3 +191,140 @@ def test_cache_with_none_result():
     assert result2 is None
     # None não é cacheado, então a função é chamada duas vezes
     assert call_count[0] == 2
+
+
+def test_cached_api_call_keeps_dates_and_decimals():
+    """Resultados com date/Decimal (que o JSON não serializa) voltam do cache com o mesmo tipo."""
+    from datetime import date
+    from decimal import Decimal
+    clear_all_cache()
+
+    call_count = [0]
+
+    @cached_api_call(ttl=10, key_prefix="typed_")
+    def pedido(order_sn):
+        call_count[0] += 1
+        return {"order_sn": order_sn, "data": date(2025, 1, 31), "total": Decimal("99.90")}
+
+    primeiro = pedido("2501")
+    segundo = pedido("2501")
+    assert segundo == primeiro
+    assert isinstance(segundo["total"], Decimal)
+    assert call_count[0] == 1
+
+
+def test_concurrent_misses_call_api_once():
+    """Falhas simultâneas na mesma chave (várias sessões) geram uma única chamada."""
+    import threading
+    import time
+    clear_metrics()
+    clear_all_cache()
+
+    call_count = [0]
+
+    @cached_api_call(ttl=10, key_prefix="flight_")
+    def lento(param):
+        call_count[0] += 1
+        time.sleep(0.2)
+        return {"param": param}
+
+    resultados = []
+    threads = [threading.Thread(target=lambda: resultados.append(lento("x"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert call_count[0] == 1
+    assert resultados == [{"param": "x"}] * 8
+    assert get_metrics()["cache"]["coalesced"] == 7
+
+
+def test_waits_for_lease_held_by_other_process():
+    """Com a lease de outro processo ativa, espera o valor gravado por ele."""
+    import threading
+    from modules.cache import LEASE_PREFIX, cache_set_value, get_redis_binary_client
+    clear_all_cache()
+
+    api = CachedAPI()
+    api.cache_prefix = "lease_"
+    chave = api.get_cache_key(42)
+    get_redis_binary_client().set(LEASE_PREFIX + chave, b"outro", px=5000)
+    # "Outro processo" termina a carga e libera a lease
+    def lider():
+        cache_set_value(chave, {"de": "lider"}, expire=10)
+        get_redis_binary_client().delete(LEASE_PREFIX + chave)
+    threading.Timer(0.2, lider).start()
+
+    chamadas = []
+    assert api.get_or_fetch(lambda: chamadas.append(1) or {"de": "local"}, 42) == {"de": "lider"}
+    assert chamadas == []
+
+
+def test_expired_lease_bounds_the_wait():
+    """Líder morto: a lease expira e quem espera faz a chamada."""
+    import time
+    from modules.cache import LEASE_PREFIX, get_redis_binary_client
+    clear_all_cache()
+
+    api = CachedAPI()
+    api.cache_prefix = "lease_morto_"
+    get_redis_binary_client().set(LEASE_PREFIX + api.get_cache_key(1), b"morto", px=300)
+
+    inicio = time.monotonic()
+    assert api.get_or_fetch(lambda: {"ok": True}, 1) == {"ok": True}
+    assert time.monotonic() - inicio < 2
+    assert api.get_cached(1) == {"ok": True}
+
+
+def test_stale_value_served_and_refreshed_in_background():
+    """Após o soft TTL o valor antigo volta na hora e a atualização roda em segundo plano."""
+    import time
+    from modules.cache_wrapper import wait_refreshes
+    clear_metrics()
+    clear_all_cache()
+
+    call_count = [0]
+
+    @cached_api_call(ttl=30, soft_ttl=1, key_prefix="swr_")
+    def catalogo(shop_id):
+        call_count[0] += 1
+        time.sleep(0.3)
+        return {"versao": call_count[0]}
+
+    assert catalogo(1) == {"versao": 1}
+    time.sleep(1.1)
+
+    inicio = time.monotonic()
+    assert catalogo(1) == {"versao": 1}  # vencido, servido sem esperar a API
+    assert time.monotonic() - inicio < 0.2
+    assert wait_refreshes(5)
+    assert catalogo(1) == {"versao": 2}
+    assert call_count[0] == 2
+
+    stats = get_metrics()
+    assert stats["cache"]["stale"] == 1
+    assert stats["cache_refresh"]["total_calls"] == 1
+
+
+def test_stale_refresh_failure_keeps_serving_old_value():
+    """Falha na atualização em segundo plano não derruba quem lê o cache."""
+    import time
+    from modules.cache_wrapper import wait_refreshes
+    clear_metrics()
+    clear_all_cache()
+
+    api = CachedAPI()
+    api.cache_prefix = "swr_falha_"
+    api.cache_soft_ttl = 1
+
+    assert api.get_or_fetch(lambda: {"v": 1}, "sku") == {"v": 1}
+    time.sleep(1.1)
+
+    def quebra():
+        raise RuntimeError("API fora")
+
+    assert api.get_or_fetch(quebra, "sku") == {"v": 1}
+    assert wait_refreshes(5)
+    assert api.get_cached("sku") == {"v": 1}
+    assert get_metrics()["cache"]["refresh_errors"] == 1
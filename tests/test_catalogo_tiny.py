@@ -0,0 +1,247 @@
+"""
+Testes do espelho local do catálogo Tiny (catalogo_tiny).
+"""
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
+
+import pytest
+from sqlalchemy import create_engine, inspect
+
+from modules import catalogo_tiny, config
+from modules.catalogo_tiny import buscar_candidatos, buscar_local, sincronizar_catalogo
+from modules.database import ProdutoTiny, migrate_produtos_tiny_columns, set_marca_sincronizacao
+from modules.rate_limiter import AdaptiveRateLimiter
+from modules.tiny_api import get_client
+
+
+@pytest.fixture
+def espelho(sqlite_session_local, tmp_path):
+    """Banco de teste no lugar do SessionLocal do módulo, com índice de nomes próprio."""
+    with patch.object(catalogo_tiny, 'CATALOGO_INDICE_PATH', str(tmp_path / 'indice_nomes.pkl')), \
+            patch.object(catalogo_tiny, '_indice', catalogo_tiny._IndiceLocal()):
+        yield sqlite_session_local
+
+
+def _pagina(produtos, paginas=1):
+    return {'retorno': {'status': 'OK', 'numero_paginas': paginas,
+                        'produtos': [{'produto': p} for p in produtos]}}
+
+
+def _prod(n, **extra):
+    dados = {'id': str(100 + n), 'codigo': f'SKU-{n}', 'nome': f'Caneca Ágata {n}',
+             'preco': 19.9, 'preco_custo': n + 0.5, 'gtin': f'789{n:010d}', 'situacao': 'A'}
+    dados.update(extra)
+    return dados
+
+
+def test_full_crawl_reads_every_page_and_serves_lookups(espelho):
+    paginas = {1: _pagina([_prod(1), _prod(2)], paginas=2), 2: _pagina([_prod(3)], paginas=2)}
+    with patch.object(catalogo_tiny, 'listar_produtos', side_effect=lambda page, pesquisa: paginas[page]) as listar:
+        stats = sincronizar_catalogo()
+
+    assert stats['modo'] == 'completa'
+    assert (stats['paginas'], stats['produtos'], stats['erros']) == (2, 3, [])
+    assert listar.call_count == 2
+    produto = buscar_local(codigo='SKU-2')
+    assert produto['id'] == '102' and produto['preco_custo'] == 2.5 and produto['preco'] == 19.9
+    assert buscar_local(gtin='7890000000003')['codigo'] == 'SKU-3'
+    assert buscar_local(nome='caneca agata 1')['codigo'] == 'SKU-1'
+    assert buscar_local(codigo='SKU-9') is None
+
+
+def test_incremental_refresh_updates_changed_products_only(espelho):
+    with patch.object(catalogo_tiny, 'listar_produtos', return_value=_pagina([_prod(1), _prod(2)])):
+        sincronizar_catalogo(completo=True)
+    ultima = catalogo_tiny.ultima_sincronizacao()
+
+    alterados = _pagina([_prod(2, preco_custo=7.0), _prod(4)])
+    with patch.object(catalogo_tiny, 'listar_produtos', side_effect=AssertionError('não deve varrer tudo')), \
+            patch.object(catalogo_tiny, 'listar_produtos_alterados', return_value=alterados) as listar_alt:
+        stats = sincronizar_catalogo()
+
+    assert stats['modo'] == 'incremental' and stats['produtos'] == 2
+    desde = listar_alt.call_args[0][0]
+    assert desde == ultima - timedelta(minutes=catalogo_tiny.CATALOGO_MARGEM_MIN)
+    assert buscar_local(codigo='SKU-2')['preco_custo'] == 7.0
+    assert buscar_local(codigo='SKU-4') is not None
+    assert buscar_local(codigo='SKU-1')['preco_custo'] == 1.5
+
+
+def test_full_crawl_deactivates_missing_and_incremental_falls_back(espelho):
+    with patch.object(catalogo_tiny, 'listar_produtos', return_value=_pagina([_prod(1), _prod(2)])):
+        sincronizar_catalogo(completo=True)
+
+    with patch.object(catalogo_tiny, 'listar_produtos_alterados', return_value={'error': 'endpoint indisponível'}), \
+            patch.object(catalogo_tiny, 'listar_produtos', return_value=_pagina([_prod(1)])):
+        stats = sincronizar_catalogo(completo=False)
+
+    assert stats['modo'] == 'completa' and stats['desativados'] == 1
+    assert buscar_local(codigo='SKU-2') is None
+    db = espelho()
+    assert db.query(ProdutoTiny).filter_by(codigo='SKU-2').one().ativo is False
+    db.close()
+
+
+def test_failed_page_keeps_products_active(espelho):
+    with patch.object(catalogo_tiny, 'listar_produtos', return_value=_pagina([_prod(1), _prod(2)])):
+        sincronizar_catalogo(completo=True)
+    respostas = [_pagina([_prod(1)], paginas=2), {'error': 'Timeout na requisição'}]
+    with patch.object(catalogo_tiny, 'listar_produtos', side_effect=respostas):
+        stats = sincronizar_catalogo(completo=True)
+    assert stats['desativados'] == 0 and len(stats['erros']) == 1
+    assert buscar_local(codigo='SKU-2') is not None
+
+
+def _resposta_tiny(corpo):
+    resp = Mock(status_code=200, text=str(corpo), headers={})
+    resp.json.return_value = corpo
+    return resp
+
+
+def _respostas_por_pagina(por_pagina):
+    """session.get falso: a cada chamada devolve a próxima resposta da página pedida."""
+    def get(url, params=None, **kwargs):
+        return _resposta_tiny(por_pagina[params['pagina']].pop(0))
+    return get
+
+
+def test_throttled_page_is_retried_before_full_crawl_finishes(espelho):
+    with patch.object(catalogo_tiny, 'listar_produtos', return_value=_pagina([_prod(n) for n in range(1, 6)])):
+        sincronizar_catalogo(completo=True)
+    bloqueio = {'retorno': {'status': 'Erro', 'codigo_erro': '6', 'erros': [{'erro': 'API Bloqueada'}]}}
+    por_pagina = {1: [_pagina([_prod(1), _prod(2)], paginas=3)],
+                  2: [bloqueio, _pagina([_prod(3), _prod(4)], paginas=3)],
+                  3: [_pagina([_prod(5)], paginas=3)]}
+
+    client = get_client()
+    limiter = AdaptiveRateLimiter('teste_catalogo', dormir=lambda s: None)
+    with patch.object(client, 'limiter', limiter), \
+            patch.object(client.session, 'get', side_effect=_respostas_por_pagina(por_pagina)), \
+            patch.object(config, 'TINY_API_TOKEN', 'test_token'):
+        stats = sincronizar_catalogo(completo=True)
+
+    assert (stats['paginas'], stats['produtos'], stats['desativados'], stats['erros']) == (3, 5, 0, [])
+    assert limiter.state()['bloqueios'] == 1
+    assert buscar_local(codigo='SKU-4') is not None
+
+
+def test_error_page_stops_full_crawl_without_deactivating(espelho):
+    with patch.object(catalogo_tiny, 'listar_produtos', return_value=_pagina([_prod(n) for n in range(1, 6)])):
+        sincronizar_catalogo(completo=True)
+    completa = catalogo_tiny.ultima_completa()
+    bloqueio = {'retorno': {'status': 'Erro', 'codigo_erro': '6'}}
+    por_pagina = {1: [_pagina([_prod(1)], paginas=3)], 2: [bloqueio] * 3, 3: [_pagina([_prod(5)], paginas=3)]}
+
+    client = get_client()
+    with patch.object(client, 'limiter', AdaptiveRateLimiter('teste_catalogo', dormir=lambda s: None)), \
+            patch.object(client.session, 'get', side_effect=_respostas_por_pagina(por_pagina)), \
+            patch.object(config, 'TINY_API_TOKEN', 'test_token'):
+        stats = sincronizar_catalogo(completo=True)
+
+    assert stats['desativados'] == 0 and len(stats['erros']) == 1
+    assert 'bloqueio' in stats['erros'][0]
+    assert buscar_local(codigo='SKU-3') is not None
+    assert catalogo_tiny.ultima_completa() == completa
+
+    # Página com retorno.status 'Erro' vinda de outro caminho também não conta como lida
+    with patch.object(catalogo_tiny, 'listar_produtos', return_value={'retorno': {'status': 'Erro'}}):
+        assert sincronizar_catalogo(completo=True)['desativados'] == 0
+    assert catalogo_tiny.ultima_completa() == completa
+
+
+def test_stale_full_crawl_forces_full_crawl_even_after_incrementals(espelho):
+    with patch.object(catalogo_tiny, 'listar_produtos', return_value=_pagina([_prod(1)])):
+        sincronizar_catalogo(completo=True)
+    set_marca_sincronizacao(catalogo_tiny.MARCA_COMPLETA, datetime.now() - timedelta(days=30))
+
+    # Incrementais recentes não adiam a varredura completa
+    with patch.object(catalogo_tiny, 'listar_produtos_alterados', return_value=_pagina([_prod(1)])):
+        assert sincronizar_catalogo(completo=False)['modo'] == 'incremental'
+    with patch.object(catalogo_tiny, 'listar_produtos', return_value=_pagina([])):
+        assert sincronizar_catalogo()['modo'] == 'completa'
+    assert datetime.now() - catalogo_tiny.ultima_completa() < timedelta(minutes=1)
+
+
+def test_partially_failed_incremental_keeps_watermark(espelho):
+    with patch.object(catalogo_tiny, 'listar_produtos', return_value=_pagina([_prod(1)])):
+        sincronizar_catalogo(completo=True)
+    ultima = catalogo_tiny.ultima_sincronizacao()
+
+    respostas = [_pagina([_prod(2)], paginas=2), {'error': 'Timeout na requisição'}]
+    with patch.object(catalogo_tiny, 'listar_produtos_alterados', side_effect=respostas), \
+            patch.object(catalogo_tiny, 'listar_produtos', return_value={'error': 'Timeout na requisição'}):
+        stats = sincronizar_catalogo(completo=False)
+    assert len(stats['erros']) == 2
+    # A página 1 foi gravada, mas a marca não avança: a próxima repete desde a anterior
+    assert buscar_local(codigo='SKU-2') is not None
+    assert catalogo_tiny.ultima_sincronizacao() == ultima
+    assert catalogo_tiny.ultima_completa() == ultima
+
+    with patch.object(catalogo_tiny, 'listar_produtos_alterados', return_value=_pagina([])) as listar_alt:
+        sincronizar_catalogo(completo=False)
+    assert listar_alt.call_args[0][0] == ultima - timedelta(minutes=catalogo_tiny.CATALOGO_MARGEM_MIN)
+    assert catalogo_tiny.ultima_sincronizacao() > ultima
+
+
+def test_tiny_lookups_answer_from_mirror_in_local_first_mode(espelho):
+    from modules.tiny_api import get_client, obter_produto_detalhado, obter_produto_por_sku, obter_produto_por_sku_ou_nome
+
+    with patch.object(catalogo_tiny, 'listar_produtos', return_value=_pagina([_prod(1)])):
+        sincronizar_catalogo(completo=True)
+
+    with patch.object(get_client().session, 'get', side_effect=AssertionError('não deve ir à API')):
+        assert obter_produto_por_sku('SKU-1', local_first=True)['preco_custo'] == 1.5
+        assert obter_produto_detalhado('SKU-1', local_first=True)['id'] == '101'
+        assert obter_produto_por_sku_ou_nome('', 'CANECA AGATA 1', local_first=True)['codigo'] == 'SKU-1'
+        # O chamador pode mexer no resultado sem estragar o índice
+        obter_produto_por_sku('SKU-1', local_first=True).pop('raw')
+        assert 'raw' in buscar_local(codigo='SKU-1')
+
+
+def test_fuzzy_name_candidates_for_a_batch_of_descriptions(espelho):
+    catalogo = [
+        _prod(1, nome='Caneca Ágata Azul 300ml'),
+        _prod(2, nome='Caneca Ágata Vermelha 500ml'),
+        _prod(3, nome='Prato Fundo Cerâmica'),
+    ]
+    with patch.object(catalogo_tiny, 'listar_produtos', return_value=_pagina(catalogo)):
+        sincronizar_catalogo(completo=True)
+
+    resultado = buscar_candidatos(['CANECA AGATA 300ML AZUL', 'prato ceramica fundo', 'xyz'], k=2)
+    assert [p['codigo'] for p in resultado['CANECA AGATA 300ML AZUL']] == ['SKU-1', 'SKU-2']
+    assert resultado['CANECA AGATA 300ML AZUL'][0]['score'] > resultado['CANECA AGATA 300ML AZUL'][1]['score']
+    assert resultado['prato ceramica fundo'][0]['codigo'] == 'SKU-3'
+    assert resultado['prato ceramica fundo'][0]['score'] == 1.0
+    assert resultado['xyz'] == []
+
+
+def test_name_index_is_persisted_and_updated_incrementally(espelho):
+    with patch.object(catalogo_tiny, 'listar_produtos', return_value=_pagina([_prod(1), _prod(2)])):
+        sincronizar_catalogo(completo=True)
+    buscar_candidatos(['caneca'])
+    caminho = catalogo_tiny.CATALOGO_INDICE_PATH
+
+    # Outro processo: o índice salvo já está na assinatura do espelho e não é reconstruído
+    with patch.object(catalogo_tiny, '_indice', catalogo_tiny._IndiceLocal()), \
+            patch.object(catalogo_tiny.IndiceTrigramas, 'adicionar', side_effect=AssertionError('reindexou')):
+        assert len(buscar_candidatos(['caneca agata'], k=5)['caneca agata']) == 2
+
+    alterados = _pagina([_prod(2, nome='Jarra de Vidro')])
+    with patch.object(catalogo_tiny, 'listar_produtos_alterados', return_value=alterados):
+        sincronizar_catalogo(completo=False)
+    assert buscar_candidatos(['jarra vidro'])['jarra vidro'][0]['codigo'] == 'SKU-2'
+    assert [p['codigo'] for p in buscar_candidatos(['caneca agata'])['caneca agata']] == ['SKU-1']
+    assert catalogo_tiny.IndiceTrigramas.carregar(caminho).marca == catalogo_tiny._assinatura()
+
+
+def test_migration_adds_catalog_columns_to_old_table():
+    engine = create_engine('sqlite://')
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE produtos_tiny (id INTEGER PRIMARY KEY, produto_id VARCHAR(100) UNIQUE NOT NULL, "
+            "nome VARCHAR(500), preco FLOAT, estoque INTEGER, ativo BOOLEAN, data_sincronizacao DATETIME)"
+        )
+    assert migrate_produtos_tiny_columns(bind=engine) == ['codigo', 'preco_custo', 'gtin']
+    assert migrate_produtos_tiny_columns(bind=engine) == []
+    indices = {i['name'] for i in inspect(engine).get_indexes('produtos_tiny')}
+    assert {'ix_tiny_codigo', 'ix_tiny_gtin'} <= indices
@@ -0,0 +1,98 @@
+"""
+Testes do circuit breaker por endpoint (Tiny e Shopee).
+"""
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from modules import config
+from modules.circuit_breaker import CircuitBreaker, CircuitOpenError, CircuitState, get_breaker
+from modules.metrics import get_metrics
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 100.0
+
+    def __call__(self):
+        return self.agora
+
+
+def test_opens_after_threshold_and_probes_after_interval():
+    relogio = Relogio()
+    circuito = CircuitBreaker('teste:endpoint', limite_falhas=3, intervalo_sonda=30, relogio=relogio)
+    for _ in range(2):
+        circuito.permitir()
+        circuito.falha()
+    circuito.registra(200)  # sucesso zera a contagem
+    for _ in range(3):
+        circuito.permitir()
+        circuito.registra(503)
+    assert circuito.estado == CircuitState.OPEN
+    with pytest.raises(CircuitOpenError):
+        circuito.permitir()
+
+    relogio.agora += 30
+    circuito.permitir()  # sonda
+    assert circuito.estado == CircuitState.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        circuito.permitir()  # só uma sonda por vez
+    circuito.falha()
+    assert circuito.estado == CircuitState.OPEN
+
+    relogio.agora += 30
+    circuito.permitir()
+    circuito.registra(200)
+    assert circuito.estado == CircuitState.CLOSED
+    estado = get_metrics()['circuits']['teste:endpoint']
+    assert estado['estado'] == 'closed'
+    assert estado['aberturas'] == 2
+    assert estado['recusadas'] == 2
+
+
+def test_client_errors_do_not_open_circuit():
+    circuito = CircuitBreaker('teste:4xx', limite_falhas=1)
+    circuito.registra(404)
+    circuito.registra(429)
+    assert circuito.estado == CircuitState.CLOSED
+
+
+def test_tiny_outage_fails_fast_after_threshold():
+    from modules.tiny_api import atualizar_preco_custo, get_client, obter_produto_por_sku
+
+    client = get_client()
+    with patch.object(client.session, 'get', side_effect=requests.ConnectionError('fora do ar')) as mock_get, \
+            patch.object(config, 'TINY_API_TOKEN', 'test_token'):
+        for _ in range(5):
+            assert 'error' in obter_produto_por_sku('SKU1')
+        assert mock_get.call_count == 5
+        resultado = obter_produto_por_sku('SKU1')
+        assert 'aberto' in resultado['error']
+        assert mock_get.call_count == 5
+    assert get_breaker('tiny', 'produtos.pesquisa.php').estado == CircuitState.OPEN
+
+    # Escrita com o endpoint fora do ar: desiste sem dormir entre tentativas
+    circuito = get_breaker('tiny', 'produto.alterar.php')
+    for _ in range(5):
+        circuito.falha()
+    with patch.object(client.session, 'post') as mock_post, patch('modules.tiny_api.time.sleep') as dormir:
+        resultado = atualizar_preco_custo('SKU1', 10, max_retries=3)
+    assert resultado['ok'] is False
+    assert resultado['tentativa'] == 1
+    mock_post.assert_not_called()
+    dormir.assert_not_called()
+
+
+@patch('modules.config.SHOPEE_PARTNER_ID', 123456)
+@patch('modules.config.SHOPEE_PARTNER_KEY', 'test_key')
+@patch('modules.config.SHOPEE_ACCESS_TOKEN', 'test_token')
+@patch('modules.config.SHOPEE_SHOP_ID', 789)
+def test_shopee_outage_fails_fast_after_threshold():
+    from modules.shopee_api import obter_detalhe_pedido
+
+    with patch('modules.shopee_api.requests.get', side_effect=requests.Timeout('timeout')) as mock_get:
+        for _ in range(5):
+            assert 'error' in obter_detalhe_pedido('2501000001')
+        assert 'aberto' in obter_detalhe_pedido('2501000001')['error']
+    assert mock_get.call_count == 5
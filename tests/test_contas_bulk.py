@@ -0,0 +1,79 @@
+"""
+Testes da API de escrita em lote (add_contas_bulk / upsert_contas_bulk).
+"""
+from datetime import date
+
+import pytest
+
+from modules.database import (
+    ContaPagar, add_contas_bulk, make_dedup_hash, upsert_contas_bulk
+)
+from modules.domain.entities import Conta
+
+
+def _conta(n, **extra):
+    dados = dict(vencimento='10/01/2025', fornecedor=f"Fornecedor {n}", valor=float(n),
+                 categoria="Pedido Tiny ERP", dedup_hash=make_dedup_hash(n))
+    dados.update(extra)
+    return dados
+
+
+def test_bulk_insert_in_chunks_returns_ids(sqlite_session):
+    result = add_contas_bulk([_conta(n) for n in range(25)], chunk_size=10, db=sqlite_session)
+    sqlite_session.commit()
+    assert len(result['ids']) == 25
+    assert result['skipped'] == []
+    contas = sqlite_session.query(ContaPagar).order_by(ContaPagar.id).all()
+    assert [c.id for c in contas] == sorted(result['ids'])
+    assert contas[0].vencimento == date(2025, 1, 10) and contas[0].mes == 1
+    assert contas[0].status == 'Pendente'
+    assert contas[0].data_cadastro is not None
+
+
+def test_bulk_insert_skips_existing_and_repeated_rows(sqlite_session):
+    add_contas_bulk([_conta(1)], db=sqlite_session)
+    result = add_contas_bulk([_conta(1), _conta(2), _conta(2, valor=99.0)], db=sqlite_session)
+    sqlite_session.commit()
+    assert len(result['ids']) == 1
+    assert sorted(r['dedup_hash'] for r in result['skipped']) == sorted(
+        [make_dedup_hash(1), make_dedup_hash(2)])
+    assert sqlite_session.query(ContaPagar).count() == 2
+    # A primeira ocorrência dentro do lote é a que fica
+    assert sqlite_session.query(ContaPagar.valor).filter(
+        ContaPagar.dedup_hash == make_dedup_hash(2)).scalar() == 2.0
+
+
+def test_bulk_insert_without_hash_always_inserts(sqlite_session):
+    linhas = [dict(vencimento=date(2025, 2, 1), fornecedor="Avulso", valor=1.0)] * 3
+    assert len(add_contas_bulk(linhas, db=sqlite_session)['ids']) == 3
+
+
+def test_upsert_updates_existing_rows(sqlite_session):
+    add_contas_bulk([_conta(1), _conta(2)], db=sqlite_session)
+    result = upsert_contas_bulk(
+        [_conta(1, status='Pago', valor=50.0, data_pagamento=date(2025, 1, 15)), _conta(3)],
+        db=sqlite_session,
+    )
+    sqlite_session.commit()
+    assert len(result['ids']) == 2
+    assert sqlite_session.query(ContaPagar).count() == 3
+    conta = sqlite_session.query(ContaPagar).filter(ContaPagar.dedup_hash == make_dedup_hash(1)).one()
+    assert (conta.status, conta.valor, conta.data_pagamento) == ('Pago', 50.0, date(2025, 1, 15))
+    assert conta.fornecedor == "Fornecedor 1"
+
+
+def test_upsert_requires_update_fields(sqlite_session):
+    with pytest.raises(ValueError):
+        upsert_contas_bulk([_conta(1)], update_fields=(), db=sqlite_session)
+
+
+def test_bulk_accepts_domain_entities(sqlite_session):
+    entidade = Conta(id=None, mes=3, vencimento=date(2025, 3, 5), fornecedor="Entidade",
+                     cnpj=None, categoria="Aluguel", descricao=None, valor=120.0,
+                     status="Pendente", data_pagamento=None, linha_digitavel=None,
+                     pdf_url=None, observacoes=None, dedup_hash="abc")
+    result = add_contas_bulk([entidade], db=sqlite_session)
+    assert len(result['ids']) == 1
+    assert sqlite_session.get(ContaPagar, result['ids'][0]).fornecedor == "Entidade"
+    with pytest.raises(TypeError):
+        add_contas_bulk([object()], db=sqlite_session)
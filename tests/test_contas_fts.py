@@ -0,0 +1,94 @@
+"""
+Testes do índice de busca textual FTS5 (contas_fts).
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+from modules.database import (
+    ContaPagar, contas_fts_filter, contas_texto_filter, ensure_contas_fts, fts_query, list_contas,
+    rebuild_contas_fts, search_contas
+)
+
+
+def _add(sqlite_session, **campos):
+    dados = dict(mes=1, vencimento=date(2025, 1, 10), fornecedor="F", valor=1.0)
+    dados.update(campos)
+    conta = ContaPagar(**dados)
+    sqlite_session.add(conta)
+    sqlite_session.commit()
+    return conta
+
+
+def test_fts_query_builder():
+    assert fts_query("energ elétrica") == '"energ"* "elétrica"*'
+    assert fts_query("Pedido Shopee", colunas=('descricao',), frase=True) == '{descricao} : ("Pedido Shopee")'
+    assert fts_query("  --  ") is None
+    with pytest.raises(ValueError):
+        fts_query("x", colunas=('cnpj',))
+
+
+def test_existing_rows_indexed_on_creation(sqlite_engine, sqlite_session):
+    antiga = _add(sqlite_session, fornecedor="Companhia de Água")
+    assert ensure_contas_fts(sqlite_engine) is True
+    assert ensure_contas_fts(sqlite_engine) is False
+    assert search_contas("agua", db=sqlite_session) == [antiga.id]  # sem acento
+
+
+def test_triggers_keep_index_in_sync(sqlite_engine, sqlite_session):
+    ensure_contas_fts(sqlite_engine)
+    conta = _add(sqlite_session, fornecedor="Energia Eletrica SA", descricao="Conta de luz")
+    outra = _add(sqlite_session, fornecedor="Telecom", observacoes="Pedido Shopee #ABC")
+    assert search_contas("energ", db=sqlite_session) == [conta.id]
+    assert search_contas("Pedido Shopee", colunas=('observacoes',), frase=True,
+                         db=sqlite_session) == [outra.id]
+
+    conta.fornecedor = "Internet Fibra"
+    sqlite_session.commit()
+    assert search_contas("energia", db=sqlite_session) == []
+    assert search_contas("fibra luz", db=sqlite_session) == [conta.id]
+
+    sqlite_session.delete(outra)
+    sqlite_session.commit()
+    assert search_contas("shopee", db=sqlite_session) == []
+
+    rebuild_contas_fts(sqlite_engine)
+    assert search_contas("fibra", db=sqlite_session) == [conta.id]
+
+
+def test_ranking_and_filter_clause(sqlite_engine, sqlite_session):
+    ensure_contas_fts(sqlite_engine)
+    fraca = _add(sqlite_session, fornecedor="Marketing", descricao="serviço geral")
+    forte = _add(sqlite_session, fornecedor="Marketing Digital", descricao="marketing marketing")
+    assert search_contas("marketing", db=sqlite_session) == [forte.id, fraca.id]
+    assert sqlite_session.query(ContaPagar).filter(contas_fts_filter("digital")).count() == 1
+    assert sqlite_session.query(ContaPagar).filter(contas_fts_filter("")).count() == 2
+
+
+def test_list_contas_busca_uses_fts_or_falls_back(sqlite_engine, sqlite_session):
+    _add(sqlite_session, fornecedor="Aluguel Comercial", categoria="Aluguel")
+    # Sem índice FTS: LIKE em categoria/fornecedor
+    assert len(list_contas({'busca': 'omercia'}, db=sqlite_session)['items']) == 1
+    ensure_contas_fts(sqlite_engine)
+    assert len(list_contas({'busca': 'comerc'}, db=sqlite_session)['items']) == 1
+    assert list_contas({'busca': 'omercia'}, db=sqlite_session)['items'] == []
+    with sqlite_engine.connect() as conn:
+        plano = " ".join(r[-1] for r in conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT rowid FROM contas_fts WHERE contas_fts MATCH 'aluguel'")))
+    assert 'VIRTUAL TABLE INDEX' in plano
+
+
+def test_text_filter_falls_back_to_like_without_fts(sqlite_engine, sqlite_session):
+    # Usado por analytics.shopee_stats e pela página Shopee
+    _add(sqlite_session, descricao="Pedido Shopee #ABC", valor=10.0)
+    _add(sqlite_session, descricao="Shopee taxa", valor=3.0)
+
+    def _pedidos():
+        filtro = contas_texto_filter(sqlite_session, 'Pedido Shopee', colunas=('descricao',), frase=True)
+        return [c.descricao for c in sqlite_session.query(ContaPagar).filter(filtro)]
+
+    # Banco anterior ao índice: LIKE '%Pedido Shopee%'
+    assert _pedidos() == ["Pedido Shopee #ABC"]
+    ensure_contas_fts(sqlite_engine)
+    assert _pedidos() == ["Pedido Shopee #ABC"]
@@ -0,0 +1,100 @@
+"""
+Testes para modules/db_engine.py (perfis SQLite e writer serializado).
+"""
+import threading
+
+import pytest
+from sqlalchemy import text
+
+from modules.db_engine import (
+    PROFILES, EngineProfile, SerializedWriter, build_engine, profile_from_env, is_memory_url
+)
+
+
+def _pragma(engine, name):
+    with engine.connect() as conn:
+        return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+def test_production_profile_applies_pragmas(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'prod.db'}", PROFILES['production'])
+    try:
+        assert str(_pragma(engine, 'journal_mode')).lower() == 'wal'
+        assert _pragma(engine, 'synchronous') == 1  # NORMAL
+        assert _pragma(engine, 'busy_timeout') == PROFILES['production'].busy_timeout_ms
+        assert _pragma(engine, 'cache_size') == PROFILES['production'].cache_size
+        assert engine.pool.size() == PROFILES['production'].pool_size
+    finally:
+        engine.dispose()
+
+
+def test_legacy_profile_keeps_defaults(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'legacy.db'}", PROFILES['legacy'])
+    try:
+        assert str(_pragma(engine, 'journal_mode')).lower() == 'delete'
+    finally:
+        engine.dispose()
+
+
+def test_memory_url_skips_pool_sizing():
+    assert is_memory_url('sqlite:///:memory:')
+    assert not is_memory_url('sqlite:///./data/x.db')
+    engine = build_engine('sqlite:///:memory:', PROFILES['production'])
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+    engine.dispose()
+
+
+def test_profile_from_env_overrides(monkeypatch):
+    monkeypatch.setenv('DB_PROFILE', 'production')
+    monkeypatch.setenv('DB_POOL_SIZE', '3')
+    monkeypatch.setenv('DB_BUSY_TIMEOUT_MS', '1234')
+    monkeypatch.setenv('DB_SERIALIZE_WRITES', '0')
+    profile = profile_from_env()
+    assert isinstance(profile, EngineProfile)
+    assert profile.pool_size == 3
+    assert profile.busy_timeout_ms == 1234
+    assert profile.serialize_writes is False
+
+    monkeypatch.setenv('DB_PROFILE', 'legacy')
+    monkeypatch.delenv('DB_POOL_SIZE')
+    monkeypatch.delenv('DB_BUSY_TIMEOUT_MS')
+    monkeypatch.delenv('DB_SERIALIZE_WRITES')
+    assert profile_from_env().pragmas() == {}
+
+
+def test_serialized_writer_runs_on_single_thread():
+    writer = SerializedWriter(name='test-writer')
+    seen = set()
+    try:
+        def record():
+            seen.add(threading.current_thread().name)
+            return len(seen)
+
+        threads = [threading.Thread(target=writer.run, args=(record,)) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert seen == {'test-writer'}
+    finally:
+        writer.shutdown()
+
+
+def test_serialized_writer_propagates_errors_and_allows_nesting():
+    writer = SerializedWriter(name='test-writer-nested')
+    try:
+        assert writer.run(lambda: writer.run(lambda: 42)) == 42
+
+        def boom():
+            raise ValueError("falhou")
+
+        with pytest.raises(ValueError):
+            writer.run(boom)
+    finally:
+        writer.shutdown()
+
+
+def test_disabled_writer_runs_inline():
+    writer = SerializedWriter(enabled=False)
+    assert writer.run(lambda: threading.current_thread()) is threading.current_thread()
@@ -0,0 +1,115 @@
+"""
+Testes das colunas indexadas order_sn / dedup_hash em contas_pagar.
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from modules import database
+from modules.database import (
+    ContaPagar, add_contas_bulk, extract_dedup_hash, extract_order_sn,
+    make_dedup_hash, migrate_contas_dedup_columns, shopee_dedup_hash
+)
+
+LEGACY_DDL = """
+CREATE TABLE contas_pagar (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    mes INTEGER NOT NULL,
+    vencimento DATE NOT NULL,
+    fornecedor VARCHAR(200) NOT NULL,
+    cnpj VARCHAR(18),
+    categoria VARCHAR(100),
+    descricao VARCHAR(500),
+    valor FLOAT NOT NULL,
+    status VARCHAR(20),
+    data_pagamento DATE,
+    linha_digitavel VARCHAR(100),
+    pdf_url VARCHAR(500),
+    observacoes VARCHAR(1000),
+    data_cadastro DATETIME
+)
+"""
+
+
+def test_extract_helpers():
+    assert extract_order_sn("SN:2312ABC | buyer:x") == "2312ABC"
+    assert extract_order_sn("Pedido Shopee #99XYZ\nStatus: OK") == "99XYZ"
+    assert extract_order_sn("Importado | HASH:abc123") is None
+    assert extract_dedup_hash("Importado | HASH:abc123") == "abc123"
+    assert make_dedup_hash("1", 10.0, "2025-01-01") == make_dedup_hash("1", 10.0, "2025-01-01")
+
+
+def test_before_insert_fills_columns(sqlite_session):
+    for _ in range(2):  # lançamento manual repetido não esbarra no índice único
+        sqlite_session.add(ContaPagar(mes=1, vencimento=date(2025, 1, 2), fornecedor="Shopee", valor=10.0,
+                                      categoria="Receita Shopee", observacoes="SN:ORD1 | buyer:x"))
+    sqlite_session.add(ContaPagar(mes=1, vencimento=date(2025, 1, 2), fornecedor="Tiny", valor=5.0,
+                                  observacoes="Importado | HASH:feedbeef"))
+    sqlite_session.commit()
+    rows = [(c.order_sn, c.dedup_hash) for c in sqlite_session.query(ContaPagar).order_by(ContaPagar.id)]
+    assert rows == [("ORD1", None), ("ORD1", None), (None, "feedbeef")]
+
+
+def test_add_conta_manual_duplicate_sn_and_explicit_hash_conflict(sqlite_session_local):
+    dados = dict(vencimento='02/01/2025', fornecedor="Shopee", valor=10.0,
+                 categoria="Ajuste Shopee", observacoes="SN:ORD3 | estorno")
+    ids = [database.add_conta(dados), database.add_conta(dados)]
+    assert len(set(ids)) == 2
+    hash_ = shopee_dedup_hash("ORD3", "Ajuste Shopee")
+    primeiro = database.add_conta(dados, dedup_hash=hash_)
+    # Via módulo: outros testes recarregam modules.database
+    with pytest.raises(database.ContaDuplicadaError) as erro:
+        database.add_conta(dados, dedup_hash=hash_)
+    assert erro.value.conta_id == primeiro
+
+
+def test_bulk_import_derives_hash_from_observacoes(sqlite_session):
+    row = dict(vencimento=date(2025, 1, 2), fornecedor="Shopee", valor=10.0,
+               categoria="Receita Shopee", observacoes="Pedido Shopee #ORD4\nStatus: OK")
+    assert len(add_contas_bulk([row], db=sqlite_session)['ids']) == 1
+    assert len(add_contas_bulk([row], db=sqlite_session)['skipped']) == 1
+    conta = sqlite_session.query(ContaPagar).one()
+    assert conta.dedup_hash == shopee_dedup_hash("ORD4", "Receita Shopee")
+
+
+def test_bulk_insert_skips_duplicates(sqlite_session):
+    row = dict(vencimento=date(2025, 1, 2), fornecedor="Shopee", valor=10.0,
+               categoria="Receita Shopee", order_sn="ORD2",
+               dedup_hash=shopee_dedup_hash("ORD2", "Receita Shopee"))
+    assert len(add_contas_bulk([row], db=sqlite_session)['ids']) == 1
+    assert len(add_contas_bulk([row], db=sqlite_session)['skipped']) == 1
+    sqlite_session.commit()
+    assert sqlite_session.query(ContaPagar).filter(ContaPagar.order_sn == "ORD2").count() == 1
+
+
+def test_migration_adds_columns_and_backfills(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql(LEGACY_DDL)
+        for obs, cat in (
+            ("SN:AAA | buyer:x", "Receita Shopee"),
+            ("SN:AAA | Carrier:y", "Despesa Venda - Frete Shopee"),
+            ("SN:AAA | buyer:x", "Receita Shopee"),  # duplicata legada
+            ("Importado do Tiny ERP | HASH:0123abcd", "Pedido Tiny ERP"),
+            ("Sem marcador", "Aluguel"),
+        ):
+            conn.execute(text(
+                "INSERT INTO contas_pagar (mes, vencimento, fornecedor, valor, categoria, observacoes) "
+                "VALUES (1, '2024-01-10', 'F', 1.0, :cat, :obs)"
+            ), {'cat': cat, 'obs': obs})
+
+    stats = migrate_contas_dedup_columns(batch_size=2, bind=engine)
+
+    assert set(stats['colunas_adicionadas']) == {'order_sn', 'dedup_hash'}
+    assert stats['order_sn'] == 3
+    assert stats['dedup_hash'] == 3  # receita + frete + tiny; duplicata fica NULL
+    index_names = {ix['name'] for ix in inspect(engine).get_indexes('contas_pagar')}
+    assert {'ix_contas_order_sn', 'ux_contas_dedup_hash'} <= index_names
+    with engine.connect() as conn:
+        hashes = conn.execute(text("SELECT dedup_hash FROM contas_pagar ORDER BY id")).scalars().all()
+    assert hashes[3] == '0123abcd'
+    assert hashes[2] is None and hashes[4] is None
+
+    # Segunda execução sem force não refaz o backfill
+    assert migrate_contas_dedup_columns(bind=engine)['dedup_hash'] == 0
@@ -0,0 +1,131 @@
+"""
+Testes do cache em disco (SQLite) usado quando não há Redis.
+"""
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+import modules.cache as cache_mod
+from modules.cache import cache_backend, cached, invalidate_tags, single_flight
+from modules.disk_cache import DiskCache
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture
+def disco(tmp_path):
+    d = DiskCache(str(tmp_path / 'cache.db'))
+    yield d
+    d.close()
+
+
+def test_get_set_ttl_and_nx(disco):
+    assert disco.set('a', b'1', ex=60) is True
+    assert disco.get('a') == b'1'
+    assert 55 <= disco.ttl('a') <= 60
+    assert disco.set('a', b'2', nx=True) is None
+    assert disco.get('a') == b'1'
+
+    disco.set('curta', 'x', px=100)
+    time.sleep(0.15)
+    assert disco.get('curta') is None
+    assert disco.ttl('curta') == -2
+    assert disco.set('curta', 'y', nx=True) is True
+
+
+def test_text_view_and_scan_delete(disco):
+    texto = disco.with_decode(True)
+    texto.set('mlh:a', 'á')
+    disco.set('mlh:b', b'\x00\x01')
+    disco.set('outro', b'z')
+    assert texto.get('mlh:a') == 'á'
+    assert sorted(disco.scan_iter(match='mlh:*')) == [b'mlh:a', b'mlh:b']
+    assert disco.delete(*disco.scan_iter(match='mlh:*')) == 2
+    assert disco.exists('mlh:a', 'outro') == 1
+
+
+def test_sets_pipeline_and_lease_release(disco):
+    pipe = disco.pipeline(transaction=False)
+    pipe.sadd('mlh:tag:x', 'k1').sadd('mlh:tag:x', 'k2').expire('mlh:tag:x', 60)
+    pipe.execute()
+    assert disco.smembers('mlh:tag:x') == {b'k1', b'k2'}
+
+    disco.set('lease', 'meu', px=5000)
+    assert disco.delete_if_equal('lease', 'outro') is False
+    assert disco.delete_if_equal('lease', 'meu') is True
+
+
+def test_lru_eviction_bounds_size(tmp_path):
+    d = DiskCache(str(tmp_path / 'lru.db'), max_bytes=10_000)
+    for i in range(20):
+        d.set(f"k{i}", b'x' * 1000, ex=60)
+    # Mantém a primeira "recente": leitura com marca antiga atualiza o acesso
+    d._conn().execute("UPDATE cache SET accessed_at = 0 WHERE key != 'k0'")
+    d._conn().execute("UPDATE cache SET accessed_at = 1 WHERE key = 'k0'")
+    d.get('k0')
+    stats = d.cleanup()
+    assert stats['despejadas'] >= 11
+    assert d.size_bytes() <= 9_000
+    assert d.get('k0') == b'x' * 1000
+    d.close()
+
+
+def test_shared_between_processes(disco):
+    codigo = (
+        "import sys; from modules.disk_cache import DiskCache; "
+        "d = DiskCache(sys.argv[1]); "
+        "print(d.get('de_fora') is None, d.set('lease', 'p2', px=5000, nx=True)); d.set('de_fora', b'ok')"
+    )
+    disco.set('lease', 'p1', px=5000)
+    saida = subprocess.run([sys.executable, '-c', codigo, disco.path], cwd=ROOT,
+                           capture_output=True, text=True, timeout=60)
+    assert saida.stdout.split() == ['True', 'None']
+    assert disco.get('de_fora') == b'ok'
+
+
+@pytest.fixture
+def cache_em_disco(tmp_path, monkeypatch):
+    d = DiskCache(str(tmp_path / 'l2.db'))
+    monkeypatch.setattr(cache_mod, '_binary_client_cache', d)
+    monkeypatch.setattr(cache_mod, '_client_cache', d.with_decode(True))
+    monkeypatch.setattr(cache_mod, '_l2_desligado_ate', 0.0)
+    cache_mod._l1.clear()
+    yield d
+    cache_mod._l1.clear()
+    d.close()
+
+
+def test_two_level_cache_and_tags_on_disk(cache_em_disco):
+    chamadas = []
+
+    @cached(ttl_seconds=60, namespace='disco', tags=['contas_pagar:2025-01'])
+    def total(ano):
+        chamadas.append(ano)
+        return {'ano': ano}
+
+    assert cache_backend() == 'disk'
+    total(2025)
+    cache_mod._l1.clear()  # "reinício": só o disco tem o valor
+    assert total(2025) == {'ano': 2025}
+    assert chamadas == [2025]
+
+    invalidate_tags(['contas_pagar:2025-01'])
+    cache_mod._l1.clear()
+    total(2025)
+    assert chamadas == [2025, 2025]
+
+
+def test_single_flight_lease_on_disk(cache_em_disco):
+    assert single_flight('mlh:sf', lambda: 7, lambda: None) == (7, True)
+    assert cache_em_disco.exists(cache_mod.LEASE_PREFIX + 'mlh:sf') == 0
+
+
+def test_incr_keeps_ttl(disco):
+    assert disco.incr('contador') == 1
+    disco.expire('contador', 60)
+    assert disco.incr('contador', 4) == 5
+    assert disco.decr('contador') == 4
+    assert 55 <= disco.ttl('contador') <= 60
@@ -0,0 +1,64 @@
+"""
+Testes do índice de trigramas de nomes de produto (indice_nomes).
+"""
+from modules.indice_nomes import IndiceTrigramas, similaridade, trigramas
+
+
+def _indice():
+    indice = IndiceTrigramas()
+    indice.adicionar('1', 'Caneca Ágata Azul 300ml', {'codigo': 'SKU-1'})
+    indice.adicionar('2', 'Caneca Ágata Vermelha 500ml', {'codigo': 'SKU-2'})
+    indice.adicionar('3', 'Prato Fundo Cerâmica', {'codigo': 'SKU-3'})
+    return indice
+
+
+def test_similarity_ignores_accents_case_and_word_order():
+    assert similaridade('CANECA AGATA 300ML', 'caneca  300ml ágata') == 1.0
+    assert similaridade('caneca', 'prato') == 0.0
+    assert similaridade('', 'prato') == 0.0
+    assert '  c' in trigramas('Caneca')
+
+
+def test_search_returns_top_k_with_scores():
+    resultado = _indice().buscar('caneca agata azul', k=2)
+    assert [doc_id for _, doc_id, _ in resultado] == ['1', '2']
+    assert resultado[0][0] > resultado[1][0]
+    assert resultado[0][2] == {'codigo': 'SKU-1'}
+    assert _indice().buscar('caneca agata azul', minimo=0.9) == []
+    assert _indice().buscar('   ') == []
+
+
+def test_incremental_updates_keep_postings_consistent():
+    indice = _indice()
+    indice.adicionar('1', 'Jarra de Vidro', {'codigo': 'SKU-1'})
+    indice.remover('3')
+    indice.remover('nao-existe')
+    assert len(indice) == 2 and '3' not in indice
+    assert [d for _, d, _ in indice.buscar('caneca agata')] == ['2']
+    assert indice.buscar('prato fundo') == []
+    assert indice.buscar('jarra vidro')[0][1] == '1'
+
+    # Mesmo nome: só os dados mudam
+    indice.adicionar('2', 'caneca agata vermelha 500ML', {'codigo': 'SKU-2', 'preco_custo': 9.5})
+    assert indice.buscar('caneca agata vermelha')[0][2]['preco_custo'] == 9.5
+
+
+def test_batch_search_and_disk_round_trip(tmp_path):
+    indice = _indice()
+    indice.marca = ('assinatura', 3)
+    caminho = str(tmp_path / 'sub' / 'indice.pkl')
+    indice.salvar(caminho)
+
+    carregado = IndiceTrigramas.carregar(caminho)
+    assert carregado.marca == ('assinatura', 3)
+    lote = carregado.buscar_lote(['prato ceramica', 'caneca 500ml', 'prato ceramica'], k=1)
+    assert list(lote) == ['prato ceramica', 'caneca 500ml']
+    assert lote['prato ceramica'][0][1] == '3'
+    assert lote['caneca 500ml'][0][1] == '2'
+
+
+def test_missing_or_corrupt_file_is_ignored(tmp_path):
+    assert IndiceTrigramas.carregar(str(tmp_path / 'nao_existe.pkl')) is None
+    corrompido = tmp_path / 'corrompido.pkl'
+    corrompido.write_bytes(b'lixo')
+    assert IndiceTrigramas.carregar(str(corrompido)) is None
@@ -0,0 +1,81 @@
+"""
+Testes da listagem paginada por keyset (list_contas / count_contas).
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from modules.database import (
+    ContaPagar, count_contas, ensure_resumo_mensal, list_contas
+)
+
+
+@pytest.fixture
+def session(sqlite_engine, sqlite_session):
+    ensure_resumo_mensal(sqlite_engine)
+    s = sqlite_session
+    base = date(2025, 1, 1)
+    for i in range(45):
+        venc = base + timedelta(days=i // 3)  # três contas por dia: desempate por id
+        s.add(ContaPagar(mes=venc.month, vencimento=venc, valor=float(i + 1),
+                         fornecedor="Shopee - x" if i % 5 == 0 else f"Fornecedor {i}",
+                         categoria="Receita Shopee" if i % 5 == 0 else "Aluguel",
+                         status="Pago" if i % 2 else "Pendente"))
+    s.commit()
+    return s
+
+
+def _todas(session, filters=None, limit=7):
+    ids, cursor = [], None
+    while True:
+        pagina = list_contas(filters, after=cursor, limit=limit, db=session)
+        assert len(pagina['items']) <= limit
+        ids.extend(c['id'] for c in pagina['items'])
+        cursor = pagina['next']
+        if cursor is None:
+            return ids
+
+
+def test_keyset_pages_cover_all_rows_in_order(session):
+    esperado = [c.id for c in session.query(ContaPagar).order_by(
+        ContaPagar.vencimento.desc(), ContaPagar.id.desc())]
+    assert _todas(session) == esperado
+    primeira = list_contas(limit=5, db=session)
+    assert primeira['next'] == (date.fromisoformat(primeira['items'][-1]['vencimento']),
+                                primeira['items'][-1]['id'])
+
+
+def test_filters_and_string_cursor(session):
+    pagos = _todas(session, {'status': 'Pago', 'busca': None})
+    assert pagos and all(session.get(ContaPagar, i).status == 'Pago' for i in pagos)
+    shopee = list_contas({'categoria_contem': 'Shopee'}, limit=3, db=session)
+    assert [c['categoria'] for c in shopee['items']] == ['Receita Shopee'] * 3
+    ultimo = shopee['items'][-1]
+    seguinte = list_contas({'categoria_contem': 'Shopee'}, after=(ultimo['vencimento'], ultimo['id']),
+                           limit=3, db=session)
+    assert seguinte['items'][0]['id'] < ultimo['id']
+    with pytest.raises(ValueError):
+        list_contas({'inexistente': 1}, db=session)
+
+
+@pytest.mark.parametrize('filters', [
+    None, {'status': 'Pendente'}, {'mes': 1, 'categoria': 'Aluguel'},
+    {'busca': 'Shopee'}, {'data_inicio': date(2025, 1, 5), 'data_fim': date(2025, 1, 10)},
+])
+def test_count_matches_listing(session, filters):
+    ids = _todas(session, filters)
+    totais = count_contas(filters, db=session)
+    assert totais['total'] == len(ids)
+    assert totais['valor_total'] == pytest.approx(sum(session.get(ContaPagar, i).valor for i in ids))
+
+
+def test_count_by_mes_uses_the_listing_month_not_the_due_date(session):
+    # Competência de janeiro com vencimento em fevereiro: conta no mês 1, como em list_contas
+    session.add(ContaPagar(mes=1, vencimento=date(2025, 2, 20), valor=7.0, fornecedor="Energia",
+                           categoria="Aluguel", status="Pendente"))
+    session.commit()
+    for filters in ({'mes': 1}, {'mes': 2}, {'mes': 1, 'status': 'Pendente'}):
+        ids = _todas(session, filters)
+        totais = count_contas(filters, db=session)
+        assert totais['total'] == len(ids)
+        assert totais['valor_total'] == pytest.approx(sum(session.get(ContaPagar, i).valor for i in ids))
@@ -0,0 +1,162 @@
+"""
+Testes da exportação Parquet particionada e do backend DuckDB opcional.
+"""
+from datetime import date, datetime
+
+import pyarrow.parquet as pq
+import pytest
+
+from modules.database import ContaPagar, PedidoShopee, ProdutoTiny, upsert_contas_bulk
+from modules import parquet_export
+from modules.parquet_export import export_all, export_table
+
+HOJE = date(2025, 3, 15)
+
+
+@pytest.fixture
+def engine(sqlite_engine, sqlite_session):
+    s = sqlite_session
+    contas = [
+        (date(2025, 1, 5), "Receita Shopee", "Shopee", 100.0),
+        (date(2025, 1, 20), "Aluguel", "Imobiliária", 40.0),
+        (date(2025, 2, 10), "Aluguel", "Imobiliária", 40.0),
+        (date(2025, 2, 11), "Energia", "Luz SA", 15.5),
+        (date(2025, 3, 1), "Receita Shopee", "Shopee", 80.0),
+    ]
+    for venc, cat, forn, valor in contas:
+        s.add(ContaPagar(mes=venc.month, vencimento=venc, categoria=cat, fornecedor=forn, valor=valor))
+    s.add(PedidoShopee(order_sn="A1", create_time=datetime(2025, 2, 3, 10, 0), total_amount=10.0))
+    s.add(PedidoShopee(order_sn="A2", create_time=None, total_amount=5.0))
+    s.add(ProdutoTiny(produto_id="P1", nome="Produto", preco=9.9, estoque=3,
+                      data_sincronizacao=datetime(2025, 3, 2)))
+    s.commit()
+    return sqlite_engine
+
+
+def test_export_partitions_and_schema(engine, tmp_path):
+    destino = tmp_path / 'parquet'
+    r = export_table('contas_pagar', destino=str(destino), bind=engine, hoje=HOJE)
+    assert r['escritas'] == ['2025-01', '2025-02', '2025-03'] and r['linhas'] == 5
+    tabela = pq.read_table(destino / 'contas_pagar' / 'ano=2025' / 'mes=02' / 'part-0.parquet')
+    assert tabela.num_rows == 2
+    assert str(tabela.schema.field('vencimento').type) == 'date32[day]'
+    assert str(tabela.schema.field('order_sn').type) == 'string'  # coluna toda nula mantém o tipo
+
+    outros = {r['tabela']: r for r in export_all(destino=str(destino), bind=engine)}
+    assert outros['pedidos_shopee']['escritas'] == ['0000-00', '2025-02']
+    assert outros['produtos_tiny']['linhas'] == 1
+
+
+def test_closed_months_are_skipped_unless_changed_or_forced(engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(parquet_export, 'PARQUET_JANELA_DIAS', 0)
+    destino = str(tmp_path / 'parquet')
+    export_table('contas_pagar', destino=destino, bind=engine, hoje=HOJE)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO contas_pagar (mes, vencimento, fornecedor, valor) VALUES (4, '2025-04-02', 'Novo', 1.0)")
+    r = export_table('contas_pagar', destino=destino, bind=engine, hoje=HOJE)
+    assert r['escritas'] == ['2025-03', '2025-04'] and r['puladas'] == 2
+
+    # Lançamento tardio e exclusão em meses encerrados mudam a assinatura
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO contas_pagar (mes, vencimento, fornecedor, valor) VALUES (1, '2025-01-28', 'Tardio', 2.0)")
+        conn.exec_driver_sql("DELETE FROM contas_pagar WHERE fornecedor = 'Luz SA'")
+    r = export_table('contas_pagar', destino=destino, bind=engine, hoje=HOJE)
+    assert r['escritas'] == ['2025-01', '2025-02', '2025-03', '2025-04']
+    tabela = pq.read_table(f"{destino}/contas_pagar/ano=2025/mes=01/part-0.parquet")
+    assert 'Tardio' in tabela.column('fornecedor').to_pylist()
+
+    r = export_table('contas_pagar', destino=destino, bind=engine, hoje=HOJE, force=True)
+    assert len(r['escritas']) == 4
+    with pytest.raises(ValueError):
+        export_table('regras_m11', destino=destino, bind=engine)
+
+
+def test_months_inside_sync_window_are_always_rewritten(engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(parquet_export, 'PARQUET_JANELA_DIAS', 30)
+    destino = str(tmp_path / 'parquet')
+    export_table('contas_pagar', destino=destino, bind=engine, hoje=HOJE)
+    # Sem mudança: fevereiro está na janela e é regravado mesmo assim; janeiro não
+    r = export_table('contas_pagar', destino=destino, bind=engine, hoje=HOJE)
+    assert r['escritas'] == ['2025-02', '2025-03'] and r['puladas'] == 1
+
+
+@pytest.mark.parametrize('update', [
+    "UPDATE contas_pagar SET status = 'Pago' WHERE fornecedor = 'Shopee'",
+    "UPDATE contas_pagar SET valor = 160.0 WHERE fornecedor = 'Shopee'",
+    "UPDATE contas_pagar SET descricao = 'x' WHERE fornecedor = 'Shopee'",
+    "UPDATE contas_pagar SET fornecedor = 'Shopei' WHERE fornecedor = 'Shopee'",
+    "UPDATE contas_pagar SET data_pagamento = '2025-01-25' WHERE fornecedor = 'Shopee'",
+])
+def test_updates_in_closed_months_change_the_signature(engine, tmp_path, monkeypatch, update):
+    monkeypatch.setattr(parquet_export, 'PARQUET_JANELA_DIAS', 0)
+    destino = str(tmp_path / 'parquet')
+    export_table('contas_pagar', destino=destino, bind=engine, hoje=HOJE)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(update)
+    r = export_table('contas_pagar', destino=destino, bind=engine, hoje=HOJE)
+    # Janeiro mudou (update sem mexer em linhas, id ou data de cadastro); fevereiro não
+    assert r['escritas'] == ['2025-01', '2025-03'] and r['puladas'] == 1
+
+
+def test_upsert_in_closed_month_is_reexported(engine, sqlite_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(parquet_export, 'PARQUET_JANELA_DIAS', 0)
+    destino = str(tmp_path / 'parquet')
+    conta = dict(vencimento=date(2025, 1, 8), fornecedor='Upsert', valor=10.0, dedup_hash='h1')
+    upsert_contas_bulk([conta], db=sqlite_session)
+    sqlite_session.commit()
+    export_table('contas_pagar', destino=destino, bind=engine, hoje=HOJE)
+
+    upsert_contas_bulk([{**conta, 'valor': 12.0, 'status': 'Pago'}], db=sqlite_session)
+    sqlite_session.commit()
+    r = export_table('contas_pagar', destino=destino, bind=engine, hoje=HOJE)
+    assert '2025-01' in r['escritas']
+    tabela = pq.read_table(f"{destino}/contas_pagar/ano=2025/mes=01/part-0.parquet").to_pylist()
+    assert [(c['valor'], c['status']) for c in tabela if c['fornecedor'] == 'Upsert'] == [(12.0, 'Pago')]
+
+
+def test_partitions_of_emptied_months_are_removed(engine, tmp_path):
+    destino = tmp_path / 'parquet'
+    export_table('contas_pagar', destino=str(destino), bind=engine, hoje=HOJE)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM contas_pagar WHERE vencimento < '2025-02-01'")
+    r = export_table('contas_pagar', destino=str(destino), bind=engine, hoje=HOJE)
+    assert r['removidas'] == ['2025-01']
+    assert not (destino / 'contas_pagar' / 'ano=2025' / 'mes=01').exists()
+    assert (destino / 'contas_pagar' / 'ano=2025' / 'mes=02' / 'part-0.parquet').exists()
+
+
+def test_duckdb_backend_matches_sqlite_shapes(engine, tmp_path):
+    pytest.importorskip('duckdb')
+    from modules import analytics_duckdb
+    destino = str(tmp_path / 'parquet')
+    assert not analytics_duckdb.disponivel(destino)
+    export_table('contas_pagar', destino=destino, bind=engine, hoje=HOJE)
+    assert analytics_duckdb.disponivel(destino)
+
+    assert analytics_duckdb.categorias_sum(base_dir=destino) == [
+        ("Receita Shopee", 180.0), ("Aluguel", 80.0), ("Energia", 15.5)]
+    assert analytics_duckdb.categorias_sum(date(2025, 1, 15), date(2025, 2, 10), base_dir=destino) == [
+        ("Aluguel", 80.0)]
+    assert analytics_duckdb.top_fornecedores(limit=1, base_dir=destino) == [("Shopee", 180.0)]
+    serie = analytics_duckdb.monthly_series(2025, base_dir=destino)
+    assert serie['receita'][:3] == [100.0, 0.0, 80.0]
+    assert serie['despesa'][:3] == [40.0, 55.5, 0.0]
+    assert serie['total'][1] == 55.5
+
+
+def test_dashboard_session_does_not_bypass_duckdb_backend(engine, sqlite_session, tmp_path, monkeypatch):
+    pytest.importorskip('duckdb')
+    from modules import analytics, analytics_duckdb
+    destino = str(tmp_path / 'parquet')
+    export_table('contas_pagar', destino=destino, bind=engine, hoje=HOJE)
+    monkeypatch.setattr(analytics_duckdb, 'PARQUET_DIR', destino)
+    monkeypatch.setattr(analytics, 'ANALYTICS_BACKEND', 'duckdb')
+    # Depois do snapshot a sessão deixa de ter as contas: só o DuckDB ainda as enxerga
+    sqlite_session.query(ContaPagar).delete()
+    sqlite_session.commit()
+
+    assert analytics.categorias_sum.__wrapped__(sqlite_session)[0] == ("Receita Shopee", 180.0)
+    assert analytics.top_fornecedores.__wrapped__(sqlite_session, limit=1) == [("Shopee", 180.0)]
+    assert analytics.monthly_series.__wrapped__(sqlite_session, 2025)['receita'][:3] == [100.0, 0.0, 80.0]
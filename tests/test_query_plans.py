@@ -0,0 +1,96 @@
+"""
+Regressão de planos de consulta: nenhuma consulta quente pode passar a varrer contas_pagar.
+"""
+import importlib
+
+import pytest
+
+from modules.database import list_categorias
+from modules.query_plans import (
+    HOT_QUERIES, build_synthetic_engine, plan_problems, run_advisor, suggest_index
+)
+
+
+def _analytics_importavel() -> bool:
+    try:
+        importlib.import_module('modules.analytics')
+        return True
+    except ImportError:
+        return False
+
+
+@pytest.fixture(scope='module')
+def sintetico(tmp_path_factory):
+    bind = build_synthetic_engine(str(tmp_path_factory.mktemp('planos') / 'sintetico.db'), linhas=20000)
+    yield bind
+    bind.dispose()
+
+
+@pytest.fixture(scope='module')
+def relatorios(sintetico):
+    queries = HOT_QUERIES
+    if not _analytics_importavel():
+        queries = [q for q in HOT_QUERIES if not q.nome.startswith('analytics.')]
+    return run_advisor(sintetico, queries=queries)
+
+
+def test_hot_queries_have_no_plan_regressions(relatorios):
+    regressoes = {r.nome: (r.regressoes, r.plano) for r in relatorios if r.regressoes}
+    assert not regressoes, regressoes
+
+
+def test_every_hot_query_emitted_sql(relatorios):
+    nomes = {r.nome for r in relatorios if r.sql}
+    esperados = {r.nome for r in relatorios}
+    assert nomes == esperados
+
+
+def test_plan_problems_classification():
+    assert plan_problems(["SCAN contas_pagar"]) == ['scan:contas_pagar']
+    assert plan_problems(["SCAN contas_pagar USING INDEX ix_contas_vencimento"]) == ['scan-index:contas_pagar']
+    assert plan_problems(["SCAN contas_pagar USING COVERING INDEX ix_x"]) == ['scan-index:contas_pagar']
+    assert plan_problems(["SEARCH contas_pagar USING INDEX ix_contas_status_vencimento (status=?)"]) == []
+    # Tabelas pequenas e tabelas virtuais (FTS5) não contam
+    assert plan_problems(["SCAN contas_resumo_mensal", "USE TEMP B-TREE FOR GROUP BY"]) == []
+    assert plan_problems(["SCAN contas_fts VIRTUAL TABLE INDEX 0:M4"]) == []
+    assert plan_problems([
+        "SEARCH contas_pagar USING INDEX ix_contas_vencimento (vencimento>?)",
+        "USE TEMP B-TREE FOR ORDER BY",
+    ]) == ['temp-btree:ORDER BY']
+
+
+def test_suggest_index_orders_equality_then_range():
+    sql = ("SELECT contas_pagar.id FROM contas_pagar WHERE contas_pagar.mes = ? "
+           "AND contas_pagar.vencimento < ? ORDER BY contas_pagar.vencimento DESC LIMIT ?")
+    sugestao = suggest_index(sql, 'contas_pagar')
+    assert sugestao['ddl'] == (
+        "CREATE INDEX IF NOT EXISTS ix_contas_pagar_mes_vencimento ON contas_pagar (mes, vencimento)"
+    )
+
+
+def test_suggest_index_partial_for_not_null():
+    sql = ("SELECT contas_pagar.observacoes FROM contas_pagar WHERE contas_pagar.categoria = ? "
+           "AND contas_pagar.observacoes IS NOT NULL")
+    assert suggest_index(sql, 'contas_pagar')['ddl'].endswith("WHERE observacoes IS NOT NULL")
+
+
+def test_advisor_confirms_missing_index_fix(sintetico):
+    with sintetico.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX ix_contas_mes_vencimento")
+        conn.exec_driver_sql("DROP INDEX ix_contas_mes")
+    try:
+        [rel] = run_advisor(sintetico, queries=[q for q in HOT_QUERIES if q.nome == "list_contas: mês"])
+        assert rel.regressoes
+        assert any(rel.regressoes[0] in s['resolve'] for s in rel.sugestoes)
+    finally:
+        with sintetico.begin() as conn:
+            conn.exec_driver_sql("CREATE INDEX ix_contas_mes ON contas_pagar (mes)")
+            conn.exec_driver_sql("CREATE INDEX ix_contas_mes_vencimento ON contas_pagar (mes, vencimento)")
+
+
+def test_list_categorias_reads_summary(sintetico):
+    from sqlalchemy.orm import Session
+    with Session(sintetico) as db:
+        categorias = list_categorias(db)
+    assert categorias == sorted(categorias)
+    assert "Receita Shopee" in categorias and '' not in categorias
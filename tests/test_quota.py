@@ -0,0 +1,97 @@
+"""
+Testes da cota de APIs compartilhada entre processos (quota).
+"""
+import pytest
+
+from modules.disk_cache import DiskCache
+from modules.metrics import get_metrics
+from modules.quota import QuotaCoordinator
+
+
+class Relogio:
+    """Relógio falso (início de janela): dormir avança o tempo."""
+
+    def __init__(self):
+        self.agora = 6000.0
+
+    def __call__(self):
+        return self.agora
+
+    def dormir(self, segundos):
+        self.agora += segundos
+
+
+@pytest.fixture
+def disco(tmp_path):
+    d = DiskCache(str(tmp_path / 'quota.db'))
+    yield d
+    d.close()
+
+
+def _processo(nome, disco, relogio):
+    return QuotaCoordinator('api_teste', janela=60, cliente=lambda: disco, processo=nome,
+                            relogio=relogio, dormir=relogio.dormir)
+
+
+def test_single_process_uses_whole_budget_then_waits_next_window(disco):
+    relogio = Relogio()
+    app = _processo('app', disco, relogio)
+    for _ in range(10):
+        assert app.acquire('token', por_minuto=10) == 0
+    espera = app.acquire('token', por_minuto=10)
+    assert espera == pytest.approx(60, abs=0.1)
+    assert app.state()['usadas_na_janela'] == 1
+
+
+def test_budget_is_split_between_processes_and_leftover_is_shared(disco):
+    relogio = Relogio()
+    app, script = _processo('app', disco, relogio), _processo('script', disco, relogio)
+    script.acquire('token', por_minuto=10)
+
+    # Dois processos ativos: o app fica com 5 na primeira metade da janela
+    for _ in range(5):
+        assert app.acquire('token', por_minuto=10) == 0
+    assert app.acquire('token', por_minuto=10) == pytest.approx(30, abs=0.1)
+    # Segunda metade: a sobra do script fica disponível até o orçamento acabar
+    for _ in range(3):
+        assert app.acquire('token', por_minuto=10) == 0
+    assert app.acquire('token', por_minuto=10) > 0
+    assert get_metrics()['rate_limits']['api_teste (cota entre processos)']['processos'] == 2
+
+
+def test_tokens_have_separate_budgets(disco):
+    relogio = Relogio()
+    app = _processo('app', disco, relogio)
+    app.acquire('token_a', por_minuto=1)
+    assert app.acquire('token_b', por_minuto=1) == 0
+
+
+def test_unavailable_backend_grants_permit():
+    def sem_l2():
+        raise ConnectionError('Redis fora do ar')
+
+    cota = QuotaCoordinator('api_teste', cliente=sem_l2)
+    assert cota.acquire('token', por_minuto=1) == 0
+    assert cota.acquire('token', por_minuto=1) == 0
+
+
+def test_default_client_follows_cache_l2_back_off(monkeypatch):
+    from modules import cache, quota
+
+    class RedisFora:
+        chamadas = 0
+
+        def pipeline(self, **kwargs):
+            RedisFora.chamadas += 1
+            raise ConnectionError('Redis fora do ar')
+
+    monkeypatch.setattr(cache, 'get_redis_binary_client', lambda: RedisFora())
+    monkeypatch.setattr(cache, '_l2_desligado_ate', 0.0)
+    cota = QuotaCoordinator('api_teste')
+    assert cota._cliente is quota._l2
+
+    assert cota.acquire('token', por_minuto=1) == 0
+    assert cache._l2_desligado_ate > 0  # falha registrada no cache
+    # Em espera: nem a cota nem o cache tentam o Redis de novo
+    assert cota.acquire('token', por_minuto=1) == 0
+    assert RedisFora.chamadas == 1
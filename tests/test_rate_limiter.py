@@ -0,0 +1,151 @@
+"""
+Testes do limitador adaptativo de requisições (rate_limiter).
+"""
+from unittest.mock import Mock, patch
+
+import pytest
+
+from modules import config
+from modules.metrics import get_metrics
+from modules.rate_limiter import AdaptiveRateLimiter
+
+
+class Relogio:
+    """Relógio falso: dormir avança o tempo."""
+
+    def __init__(self):
+        self.agora = 1000.0
+        self.dormido = 0.0
+
+    def __call__(self):
+        return self.agora
+
+    def dormir(self, segundos):
+        self.agora += segundos
+        self.dormido += segundos
+
+
+@pytest.fixture
+def relogio():
+    return Relogio()
+
+
+def _limiter(relogio, **kwargs):
+    kwargs.setdefault('margem', 1.0)
+    return AdaptiveRateLimiter('teste', relogio=relogio, dormir=relogio.dormir, **kwargs)
+
+
+def test_uncalibrated_limiter_does_not_wait(relogio):
+    limiter = _limiter(relogio)
+    for _ in range(50):
+        assert limiter.acquire() == 0
+    assert relogio.dormido == 0
+
+
+def test_calibrates_from_headers_and_paces_at_full_allowance(relogio):
+    limiter = _limiter(relogio, burst=2)
+    limiter.observe('60', '59')  # 60 req/min = 1 req/s
+    for _ in range(12):
+        limiter.acquire()
+    # 2 na rajada, as outras 10 a 1 req/s
+    assert relogio.dormido == pytest.approx(10.0)
+    assert limiter.state()['taxa_por_min'] == 60.0
+
+    # Plano maior informado pela API: a taxa sobe direto para o teto novo
+    limiter.observe('120', '110')
+    assert limiter.state()['taxa_por_min'] == 120.0
+
+
+def test_remaining_quota_caps_available_tokens(relogio):
+    limiter = _limiter(relogio, burst=5)
+    # Outro processo gastou a janela: restam 2 e 1 fica de reserva
+    limiter.observe('60', '2')
+    limiter.acquire()
+    assert relogio.dormido == 0
+    limiter.acquire()
+    assert relogio.dormido == pytest.approx(1.0)
+
+
+def test_throttle_halves_rate_pauses_and_recovers(relogio):
+    limiter = _limiter(relogio, burst=1, pausa=2)
+    limiter.observe('60', '50')
+    limiter.acquire()
+
+    assert limiter.throttled() == 2
+    assert limiter.throttled() == 4  # bloqueio seguido dobra a pausa
+    estado = limiter.state()
+    assert estado['taxa_por_min'] == 15.0
+    assert estado['bloqueios'] == 2
+    assert estado['pausa_restante_s'] == 4
+
+    espera = limiter.acquire()
+    assert espera == pytest.approx(4 + 60 / 15)
+
+    for _ in range(10):
+        limiter.observe('60', '50')
+    assert limiter.state()['taxa_por_min'] == 60.0
+    assert get_metrics()['rate_limits']['teste']['bloqueios'] == 2
+
+
+def test_tiny_write_path_uses_limiter_on_codigo_erro_6(relogio):
+    """codigo_erro=6 para o limitador; a repetição sai depois da pausa, sem sleep fixo"""
+    from modules.tiny_api import atualizar_preco_custo, get_client
+
+    limiter = _limiter(relogio, pausa=3)
+    bloqueado = Mock(status_code=200, text='{}', headers={'x-limit-api': '60', 'x-remaining-api': '0'})
+    bloqueado.json.return_value = {'retorno': {'status': 'Erro', 'codigo_erro': 6}}
+    ok = Mock(status_code=200, text='{}', headers={'x-limit-api': '60', 'x-remaining-api': '40'})
+    ok.json.return_value = {'retorno': {'status': 'OK'}}
+
+    client = get_client()
+    with patch.object(client, 'limiter', limiter), \
+            patch.object(client.session, 'post', side_effect=[bloqueado, ok]), \
+            patch('modules.tiny_api.time.sleep') as sleep_fixo, \
+            patch.object(config, 'TINY_API_TOKEN', 'test_token'):
+        resultado = atualizar_preco_custo('SKU1', 10, max_retries=3)
+
+    assert resultado['ok'] is True
+    assert resultado['tentativa'] == 2
+    assert resultado['waited'] >= 3
+    assert limiter.state()['bloqueios'] == 1
+    sleep_fixo.assert_not_called()
+
+
+def test_consecutive_codigo_erro_6_blocks_double_the_pause(relogio):
+    """Bloqueio com HTTP 200 não calibra o limitador: a pausa dobra como no 429 (2, 4, 8, 16 s)"""
+    from modules.tiny_api import atualizar_preco_custo, get_client
+
+    limiter = _limiter(relogio, pausa=2)
+    bloqueado = Mock(status_code=200, text='{}', headers={'x-limit-api': '60', 'x-remaining-api': '0'})
+    bloqueado.json.return_value = {'retorno': {'status': 'Erro', 'codigo_erro': '6'}}
+    ok = Mock(status_code=200, text='{}', headers={'x-limit-api': '60', 'x-remaining-api': '40'})
+    ok.json.return_value = {'retorno': {'status': 'OK'}}
+    pausas = []
+    registra = limiter.throttled
+
+    def throttled(espera=None):
+        pausas.append(registra(espera))
+        return pausas[-1]
+
+    client = get_client()
+    with patch.object(client, 'limiter', limiter), \
+            patch.object(limiter, 'throttled', throttled), \
+            patch.object(client.session, 'post', side_effect=[bloqueado] * 4 + [ok]), \
+            patch.object(config, 'TINY_API_TOKEN', 'test_token'):
+        resultado = atualizar_preco_custo('SKU1', 10, max_retries=5)
+
+    assert resultado['ok'] is True
+    assert pausas == [2, 4, 8, 16]
+    assert resultado['waited'] >= 30
+    assert limiter.state()['bloqueios'] == 4
+
+
+def test_estimated_wait_does_not_reserve(relogio):
+    limiter = _limiter(relogio, burst=1)
+    assert limiter.espera_estimada() == 0
+    limiter.observe('60', '50')
+    limiter.acquire()
+    assert limiter.espera_estimada() == pytest.approx(1.0)
+    assert limiter.espera_estimada() == pytest.approx(1.0)
+    limiter.throttled(5)
+    assert limiter.espera_estimada() >= 5
@@ -0,0 +1,118 @@
+"""
+Testes do resumo mensal (contas_resumo_mensal) mantido por triggers.
+"""
+import random
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import func
+
+from modules.database import (
+    ContaPagar, ResumoMensal, add_contas_bulk, ensure_resumo_mensal,
+    rebuild_resumo_mensal, resumo_por_periodo
+)
+
+
+@pytest.fixture
+def engine(sqlite_engine):
+    ensure_resumo_mensal(sqlite_engine)
+    return sqlite_engine
+
+
+@pytest.fixture
+def session(engine, sqlite_session):
+    return sqlite_session
+
+
+def _resumo(session):
+    return {
+        (r.ano, r.mes, r.categoria, r.status): (r.quantidade, round(r.valor_total, 2))
+        for r in session.query(ResumoMensal).all()
+    }
+
+
+def _conta(venc, categoria="Aluguel", status="Pendente", valor=10.0):
+    return ContaPagar(mes=venc.month, vencimento=venc, fornecedor="F", categoria=categoria,
+                      status=status, valor=valor)
+
+
+def test_triggers_follow_insert_update_delete(session):
+    a = _conta(date(2025, 1, 10), valor=10.0)
+    b = _conta(date(2025, 1, 20), valor=5.0)
+    c = _conta(date(2025, 2, 1), categoria=None, valor=7.0)
+    session.add_all([a, b, c])
+    session.commit()
+    assert _resumo(session) == {
+        (2025, 1, 'Aluguel', 'Pendente'): (2, 15.0),
+        (2025, 2, '', 'Pendente'): (1, 7.0),
+    }
+
+    a.status = 'Pago'
+    b.vencimento = date(2025, 3, 5)
+    session.delete(c)
+    session.commit()
+    assert _resumo(session) == {
+        (2025, 1, 'Aluguel', 'Pago'): (1, 10.0),
+        (2025, 3, 'Aluguel', 'Pendente'): (1, 5.0),
+    }
+
+
+def test_bulk_insert_updates_summary(session):
+    add_contas_bulk([dict(vencimento='05/04/2025', fornecedor="F", valor=2.5, categoria="Receita Shopee")] * 4,
+                    db=session)
+    session.commit()
+    assert _resumo(session) == {(2025, 4, 'Receita Shopee', 'Pendente'): (4, 10.0)}
+
+
+def test_rebuild_recovers_and_ensure_backfills(engine, session):
+    session.add_all([_conta(date(2025, 5, d), valor=d) for d in range(1, 6)])
+    session.commit()
+    esperado = _resumo(session)
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE contas_resumo_mensal SET quantidade = 99")
+    assert rebuild_resumo_mensal(engine) == 1
+    assert _resumo(session) == esperado
+
+    # Banco sem resumo (anterior às triggers): ensure reconstrói
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM contas_resumo_mensal")
+    assert ensure_resumo_mensal(engine) is True
+    assert _resumo(session) == esperado
+    assert ensure_resumo_mensal(engine) is False
+
+
+def test_resumo_por_periodo_matches_base_table(session):
+    rnd = random.Random(42)
+    inicio_base = date(2024, 11, 1)
+    session.add_all([
+        _conta(inicio_base + timedelta(days=rnd.randint(0, 180)),
+               categoria=rnd.choice(["Aluguel", "Receita Shopee", None]),
+               status=rnd.choice(["Pendente", "Pago"]),
+               valor=rnd.randint(1, 100))
+        for _ in range(300)
+    ])
+    session.commit()
+
+    def direto(ini, fim, status=None):
+        q = session.query(func.count(ContaPagar.id), func.sum(ContaPagar.valor))
+        if ini:
+            q = q.filter(ContaPagar.vencimento >= ini)
+        if fim:
+            q = q.filter(ContaPagar.vencimento <= fim)
+        if status:
+            q = q.filter(ContaPagar.status == status)
+        qtd, soma = q.one()
+        return qtd, float(soma or 0.0)
+
+    intervalos = [
+        (None, None), (date(2024, 12, 1), date(2025, 2, 28)), (date(2024, 12, 15), date(2025, 3, 10)),
+        (date(2025, 1, 5), date(2025, 1, 25)), (date(2025, 1, 20), date(2025, 2, 10)),
+        (None, date(2025, 2, 14)), (date(2025, 3, 2), None),
+    ]
+    for ini, fim in intervalos:
+        for status in (None, 'Pendente'):
+            totais = resumo_por_periodo(session, ini, fim, status=status)
+            qtd = sum(q for q, _ in totais.values())
+            soma = sum(v for _, v in totais.values())
+            assert (qtd, soma) == direto(ini, fim, status), (ini, fim, status)
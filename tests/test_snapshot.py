@@ -0,0 +1,146 @@
+"""
+Testes dos snapshots online (API de backup do SQLite) e da rotação.
+"""
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from modules import snapshot
+from modules.cache import cached, clear_cache
+from modules.database import ContaPagar, ensure_resumo_mensal
+
+
+@pytest.fixture
+def origem(sqlite_engine, sqlite_session):
+    ensure_resumo_mensal(sqlite_engine)
+    with sqlite_engine.begin() as conn:
+        conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+    s = sqlite_session
+    for i in range(500):
+        s.add(ContaPagar(mes=1, vencimento=date(2025, 1, 1 + i % 28), valor=1.0, fornecedor=f"F{i}" * 20))
+    s.commit()
+    return sqlite_engine.url.database
+
+
+def _conta(caminho):
+    with sqlite3.connect(caminho) as conn:
+        return conn.execute("SELECT COUNT(*) FROM contas_pagar").fetchone()[0]
+
+
+def test_snapshot_is_consistent_standalone_copy(origem, tmp_path):
+    stats = snapshot.take_snapshot(origem, base_dir=str(tmp_path / 'snaps'))
+    assert stats['passos'] == 1
+    assert stats['caminho'].exists()
+    assert not list((tmp_path / 'snaps').glob('*.tmp'))
+    assert _conta(stats['caminho']) == 500
+    with sqlite3.connect(stats['caminho']) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'delete'
+        assert conn.execute("SELECT SUM(quantidade) FROM contas_resumo_mensal").fetchone()[0] == 500
+
+
+def test_snapshot_does_not_block_writers(origem, tmp_path):
+    parar = threading.Event()
+    escritas = []
+
+    def escritor():
+        conn = sqlite3.connect(origem, timeout=1)
+        while not parar.is_set():
+            conn.execute("INSERT INTO contas_pagar (mes, vencimento, valor, fornecedor) VALUES (1, '2025-02-01', 1, 'W')")
+            conn.commit()
+            escritas.append(1)
+        conn.close()
+
+    t = threading.Thread(target=escritor)
+    t.start()
+    try:
+        stats = snapshot.take_snapshot(origem, base_dir=str(tmp_path))
+    finally:
+        parar.set()
+        t.join()
+    assert escritas
+    assert 500 <= _conta(stats['caminho']) <= 500 + len(escritas)
+
+
+def test_rotation_keeps_recent_daily_and_weekly(tmp_path):
+    agora = datetime(2025, 6, 15, 12, 0, 0)
+    momentos = [agora - timedelta(hours=h) for h in range(0, 24 * 60, 6)]
+    for m in momentos:
+        (tmp_path / snapshot._nome(m)).write_bytes(b'')
+
+    removidos = snapshot.rotate(str(tmp_path), recent=3, daily=7, weekly=4, agora=agora)
+    restantes = snapshot.list_snapshots(str(tmp_path))
+
+    assert restantes[:3] == [tmp_path / snapshot._nome(m) for m in momentos[:3]]
+    dias = {snapshot._momento(p).date() for p in restantes}
+    assert all(agora.date() - timedelta(days=d) in dias for d in range(7))
+    assert min(snapshot._momento(p) for p in restantes) >= agora - timedelta(days=28)
+    assert len(restantes) + len(removidos) == len(momentos)
+    # Uma segunda rotação não remove nada
+    assert snapshot.rotate(str(tmp_path), recent=3, daily=7, weekly=4, agora=agora) == []
+
+
+def test_get_read_db_uses_fresh_snapshot_only(origem, tmp_path, monkeypatch):
+    base = str(tmp_path / 'snaps')
+    monkeypatch.setattr(snapshot, 'SNAPSHOT_READS', True)
+    monkeypatch.setattr(snapshot.database, 'get_db', lambda: 'principal')
+    assert snapshot.get_read_db(base_dir=base) == 'principal'
+
+    snapshot.take_snapshot(origem, base_dir=base)
+    db = snapshot.get_read_db(max_age=60, base_dir=base)
+    try:
+        assert db.query(ContaPagar).count() == 500
+        with pytest.raises(Exception):
+            db.execute(ContaPagar.__table__.delete())
+    finally:
+        db.close()
+
+    antigo = datetime.now() - timedelta(hours=2)
+    for p in snapshot.list_snapshots(base):
+        p.rename(p.with_name(snapshot._nome(antigo)))
+    assert snapshot.get_read_db(max_age=60, base_dir=base) == 'principal'
+
+
+def test_new_snapshot_keeps_open_sessions_on_previous_one(origem, tmp_path, monkeypatch):
+    base = str(tmp_path / 'snaps')
+    monkeypatch.setattr(snapshot, 'SNAPSHOT_READS', True)
+    snapshot.take_snapshot(origem, base_dir=base, agora=datetime.now() - timedelta(seconds=5))
+    antiga = snapshot.get_read_db(max_age=60, base_dir=base)
+    try:
+        snapshot.take_snapshot(origem, base_dir=base)
+        nova = snapshot.get_read_db(max_age=60, base_dir=base)
+        assert nova.get_bind() is not antiga.get_bind()
+        nova.close()
+        # Sessão aberta antes do snapshot novo continua lendo do anterior
+        assert antiga.query(ContaPagar).count() == 500
+    finally:
+        antiga.close()
+
+
+def test_cached_results_follow_the_snapshot_generation(origem, sqlite_session, tmp_path, monkeypatch):
+    base = str(tmp_path / 'snaps')
+    monkeypatch.setattr(snapshot, 'SNAPSHOT_READS', True)
+    clear_cache()
+
+    @cached(ttl_seconds=3600, tags=['contas_pagar'])
+    def total(db=None):
+        return db.query(ContaPagar).count()
+
+    snapshot.take_snapshot(origem, base_dir=base, agora=datetime.now() - timedelta(seconds=5))
+    antiga = snapshot.get_read_db(max_age=60, base_dir=base)
+    try:
+        assert total(antiga) == 500
+    finally:
+        antiga.close()
+
+    sqlite_session.add(ContaPagar(mes=1, vencimento=date(2025, 1, 2), valor=1.0, fornecedor="Novo"))
+    sqlite_session.commit()
+    snapshot.take_snapshot(origem, base_dir=base)
+    nova = snapshot.get_read_db(max_age=60, base_dir=base)
+    try:
+        # Mesmos argumentos e tags, mas o snapshot mudou: não serve o total da cópia anterior
+        assert total(nova) == 501
+    finally:
+        nova.close()
+        clear_cache()
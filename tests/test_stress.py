@@ -8,27 +8,19 @@ from datetime import datetime, timedelta
 import random
 import time
 
+import pytest
+
 # Adicionar pasta raiz ao path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from modules.database import (
-    init_database, get_db, add_conta, get_regra,
-    add_or_update_regra, registrar_uso_cnpj, count_regras_ativas
+    init_database, get_db, add_conta, add_contas_bulk, search_contas, get_regra,
+    add_or_update_regra, registrar_uso_cnpj, count_regras_ativas, ensure_contas_fts, ensure_resumo_mensal
 )
 from modules.validation import normalize_cnpj, detect_duplicate_conta, parse_valor, parse_date_br
 from modules.export_utils import export_to_excel
 from sqlalchemy import text
 
-print("=" * 60)
-print("🧪 TESTE DE ESTRESSE E PERFORMANCE")
-print("=" * 60)
-
-# Garantir que o banco e as tabelas existem antes dos testes de estresse
-try:
-    init_database()
-except Exception as e:
-    print(f"[SETUP] Falha ao inicializar banco de testes: {e}")
-
 # Dados para geração de massa
 fornecedores = [
     "Fornecedor ABC Ltda", "Energia Eletrica SA", "Telecom Brasil",
@@ -64,94 +56,109 @@ def gerar_conta():
         "linha_digitavel": f"{random.randint(10**46, 10**47-1)}"
     }
 
-# Teste 1: Criação em massa
-print("\n📊 Teste 1: Criação de 100 contas")
-print("-" * 60)
-db = get_db()
-start_time = time.time()
-
-try:
-    for i in range(100):
-        conta = gerar_conta()
-        add_conta(conta)
-        if (i + 1) % 20 == 0:
-            print(f"  ✓ {i + 1} contas criadas...")
-    
-    elapsed = time.time() - start_time
-    print(f"✅ 100 contas criadas em {elapsed:.2f}s ({elapsed/100*1000:.1f}ms/conta)")
-except Exception as e:
-    print(f"❌ Erro: {e}")
-    sys.exit(1)
 
-# Teste 2: Consultas em massa
-print("\n📊 Teste 2: Consultas de leitura")
-print("-" * 60)
+def _executar():
+    """Roda os cenários de estresse no banco apontado por SessionLocal."""
+    print("=" * 60)
+    print("🧪 TESTE DE ESTRESSE E PERFORMANCE")
+    print("=" * 60)
+
+    # Teste 1: Criação em massa
+    print("\n📊 Teste 1: Criação de 100 contas")
+    print("-" * 60)
+    db = get_db()
+    start_time = time.time()
+
+    try:
+        for i in range(100):
+            conta = gerar_conta()
+            add_conta(conta)
+            if (i + 1) % 20 == 0:
+                print(f"  ✓ {i + 1} contas criadas...")
+
+        elapsed = time.time() - start_time
+        taxa_individual = 100 / elapsed if elapsed else float('inf')
+        print(f"✅ 100 contas criadas em {elapsed:.2f}s ({elapsed/100*1000:.1f}ms/conta, {taxa_individual:.0f} linhas/s)")
+    except Exception as e:
+        print(f"❌ Erro: {e}")
+        pytest.fail(str(e))
+
+    # Teste 1b: Criação em lote (add_contas_bulk)
+    print("\n📊 Teste 1b: Criação de 1000 contas em lote")
+    print("-" * 60)
+    try:
+        lote = [gerar_conta() for _ in range(1000)]
+        start_time = time.time()
+        resultado = add_contas_bulk(lote)
+        elapsed = time.time() - start_time
+        taxa_lote = len(resultado['ids']) / elapsed if elapsed else float('inf')
+        print(f"✅ {len(resultado['ids'])} contas criadas em {elapsed:.2f}s ({taxa_lote:.0f} linhas/s)")
+        print(f"  ✓ Ganho sobre add_conta individual: {taxa_lote / taxa_individual:.1f}x")
+    except Exception as e:
+        print(f"❌ Erro: {e}")
+        pytest.fail(str(e))
+
+    # Teste 2: Consultas em massa
+    print("\n📊 Teste 2: Consultas de leitura")
+    print("-" * 60)
 
-try:
     # Contar total
     start_time = time.time()
-    result = db.execute(text("SELECT COUNT(*) FROM contas_pagar"))
-    total = result.scalar()
+    total = db.execute(text("SELECT COUNT(*) FROM contas_pagar")).scalar()
     elapsed = time.time() - start_time
+    assert total >= 100 + len(resultado['ids'])
     print(f"  ✓ COUNT(*): {total} registros em {elapsed*1000:.1f}ms")
-    
+
     # Buscar com filtros
     start_time = time.time()
-    result = db.execute(text("SELECT * FROM contas_pagar WHERE status = 'Pendente'"))
-    pendentes = result.fetchall()
+    pendentes = db.execute(text("SELECT * FROM contas_pagar WHERE status = 'Pendente'")).fetchall()
     elapsed = time.time() - start_time
+    assert 0 < len(pendentes) < total
     print(f"  ✓ SELECT com filtro: {len(pendentes)} pendentes em {elapsed*1000:.1f}ms")
-    
+
     # Buscar com LIKE
     start_time = time.time()
-    result = db.execute(text("SELECT * FROM contas_pagar WHERE fornecedor LIKE '%Energia%'"))
-    energia = result.fetchall()
+    energia = db.execute(text("SELECT * FROM contas_pagar WHERE fornecedor LIKE '%Energia%'")).fetchall()
     elapsed = time.time() - start_time
     print(f"  ✓ SELECT com LIKE: {len(energia)} resultados em {elapsed*1000:.1f}ms")
-    
+
+    # Mesma busca pelo índice FTS5
+    start_time = time.time()
+    energia_fts = search_contas("Energia", limit=10000, colunas=('fornecedor',))
+    elapsed = time.time() - start_time
+    assert len(energia_fts) == len(energia), "FTS5 e LIKE devem achar as mesmas contas"
+    print(f"  ✓ Busca FTS5: {len(energia_fts)} resultados em {elapsed*1000:.1f}ms")
+
     # Ordenação e limite
     start_time = time.time()
-    result = db.execute(text("SELECT * FROM contas_pagar ORDER BY vencimento DESC LIMIT 50"))
-    recent = result.fetchall()
+    recent = db.execute(text("SELECT * FROM contas_pagar ORDER BY vencimento DESC LIMIT 50")).fetchall()
     elapsed = time.time() - start_time
+    assert len(recent) == 50
     print(f"  ✓ SELECT com ORDER e LIMIT: {len(recent)} registros em {elapsed*1000:.1f}ms")
-    
+
     print("✅ Consultas executadas com sucesso")
-except Exception as e:
-    print(f"❌ Erro: {e}")
 
-# Teste 3: Criação e ativação de regras
-print("\n📊 Teste 3: Sistema de Regras M11")
-print("-" * 60)
+    # Teste 3: Criação e ativação de regras
+    print("\n📊 Teste 3: Sistema de Regras M11")
+    print("-" * 60)
 
-try:
     test_cnpj = gerar_cnpj()
     test_fornecedor = "Fornecedor Teste Regra"
     test_categoria = "Categoria Teste"
-    
-    # Uso 1
-    add_or_update_regra(test_cnpj, test_fornecedor, test_categoria)
-    regra = get_regra(test_cnpj)
-    print(f"  ✓ Uso 1: {regra['contador_usos']} uso(s), ativo={regra['ativo']}")
-    
-    # Uso 2
-    add_or_update_regra(test_cnpj, test_fornecedor, test_categoria)
-    regra = get_regra(test_cnpj)
-    print(f"  ✓ Uso 2: {regra['contador_usos']} uso(s), ativo={regra['ativo']}")
-    
-    # Uso 3 (deve ativar)
-    add_or_update_regra(test_cnpj, test_fornecedor, test_categoria)
-    regra = get_regra(test_cnpj)
-    print(f"  ✓ Uso 3: {regra['contador_usos']} uso(s), ativo={regra['ativo']}")
-    
-    if regra['ativo'] and regra['contador_usos'] == 3:
-        print("✅ Regra ativada corretamente após 3 usos")
-    else:
-        print("❌ Regra não ativou corretamente")
-        sys.exit(1)
-        
+
+    for uso in range(1, 4):
+        add_or_update_regra(test_cnpj, test_fornecedor, test_categoria)
+        regra = get_regra(test_cnpj)
+        print(f"  ✓ Uso {uso}: {regra['contador_usos']} uso(s), ativo={regra['ativo']}")
+        assert regra['contador_usos'] == uso
+
+    # Uso 3 deve ativar
+    assert regra['ativo'], "Regra não ativou após 3 usos"
+    print("✅ Regra ativada corretamente após 3 usos")
+
     # Criar 50 regras diversas
     print("\n  Criando 50 regras diversas...")
+    regras_antes = db.execute(text("SELECT COUNT(*) FROM regras_m11")).scalar()
     for i in range(50):
         cnpj = gerar_cnpj()
         forn = random.choice(fornecedores)
@@ -163,21 +170,20 @@ try:
                 registrar_uso_cnpj(cnpj)
         if (i + 1) % 10 == 0:
             print(f"  ✓ {i + 1} regras criadas...")
-    
+
     total_regras = db.execute(text("SELECT COUNT(*) FROM regras_m11")).scalar()
     ativas = count_regras_ativas()
+    # CNPJs aleatórios podem repetir: no máximo 50 regras novas
+    assert regras_antes < total_regras <= regras_antes + 50
+    assert 1 <= ativas <= total_regras
     print(f"  ✓ Total de regras: {total_regras}")
     print(f"  ✓ Regras ativas: {ativas}")
     print("✅ Sistema de regras funcionando corretamente")
-    
-except Exception as e:
-    print(f"❌ Erro: {e}")
 
-# Teste 4: Detecção de duplicatas
-print("\n📊 Teste 4: Detecção de Duplicatas")
-print("-" * 60)
+    # Teste 4: Detecção de duplicatas
+    print("\n📊 Teste 4: Detecção de Duplicatas")
+    print("-" * 60)
 
-try:
     # Criar conta base
     base_conta = {
         "vencimento": "15/06/2024",
@@ -187,152 +193,120 @@ try:
         "cnpj": gerar_cnpj(),
         "status": "Pendente"
     }
-    
+
     add_conta(base_conta)
     print("  ✓ Conta base criada")
-    
-    # Teste duplicata exata (mesmo dia)
-    duplicate = detect_duplicate_conta(
-        fornecedor=base_conta["fornecedor"],
-        valor=base_conta["valor"],
-        vencimento=parse_date_br(base_conta["vencimento"]),
-        db=db
-    )
-    if duplicate:
-        print(f"  ✓ Duplicata exata detectada: {1} conta(s)")
-    else:
-        print("  ⚠ Duplicata exata não detectada (esperado: 1)")
-    
-    # Teste duplicata próxima (±2 dias)
-    duplicate = detect_duplicate_conta(
-        fornecedor=base_conta["fornecedor"],
-        valor=base_conta["valor"],
-        vencimento=parse_date_br("17/06/2024"),  # +2 dias
-        db=db
-    )
-    if duplicate:
-        print(f"  ✓ Duplicata próxima (+2 dias) detectada: {1} conta(s)")
-    else:
-        print("  ⚠ Duplicata próxima não detectada")
-    
-    # Teste valor similar (±1%)
-    valor_similar = 1500 * 1.005  # +0.5%
-    duplicate = detect_duplicate_conta(
-        fornecedor=base_conta["fornecedor"],
-        valor=valor_similar,
-        vencimento=parse_date_br("15/06/2024"),
-        db=db
-    )
-    if duplicate:
-        print(f"  ✓ Valor similar (+0.5%) detectado: {1} conta(s)")
-    else:
-        print("  ⚠ Valor similar não detectado")
-    
-    # Teste fora do range (deve não detectar)
-    duplicate = detect_duplicate_conta(
-        fornecedor=base_conta["fornecedor"],
-        valor=base_conta["valor"],
-        vencimento=parse_date_br("25/06/2024"),  # +10 dias
-        db=db
-    )
-    if not duplicate:
-        print("  ✓ Fora do range corretamente não detectado")
-    else:
-        print(f"  ⚠ Falso positivo: detectou {1} quando não deveria")
-    
+
+    casos = [
+        ("Duplicata exata (mesmo dia)", base_conta["valor"], "15/06/2024", True),
+        ("Duplicata próxima (+2 dias)", base_conta["valor"], "17/06/2024", True),
+        ("Valor similar (+0.5%)", 1500 * 1.005, "15/06/2024", True),
+        ("Fora do range (+10 dias)", base_conta["valor"], "25/06/2024", False),
+    ]
+    for descricao, valor, vencimento, esperado in casos:
+        duplicate = detect_duplicate_conta(
+            fornecedor=base_conta["fornecedor"],
+            valor=valor,
+            vencimento=parse_date_br(vencimento),
+            db=db
+        )
+        assert bool(duplicate) == esperado, f"{descricao}: detectado={bool(duplicate)}"
+        print(f"  ✓ {descricao}: detectado={bool(duplicate)}")
+
     print("✅ Detecção de duplicatas funcionando")
-    
-except Exception as e:
-    print(f"❌ Erro: {e}")
-
-# Teste 5: Export de grande volume
-print("\n📊 Teste 5: Exportação de Dados")
-print("-" * 60)
-
-try:
-    # Buscar usando ORM (como na aplicação real)
-    from modules.database import ContaPagar, RegraM11
-    
-    start_time = time.time()
-    contas_list = db.query(ContaPagar).all()
-    regras_list = db.query(RegraM11).all()
-    
-    # Exportar
-    excel_bytes = export_to_excel(contas_list, regras_list)
-    elapsed = time.time() - start_time
-    
-    size_kb = len(excel_bytes.getvalue()) / 1024
-    print(f"  ✓ Excel gerado: {size_kb:.1f} KB")
-    print(f"  ✓ {len(contas_list)} contas + {len(regras_list)} regras")
-    print(f"  ✓ Tempo: {elapsed:.2f}s")
-    print("✅ Exportação concluída com sucesso")
-    
-except Exception as e:
-    print(f"❌ Erro: {e}")
-
-# Teste 6: Performance de validações
-print("\n📊 Teste 6: Performance de Validações")
-print("-" * 60)
-
-try:
+
+    # Teste 5: Export de grande volume
+    print("\n📊 Teste 5: Exportação de Dados")
+    print("-" * 60)
+
+    try:
+        import openpyxl  # noqa: F401  (engine do pandas em export_to_excel)
+    except ImportError:
+        print("  ⚠ openpyxl não instalado: exportação Excel não testada")
+    else:
+        # Buscar usando ORM (como na aplicação real)
+        from modules.database import ContaPagar, RegraM11
+
+        start_time = time.time()
+        contas_list = db.query(ContaPagar).all()
+        regras_list = db.query(RegraM11).all()
+
+        # Exportar
+        excel_bytes = export_to_excel(contas_list, regras_list)
+        elapsed = time.time() - start_time
+
+        size_kb = len(excel_bytes.getvalue()) / 1024
+        assert size_kb > 0
+        print(f"  ✓ Excel gerado: {size_kb:.1f} KB")
+        print(f"  ✓ {len(contas_list)} contas + {len(regras_list)} regras")
+        print(f"  ✓ Tempo: {elapsed:.2f}s")
+        print("✅ Exportação concluída com sucesso")
+
+    # Teste 6: Performance de validações
+    print("\n📊 Teste 6: Performance de Validações")
+    print("-" * 60)
+
     test_cnpjs = [
         "12345678000199",
         "12.345.678/0001-99",
         "12 345 678 0001 99",
         "12-345-678/0001-99"
     ]
-    
+
     start_time = time.time()
     for cnpj in test_cnpjs:
         normalized = normalize_cnpj(cnpj)
-        if normalized != "12.345.678/0001-99":
-            print(f"  ❌ Normalização falhou: {cnpj} → {normalized}")
+        assert normalized == "12.345.678/0001-99", f"Normalização falhou: {cnpj} → {normalized}"
     elapsed = time.time() - start_time
     print(f"  ✓ Normalização de CNPJs: {elapsed*1000:.1f}ms para 4 formatos")
-    
+
     # Teste parse de valores
     start_time = time.time()
     test_valores = ["R$ 1.500,00", "1500", "1.500,50", "R$2.999,99"]
     for v in test_valores:
-        parsed = parse_valor(v)
-        if parsed <= 0:
-            print(f"  ❌ Parse falhou: {v}")
+        assert parse_valor(v) > 0, f"Parse falhou: {v}"
     elapsed = time.time() - start_time
     print(f"  ✓ Parse de valores: {elapsed*1000:.1f}ms para 4 valores")
-    
+
     # Teste parse de datas
     start_time = time.time()
     test_datas = ["15/06/2024", "01/01/2024", "31/12/2024", "28/02/2024"]
     for d in test_datas:
-        parsed = parse_date_br(d)
-        if not parsed:
-            print(f"  ❌ Parse de data falhou: {d}")
+        assert parse_date_br(d), f"Parse de data falhou: {d}"
     elapsed = time.time() - start_time
     print(f"  ✓ Parse de datas: {elapsed*1000:.1f}ms para 4 datas")
-    
+
     print("✅ Validações com boa performance")
-    
-except Exception as e:
-    print(f"❌ Erro: {e}")
 
-# Resumo final
-print("\n" + "=" * 60)
-print("📊 RESUMO DO TESTE DE ESTRESSE")
-print("=" * 60)
+    # Resumo final
+    print("\n" + "=" * 60)
+    print("📊 RESUMO DO TESTE DE ESTRESSE")
+    print("=" * 60)
 
-try:
-    total_contas = db.execute(text("SELECT COUNT(*) FROM contas_pagar")).scalar()
-    total_regras = db.execute(text("SELECT COUNT(*) FROM regras_m11")).scalar()
-    regras_ativas = count_regras_ativas()
-    
-    print(f"✅ Total de contas no banco: {total_contas}")
-    print(f"✅ Total de regras: {total_regras}")
-    print(f"✅ Regras ativas: {regras_ativas}")
-    print(f"✅ Todos os testes de estresse passaram!")
-    print("\n🎉 SISTEMA APROVADO NO TESTE DE CARGA")
-    
-except Exception as e:
-    print(f"❌ Erro ao gerar resumo: {e}")
-
-print("=" * 60)
+    try:
+        total_contas = db.execute(text("SELECT COUNT(*) FROM contas_pagar")).scalar()
+        total_regras = db.execute(text("SELECT COUNT(*) FROM regras_m11")).scalar()
+        regras_ativas = count_regras_ativas()
 
+        print(f"✅ Total de contas no banco: {total_contas}")
+        print(f"✅ Total de regras: {total_regras}")
+        print(f"✅ Regras ativas: {regras_ativas}")
+        print(f"✅ Todos os testes de estresse passaram!")
+        print("\n🎉 SISTEMA APROVADO NO TESTE DE CARGA")
+    finally:
+        db.close()
+
+    print("=" * 60)
+
+
+def test_estresse_e_performance(sqlite_engine, sqlite_session_local):
+    """Cenários de estresse num banco temporário (o banco de testes compartilhado fica intacto)."""
+    ensure_resumo_mensal(sqlite_engine)
+    ensure_contas_fts(sqlite_engine)
+    _executar()
+
+
+if __name__ == "__main__":
+    # Execução direta: roda contra o banco configurado (DATABASE_URL)
+    init_database()
+    _executar()
@@ -60,6 +60,26 @@ def test_get_shopee_order_details_error(mock_get):
     
     assert result == []
 
+@patch('modules.shopee_api._aguarda_cota')
+@patch('requests.get')
+@patch('modules.config.SHOPEE_PARTNER_ID', 123456)
+@patch('modules.config.SHOPEE_PARTNER_KEY', 'test_key')
+@patch('modules.config.SHOPEE_ACCESS_TOKEN', 'test_token')
+@patch('modules.config.SHOPEE_SHOP_ID', 789)
+def test_get_shopee_order_details_uses_shop_quota_and_breaker(mock_get, mock_cota):
+    """Detalhes passam pela cota da loja e pelo circuit breaker do path"""
+    from modules.circuit_breaker import CircuitOpenError, get_breaker
+    from modules.sync_apis import get_shopee_order_details
+
+    mock_get.return_value = Mock(status_code=200, json=Mock(return_value={'response': {'order_list': []}}))
+    get_shopee_order_details(['ORDER123'])
+    assert mock_cota.call_count == 1
+
+    circuito = get_breaker('shopee', '/api/v2/order/get_order_detail')
+    with patch.object(circuito, 'permitir', side_effect=CircuitOpenError('aberto')):
+        assert get_shopee_order_details(['ORDER123']) == []
+    assert mock_get.call_count == 1
+
 @patch('modules.config.SHOPEE_ACCESS_TOKEN', None)
 def test_get_shopee_order_details_no_token():
     """Test that missing access token returns empty list"""
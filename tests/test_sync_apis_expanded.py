@@ -2,13 +2,14 @@ import pytest
 from unittest.mock import Mock, patch, MagicMock
 from modules.sync_apis import sync_shopee_pedidos, get_shopee_order_details
 
-@patch('modules.sync_apis.add_conta')
+@patch('modules.sync_apis.add_contas_bulk')
 @patch('modules.sync_apis.get_shopee_order_details')
 @patch('modules.sync_apis.listar_pedidos')
 @patch('modules.sync_apis.get_access_token')
 def test_sync_shopee_pedidos_full_flow(mock_token, mock_listar, mock_details, mock_add):
     """Test complete sync flow with order processing"""
     mock_token.return_value = 'valid_token'
+    mock_add.return_value = {'ids': [1, 2], 'skipped': []}
     
     mock_listar.return_value = {
         'order_list': [
@@ -54,6 +55,10 @@ def test_sync_shopee_pedidos_full_flow(mock_token, mock_listar, mock_details, mo
     # Verify orders were fetched
     assert mock_listar.called
     assert mock_details.called
+    # Todos os pedidos gravados em uma única chamada em lote
+    mock_add.assert_called_once()
+    assert [c['order_sn'] for c in mock_add.call_args[0][0]] == ['ORDER001', 'ORDER002']
+    assert result['total_importados'] == 2
 
 @patch('requests.get')
 @patch('modules.config.SHOPEE_PARTNER_ID', 123456)
@@ -0,0 +1,115 @@
+"""
+Testes da sincronização de pedidos do Tiny (sync_tiny_erp).
+"""
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+import sync_tiny_erp
+from modules import config
+from modules.rate_limiter import AdaptiveRateLimiter
+from modules.tiny_api import get_client, listar_pedidos
+
+
+class TinyFalso:
+    """listar_pedidos falso: N páginas, latência fixa e medição de chamadas simultâneas."""
+
+    def __init__(self, paginas, latencia=0.05, falhas=(), bloqueadas=()):
+        self.paginas = paginas
+        self.latencia = latencia
+        self.falhas = set(falhas)
+        self.bloqueadas = set(bloqueadas)
+        self.ativas = 0
+        self.maximo = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, page, data_inicial=None, data_final=None):
+        with self._lock:
+            self.ativas += 1
+            self.maximo = max(self.maximo, self.ativas)
+        time.sleep(self.latencia)
+        with self._lock:
+            self.ativas -= 1
+        if page in self.falhas:
+            return {'error': 'Timeout', 'retorno': {'pedidos': []}}
+        if page in self.bloqueadas:
+            # Resposta do Tiny com HTTP 200, sem chave 'error'
+            return {'retorno': {'status': 'Erro', 'codigo_erro': '6', 'erros': [{'erro': 'API Bloqueada'}]}}
+        pedidos = [{'pedido': {'numero': f'{page}-{i}', 'data_pedido': '10/01/2025', 'valor': '10.0',
+                               'nome': 'Cliente', 'situacao': 'Aprovado'}} for i in range(3)]
+        return {'retorno': {'status': 'OK', 'numero_paginas': self.paginas, 'pedidos': pedidos}}
+
+
+def _sync(tiny, workers=4):
+    gravadas = []
+
+    def add_contas_bulk(contas):
+        time.sleep(0.02)  # escrita no banco
+        gravadas.append(contas)
+        return {'ids': list(range(len(contas))), 'skipped': []}
+
+    with patch.object(sync_tiny_erp, 'listar_pedidos', tiny), \
+            patch.object(sync_tiny_erp, 'add_contas_bulk', add_contas_bulk), \
+            patch.object(sync_tiny_erp, 'init_database'):
+        inicio = time.perf_counter()
+        stats = sync_tiny_erp.sync_pedidos_tiny(dias=90, workers=workers)
+    return stats, gravadas, time.perf_counter() - inicio
+
+
+def test_pages_are_fetched_concurrently_and_all_written():
+    tiny = TinyFalso(paginas=12)
+    stats, gravadas, decorrido = _sync(tiny, workers=4)
+
+    assert stats['paginas_processadas'] == 12
+    assert stats['pedidos_processados'] == 36 and stats['contas_criadas'] == 36
+    assert stats['erros'] == 0
+    assert len(gravadas) == 12
+    assert tiny.maximo == 4
+    # Sequencial seriam 12 x (50 + 20) ms
+    assert decorrido < 0.7
+
+
+def test_failed_page_is_counted_and_others_still_processed():
+    stats, gravadas, _ = _sync(TinyFalso(paginas=5, latencia=0, falhas={3}, bloqueadas={4}))
+    assert stats['erros'] == 2
+    assert sorted(stats['paginas_com_erro']) == [3, 4]
+    assert stats['paginas_processadas'] == 3
+    assert len(gravadas) == 3
+
+
+@pytest.mark.parametrize('falha', ['falhas', 'bloqueadas'])
+def test_error_on_first_page_stops_sync(falha):
+    tiny = TinyFalso(paginas=5, latencia=0, **{falha: {1}})
+    stats, gravadas, _ = _sync(tiny)
+    assert stats['erros'] == 1 and gravadas == []
+    assert stats['paginas_com_erro'] == [1]
+    assert tiny.maximo == 1
+
+
+def test_throttled_pages_are_fetched_again_by_the_client():
+    """codigo_erro=6 com HTTP 200 e 429: a página espera a pausa do limitador e é buscada de novo"""
+    bloqueio = {'retorno': {'status': 'Erro', 'codigo_erro': '6'}}
+    por_pagina = {1: [bloqueio, TinyFalso(paginas=3, latencia=0)(1)],
+                  2: [429, TinyFalso(paginas=3, latencia=0)(2)],
+                  3: [TinyFalso(paginas=3, latencia=0)(3)]}
+    lock = threading.Lock()
+
+    def get(url, params=None, **kwargs):
+        with lock:
+            corpo = por_pagina[params['pagina']].pop(0)
+        resp = Mock(status_code=corpo if corpo == 429 else 200, text=str(corpo), headers={})
+        resp.json.return_value = corpo if corpo != 429 else {}
+        return resp
+
+    client = get_client()
+    limiter = AdaptiveRateLimiter('teste_pedidos', dormir=lambda s: None)
+    with patch.object(client, 'limiter', limiter), \
+            patch.object(client.session, 'get', side_effect=get), \
+            patch.object(config, 'TINY_API_TOKEN', 'test_token'):
+        stats, gravadas, _ = _sync(listar_pedidos)
+
+    assert stats['erros'] == 0 and stats['paginas_com_erro'] == []
+    assert stats['paginas_processadas'] == 3 and len(gravadas) == 3
+    assert limiter.state()['bloqueios'] == 2
@@ -10,7 +10,7 @@ from modules import config
 class TestTinyApiAdditional:
     """Additional tests for Tiny API functions with low coverage"""
     
-    @patch('modules.tiny_api.requests.get')
+    @patch('modules.tiny_api.requests.Session.get')
     def test_obter_produto_detalhado_success(self, mock_get):
         """Test fetching detailed product information"""
         mock_response = Mock()
@@ -37,7 +37,7 @@ class TestTinyApiAdditional:
             assert result['preco'] == 15050.0
             assert result['preco_custo'] == 10025.0
     
-    @patch('modules.tiny_api.requests.get')
+    @patch('modules.tiny_api.requests.Session.get')
     def test_obter_produto_detalhado_not_found(self, mock_get):
         """Test product not found"""
         mock_response = Mock()
@@ -53,7 +53,7 @@ class TestTinyApiAdditional:
             assert 'error' in result
             assert result['error'] == 'Produto não encontrado'
     
-    @patch('modules.tiny_api.requests.get')
+    @patch('modules.tiny_api.requests.Session.get')
     def test_obter_produto_por_sku_ou_nome_by_sku(self, mock_get):
         """Test fetching product by SKU"""
         mock_response = Mock()
@@ -81,7 +81,7 @@ class TestTinyApiAdditional:
             assert result['codigo'] == 'PROD001'
             assert result['nome'] == 'Product Name'
     
-    @patch('modules.tiny_api.requests.get')
+    @patch('modules.tiny_api.requests.Session.get')
     def test_obter_produto_por_sku_ou_nome_by_name(self, mock_get):
         """Test fetching product by name when SKU not found"""
         # First call (SKU search) returns empty
@@ -121,7 +121,7 @@ class TestTinyApiAdditional:
             assert result['codigo'] == 'PROD002'
             assert 'Widget' in result['nome']
     
-    @patch('modules.tiny_api.requests.get')
+    @patch('modules.tiny_api.requests.Session.get')
     def test_obter_produto_sem_token(self, mock_get):
         """Test product fetch without token configured"""
         with patch.object(config, 'TINY_API_TOKEN', ''):
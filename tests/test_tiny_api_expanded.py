@@ -8,7 +8,7 @@ from modules.tiny_api import (
 )
 from modules import config
 
-@patch('modules.tiny_api.requests.get')
+@patch('modules.tiny_api.requests.Session.get')
 def test_listar_produtos_pagination(mock_get):
     """Test product listing with pagination"""
     mock_response = Mock()
@@ -33,7 +33,7 @@ def test_listar_produtos_pagination(mock_get):
         assert result['retorno']['numero_paginas'] == 3
         assert len(result['retorno']['produtos']) == 100
 
-@patch('modules.tiny_api.requests.get')
+@patch('modules.tiny_api.requests.Session.get')
 def test_obter_produto_por_sku_multiple_results(mock_get):
     """Test product fetch when multiple results returned"""
     mock_response = Mock()
@@ -55,7 +55,7 @@ def test_obter_produto_por_sku_multiple_results(mock_get):
         assert result['codigo'] == 'SKU001'
         assert result['nome'] == 'First Match'
 
-@patch('modules.tiny_api.requests.post')
+@patch('modules.tiny_api.requests.Session.post')
 def test_atualizar_preco_custo_success(mock_post):
     """Test successful cost price update"""
     mock_response = Mock()
@@ -77,7 +77,7 @@ def test_atualizar_preco_custo_success(mock_post):
         assert result['status_code'] == 200
         assert result['data']['retorno']['status'] == 'OK'
 
-@patch('modules.tiny_api.requests.post')
+@patch('modules.tiny_api.requests.Session.post')
 def test_atualizar_preco_custo_retry(mock_post):
     """Test cost price update with retry on failure"""
     # First call fails, second succeeds
@@ -105,7 +105,7 @@ def test_atualizar_preco_custo_retry(mock_post):
         assert result['data']['retorno']['status'] == 'OK'
         assert mock_post.call_count == 2
 
-@patch('modules.tiny_api.requests.get')
+@patch('modules.tiny_api.requests.Session.get')
 def test_obter_produto_detalhado_fields(mock_get):
     """Test detailed product fetch returns all expected fields"""
     mock_response = Mock()
@@ -133,3 +133,48 @@ def test_obter_produto_detalhado_fields(mock_get):
         assert result['preco_custo'] == 100.00
         assert 'raw' in result
         assert result['raw']['ncm'] == '12345678'
+
+@patch('modules.tiny_api.requests.Session.get')
+def test_obter_produtos_por_skus_uses_cache_in_batch(mock_get):
+    """Custos por SKU: API só para SKUs fora do cache; o resto vem num MGET"""
+    from modules.cache import cache_clear
+    from modules.tiny_api import custos_por_sku
+    cache_clear()
+
+    def resposta(url, params=None, timeout=None):
+        sku = params['pesquisa']
+        r = Mock()
+        r.status_code = 200
+        produtos = [] if sku == 'SUMIU' else [{'produto': {'codigo': sku, 'nome': sku, 'preco_custo': '12,50'}}]
+        r.json.return_value = {'retorno': {'produtos': produtos}}
+        return r
+    mock_get.side_effect = resposta
+
+    with patch.object(config, 'TINY_API_TOKEN', 'test_token'):
+        assert custos_por_sku(['A', 'B', 'A', 'SUMIU']) == {'A': 12.5, 'B': 12.5, 'SUMIU': 0.0}
+        assert mock_get.call_count == 3
+        # Segunda página com os mesmos SKUs (inclusive o inexistente): nenhuma chamada nova
+        assert custos_por_sku(['B', 'SUMIU', 'C']) == {'B': 12.5, 'SUMIU': 0.0, 'C': 12.5}
+        assert mock_get.call_count == 4
+
+def test_tiny_client_reuses_session_and_reads_token_per_call():
+    """Todas as operações usam a mesma Session; o token vem do config no momento da chamada"""
+    from modules.rate_limiter import AdaptiveRateLimiter
+    from modules.tiny_api import TINY_POOL_SIZE, TinyClient, get_client, nota_fiscal_lancar_estoque
+
+    client = get_client()
+    assert get_client() is client
+    assert client.session.get_adapter('https://api.tiny.com.br')._pool_maxsize == TINY_POOL_SIZE
+
+    resposta = Mock(status_code=200, text='{}', headers={'x-limit-api': '60', 'x-remaining-api': '59'})
+    resposta.json.return_value = {'retorno': {'status': 'OK'}}
+    with patch.object(client, 'limiter', AdaptiveRateLimiter('teste')), \
+            patch.object(client.session, 'post', return_value=resposta) as mock_post:
+        with patch.object(config, 'TINY_API_TOKEN', 'token_novo'):
+            assert atualizar_preco_custo('SKU1', 10)['x_remaining_api'] == '59'
+            assert nota_fiscal_lancar_estoque(123)['ok'] is True
+    assert mock_post.call_args_list[0].kwargs['params']['token'] == 'token_novo'
+    # lancar.estoque recebe token e id no corpo do formulário
+    assert mock_post.call_args_list[1].kwargs['data'] == {'token': 'token_novo', 'formato': 'json', 'id': 123}
+    assert TinyClient.limites(Mock(headers={})) == (None, None)
+
@@ -0,0 +1,103 @@
+"""
+Testes do cliente assíncrono do Tiny (tiny_async).
+"""
+import asyncio
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+from modules import config, tiny_api
+from modules.rate_limiter import AdaptiveRateLimiter
+from modules.tiny_async import (
+    AsyncTinyClient, atualizar_precos_custo_paralelo, em_paralelo, obter_produtos_paralelo, rodar
+)
+
+
+class Contador:
+    """Operação falsa que mede quantas chamadas ficaram em andamento ao mesmo tempo."""
+
+    def __init__(self, duracao=0.05):
+        self.duracao = duracao
+        self.ativas = 0
+        self.maximo = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, sku, **kwargs):
+        with self._lock:
+            self.ativas += 1
+            self.maximo = max(self.maximo, self.ativas)
+        time.sleep(self.duracao)
+        with self._lock:
+            self.ativas -= 1
+        if sku == 'FALHA':
+            raise RuntimeError('falha simulada')
+        return {'codigo': sku}
+
+
+def test_fan_out_is_bounded_and_keeps_order():
+    operacao = Contador()
+    skus = [f'SKU{i}' for i in range(20)]
+    inicio = time.perf_counter()
+    with patch.object(tiny_api, 'obter_produto_por_sku', operacao):
+        resultados = em_paralelo('pesquisar_produto', skus, concorrencia=5)
+    decorrido = time.perf_counter() - inicio
+
+    assert [r['codigo'] for r in resultados] == skus
+    assert operacao.maximo == 5
+    # 20 chamadas de 50 ms: ~4 rodadas, longe dos ~1 s sequenciais
+    assert decorrido < 0.6
+
+
+def test_exceptions_stay_in_place_of_results():
+    with patch.object(tiny_api, 'obter_produto_por_sku', Contador(0)):
+        produtos = obter_produtos_paralelo(['A', 'FALHA', 'B', 'A', ''])
+    assert list(produtos) == ['A', 'FALHA', 'B']
+    assert isinstance(produtos['FALHA'], RuntimeError)
+    assert produtos['B'] == {'codigo': 'B'}
+    assert em_paralelo('pesquisar_produto', []) == []
+
+
+def test_tasks_wait_for_limiter_pause_in_event_loop():
+    # Limitador em pausa por um bloqueio: 0,2 s até a próxima permissão
+    cliente = Mock(limiter=Mock(espera_estimada=Mock(return_value=0.2)))
+    operacao = Mock(return_value={'ok': True})
+
+    async def _lote():
+        async with AsyncTinyClient(concorrencia=2) as tiny:
+            inicio = time.perf_counter()
+            await tiny.executar(operacao, 'x')
+            return time.perf_counter() - inicio
+
+    with patch.object(tiny_api, 'get_client', return_value=cliente):
+        assert rodar(_lote()) >= 0.19
+    operacao.assert_called_once_with('x')
+
+
+def test_rodar_works_inside_running_loop():
+    async def _dentro():
+        async def _valor():
+            return 42
+        return rodar(_valor())
+
+    assert asyncio.run(_dentro()) == 42
+
+
+def test_parallel_cost_update_goes_through_shared_client():
+    ok = Mock(status_code=200, text='{}', headers={})
+    ok.json.return_value = {'retorno': {'status': 'OK'}}
+    client = tiny_api.get_client()
+    with patch.object(client, 'limiter', AdaptiveRateLimiter('teste_async')), \
+            patch.object(client.session, 'post', return_value=ok) as post, \
+            patch.object(config, 'TINY_API_TOKEN', 'test_token'):
+        resultados = atualizar_precos_custo_paralelo({'SKU1': 10.5, 'SKU2': 3})
+
+    assert {k: r['ok'] for k, r in resultados.items()} == {'SKU1': True, 'SKU2': True}
+    assert post.call_count == 2
+    assert all(c.args[0].endswith('produto.alterar.php') for c in post.call_args_list)
+
+
+def test_unknown_operation_raises():
+    with pytest.raises(AttributeError):
+        em_paralelo('operacao_inexistente', ['x'])
@@ -3,7 +3,7 @@ from unittest.mock import Mock, patch
 from modules.tiny_api import listar_produtos, obter_produto_por_sku, obter_produto_detalhado
 from modules import config
 
-@patch('modules.tiny_api.requests.get')
+@patch('modules.tiny_api.requests.Session.get')
 def test_listar_produtos_success(mock_get):
     """Test product listing with mocked successful Tiny API response"""
     mock_response = Mock()
@@ -28,7 +28,7 @@ def test_listar_produtos_success(mock_get):
         assert 'retorno' in result
         assert len(result['retorno']['produtos']) == 2
 
-@patch('modules.tiny_api.requests.get')
+@patch('modules.tiny_api.requests.Session.get')
 def test_listar_produtos_timeout(mock_get):
     """Test product listing handles timeout gracefully"""
     mock_get.side_effect = Exception('Timeout')
@@ -47,7 +47,7 @@ def test_listar_produtos_no_token():
         assert 'error' in result
         assert 'Token não configurado' in result['error']
 
-@patch('modules.tiny_api.requests.get')
+@patch('modules.tiny_api.requests.Session.get')
 def test_obter_produto_por_sku_success(mock_get):
     """Test fetching product by SKU with mocked response"""
     mock_response = Mock()
@@ -77,7 +77,7 @@ def test_obter_produto_por_sku_success(mock_get):
         assert result['preco'] == 99.90
         assert result['preco_custo'] == 50.00
 
-@patch('modules.tiny_api.requests.get')
+@patch('modules.tiny_api.requests.Session.get')
 def test_obter_produto_por_sku_not_found(mock_get):
     """Test product not found by SKU returns error"""
     mock_response = Mock()
@@ -95,7 +95,7 @@ def test_obter_produto_por_sku_not_found(mock_get):
         assert 'error' in result
         assert 'não encontrado' in result['error'].lower()
 
-@patch('modules.tiny_api.requests.get')
+@patch('modules.tiny_api.requests.Session.get')
 def test_obter_produto_detalhado_success(mock_get):
     """Test fetching detailed product info with mocked response"""
     mock_response = Mock()
@@ -119,7 +119,7 @@ def test_obter_produto_detalhado_success(mock_get):
         assert result['codigo'] == 'DETAIL001'
         assert result['preco'] == 199.99
 
-@patch('modules.tiny_api.requests.get')
+@patch('modules.tiny_api.requests.Session.get')
 def test_obter_produto_detalhado_error(mock_get):
     """Test detailed product fetch handles errors"""
     mock_get.side_effect = Exception('Network error')